@@ -30,23 +30,30 @@
 #
 # The script will add recommended mount options, if not provided in fstab.
 
+import atexit
 import base64
 import errno
 import hashlib
 import hmac
+import importlib
+import importlib.util
+import io
 import ipaddress
 import json
 import logging
+import math
 import os
 import platform
 import pwd
 import random
 import re
+import select
 import socket
 import subprocess
 import sys
 import threading
 import time
+from collections import namedtuple
 from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
 from logging.handlers import RotatingFileHandler
@@ -57,6 +64,11 @@ except ImportError:
     import ConfigParser
     from ConfigParser import NoOptionError, NoSectionError
 
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
 try:
     from urllib.parse import quote_plus
 except ImportError:
@@ -71,19 +83,42 @@ except ImportError:
 
     from urllib2 import HTTPError, HTTPHandler, Request, URLError, build_opener, urlopen
 
-try:
-    import botocore.config
-    import botocore.session
-    from botocore.exceptions import (
-        ClientError,
-        EndpointConnectionError,
-        NoCredentialsError,
-        ProfileNotFound,
-    )
 
-    BOTOCORE_PRESENT = True
-except ImportError:
-    BOTOCORE_PRESENT = False
+class DeferredImport(object):
+    """
+    Stand-in for a module that is imported on first attribute access
+    """
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+
+def is_module_available(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+# botocore is only needed for CloudWatch logging, the mount target ip address fallback and named profile credentials,
+# while importing it takes a large part of the start up time of mount.efs
+botocore_config = DeferredImport("botocore.config")
+botocore_session = DeferredImport("botocore.session")
+botocore_exceptions = DeferredImport("botocore.exceptions")
+
+BOTOCORE_PRESENT = is_module_available("botocore")
+# botocore sessions by named profile, and clients by service, region, named profile and FIPS setting
+BOTOCORE_SESSIONS = {}
+BOTOCORE_CLIENTS = {}
+BOTOCORE_CLIENTS_LOCK = threading.Lock()
+BOTOCORE_SERVICES = ("ec2", "efs", "logs")
+# Library callers of mount() and background threads, such as the cloudwatch log shipper, set quiet so that fatal_error
+# only raises: library callers get the exception alone, and failures of background threads are not failed mounts
+FATAL_ERROR_STATE = threading.local()
 
 
 VERSION = "2.3.3"
@@ -105,6 +140,15 @@ CLIENT_SOURCE_STR_LEN_LIMIT = 100
 CLOUDWATCHLOG_AGENT = None
 CLOUDWATCH_LOG_SECTION = "cloudwatch-log"
 DEFAULT_CLOUDWATCH_LOG_GROUP = "/aws/efs/utils"
+DEFAULT_CLOUDWATCH_LOG_FLUSH_TIMEOUT_SEC = 5
+CLOUDWATCH_LOG_QUEUE_SIZE = 1000
+# PutLogEvents limits, where every event counts with its message size in bytes plus 26 bytes
+CLOUDWATCH_LOG_MAX_BATCH_EVENTS = 10000
+CLOUDWATCH_LOG_MAX_BATCH_BYTES = 1048576
+CLOUDWATCH_LOG_EVENT_OVERHEAD_BYTES = 26
+CLOUDWATCH_LOG_MAX_EVENT_BYTES = 262144
+CLOUDWATCH_LOG_PROVISIONED_DIR = "cloudwatch-log"
+CLOUDWATCH_LOG_PROVISIONED_TTL_SEC = 24 * 60 * 60
 DEFAULT_FALLBACK_ENABLED = True
 DEFAULT_RETENTION_DAYS = 14
 DEFAULT_UNKNOWN_VALUE = "unknown"
@@ -119,14 +163,90 @@ FALLBACK_TO_MOUNT_TARGET_IP_ADDRESS_ITEM = (
     "fall_back_to_mount_target_ip_address_enabled"
 )
 INSTANCE_IDENTITY = None
+MOUNT_TARGET_CACHE_TTL_ITEM = "mount_target_ip_address_cache_ttl_sec"
+MOUNT_TARGET_PROBING_ENABLED_ITEM = "mount_target_probing_enabled"
+DEFAULT_MOUNT_TARGET_CACHE_TTL_SEC = 3600
 INSTANCE_AZ_ID_METADATA = None
-RETRYABLE_ERRORS = ["reset by peer"]
+# Substrings of the stderr of mount.nfs, the class of the failure and whether a mount attempt failing with it is retried
+NFS_MOUNT_FAILURES = [
+    ("reset by peer", "connection_reset", True),
+    ("connection refused", "connection_refused", True),
+    ("timed out", "timeout", True),
+    ("network is unreachable", "network_unreachable", True),
+    ("no route to host", "network_unreachable", True),
+    ("resource temporarily unavailable", "resource_unavailable", True),
+    ("access denied", "access_denied", False),
+    ("permission denied", "access_denied", False),
+    ("no such file or directory", "path_not_found", False),
+    ("not supported", "not_supported", False),
+    ("already mounted", "already_mounted", False),
+]
+# Durations of successful mount.nfs calls are kept in STATE_FILE_DIR/mount-history/<dns name>
+NFS_MOUNT_HISTORY_DIR = "mount-history"
+NFS_MOUNT_HISTORY_SIZE = 20
+NFS_MOUNT_HISTORY_MIN_SAMPLES = 5
+NFS_MOUNT_TIMEOUT_P99_FACTOR = 3
+MIN_NFS_MOUNT_COMMAND_TIMEOUT_SEC = 5
+NFS_MOUNT_BACKEND_PROBE_AFTER_SEC = 5
+NFS_MOUNT_POLL_INTERVAL_SEC = 0.5
 OPTIMIZE_READAHEAD_ITEM = "optimize_readahead"
+TUNNEL_SHARING_ENABLED_ITEM = "tunnel_sharing_enabled"
 
 LOG_DIR = "/var/log/amazon/efs"
 LOG_FILE = "mount.log"
 
 STATE_FILE_DIR = "/var/run/efs"
+# Mounts attached to a tunnel started by another mount record a reference in STATE_FILE_DIR/tunnel-refs/<state file>
+SHARED_TUNNEL_REFS_DIR = "tunnel-refs"
+# Resolved names are cached in STATE_FILE_DIR/dns-cache, names that do not exist for a shorter time
+DNS_CACHE_DIR = "dns-cache"
+DNS_CACHE_TTL_SEC = 60
+DNS_NEGATIVE_CACHE_TTL_SEC = 5
+# Time to wait for the addresses of the other family once the addresses of one family are resolved
+DNS_RESOLUTION_DELAY_SEC = 0.05
+DNS_CACHE = {}
+DNS_CACHE_LOCK = threading.Lock()
+NEGATIVE_DNS_ERRORS = [
+    socket.EAI_NONAME,
+    getattr(socket, "EAI_NODATA", socket.EAI_NONAME),
+]
+# Mount target ip addresses looked up by the fallback are cached in STATE_FILE_DIR/mount-targets/<fs id>.<az>
+MOUNT_TARGET_CACHE_DIR = "mount-targets"
+
+# mount.efs --daemon serves mount requests of mount.efs clients on this socket
+MOUNT_SERVICE_DAEMON_OPTION = "--daemon"
+MOUNT_SERVICE_SOCKET = os.path.join(STATE_FILE_DIR, "mount.sock")
+MOUNT_SERVICE_CONNECT_TIMEOUT_SEC = 1
+MOUNT_SERVICE_BACKLOG = 64
+# How often the daemon reaps the processes serving finished requests and checks the config file for changes
+MOUNT_SERVICE_POLL_INTERVAL_SEC = 1
+
+BATCH_MOUNT_OPTION = "--batch"
+FSTAB_FILE = "/etc/fstab"
+BATCH_MOUNT_CONCURRENCY_ITEM = "batch_mount_concurrency"
+DEFAULT_BATCH_MOUNT_CONCURRENCY = 4
+# Options of fstab entries that are consumed by mount(8) itself, and never passed to mount helpers
+FSTAB_ONLY_OPTIONS = [
+    "auto",
+    "comment",
+    "defaults",
+    "group",
+    "noauto",
+    "nofail",
+    "nogroup",
+    "noowner",
+    "nouser",
+    "owner",
+    "user",
+    "users",
+]
+BatchMountEntry = namedtuple(
+    "BatchMountEntry", ["fsname", "mountpoint", "options", "nofail"]
+)
+# The tls ports handed to this process by a batch mount, which are tried before the rest of the port range
+RESERVED_TLS_PORTS = []
+# The output of "stunnel -help", when it was loaded up front by a batch mount
+STUNNEL_OPTIONS = None
 
 PRIVATE_KEY_FILE = "/etc/amazon/efs/privateKey.pem"
 DATE_ONLY_FORMAT = "%Y%m%d"
@@ -230,6 +350,9 @@ NOT_BEFORE_MINS = 15
 NOT_AFTER_HOURS = 3
 
 EFS_PROXY_TLS_OPTION = "--tls"
+EFS_PROXY_READY_FD_OPTION = "--ready-fd"
+# How long to wait for efs-proxy to report that it is listening before probing the tlsport instead
+DEFAULT_TUNNEL_READY_TIMEOUT_SEC = 5
 
 EFS_ONLY_OPTIONS = [
     "accesspoint",
@@ -251,9 +374,27 @@ EFS_ONLY_OPTIONS = [
     "jwtpath",
     "fsap",
     "crossaccount",
+    "readahead_kb",
+    "perfprofile",
     LEGACY_STUNNEL_MOUNT_OPTION,
 ]
 
+NFS_PERFORMANCE_PROFILE_OPTION = "perfprofile"
+NFS_PERFORMANCE_PROFILE_ITEM = "performance_profile"
+# The NFS options every performance profile adds to the mount, unless they are given as mount options.
+# If you change these profiles, update the man page at man/mount.efs.8 and the README as well
+NFS_PERFORMANCE_PROFILES = {
+    # More TCP connections to spread large reads and writes over
+    "throughput": {"nconnect": "16"},
+    # Less head-of-line blocking between requests. timeo keeps its default of 60 seconds, a shorter one
+    # retransmits requests that are only slow and adds to the load of a busy server
+    "latency": {"nconnect": "4"},
+    # Cache file and directory attributes for a minute, saving the GETATTR calls of stat-heavy workloads
+    "metadata": {"nconnect": "4", "actimeo": "60"},
+}
+# The Linux kernel version that first supports an NFS option added by a performance profile
+NFS_OPTION_MIN_LINUX_KERNEL_VERSIONS = {"nconnect": [5, 3]}
+
 UNSUPPORTED_OPTIONS = ["capath"]
 
 STUNNEL_GLOBAL_CONFIG = {
@@ -294,6 +435,9 @@ MACOS_SEQUOIA_RELEASE = "macOS-15"
 DEFAULT_NFS_MAX_READAHEAD_MULTIPLIER = 15
 NFS_READAHEAD_CONFIG_PATH_FORMAT = "/sys/class/bdi/%s:%s/read_ahead_kb"
 NFS_READAHEAD_OPTIMIZE_LINUX_KERNEL_MIN_VERSION = [5, 4]
+# The readahead settings of every mount, which the watchdog re-applies when the config file changes
+READAHEAD_STATE_DIR = "readahead"
+LINUX_KERNEL_VERSIONS = {}
 
 # MacOS does not support the property of Socket SO_BINDTODEVICE in stunnel configuration
 SKIP_NO_SO_BINDTODEVICE_RELEASES = [
@@ -374,14 +518,70 @@ class FallbackException(Exception):
         super().__init__(self.message)
 
 
-def fatal_error(user_message, log_message=None, exit_code=1):
+class MountError(Exception):
+    """Exception raised when the file system cannot be mounted
+
+    Callers of mount() can catch it, or one of the subclasses below, and main turns it into the exit code of mount.efs.
+
+    Attributes:
+        message -- explanation of the error
+        exit_code -- exit code of mount.efs for the error
+    """
+
+    def __init__(self, message, exit_code=1):
+        self.message = message
+        self.exit_code = exit_code
+        super().__init__(message)
+
+    def __str__(self):
+        return str(self.message)
+
+
+class MountOptionsError(MountError):
+    """Exception raised for invalid mount options or file system names"""
+
+
+class TargetResolutionError(MountError):
+    """Exception raised when the region, DNS name or mount target ip address of the file system cannot be found"""
+
+
+class CredentialsError(MountError):
+    """Exception raised when the AWS credentials for an iam mount cannot be retrieved"""
+
+
+class TunnelError(MountError):
+    """Exception raised when the TLS tunnel (efs-proxy or stunnel) cannot be started"""
+
+
+class NfsMountError(MountError):
+    """Exception raised when the mount.nfs command fails"""
+
+
+MountResult = namedtuple(
+    "MountResult",
+    [
+        "fs_id",
+        "mountpoint",
+        "dns_name",
+        "fallback_ip_address",
+        "tls_port",
+        "tunnel_pid",
+        "duration_sec",
+    ],
+)
+
+
+def fatal_error(user_message, log_message=None, exit_code=1, error=MountError):
     if log_message is None:
         log_message = user_message
 
+    if getattr(FATAL_ERROR_STATE, "quiet", False):
+        raise error(user_message, exit_code)
+
     sys.stderr.write("%s\n" % user_message)
     logging.error(log_message)
     publish_cloudwatch_log(CLOUDWATCHLOG_AGENT, "Mount failed, %s" % log_message)
-    sys.exit(exit_code)
+    raise error(user_message, exit_code)
 
 
 def get_target_region(config, options):
@@ -391,6 +591,7 @@ def get_target_region(config, options):
             "in the efs-utils configuration file or specify it as a "
             "mount option.",
             message,
+            error=TargetResolutionError,
         )
 
     # Check mount option first
@@ -544,7 +745,7 @@ def get_az_id_from_ecs_fargate_response(config, options, az_id_metadata):
     except TypeError as e:
         logging.warning("response %s is not a json object: %s" % (az_id_metadata, e))
     except FallbackException as e:
-        fatal_error(e.message)
+        fatal_error(e.message, error=TargetResolutionError)
     return None
 
 
@@ -796,7 +997,7 @@ def get_aws_security_credentials(
         "from ECS credentials relative uri, or from the instance security credentials service"
         % (AWS_CREDENTIALS_FILE, AWS_CONFIG_FILE)
     )
-    fatal_error(error_msg, error_msg)
+    fatal_error(error_msg, error_msg, error=CredentialsError)
 
 
 def get_aws_security_credentials_from_awsprofile(awsprofile, is_fatal=False):
@@ -819,7 +1020,7 @@ def get_aws_security_credentials_from_awsprofile(awsprofile, is_fatal=False):
             "AWS security credentials not found in %s or %s under named profile [%s]"
             % (AWS_CREDENTIALS_FILE, AWS_CONFIG_FILE, awsprofile)
         )
-        fatal_error(log_message)
+        fatal_error(log_message, error=CredentialsError)
     else:
         return None, None
 
@@ -842,7 +1043,9 @@ def get_aws_security_credentials_from_ecs(config, aws_creds_uri, is_fatal=False)
 
     # Fail if credentials cannot be fetched from the given aws_creds_uri
     if is_fatal:
-        fatal_error(ecs_unsuccessful_resp, ecs_unsuccessful_resp)
+        fatal_error(
+            ecs_unsuccessful_resp, ecs_unsuccessful_resp, error=CredentialsError
+        )
     else:
         return None, None
 
@@ -856,7 +1059,7 @@ def get_aws_security_credentials_from_webidentity(
     except Exception as e:
         if is_fatal:
             unsuccessful_resp = "Error reading token file %s: %s" % (token_file, e)
-            fatal_error(unsuccessful_resp, unsuccessful_resp)
+            fatal_error(unsuccessful_resp, unsuccessful_resp, error=CredentialsError)
         else:
             return None, None
 
@@ -905,7 +1108,7 @@ def get_aws_security_credentials_from_webidentity(
 
     # Fail if credentials cannot be fetched from the given aws_creds_uri
     if is_fatal:
-        fatal_error(unsuccessful_resp, unsuccessful_resp)
+        fatal_error(unsuccessful_resp, unsuccessful_resp, error=CredentialsError)
     else:
         return None, None
 
@@ -928,14 +1131,18 @@ def get_aws_security_credentials_from_pod_identity(config, is_fatal=False):
                     unsuccessful_resp = (
                         "AWS Container Auth Token contains invalid characters"
                     )
-                    fatal_error(unsuccessful_resp, unsuccessful_resp)
+                    fatal_error(
+                        unsuccessful_resp, unsuccessful_resp, error=CredentialsError
+                    )
                 return None, None
+    except MountError:
+        raise
     except Exception as e:
         if is_fatal:
             unsuccessful_resp = (
                 f"Error reading Aws Container Auth Token file {token_file}: {e}"
             )
-            fatal_error(unsuccessful_resp, unsuccessful_resp)
+            fatal_error(unsuccessful_resp, unsuccessful_resp, error=CredentialsError)
         return None, None
 
     unsuccessful_resp = f"Unsuccessful retrieval of AWS security credentials from Container Credentials URI at {creds_uri}"
@@ -955,7 +1162,7 @@ def get_aws_security_credentials_from_pod_identity(config, is_fatal=False):
         return pod_identity_security_dict, f"podidentity:{creds_uri},{token_file}"
 
     if is_fatal:
-        fatal_error(unsuccessful_resp, unsuccessful_resp)
+        fatal_error(unsuccessful_resp, unsuccessful_resp, error=CredentialsError)
     return None, None
 
 
@@ -1061,15 +1268,16 @@ def botocore_credentials_helper(awsprofile):
             % awsprofile
         )
         return credentials
-    session = botocore.session.get_session()
+    session = botocore_session.get_session()
     session.set_config_variable("profile", awsprofile)
 
     try:
         frozen_credentials = session.get_credentials().get_frozen_credentials()
-    except ProfileNotFound as e:
+    except botocore_exceptions.ProfileNotFound as e:
         fatal_error(
             "%s, please add the [profile %s] section in the aws config file following %s and %s."
-            % (e, awsprofile, NAMED_PROFILE_HELP_URL, CONFIG_FILE_SETTINGS_HELP_URL)
+            % (e, awsprofile, NAMED_PROFILE_HELP_URL, CONFIG_FILE_SETTINGS_HELP_URL),
+            error=CredentialsError,
         )
 
     credentials["AccessKeyId"] = frozen_credentials.access_key
@@ -1225,6 +1433,14 @@ def choose_tls_port_and_get_bind_sock(config, options, state_file_dir):
         # shuffle the ports_to_try to reduce possibility of multiple mounts starting from same port range
         random.shuffle(ports_to_try)
 
+        reserved_ports = [
+            port for port in RESERVED_TLS_PORTS if lower_bound <= port < upper_bound
+        ]
+        if reserved_ports:
+            ports_to_try = reserved_ports + [
+                port for port in ports_to_try if port not in reserved_ports
+            ]
+
     if "netns" not in options:
         tls_port_sock = find_tls_port_in_range_and_get_bind_sock(
             ports_to_try, state_file_dir
@@ -1241,12 +1457,14 @@ def choose_tls_port_and_get_bind_sock(config, options, state_file_dir):
     if "tlsport" in options:
         fatal_error(
             "Specified port [%s] is unavailable. Try selecting a different port."
-            % options["tlsport"]
+            % options["tlsport"],
+            error=TunnelError,
         )
     else:
         fatal_error(
             "Failed to locate an available port in the range [%d, %d], try specifying a different port range in %s"
-            % (lower_bound, upper_bound, CONFIG_FILE)
+            % (lower_bound, upper_bound, CONFIG_FILE),
+            error=TunnelError,
         )
 
 
@@ -1391,6 +1609,9 @@ def is_stunnel_option_supported(
 
 
 def get_stunnel_options():
+    if STUNNEL_OPTIONS is not None:
+        return STUNNEL_OPTIONS
+
     stunnel_command = [_stunnel_bin(), "-help"]
     proc = subprocess.Popen(
         stunnel_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True
@@ -1601,12 +1822,14 @@ def write_tunnel_state_file(
     files,
     state_file_dir,
     cert_details=None,
+    tunnel_key=None,
 ):
     """
     Return the name of the temporary file containing TLS tunnel state, prefixed with a '~'. This file needs to be renamed to a
     non-temporary version following a successful mount.
 
-    The "tunnel" here refers to efs-proxy, or stunnel.
+    The "tunnel" here refers to efs-proxy, or stunnel. A tunnel_key is only recorded for tunnels that later mounts
+    with the same connection profile may share.
     """
     state_file = "~" + get_mount_specific_filename(fs_id, mountpoint, tls_port)
 
@@ -1621,6 +1844,9 @@ def write_tunnel_state_file(
     if cert_details:
         state.update(cert_details)
 
+    if tunnel_key:
+        state["tunnelKey"] = tunnel_key
+
     with open(os.path.join(state_file_dir, state_file), "w") as f:
         json.dump(state, f)
 
@@ -1655,20 +1881,250 @@ def test_tunnel_process(tunnel_proc, fs_id):
             'Failed to start tunnel (errno=%d), stderr="%s". If the stderr is lacking enough details, please '
             "enable stunnel debug log in efs-utils config file and retry the mount to capture more info."
             % (tunnel_proc.returncode, err.strip()),
+            error=TunnelError,
+        )
+
+
+def open_pidfd(pid):
+    """
+    Return a file descriptor that becomes readable when the process exits, or None when pidfd_open is not available
+    (MacOS, Linux kernel < 5.3 or Python < 3.9)
+    """
+    if not hasattr(os, "pidfd_open"):
+        return None
+    try:
+        return os.pidfd_open(pid)
+    except (OSError, TypeError) as e:
+        logging.debug("Unable to open pidfd for pid %s, %s", pid, e)
+        return None
+
+
+def poll_tunnel_process(
+    tunnel_proc,
+    fs_id,
+    mount_completed,
+    mount_completed_fd=None,
+    tunnel_errors=None,
+    quiet=False,
+):
+    """
+    watch the tunnel process health during the mount attempt to fail fast if the tunnel dies - since this is not called
+    from the main thread, if the tunnel fails, exit uncleanly with os._exit, or if tunnel_errors is given, append the
+    error to it and return
+
+    Where pidfd is supported, block until either the tunnel exits or mount_completed_fd becomes readable, otherwise
+    poll the tunnel process every .5s. quiet is the FATAL_ERROR_STATE of the thread that mounts.
+    """
+    FATAL_ERROR_STATE.quiet = quiet
+    pidfd = open_pidfd(tunnel_proc.pid) if mount_completed_fd is not None else None
+    try:
+        while not mount_completed.is_set():
+            try:
+                test_tunnel_process(tunnel_proc, fs_id)
+            except MountError as e:
+                if tunnel_errors is None:
+                    flush_cloudwatch_log(CLOUDWATCHLOG_AGENT)
+                    os._exit(e.exit_code)
+                tunnel_errors.append(e)
+                return
+            if pidfd is not None:
+                select.select([pidfd, mount_completed_fd], [], [])
+            else:
+                mount_completed.wait(0.5)
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+
+
+@contextmanager
+def watch_tunnel_process(tunnel_proc, fs_id, exit_on_failure=True):
+    """
+    Watch the tunnel process in a background thread for the duration of the context, so the mount fails as soon as
+    the tunnel dies. There is nothing to watch when the mount attached to a tunnel owned by another mount.
+
+    Unless exit_on_failure is set, the process is not ended when the tunnel dies, and the error is raised once the
+    context exits instead.
+    """
+    if tunnel_proc is None:
+        yield
+        return
+
+    mount_completed = threading.Event()
+    read_fd, write_fd = os.pipe()
+    tunnel_errors = None if exit_on_failure else []
+    t = threading.Thread(
+        target=poll_tunnel_process,
+        args=(
+            tunnel_proc,
+            fs_id,
+            mount_completed,
+            read_fd,
+            tunnel_errors,
+            getattr(FATAL_ERROR_STATE, "quiet", False),
+        ),
+    )
+    t.daemon = True
+    t.start()
+    try:
+        yield
+    finally:
+        mount_completed.set()
+        os.write(write_fd, b"\0")
+        t.join()
+        os.close(read_fd)
+        os.close(write_fd)
+
+    if tunnel_errors:
+        raise tunnel_errors[0]
+
+
+def wait_for_tunnel_ready(
+    tunnel_proc, ready_fd, timeout_sec=DEFAULT_TUNNEL_READY_TIMEOUT_SEC
+):
+    """
+    Block until the tunnel writes to ready_fd, which efs-proxy does once it is listening on the tlsport.
+
+    Return True if the tunnel reported readiness. Return False if the tunnel closed the fd without doing so (e.g. it
+    exited) or did not report in time, in which case the caller should fall back to probing the tlsport.
+    """
+    try:
+        readable, _, _ = select.select([ready_fd], [], [], timeout_sec)
+        data = os.read(ready_fd, 64) if readable else None
+    finally:
+        os.close(ready_fd)
+
+    if data:
+        logging.debug("TLS tunnel with pid %s is ready", tunnel_proc.pid)
+        return True
+
+    if readable:
+        logging.debug(
+            "TLS tunnel with pid %s closed the readiness fd without reporting readiness",
+            tunnel_proc.pid,
+        )
+    else:
+        logging.warning(
+            "TLS tunnel with pid %s did not report readiness within %s sec",
+            tunnel_proc.pid,
+            timeout_sec,
+        )
+    return False
+
+
+def is_tunnel_sharing_enabled(config, options):
+    # A tlsport given on the command line asks for a dedicated tunnel on that port
+    return "tlsport" not in options and get_boolean_config_item_value(
+        config, CONFIG_SECTION, TUNNEL_SHARING_ENABLED_ITEM, default_value=False
+    )
+
+
+def get_tunnel_sharing_key(
+    config, dns_name, fs_id, options, fallback_ip_address, efs_proxy_enabled
+):
+    """
+    Return a digest of everything that determines the connection a tunnel makes: the target, the TLS settings and the
+    identity presented in the client certificate. Mounts with the same key can be served by the same tunnel.
+
+    The access point is part of the client certificate, so mounts of different access points never share a tunnel.
+    """
+    use_iam = "iam" in options
+    profile = {
+        "fsId": fs_id,
+        "dnsName": dns_name,
+        "fallbackIpAddress": fallback_ip_address,
+        "efsProxy": efs_proxy_enabled,
+        "region": get_target_region(config, options),
+        "netns": options.get("netns"),
+        "tls": tls_enabled(options),
+        "verify": options.get("verify"),
+        "ocsp": is_ocsp_enabled(config, options),
+        "cafile": options.get("cafile"),
+        "accessPoint": options.get("accesspoint"),
+        "iam": use_iam,
+    }
+    if use_iam:
+        # Without explicit options the credentials are resolved from the environment of the mount command
+        profile.update(
+            {
+                "awsprofile": get_aws_profile(options, use_iam),
+                "awscredsuri": options.get("awscredsuri"),
+                "rolearn": options.get(
+                    "rolearn", os.environ.get(WEB_IDENTITY_ROLE_ARN_ENV)
+                ),
+                "jwtpath": options.get(
+                    "jwtpath", os.environ.get(WEB_IDENTITY_TOKEN_FILE_ENV)
+                ),
+                "ecsCredentialsUri": os.environ.get(ECS_URI_ENV),
+                "containerCredentialsUri": os.environ.get(
+                    AWS_CONTAINER_CREDS_FULL_URI_ENV
+                ),
+            }
         )
 
+    return hashlib.sha256(
+        json.dumps(profile, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def is_pid_running(pid):
+    if not pid or pid < 0:
+        return False
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError:
+        return False
+
+
+def get_tls_port_from_state_file(state_file):
+    # The state file name "fs-deadbeef.home.user.mnt.12345" ends with the tlsport
+    return int(state_file.rsplit(".", 1)[1])
 
-def poll_tunnel_process(tunnel_proc, fs_id, mount_completed):
+
+def find_shared_tunnel(state_file_dir, tunnel_key):
     """
-    poll the tunnel process health every .5s during the mount attempt to fail fast if the tunnel dies - since this is not called
-    from the main thread, if the tunnel fails, exit uncleanly with os._exit
+    Return the name and the content of the state file of a running tunnel that was started with tunnel_key, or
+    (None, None) if there is none. Tunnels whose mounts are still in progress or already unmounted are not shared.
     """
-    while not mount_completed.is_set():
+    if not os.path.isdir(state_file_dir):
+        return None, None
+
+    for sf in sorted(os.listdir(state_file_dir)):
+        state_file_path = os.path.join(state_file_dir, sf)
+        if not sf.startswith("fs-") or os.path.isdir(state_file_path):
+            continue
+
         try:
-            test_tunnel_process(tunnel_proc, fs_id)
-        except SystemExit as e:
-            os._exit(e.code)
-        mount_completed.wait(0.5)
+            with open(state_file_path) as f:
+                state = json.load(f)
+        except (IOError, ValueError):
+            continue
+
+        if (
+            state.get("tunnelKey") == tunnel_key
+            and "unmount_time" not in state
+            and is_pid_running(state.get("pid"))
+        ):
+            return sf, state
+
+    return None, None
+
+
+def add_shared_tunnel_reference(
+    config, fs_id, mountpoint, tls_port, shared_state_file, state_file_dir
+):
+    """
+    Record that mountpoint uses the tunnel of shared_state_file, so that the watchdog keeps the tunnel running until
+    the last mount using it is gone.
+    """
+    refs_dir = os.path.join(state_file_dir, SHARED_TUNNEL_REFS_DIR, shared_state_file)
+    create_required_directory(config, refs_dir)
+
+    ref_file = get_mount_specific_filename(fs_id, mountpoint, tls_port)
+    with open(os.path.join(refs_dir, ref_file), "w") as f:
+        json.dump({"mountpoint": mountpoint, "mount_time": time.time()}, f)
+
+    return ref_file
 
 
 def get_init_system(comm_file="/proc/1/comm"):
@@ -1844,7 +2300,34 @@ def bootstrap_proxy(
     the Watchdog daemon service. This allows Watchdog to monitor the proxy process's health.
 
     This function will yield a handle on the proxy process, whether it's efs-proxy or stunnel.
+
+    When tunnel sharing is enabled and a running tunnel has the same connection profile, the mount is attached to that
+    tunnel instead, and None is yielded as the tunnel is owned by the mount that started it.
     """
+    tunnel_key = None
+    if is_tunnel_sharing_enabled(config, options):
+        tunnel_key = get_tunnel_sharing_key(
+            config, dns_name, fs_id, options, fallback_ip_address, efs_proxy_enabled
+        )
+        shared_state_file, shared_state = find_shared_tunnel(state_file_dir, tunnel_key)
+        if shared_state_file:
+            options["tlsport"] = get_tls_port_from_state_file(shared_state_file)
+            logging.info(
+                "Sharing TLS tunnel with pid %d on port %d of %s",
+                shared_state["pid"],
+                options["tlsport"],
+                shared_state_file,
+            )
+            add_shared_tunnel_reference(
+                config,
+                fs_id,
+                mountpoint,
+                options["tlsport"],
+                shared_state_file,
+                state_file_dir,
+            )
+            yield None
+            return
 
     proxy_listen_sock = choose_tls_port_and_get_bind_sock(
         config, options, state_file_dir
@@ -1976,6 +2459,7 @@ def bootstrap_proxy(
             [stunnel_config_file],
             state_file_dir,
             cert_details=cert_details,
+            tunnel_key=tunnel_key,
         )
     finally:
         # When choosing a TLS port for efs-proxy/stunnel to listen on, we open the port to ensure it is free.
@@ -1987,19 +2471,39 @@ def bootstrap_proxy(
         )
         proxy_listen_sock.close()
 
+    # efs-proxy reports readiness on an inherited pipe once it is listening. The readiness fd is only meaningful for
+    # this launch, so it is kept out of the command recorded in the state file that the watchdog uses for restarts.
+    ready_read_fd = ready_write_fd = None
+    popen_args = tunnel_args
+    pass_fds = ()
+    if efs_proxy_enabled:
+        ready_read_fd, ready_write_fd = os.pipe()
+        popen_args = tunnel_args + [EFS_PROXY_READY_FD_OPTION, str(ready_write_fd)]
+        pass_fds = (ready_write_fd,)
+
     # launch the tunnel in a process group so if it has any child processes, they can be killed easily by the mount watchdog
     logging.info(
         'Starting %s: "%s"',
         "efs-proxy" if efs_proxy_enabled else "stunnel",
-        " ".join(tunnel_args),
-    )
-    tunnel_proc = subprocess.Popen(
-        tunnel_args,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.PIPE,
-        preexec_fn=os.setsid,
-        close_fds=True,
+        " ".join(popen_args),
     )
+    try:
+        tunnel_proc = subprocess.Popen(
+            popen_args,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            preexec_fn=os.setsid,
+            close_fds=True,
+            pass_fds=pass_fds,
+        )
+    except Exception:
+        if ready_read_fd is not None:
+            os.close(ready_read_fd)
+        raise
+    finally:
+        # Only the tunnel may hold the write end, so that the read end sees EOF if the tunnel exits
+        if ready_write_fd is not None:
+            os.close(ready_write_fd)
     logging.info(
         "Started %s, pid: %d",
         "efs-proxy" if efs_proxy_enabled else "stunnel",
@@ -2010,11 +2514,12 @@ def bootstrap_proxy(
         temp_tls_state_file, state_file_dir, tunnel_proc.pid
     )
 
-    if "netns" not in options:
-        test_tlsport(options["tlsport"])
-    else:
-        with NetNS(nspath=options["netns"]):
+    if ready_read_fd is None or not wait_for_tunnel_ready(tunnel_proc, ready_read_fd):
+        if "netns" not in options:
             test_tlsport(options["tlsport"])
+        else:
+            with NetNS(nspath=options["netns"]):
+                test_tlsport(options["tlsport"])
 
     try:
         yield tunnel_proc
@@ -2047,7 +2552,10 @@ def check_if_nfsvers_is_compatible_with_macos(options):
         or ("vers" in options and options["vers"] == "4.1")
         or ("minorversion" in options and options["minorversion"] == 1)
     ):
-        fatal_error("NFSv4.1 is not supported on MacOS, please switch to NFSv4.0")
+        fatal_error(
+            "NFSv4.1 is not supported on MacOS, please switch to NFSv4.0",
+            error=MountOptionsError,
+        )
 
 
 # Use stunnel instead of efs-proxy for tls mounts,
@@ -2060,8 +2568,67 @@ def legacy_stunnel_mode_enabled(options, config):
     )
 
 
+def get_nfs_performance_profile(config, options):
+    """
+    Return the name of the performance profile of the mount, from the perfprofile mount option or the
+    performance_profile config item, or None if the mount has none
+    """
+    if NFS_PERFORMANCE_PROFILE_OPTION in options:
+        profile = options[NFS_PERFORMANCE_PROFILE_OPTION]
+    elif config.has_option(CONFIG_SECTION, NFS_PERFORMANCE_PROFILE_ITEM):
+        profile = config.get(CONFIG_SECTION, NFS_PERFORMANCE_PROFILE_ITEM).strip()
+        if not profile:
+            return None
+    else:
+        return None
+
+    check_nfs_performance_profile(profile)
+    return profile
+
+
+def check_nfs_performance_profile(profile):
+    if profile not in NFS_PERFORMANCE_PROFILES:
+        fatal_error(
+            'Unknown NFS performance profile "%s", the supported profiles are %s'
+            % (profile, ", ".join(sorted(NFS_PERFORMANCE_PROFILES))),
+            error=MountOptionsError,
+        )
+
+
+def is_nfs_option_supported(option):
+    min_kernel_version = NFS_OPTION_MIN_LINUX_KERNEL_VERSIONS.get(option)
+    if min_kernel_version is None:
+        return True
+    if check_if_platform_is_mac():
+        return False
+    return get_linux_kernel_version(len(min_kernel_version)) >= min_kernel_version
+
+
+def get_nfs_performance_profile_options(profile):
+    """
+    Return the NFS options of a performance profile, leaving out those the kernel does not support
+    """
+    profile_options = {}
+    for k, v in NFS_PERFORMANCE_PROFILES[profile].items():
+        if is_nfs_option_supported(k):
+            profile_options[k] = v
+        else:
+            logging.warning(
+                'Not using "%s" of the %s performance profile, as the kernel does not support it',
+                k,
+                profile,
+            )
+    return profile_options
+
+
 def get_nfs_mount_options(options, config):
     # If you change these options, update the man page as well at man/mount.efs.8
+    profile = get_nfs_performance_profile(config, options)
+    if profile:
+        for k, v in get_nfs_performance_profile_options(profile).items():
+            if k not in options:
+                options[k] = v
+
     if "nfsvers" not in options and "vers" not in options:
         options["nfsvers"] = "4.1" if not check_if_platform_is_mac() else "4.0"
 
@@ -2104,15 +2671,27 @@ def get_nfs_mount_options(options, config):
     return ",".join(nfs_options)
 
 
-def get_ipv6_addresses(hostname):
+def get_ipv6_addresses(hostname, network_namespace=None):
     try:
-        addrinfo = socket.getaddrinfo(hostname, None, socket.AF_INET6)
-        return [addr[4][0] for addr in addrinfo]
+        return resolve_addresses(hostname, network_namespace)["ipv6"]
     except socket.gaierror:
         return []
 
 
-def mount_nfs(config, dns_name, path, mountpoint, options, fallback_ip_address=None):
+def mount_nfs(
+    config,
+    dns_name,
+    path,
+    mountpoint,
+    options,
+    fallback_ip_address=None,
+    tunnel_proc=None,
+    backend_address=None,
+):
+    """
+    Mount path at mountpoint with mount.nfs. tunnel_proc is the tunnel process the mount goes through, if any, and
+    backend_address the address the mount connects to in the end, the mount target ip address or dns name.
+    """
     if legacy_stunnel_mode_enabled(options, config):
         if "tls" in options:
             mount_path = "127.0.0.1:%s" % path
@@ -2149,18 +2728,26 @@ def mount_nfs(config, dns_name, path, mountpoint, options, fallback_ip_address=N
         command = ["nsenter", "--net=" + options["netns"]] + command
 
     if call_nfs_mount_command_with_retry_succeed(
-        config, options, command, dns_name, mountpoint
+        config,
+        options,
+        command,
+        dns_name,
+        mountpoint,
+        tunnel_proc=tunnel_proc,
+        backend_address=backend_address or fallback_ip_address or dns_name,
     ):
         return
 
     logging.info('Executing: "%s"', " ".join(command))
 
+    start_time = time.time()
     proc = subprocess.Popen(
         command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True
     )
     out, err = proc.communicate()
 
     if proc.returncode == 0:
+        record_nfs_mount_duration(config, dns_name, time.time() - start_time)
         post_mount_nfs_success(config, options, dns_name, mountpoint)
     else:
         message = 'Failed to mount %s at %s: returncode=%d, stderr="%s"' % (
@@ -2169,7 +2756,7 @@ def mount_nfs(config, dns_name, path, mountpoint, options, fallback_ip_address=N
             proc.returncode,
             err.strip(),
         )
-        fatal_error(err.strip(), message, proc.returncode)
+        fatal_error(err.strip(), message, proc.returncode, error=NfsMountError)
 
 
 def post_mount_nfs_success(config, options, dns_name, mountpoint):
@@ -2181,8 +2768,128 @@ def post_mount_nfs_success(config, options, dns_name, mountpoint):
     optimize_readahead_window(mountpoint, options, config)
 
 
+def get_nfs_mount_history_path(dns_name):
+    return os.path.join(
+        STATE_FILE_DIR, NFS_MOUNT_HISTORY_DIR, dns_name.replace(os.sep, "_")
+    )
+
+
+def read_nfs_mount_durations(dns_name):
+    try:
+        with open(get_nfs_mount_history_path(dns_name)) as f:
+            durations = json.load(f)["durations"]
+        return [float(d) for d in durations]
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        return []
+
+
+def record_nfs_mount_duration(config, dns_name, duration):
+    """
+    Keep the durations of the last NFS_MOUNT_HISTORY_SIZE successful mount.nfs calls for dns_name, which identifies
+    the file system and its region
+    """
+    durations = read_nfs_mount_durations(dns_name)[-(NFS_MOUNT_HISTORY_SIZE - 1) :]
+    durations.append(round(duration, 3))
+
+    history_path = get_nfs_mount_history_path(dns_name)
+    tmp_history_path = "%s.%d~" % (history_path, os.getpid())
+    try:
+        create_required_directory(config, os.path.dirname(history_path))
+        with open(tmp_history_path, "w") as f:
+            json.dump({"durations": durations}, f)
+        os.rename(tmp_history_path, history_path)
+    except (IOError, OSError) as e:
+        logging.debug("Could not record mount duration in %s, %s", history_path, e)
+
+
+def get_percentile(values, percentile):
+    ordered = sorted(values)
+    index = int(math.ceil(percentile / 100.0 * len(ordered))) - 1
+    return ordered[max(0, index)]
+
+
+def get_nfs_mount_attempt_timeout(durations, attempt, max_timeout_sec):
+    """
+    Derive the time limit of a mount.nfs attempt from the p99 of past mount durations, doubling it with every attempt,
+    so that an attempt known to be stuck is not waited on for the whole configured time limit
+    """
+    if len(durations) < NFS_MOUNT_HISTORY_MIN_SAMPLES:
+        return max_timeout_sec
+
+    timeout_sec = max(
+        MIN_NFS_MOUNT_COMMAND_TIMEOUT_SEC,
+        get_percentile(durations, 99) * NFS_MOUNT_TIMEOUT_P99_FACTOR,
+    )
+    return min(max_timeout_sec, int(math.ceil(timeout_sec * 2**attempt)))
+
+
+def classify_nfs_mount_failure(err):
+    """
+    Return the class of a failed mount.nfs call by its stderr, and whether it is worth retrying
+    """
+    err = str(err).lower()
+    for error_string, failure_class, retryable in NFS_MOUNT_FAILURES:
+        if error_string in err:
+            return failure_class, retryable
+    return "unknown", False
+
+
+def wait_for_nfs_mount_command(
+    proc,
+    timeout_sec,
+    tunnel_proc=None,
+    backend_address=None,
+    network_namespace=None,
+    backend_probe_after_sec=NFS_MOUNT_BACKEND_PROBE_AFTER_SEC,
+):
+    """
+    Wait for the mount.nfs process proc to exit within timeout_sec, and return its stdout and stderr and None, or
+    None, None and the reason to give up on the attempt early. The attempt is given up when the tunnel process of
+    the mount exits, or when it takes longer than backend_probe_after_sec and backend_address cannot be connected.
+    """
+    start_time = time.time()
+    deadline = start_time + timeout_sec
+    backend_probed = False
+    while True:
+        remaining = deadline - time.time()
+        try:
+            out, err = proc.communicate(
+                timeout=max(0, min(NFS_MOUNT_POLL_INTERVAL_SEC, remaining))
+            )
+            return out, err, None
+        except subprocess.TimeoutExpired:
+            if time.time() >= deadline:
+                raise
+
+        if tunnel_proc is not None and tunnel_proc.poll() is not None:
+            return None, None, "the tunnel process exited"
+
+        if (
+            backend_address
+            and not backend_probed
+            and time.time() - start_time >= backend_probe_after_sec
+        ):
+            backend_probed = True
+            if measure_connect_rtt(backend_address, network_namespace) is None:
+                return None, None, "%s cannot be connected" % backend_address
+
+
+def kill_nfs_mount_command(proc):
+    try:
+        proc.kill()
+    except OSError:
+        # Silently fail if the subprocess has exited already
+        pass
+
+
 def call_nfs_mount_command_with_retry_succeed(
-    config, options, command, dns_name, mountpoint
+    config,
+    options,
+    command,
+    dns_name,
+    mountpoint,
+    tunnel_proc=None,
+    backend_address=None,
 ):
     def backoff_function(i):
         """Backoff exponentially and add a constant 0-1 second jitter"""
@@ -2207,31 +2914,64 @@ def call_nfs_mount_command_with_retry_succeed(
         DEFAULT_NFS_MOUNT_COMMAND_RETRY_COUNT,
     )
 
+    durations = read_nfs_mount_durations(dns_name)
+    backend_probe_after_sec = NFS_MOUNT_BACKEND_PROBE_AFTER_SEC
+    if len(durations) >= NFS_MOUNT_HISTORY_MIN_SAMPLES:
+        backend_probe_after_sec = get_percentile(durations, 99)
+
     for retry in range(retry_count - 1):
         retry_sleep_time_sec = backoff_function(retry)
+        timeout_sec = get_nfs_mount_attempt_timeout(
+            durations, retry, retry_nfs_mount_command_timeout_sec
+        )
         err = "unknown error"
         logging.info(
-            'Executing: "%s" with %s sec time limit.'
-            % (" ".join(command), retry_nfs_mount_command_timeout_sec)
+            'Executing: "%s" with %s sec time limit.' % (" ".join(command), timeout_sec)
         )
+        start_time = time.time()
         proc = subprocess.Popen(
             command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True
         )
 
         try:
-            out, err = proc.communicate(timeout=retry_nfs_mount_command_timeout_sec)
-            rc = proc.poll()
-            if rc != 0:
-                continue_retry = any(
-                    error_string in str(err) for error_string in RETRYABLE_ERRORS
-                )
+            out, err, abort_reason = wait_for_nfs_mount_command(
+                proc,
+                timeout_sec,
+                tunnel_proc=tunnel_proc,
+                backend_address=backend_address,
+                network_namespace=options.get("netns"),
+                backend_probe_after_sec=backend_probe_after_sec,
+            )
+            if abort_reason:
+                kill_nfs_mount_command(proc)
+                err = abort_reason
+                if tunnel_proc is not None and tunnel_proc.poll() is not None:
+                    fatal_error(
+                        "Failed to mount %s at %s: %s" % (dns_name, mountpoint, err),
+                        error=TunnelError,
+                    )
+                logging.error(
+                    "Mounting %s to %s stopped early as %s, mount attempt %d/%d, wait %d sec before next attempt."
+                    % (
+                        dns_name,
+                        mountpoint,
+                        err,
+                        retry + 1,
+                        retry_count,
+                        retry_sleep_time_sec,
+                    )
+                )
+            elif proc.poll() != 0:
+                rc = proc.poll()
+                failure_class, continue_retry = classify_nfs_mount_failure(err)
                 if continue_retry:
                     logging.error(
-                        'Mounting %s to %s failed, return code=%s, stdout="%s", stderr="%s", mount attempt %d/%d, '
-                        "wait %d sec before next attempt."
+                        'Mounting %s to %s failed (%s), return code=%s, stdout="%s", stderr="%s", mount attempt '
+                        "%d/%d, wait %d sec before next attempt."
                         % (
                             dns_name,
                             mountpoint,
+                            failure_class,
                             rc,
                             out,
                             err,
@@ -2241,24 +2981,29 @@ def call_nfs_mount_command_with_retry_succeed(
                         )
                     )
                 else:
-                    message = 'Failed to mount %s at %s: returncode=%d, stderr="%s"' % (
-                        dns_name,
-                        mountpoint,
-                        proc.returncode,
-                        err.strip(),
+                    message = (
+                        'Failed to mount %s at %s (%s): returncode=%d, stderr="%s"'
+                        % (
+                            dns_name,
+                            mountpoint,
+                            failure_class,
+                            proc.returncode,
+                            err.strip(),
+                        )
+                    )
+                    fatal_error(
+                        err.strip(), message, proc.returncode, error=NfsMountError
                     )
-                    fatal_error(err.strip(), message, proc.returncode)
             else:
+                record_nfs_mount_duration(config, dns_name, time.time() - start_time)
                 post_mount_nfs_success(config, options, dns_name, mountpoint)
                 return True
+        except MountError:
+            raise
         except subprocess.TimeoutExpired:
-            try:
-                proc.kill()
-            except OSError:
-                # Silently fail if the subprocess has exited already
-                pass
+            kill_nfs_mount_command(proc)
             retry_sleep_time_sec = 0
-            err = "timeout after %s sec" % retry_nfs_mount_command_timeout_sec
+            err = "timeout after %s sec" % timeout_sec
             logging.error(
                 "Mounting %s to %s failed due to %s, mount attempt %d/%d, wait %d sec before next attempt."
                 % (
@@ -2278,7 +3023,7 @@ def call_nfs_mount_command_with_retry_succeed(
                 err.strip(),
                 e,
             )
-            fatal_error(err.strip(), message, proc.returncode)
+            fatal_error(err.strip(), message, proc.returncode, error=NfsMountError)
 
         sys.stderr.write(
             "Mount attempt %d/%d failed due to %s, wait %d sec before next attempt.\n"
@@ -2325,6 +3070,8 @@ def get_int_value_from_config_file(config, config_name, default_config_value):
 def usage(out, exit_code=1):
     out.write(
         "Usage: mount.efs [--version] [-h|--help] <fsname> <mountpoint> [-o <options>]\n"
+        "       mount.efs --daemon\n"
+        "       mount.efs --batch <file|fstab>\n"
     )
     sys.exit(exit_code)
 
@@ -2794,7 +3541,7 @@ def get_dns_name_and_fallback_mount_target_ip_address(config, fs_id, options):
             dns_name = "%s.%s.efs.%s.%s" % (az_id, fs_id, region, dns_name_suffix)
         except RuntimeError:
             err_msg = "Cannot retrieve AZ-ID from metadata service. This is required for the crossaccount mount option."
-            fatal_error(err_msg)
+            fatal_error(err_msg, error=TargetResolutionError)
     else:
         dns_name_format = config.get(CONFIG_SECTION, "dns_name_format")
 
@@ -2834,7 +3581,8 @@ def get_dns_name_and_fallback_mount_target_ip_address(config, fs_id, options):
     if "mounttargetip" in options:
         if "crossaccount" in options:
             fatal_error(
-                "mounttargetip option is incompatible with crossaccount option."
+                "mounttargetip option is incompatible with crossaccount option.",
+                error=MountOptionsError,
             )
         ip_address = options.get("mounttargetip")
         logging.info(
@@ -2854,7 +3602,9 @@ def get_dns_name_and_fallback_mount_target_ip_address(config, fs_id, options):
                 ip_address=ip_address, fallback_message=fallback_message
             )
 
-    if dns_name_can_be_resolved(dns_name):
+    if dns_name_can_be_resolved(
+        dns_name, network_namespace=options.get("netns") if "netns" in options else None
+    ):
         return dns_name, None
 
     logging.info(
@@ -2898,15 +3648,26 @@ def get_fallback_mount_target_ip_address(config, options, fs_id, dns_name):
         fallback_message = "Failed to import necessary dependency botocore, please install botocore first."
         raise FallbackException(fallback_message)
 
-    mount_target_ip_address = None
+    network_namespace = options.get("netns") if "netns" in options else None
+    cache_path = get_mount_target_cache_path(config, options, fs_id)
+
+    mount_target_ip_address = get_cached_mount_target_ip_address(
+        config, cache_path, network_namespace
+    )
+    if mount_target_ip_address:
+        return mount_target_ip_address
+
     try:
         mount_target_ip_address = get_fallback_mount_target_ip_address_helper(
             config, options, fs_id
         )
-        mount_target_ip_address_can_be_resolved(
-            mount_target_ip_address,
-            network_namespace=options.get("netns") if "netns" in options else None,
-        )
+        # A mount target selected by probing has been connected to already
+        if not is_mount_target_probing_enabled(config):
+            mount_target_ip_address_can_be_resolved(
+                mount_target_ip_address,
+                network_namespace=network_namespace,
+            )
+        cache_mount_target_ip_address(config, cache_path, mount_target_ip_address)
         return mount_target_ip_address
     except FallbackException as e:
         throw_ip_address_connect_failure_with_fallback_message(
@@ -2941,18 +3702,246 @@ def check_and_remove_lock_file(path, file):
             )
 
 
-def dns_name_can_be_resolved(dns_name):
+def dns_name_can_be_resolved(dns_name, network_namespace=None):
     try:
-        addr_info = socket.getaddrinfo(dns_name, None, socket.AF_UNSPEC)
-        return len(addr_info) > 0
+        addresses = resolve_addresses(dns_name, network_namespace)
+        return bool(addresses["ipv4"] or addresses["ipv6"])
     except socket.gaierror:
         return False
 
 
+def is_negative_dns_error(e):
+    return e.errno in NEGATIVE_DNS_ERRORS
+
+
+def get_dns_cache_path(key):
+    return os.path.join(
+        STATE_FILE_DIR,
+        DNS_CACHE_DIR,
+        hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest(),
+    )
+
+
+def read_dns_cache_file(cache_path):
+    """
+    Return the dns cache entry stored in cache_path, or None if it cannot be read
+    """
+    try:
+        with open(cache_path) as f:
+            entry = json.load(f)
+        float(entry["expires"])
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        return None
+    return entry
+
+
+def remove_dns_cache_file(cache_path):
+    try:
+        os.remove(cache_path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            logging.debug("Could not remove dns cache entry %s, %s", cache_path, e)
+
+
+def prune_dns_cache(current_time):
+    """
+    Remove the expired entries of STATE_FILE_DIR/dns-cache, and the temporary files left by writers that failed
+    """
+    cache_dir = os.path.join(STATE_FILE_DIR, DNS_CACHE_DIR)
+    try:
+        cache_files = os.listdir(cache_dir)
+    except OSError:
+        return
+
+    for cache_file in cache_files:
+        cache_path = os.path.join(cache_dir, cache_file)
+        if cache_file.endswith("~"):
+            try:
+                expired = (
+                    os.path.getmtime(cache_path) + DNS_CACHE_TTL_SEC < current_time
+                )
+            except OSError:
+                continue
+        else:
+            entry = read_dns_cache_file(cache_path)
+            expired = entry is None or entry["expires"] <= current_time
+        if expired:
+            remove_dns_cache_file(cache_path)
+
+
+def read_dns_cache_entry(key):
+    current_time = time.time()
+    with DNS_CACHE_LOCK:
+        entry = DNS_CACHE.get(key)
+        if entry is not None and entry["expires"] <= current_time:
+            del DNS_CACHE[key]
+            entry = None
+    if entry is None:
+        cache_path = get_dns_cache_path(list(key))
+        entry = read_dns_cache_file(cache_path)
+        if entry is None:
+            return None
+        if entry["expires"] <= current_time:
+            remove_dns_cache_file(cache_path)
+            return None
+
+    with DNS_CACHE_LOCK:
+        DNS_CACHE[key] = entry
+    return entry
+
+
+def write_dns_cache_entry(key, result=None, error=None):
+    ttl = DNS_NEGATIVE_CACHE_TTL_SEC if error else DNS_CACHE_TTL_SEC
+    current_time = time.time()
+    entry = {"expires": current_time + ttl, "result": result, "error": error}
+    with DNS_CACHE_LOCK:
+        DNS_CACHE[key] = entry
+
+    cache_path = get_dns_cache_path(list(key))
+    tmp_cache_path = "%s.%d.%d~" % (cache_path, os.getpid(), threading.get_ident())
+    try:
+        try:
+            os.makedirs(os.path.dirname(cache_path), 0o750)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        with open(tmp_cache_path, "w") as f:
+            json.dump(entry, f)
+        os.rename(tmp_cache_path, cache_path)
+    except (IOError, OSError) as e:
+        logging.debug("Could not write dns cache entry %s, %s", cache_path, e)
+        return
+
+    # Entries of names that are no longer looked up would otherwise stay forever
+    prune_dns_cache(current_time)
+
+
+def cached_dns_lookup(kind, name, network_namespace, lookup):
+    """
+    Return the result of lookup, which resolves name and returns the result and whether it can be cached, from the dns
+    cache if possible. Results are kept in memory and in STATE_FILE_DIR/dns-cache, which concurrent mounts share.
+    Names that do not exist are cached briefly as well, other resolution errors are not cached.
+    """
+    key = (kind, name, network_namespace)
+    entry = read_dns_cache_entry(key)
+    if entry is not None:
+        if entry["error"]:
+            raise socket.gaierror(*entry["error"])
+        return entry["result"]
+
+    try:
+        result, cacheable = lookup()
+    except socket.gaierror as e:
+        if is_negative_dns_error(e):
+            write_dns_cache_entry(key, error=[e.errno, e.strerror])
+        raise
+
+    if cacheable:
+        write_dns_cache_entry(key, result=result)
+    return result
+
+
+def getaddrinfo_in_namespace(name, family, network_namespace=None):
+    if not network_namespace:
+        return socket.getaddrinfo(name, None, family)
+    with NetNS(nspath=network_namespace):
+        return socket.getaddrinfo(name, None, family)
+
+
+def resolve_addresses_by_family(name, network_namespace=None):
+    """
+    Resolve the IPv4 and IPv6 addresses of name in parallel. Once one family has addresses, wait at most
+    DNS_RESOLUTION_DELAY_SEC for the other, as in happy eyeballs. Return the addresses by family, and whether both
+    lookups finished.
+    """
+    results = {}
+    results_updated = threading.Condition()
+
+    def lookup(family_name, family):
+        try:
+            addresses = []
+            for addrinfo in getaddrinfo_in_namespace(name, family, network_namespace):
+                if addrinfo[4][0] not in addresses:
+                    addresses.append(addrinfo[4][0])
+            result = addresses
+        except socket.gaierror as e:
+            result = e
+        with results_updated:
+            results[family_name] = result
+            results_updated.notify_all()
+
+    families = (("ipv4", socket.AF_INET), ("ipv6", socket.AF_INET6))
+    for family_name, family in families:
+        t = threading.Thread(target=lookup, args=(family_name, family))
+        t.daemon = True
+        t.start()
+
+    with results_updated:
+        deadline = None
+        while len(results) < len(families):
+            if deadline is None and any(
+                not isinstance(r, Exception) and r for r in results.values()
+            ):
+                deadline = time.time() + DNS_RESOLUTION_DELAY_SEC
+            if deadline is None:
+                results_updated.wait()
+                continue
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            results_updated.wait(remaining)
+        results = dict(results)
+
+    addresses = {
+        family_name: result
+        for family_name, result in results.items()
+        if not isinstance(result, Exception)
+    }
+    if not any(addresses.values()):
+        errors = [r for r in results.values() if isinstance(r, Exception)]
+        # Report a failure that is not cached, such as a timeout, over the name not existing
+        errors.sort(key=is_negative_dns_error)
+        if errors:
+            raise errors[0]
+        raise socket.gaierror(socket.EAI_NONAME, "No address associated with hostname")
+
+    return {
+        "ipv4": addresses.get("ipv4", []),
+        "ipv6": addresses.get("ipv6", []),
+    }, len(
+        results
+    ) == len(families)
+
+
+def resolve_addresses(name, network_namespace=None):
+    """
+    Return the IPv4 and IPv6 addresses of name as {"ipv4": [...], "ipv6": [...]}, or raise socket.gaierror
+    """
+    return cached_dns_lookup(
+        "addresses",
+        name,
+        network_namespace,
+        lambda: resolve_addresses_by_family(name, network_namespace),
+    )
+
+
+def resolve_host_aliases(name, network_namespace=None):
+    """
+    Cached socket.gethostbyname_ex
+    """
+
+    def lookup():
+        if not network_namespace:
+            return list(socket.gethostbyname_ex(name)), True
+        with NetNS(nspath=network_namespace):
+            return list(socket.gethostbyname_ex(name)), True
+
+    return tuple(cached_dns_lookup("aliases", name, network_namespace, lookup))
+
+
 def mount_target_ip_address_can_be_resolved(
-    mount_target_ip_address, passed_via_options=False, network_namespace=None
+    mount_target_ip_address, passed_via_options=False, network_namespace=None, tries=3
 ):
-    tries = 3
     for attempt in range(tries):
         try:
             # Open a socket connection to mount target nfs port to verify that the mount target can be connected
@@ -2999,6 +3988,16 @@ def get_fallback_mount_target_ip_address_helper(config, options, fs_id):
     ec2_client = get_botocore_client(config, "ec2", options)
     efs_client = get_botocore_client(config, "efs", options)
 
+    if is_mount_target_probing_enabled(config):
+        return get_fastest_mount_target_ip_address(
+            config,
+            efs_client,
+            ec2_client,
+            fs_id,
+            az_name,
+            network_namespace=options.get("netns") if "netns" in options else None,
+        )
+
     mount_target = get_mount_target_in_az(efs_client, ec2_client, fs_id, az_name)
 
     if "IpAddress" in mount_target:
@@ -3007,6 +4006,233 @@ def get_fallback_mount_target_ip_address_helper(config, options, fs_id):
         return mount_target.get("Ipv6Address")
 
 
+def get_mount_target_cache_path(config, options, fs_id):
+    """
+    The mount target ip address of fs_id is cached per az, the one the fallback looks up the mount target in
+    """
+    az_name = get_target_az(config, options)
+    return os.path.join(
+        STATE_FILE_DIR, MOUNT_TARGET_CACHE_DIR, "%s.%s" % (fs_id, az_name or "any")
+    )
+
+
+def get_mount_target_cache_ttl(config):
+    return get_int_value_from_config_file(
+        config,
+        MOUNT_TARGET_CACHE_TTL_ITEM,
+        DEFAULT_MOUNT_TARGET_CACHE_TTL_SEC,
+    )
+
+
+def get_cached_mount_target_ip_address(config, cache_path, network_namespace=None):
+    """
+    Return the cached mount target ip address if it is recent and can be connected to, so that the fallback does not
+    need to call DescribeMountTargets and DescribeAvailabilityZones again. The ttl bounds the time an ip address
+    released by a deleted mount target could be reused by another one.
+    """
+    try:
+        with open(cache_path) as f:
+            cached = json.load(f)
+        mount_target_ip_address = cached["ip_address"]
+        age = time.time() - cached["cached_time"]
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        return None
+
+    if not 0 <= age < get_mount_target_cache_ttl(config):
+        logging.debug("Cached mount target ip address in %s expired", cache_path)
+        return None
+
+    try:
+        mount_target_ip_address_can_be_resolved(
+            mount_target_ip_address, network_namespace=network_namespace, tries=1
+        )
+    except FallbackException as e:
+        logging.info(
+            "Cached mount target ip address %s cannot be used, looking it up again, %s",
+            mount_target_ip_address,
+            e.message,
+        )
+        try:
+            os.remove(cache_path)
+        except OSError:
+            pass
+        return None
+
+    logging.info("Using cached mount target ip address %s", mount_target_ip_address)
+    return mount_target_ip_address
+
+
+def cache_mount_target_ip_address(config, cache_path, mount_target_ip_address):
+    tmp_cache_path = "%s.%d~" % (cache_path, os.getpid())
+    try:
+        create_required_directory(config, os.path.dirname(cache_path))
+        with open(tmp_cache_path, "w") as f:
+            json.dump(
+                {"ip_address": mount_target_ip_address, "cached_time": time.time()}, f
+            )
+        os.rename(tmp_cache_path, cache_path)
+    except (IOError, OSError) as e:
+        logging.debug(
+            "Could not cache mount target ip address in %s, %s", cache_path, e
+        )
+
+
+def is_mount_target_probing_enabled(config):
+    return get_boolean_config_item_value(
+        config, CONFIG_SECTION, MOUNT_TARGET_PROBING_ENABLED_ITEM, default_value=False
+    )
+
+
+def get_mount_target_ip_addresses(mount_target):
+    return [
+        mount_target[key]
+        for key in ("IpAddress", "Ipv6Address")
+        if mount_target.get(key)
+    ]
+
+
+def measure_connect_rtt(ip_address, network_namespace=None, timeout=2):
+    """
+    Return the seconds it takes to connect to the nfs port of ip_address, or None if it cannot be connected
+    """
+    start_time = time.time()
+    try:
+        if not network_namespace:
+            s = socket.create_connection((ip_address, 2049), timeout=timeout)
+        else:
+            with NetNS(nspath=network_namespace):
+                s = socket.create_connection((ip_address, 2049), timeout=timeout)
+        s.close()
+    except Exception as e:
+        logging.debug(
+            "Could not connect to mount target ip address %s, %s", ip_address, e
+        )
+        return None
+    return time.time() - start_time
+
+
+def select_probed_mount_target(candidates, rtts):
+    """
+    candidates are (ip address, same az) pairs, and rtts the connect times of the probes finished so far, None for
+    the failed ones. Return the fastest ip address in the az of the instance once one is reachable, otherwise the
+    fastest other ip address once all the probes in the az of the instance failed, or None to keep waiting.
+    """
+    same_az = [ip for ip, is_same_az in candidates if is_same_az]
+    other_az = [ip for ip, is_same_az in candidates if not is_same_az]
+
+    for group, prior_groups in ((same_az, []), (other_az, [same_az])):
+        if any(ip not in rtts for prior_group in prior_groups for ip in prior_group):
+            return None
+        reachable = [ip for ip in group if rtts.get(ip) is not None]
+        if reachable:
+            return min(reachable, key=lambda ip: rtts[ip])
+    return None
+
+
+def probe_mount_targets(candidates, network_namespace=None, timeout=2):
+    """
+    Connect to all candidates concurrently, over IPv4 and IPv6 alike, and return the one chosen by
+    select_probed_mount_target as soon as it can be chosen, together with the connect times measured by then
+    """
+    rtts = {}
+    rtts_updated = threading.Condition()
+
+    def probe(ip_address):
+        rtt = measure_connect_rtt(ip_address, network_namespace, timeout)
+        with rtts_updated:
+            rtts[ip_address] = rtt
+            rtts_updated.notify_all()
+
+    for ip_address, _ in candidates:
+        t = threading.Thread(target=probe, args=(ip_address,))
+        t.daemon = True
+        t.start()
+
+    deadline = time.time() + timeout
+    with rtts_updated:
+        while True:
+            selected = select_probed_mount_target(candidates, rtts)
+            remaining = deadline - time.time()
+            if selected or len(rtts) == len(candidates) or remaining <= 0:
+                return selected, dict(rtts)
+            rtts_updated.wait(remaining)
+
+
+def get_fastest_mount_target_ip_address(
+    config, efs_client, ec2_client, fs_id, az_name=None, network_namespace=None
+):
+    """
+    Probe all available mount targets of fs_id and return the ip address of the fastest reachable one, preferring the
+    mount target in az_name
+    """
+    if not efs_client or not ec2_client:
+        raise FallbackException("Boto client cannot be null")
+
+    available_mount_targets = [
+        mount_target
+        for mount_target in get_mount_targets_info(efs_client, fs_id) or []
+        if mount_target.get("LifeCycleState") == "available"
+    ]
+    if not available_mount_targets:
+        raise FallbackException(
+            "No mount target created for the file system %s is in available state yet, please retry in 5 minutes."
+            % fs_id
+        )
+
+    az_id = get_az_id_by_az_name(ec2_client, az_name) if az_name else None
+    azs = {}
+    candidates = []
+    for mount_target in available_mount_targets:
+        for ip_address in get_mount_target_ip_addresses(mount_target):
+            azs[ip_address] = mount_target.get("AvailabilityZoneName")
+            candidates.append(
+                (
+                    ip_address,
+                    az_id is not None
+                    and mount_target.get("AvailabilityZoneId") == az_id,
+                )
+            )
+
+    selected, rtts = probe_mount_targets(candidates, network_namespace)
+    record_mount_target_rtts(config, fs_id, rtts, azs)
+
+    if not selected:
+        raise FallbackException(
+            "None of the available mount targets of the file system %s can be connected, please check your VPC "
+            "and security group configuration to ensure your file system is reachable via TCP port 2049 from your "
+            "instance." % fs_id
+        )
+
+    logging.info(
+        "Selected mount target ip address %s in az %s, connected in %.1fms",
+        selected,
+        azs[selected],
+        rtts[selected] * 1000,
+    )
+    return selected
+
+
+def record_mount_target_rtts(config, fs_id, rtts, azs):
+    """
+    Log the connect times measured by the probes, and keep them in STATE_FILE_DIR/mount-targets/<fs id>.rtt
+    """
+    records = {}
+    for ip_address, rtt in rtts.items():
+        records[ip_address] = {
+            "az": azs.get(ip_address),
+            "rtt_ms": round(rtt * 1000, 3) if rtt is not None else None,
+        }
+    logging.info("Mount target connect times of %s: %s", fs_id, records)
+
+    rtt_path = os.path.join(STATE_FILE_DIR, MOUNT_TARGET_CACHE_DIR, "%s.rtt" % fs_id)
+    try:
+        create_required_directory(config, os.path.dirname(rtt_path))
+        with open(rtt_path, "w") as f:
+            json.dump({"probe_time": time.time(), "mount_targets": records}, f)
+    except (IOError, OSError) as e:
+        logging.debug("Could not record mount target connect times, %s", e)
+
+
 def throw_dns_resolve_failure_with_fallback_message(dns_name, fallback_message=None):
     fallback_message = (
         "\nAttempting to lookup mount target ip address using botocore. %s"
@@ -3022,7 +4248,7 @@ def throw_dns_resolve_failure_with_fallback_message(dns_name, fallback_message=N
         "https://docs.aws.amazon.com/console/efs/mount-dns-name",
         fallback_message,
     )
-    fatal_error(message)
+    fatal_error(message, error=TargetResolutionError)
 
 
 def throw_ip_address_connect_failure_with_fallback_message(
@@ -3039,7 +4265,10 @@ def throw_ip_address_connect_failure_with_fallback_message(
             "Cannot connect to file system mount target ip address %s. " % ip_address
         )
     fallback_message = "\n%s" % fallback_message if fallback_message else ""
-    fatal_error("%s%s%s" % (dns_message, ip_address_message, fallback_message))
+    fatal_error(
+        "%s%s%s" % (dns_message, ip_address_message, fallback_message),
+        error=TargetResolutionError,
+    )
 
 
 def tls_paths_dictionary(mount_name, base_path=STATE_FILE_DIR):
@@ -3222,7 +4451,10 @@ def match_device(config, device, options):
         return remote, path, None
 
     try:
-        primary, secondaries, _ = socket.gethostbyname_ex(remote)
+        primary, secondaries, _ = resolve_host_aliases(
+            remote,
+            network_namespace=options.get("netns") if "netns" in options else None,
+        )
         hostnames = list(filter(lambda e: e is not None, [primary] + secondaries))
     except socket.gaierror:
         create_default_cloudwatchlog_agent_if_not_exist(config, options)
@@ -3230,13 +4462,15 @@ def match_device(config, device, options):
             'Failed to resolve "%s" - check that the specified DNS name is a CNAME record resolving to a valid EFS DNS '
             "name" % remote,
             'Failed to resolve "%s"' % remote,
+            error=TargetResolutionError,
         )
 
     if not hostnames:
         create_default_cloudwatchlog_agent_if_not_exist(config, options)
         fatal_error(
             'The specified domain name "%s" did not resolve to an EFS mount target'
-            % remote
+            % remote,
+            error=MountOptionsError,
         )
 
     for hostname in hostnames:
@@ -3250,7 +4484,8 @@ def match_device(config, device, options):
                 fatal_error(
                     'The hostname "%s" resolved by the specified domain name "%s" does not match the az provided in the '
                     "mount options, expected = %s, given = %s"
-                    % (hostname, remote, options["az"], az)
+                    % (hostname, remote, options["az"], az),
+                    error=MountOptionsError,
                 )
 
             expected_dns_name, _ = get_dns_name_and_fallback_mount_target_ip_address(
@@ -3268,7 +4503,8 @@ def match_device(config, device, options):
             % (
                 remote,
                 "https://docs.aws.amazon.com/efs/latest/ug/mounting-fs-mount-cmd-dns-name.html",
-            )
+            ),
+            error=MountOptionsError,
         )
 
 
@@ -3313,18 +4549,21 @@ def mount_with_proxy(
     mountpoint,
     options,
     fallback_ip_address=None,
+    exit_on_tunnel_failure=True,
 ):
     """
     This function is responsible for launching a efs-proxy process and attaching a NFS mount to that process
     over the loopback interface. Efs-proxy is responsible for forwarding NFS operations to EFS.
     When the legacy 'stunnel' mount option is used, this function will launch a stunnel process instead of efs-proxy.
+
+    Return the pid of the process launched for the mount, or None if no process was launched.
     """
     if os.path.ismount(mountpoint) and is_nfs_mount(mountpoint):
         sys.stdout.write(
             "%s is already mounted, please run 'mount' command to verify\n" % mountpoint
         )
         logging.warning("%s is already mounted, mount aborted" % mountpoint)
-        return
+        return None
 
     efs_proxy_enabled = not legacy_stunnel_mode_enabled(options, config)
     logging.debug("mount_with_proxy: efs_proxy_enabled = %s", efs_proxy_enabled)
@@ -3339,15 +4578,20 @@ def mount_with_proxy(
         fallback_ip_address=fallback_ip_address,
         efs_proxy_enabled=efs_proxy_enabled,
     ) as tunnel_proc:
-        mount_completed = threading.Event()
-        t = threading.Thread(
-            target=poll_tunnel_process, args=(tunnel_proc, fs_id, mount_completed)
-        )
-        t.daemon = True
-        t.start()
-        mount_nfs(config, dns_name, path, mountpoint, options)
-        mount_completed.set()
-        t.join()
+        with watch_tunnel_process(
+            tunnel_proc, fs_id, exit_on_failure=exit_on_tunnel_failure
+        ):
+            mount_nfs(
+                config,
+                dns_name,
+                path,
+                mountpoint,
+                options,
+                tunnel_proc=tunnel_proc,
+                backend_address=fallback_ip_address or dns_name,
+            )
+
+    return tunnel_proc.pid if tunnel_proc else None
 
 
 def verify_tlsport_can_be_connected(tlsport):
@@ -3378,66 +4622,146 @@ def check_unsupported_options(options):
             del options[unsupported_option]
 
 
-def check_options_validity(options):
+def check_options_validity(options, config=None):
     if "tls" in options:
         if "port" in options:
-            fatal_error('The "port" and "tls" options are mutually exclusive')
+            fatal_error(
+                'The "port" and "tls" options are mutually exclusive',
+                error=MountOptionsError,
+            )
 
         if "tlsport" in options:
             try:
                 int(options["tlsport"])
             except ValueError:
                 fatal_error(
-                    "tlsport option [%s] is not an integer" % options["tlsport"]
+                    "tlsport option [%s] is not an integer" % options["tlsport"],
+                    error=MountOptionsError,
                 )
 
         if "ocsp" in options and "noocsp" in options:
-            fatal_error('The "ocsp" and "noocsp" options are mutually exclusive')
+            fatal_error(
+                'The "ocsp" and "noocsp" options are mutually exclusive',
+                error=MountOptionsError,
+            )
 
         if "notls" in options:
-            fatal_error('The "tls" and "notls" options are mutually exclusive')
+            fatal_error(
+                'The "tls" and "notls" options are mutually exclusive',
+                error=MountOptionsError,
+            )
 
     if "accesspoint" in options:
         if "tls" not in options:
-            fatal_error('The "tls" option is required when mounting via "accesspoint"')
+            fatal_error(
+                'The "tls" option is required when mounting via "accesspoint"',
+                error=MountOptionsError,
+            )
         if not AP_ID_RE.match(options["accesspoint"]):
-            fatal_error("Access Point ID %s is malformed" % options["accesspoint"])
+            fatal_error(
+                "Access Point ID %s is malformed" % options["accesspoint"],
+                error=MountOptionsError,
+            )
+
+    if NFS_PERFORMANCE_PROFILE_OPTION in options:
+        check_nfs_performance_profile(options[NFS_PERFORMANCE_PROFILE_OPTION])
+    elif config is not None:
+        # Check the performance_profile config item as well, before the tunnel is started
+        get_nfs_performance_profile(config, options)
+
+    if "readahead_kb" in options:
+        try:
+            if int(options["readahead_kb"]) < 0:
+                raise ValueError()
+        except (TypeError, ValueError):
+            fatal_error(
+                "readahead_kb option [%s] is not a non-negative integer"
+                % options["readahead_kb"],
+                error=MountOptionsError,
+            )
 
     if "iam" in options and "tls" not in options:
-        fatal_error('The "tls" option is required when mounting via "iam"')
+        fatal_error(
+            'The "tls" option is required when mounting via "iam"',
+            error=MountOptionsError,
+        )
 
     if "awsprofile" in options and "iam" not in options:
         fatal_error(
-            'The "iam" option is required when mounting with named profile option, "awsprofile"'
+            'The "iam" option is required when mounting with named profile option, "awsprofile"',
+            error=MountOptionsError,
         )
 
     if "awscredsuri" in options:
         if "iam" not in options:
-            fatal_error('The "iam" option is required when mounting with "awscredsuri"')
+            fatal_error(
+                'The "iam" option is required when mounting with "awscredsuri"',
+                error=MountOptionsError,
+            )
         if "awsprofile" in options:
             fatal_error(
-                'The "awscredsuri" and "awsprofile" options are mutually exclusive'
+                'The "awscredsuri" and "awsprofile" options are mutually exclusive',
+                error=MountOptionsError,
             )
         # The URI must start with slash symbol as it will be appended to the ECS task metadata endpoint
         if not options["awscredsuri"].startswith("/"):
-            fatal_error("awscredsuri %s is malformed" % options["awscredsuri"])
+            fatal_error(
+                "awscredsuri %s is malformed" % options["awscredsuri"],
+                error=MountOptionsError,
+            )
 
 
 def bootstrap_cloudwatch_logging(config, options, fs_id=None):
+    """
+    Return the cloudwatchlog agent of the mount of fs_id. The client is created and the log group and stream are
+    provisioned by the thread of its log shipper, which starts right away, so that this is off the critical path.
+    """
     if not check_if_cloudwatch_log_enabled(config):
         return None
 
-    cloudwatchlog_client = get_botocore_client(config, "logs", options)
+    cloudwatchlog_config = get_cloudwatchlog_config(config, fs_id)
 
-    if not cloudwatchlog_client:
-        return None
+    cloudwatchlog_agent = {
+        "client": None,
+        "log_group_name": cloudwatchlog_config.get("log_group_name"),
+        "log_stream_name": cloudwatchlog_config.get("log_stream_name"),
+    }
+    options = dict(options)
 
-    cloudwatchlog_config = get_cloudwatchlog_config(config, fs_id)
+    def provision():
+        return provision_cloudwatch_logging(config, options, cloudwatchlog_config)
 
-    log_group_name = cloudwatchlog_config.get("log_group_name")
-    log_stream_name = cloudwatchlog_config.get("log_stream_name")
+    cloudwatchlog_agent["shipper"] = CloudWatchLogShipper(
+        cloudwatchlog_agent,
+        get_cloudwatch_log_flush_timeout(config),
+        provision=provision,
+    )
+    cloudwatchlog_agent["shipper"].start()
+    return cloudwatchlog_agent
+
+
+def provision_cloudwatch_logging(config, options, cloudwatchlog_config):
+    """
+    Create the cloudwatchlog client, and the log group, retention policy and log stream, unless a marker shows they
+    were provisioned recently. Return the client, or None if any of this failed.
+    """
+    cloudwatchlog_client = get_botocore_client(config, "logs", options)
+
+    if not cloudwatchlog_client:
+        return None
+
+    log_group_name = cloudwatchlog_config.get("log_group_name")
+    log_stream_name = cloudwatchlog_config.get("log_stream_name")
     retention_days = cloudwatchlog_config.get("retention_days")
 
+    if is_cloudwatch_log_provisioned(log_group_name, log_stream_name, retention_days):
+        logging.debug(
+            "Cloudwatch log group %s and stream %s are already provisioned",
+            log_group_name,
+            log_stream_name,
+        )
+        return cloudwatchlog_client
+
     group_creation_completed = create_cloudwatch_log_group(
         cloudwatchlog_client, log_group_name
     )
@@ -3459,11 +4783,85 @@ def bootstrap_cloudwatch_logging(config, options, fs_id=None):
     if not stream_creation_completed:
         return None
 
-    return {
-        "client": cloudwatchlog_client,
+    mark_cloudwatch_log_provisioned(
+        config, log_group_name, log_stream_name, retention_days
+    )
+    return cloudwatchlog_client
+
+
+def get_cloudwatch_log_provisioned_marker_path(
+    log_group_name, log_stream_name, state_file_dir=STATE_FILE_DIR
+):
+    key = json.dumps([log_group_name, log_stream_name])
+    return os.path.join(
+        state_file_dir,
+        CLOUDWATCH_LOG_PROVISIONED_DIR,
+        hashlib.sha256(key.encode("utf-8")).hexdigest(),
+    )
+
+
+def is_cloudwatch_log_provisioned(
+    log_group_name, log_stream_name, retention_days, state_file_dir=STATE_FILE_DIR
+):
+    marker_path = get_cloudwatch_log_provisioned_marker_path(
+        log_group_name, log_stream_name, state_file_dir
+    )
+    try:
+        with open(marker_path) as f:
+            marker = json.load(f)
+    except (IOError, OSError, ValueError):
+        return False
+
+    try:
+        age = time.time() - marker["provisioned_time"]
+        return (
+            marker["log_group_name"] == log_group_name
+            and marker["log_stream_name"] == log_stream_name
+            and marker["retention_days"] == retention_days
+            and 0 <= age < CLOUDWATCH_LOG_PROVISIONED_TTL_SEC
+        )
+    except (KeyError, TypeError):
+        return False
+
+
+def mark_cloudwatch_log_provisioned(
+    config,
+    log_group_name,
+    log_stream_name,
+    retention_days,
+    state_file_dir=STATE_FILE_DIR,
+):
+    marker_path = get_cloudwatch_log_provisioned_marker_path(
+        log_group_name, log_stream_name, state_file_dir
+    )
+    marker = {
         "log_group_name": log_group_name,
         "log_stream_name": log_stream_name,
+        "retention_days": retention_days,
+        "provisioned_time": time.time(),
     }
+    tmp_marker_path = "%s.%d~" % (marker_path, os.getpid())
+    try:
+        create_required_directory(config, os.path.dirname(marker_path))
+        with open(tmp_marker_path, "w") as f:
+            json.dump(marker, f)
+        os.rename(tmp_marker_path, marker_path)
+    except (IOError, OSError) as e:
+        logging.debug("Could not write cloudwatch log marker %s, %s", marker_path, e)
+
+
+def invalidate_cloudwatch_log_provisioned_marker(
+    cloudwatchlog_agent, state_file_dir=STATE_FILE_DIR
+):
+    marker_path = get_cloudwatch_log_provisioned_marker_path(
+        cloudwatchlog_agent.get("log_group_name"),
+        cloudwatchlog_agent.get("log_stream_name"),
+        state_file_dir,
+    )
+    try:
+        os.remove(marker_path)
+    except OSError:
+        pass
 
 
 def create_default_cloudwatchlog_agent_if_not_exist(config, options):
@@ -3490,32 +4888,78 @@ def get_fips_config(config):
     )
 
 
+def get_botocore_session(profile=None):
+    """
+    Return the botocore session of the named profile, or the default session if profile is None. Sessions are kept for
+    the lifetime of the process, so that endpoint and service models are only loaded once.
+    """
+    session = BOTOCORE_SESSIONS.get(profile)
+    if session is None:
+        session = botocore_session.get_session()
+        if profile:
+            session.set_config_variable("profile", profile)
+        BOTOCORE_SESSIONS[profile] = session
+    return session
+
+
 def get_botocore_client(config, service, options):
+    """
+    Return the botocore client of service, shared by all callers in the process that use the same region, named
+    profile and FIPS setting
+    """
     if not BOTOCORE_PRESENT:
         logging.error("Failed to import botocore, please install botocore first.")
         return None
 
-    botocore_config = None
-    if get_fips_config(config):
-        botocore_config = botocore.config.Config(use_fips_endpoint=True)
-
-    session = botocore.session.get_session()
+    use_fips = get_fips_config(config)
     region = get_target_region(config, options)
+    profile = options.get("awsprofile") if options else None
+
+    client_key = (service, region, profile, use_fips)
+    # The session is not thread safe, and the cloudwatch log shipper creates its client from another thread
+    with BOTOCORE_CLIENTS_LOCK:
+        client = BOTOCORE_CLIENTS.get(client_key)
+        if client is None:
+            client = create_botocore_client(service, region, profile, use_fips)
+            BOTOCORE_CLIENTS[client_key] = client
+    return client
+
+
+def create_botocore_client(service, region, profile, use_fips):
+    client_config = None
+    if use_fips:
+        client_config = botocore_config.Config(use_fips_endpoint=True)
 
-    if options and options.get("awsprofile"):
-        profile = options.get("awsprofile")
-        session.set_config_variable("profile", profile)
+    session = get_botocore_session(profile)
+
+    if profile:
         try:
             return session.create_client(
-                service, region_name=region, config=botocore_config
+                service, region_name=region, config=client_config
             )
-        except ProfileNotFound as e:
+        except botocore_exceptions.ProfileNotFound as e:
             fatal_error(
                 "%s, please add the [profile %s] section in the aws config file following %s and %s."
-                % (e, profile, NAMED_PROFILE_HELP_URL, CONFIG_FILE_SETTINGS_HELP_URL)
+                % (e, profile, NAMED_PROFILE_HELP_URL, CONFIG_FILE_SETTINGS_HELP_URL),
+                error=CredentialsError,
             )
 
-    return session.create_client(service, region_name=region, config=botocore_config)
+    return session.create_client(service, region_name=region, config=client_config)
+
+
+def warm_botocore_models(services=BOTOCORE_SERVICES):
+    """
+    Load the service models of the default session without creating clients, which would resolve credentials
+    """
+    if not BOTOCORE_PRESENT:
+        return
+
+    session = get_botocore_session()
+    for service in services:
+        try:
+            session.get_service_model(service)
+        except Exception as e:
+            logging.debug("Could not load the botocore model of %s, %s", service, e)
 
 
 def get_cloudwatchlog_config(config, fs_id=None):
@@ -3597,7 +5041,7 @@ def cloudwatch_create_log_group_helper(cloudwatchlog_client, log_group_name):
 def create_cloudwatch_log_group(cloudwatchlog_client, log_group_name):
     try:
         cloudwatch_create_log_group_helper(cloudwatchlog_client, log_group_name)
-    except ClientError as e:
+    except botocore_exceptions.ClientError as e:
         exception = e.response["Error"]["Code"]
 
         if exception == "ResourceAlreadyExistsException":
@@ -3626,10 +5070,10 @@ def create_cloudwatch_log_group(cloudwatchlog_client, log_group_name):
         else:
             handle_general_botocore_exceptions(e)
             return False
-    except NoCredentialsError as e:
+    except botocore_exceptions.NoCredentialsError as e:
         logging.warning("Credentials are not properly configured, %s" % e)
         return False
-    except EndpointConnectionError as e:
+    except botocore_exceptions.EndpointConnectionError as e:
         logging.warning("Could not connect to the endpoint, %s" % e)
         return False
     except Exception as e:
@@ -3654,7 +5098,7 @@ def put_cloudwatch_log_retention_policy(
         cloudwatch_put_retention_policy_helper(
             cloudwatchlog_client, log_group_name, retention_days
         )
-    except ClientError as e:
+    except botocore_exceptions.ClientError as e:
         exception = e.response["Error"]["Code"]
 
         if exception == "ResourceNotFoundException":
@@ -3677,10 +5121,10 @@ def put_cloudwatch_log_retention_policy(
         else:
             handle_general_botocore_exceptions(e)
             return False
-    except NoCredentialsError as e:
+    except botocore_exceptions.NoCredentialsError as e:
         logging.warning("Credentials are not properly configured, %s" % e)
         return False
-    except EndpointConnectionError as e:
+    except botocore_exceptions.EndpointConnectionError as e:
         logging.warning("Could not connect to the endpoint, %s" % e)
         return False
     except Exception as e:
@@ -3706,7 +5150,7 @@ def create_cloudwatch_log_stream(cloudwatchlog_client, log_group_name, log_strea
         cloudwatch_create_log_stream_helper(
             cloudwatchlog_client, log_group_name, log_stream_name
         )
-    except ClientError as e:
+    except botocore_exceptions.ClientError as e:
         exception = e.response["Error"]["Code"]
 
         if exception == "ResourceAlreadyExistsException":
@@ -3729,10 +5173,10 @@ def create_cloudwatch_log_stream(cloudwatchlog_client, log_group_name, log_strea
         else:
             handle_general_botocore_exceptions(e)
             return False
-    except NoCredentialsError as e:
+    except botocore_exceptions.NoCredentialsError as e:
         logging.warning("Credentials are not properly configured, %s" % e)
         return False
-    except EndpointConnectionError as e:
+    except botocore_exceptions.EndpointConnectionError as e:
         logging.warning("Could not connect to the endpoint, %s" % e)
         return False
     except Exception as e:
@@ -3741,40 +5185,232 @@ def create_cloudwatch_log_stream(cloudwatchlog_client, log_group_name, log_strea
     return True
 
 
-def cloudwatch_put_log_events_helper(cloudwatchlog_agent, message, token=None):
-    kwargs = {
-        "logGroupName": cloudwatchlog_agent.get("log_group_name"),
-        "logStreamName": cloudwatchlog_agent.get("log_stream_name"),
-        "logEvents": [
-            {"timestamp": int(round(time.time() * 1000)), "message": message}
-        ],
-    }
-    if token:
-        kwargs["sequenceToken"] = token
-    cloudwatchlog_agent.get("client").put_log_events(**kwargs)
+def get_cloudwatch_log_flush_timeout(config):
+    try:
+        return max(0, float(config.get(CLOUDWATCH_LOG_SECTION, "flush_timeout_sec")))
+    except (NoOptionError, NoSectionError, ValueError, TypeError):
+        return DEFAULT_CLOUDWATCH_LOG_FLUSH_TIMEOUT_SEC
+
+
+def make_cloudwatch_log_event(message, timestamp=None):
+    if timestamp is None:
+        timestamp = int(round(time.time() * 1000))
+
+    max_message_bytes = (
+        CLOUDWATCH_LOG_MAX_EVENT_BYTES - CLOUDWATCH_LOG_EVENT_OVERHEAD_BYTES
+    )
+    encoded_message = message.encode("utf-8")
+    if len(encoded_message) > max_message_bytes:
+        message = encoded_message[:max_message_bytes].decode("utf-8", "ignore")
+
+    return {"timestamp": timestamp, "message": message}
+
+
+def get_cloudwatch_log_event_size(log_event):
+    return (
+        len(log_event["message"].encode("utf-8")) + CLOUDWATCH_LOG_EVENT_OVERHEAD_BYTES
+    )
+
+
+def batch_cloudwatch_log_events(log_events):
+    """
+    Split log_events into chronologically ordered batches within the count and size limits of PutLogEvents
+    """
+    batch = []
+    batch_size = 0
+    for log_event in sorted(log_events, key=lambda e: e["timestamp"]):
+        event_size = get_cloudwatch_log_event_size(log_event)
+        if batch and (
+            len(batch) >= CLOUDWATCH_LOG_MAX_BATCH_EVENTS
+            or batch_size + event_size > CLOUDWATCH_LOG_MAX_BATCH_BYTES
+        ):
+            yield batch
+            batch = []
+            batch_size = 0
+        batch.append(log_event)
+        batch_size += event_size
+
+    if batch:
+        yield batch
+
+
+class CloudWatchLogShipper(object):
+    """
+    Ship log events to CloudWatch from a background thread, so that publishing a log message never waits for the
+    network. Events are buffered in a bounded queue, events published while it is full are dropped, and whatever is
+    queued is sent in as few PutLogEvents calls as the limits allow.
+
+    The thread is a daemon thread, the events still queued at exit are sent by flush, which is registered with atexit
+    and gives up after flush_timeout seconds.
+
+    If provision is given, the thread first calls it to get the client of the cloudwatchlog agent, and drops all events
+    if it returns None or fails.
+    """
+
+    def __init__(
+        self,
+        cloudwatchlog_agent,
+        flush_timeout=DEFAULT_CLOUDWATCH_LOG_FLUSH_TIMEOUT_SEC,
+        queue_size=CLOUDWATCH_LOG_QUEUE_SIZE,
+        provision=None,
+    ):
+        self.cloudwatchlog_agent = cloudwatchlog_agent
+        self.flush_timeout = flush_timeout
+        self._provision = provision
+        self.dropped_count = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        # Number of events published but not sent yet, guarded by _pending_condition
+        self._pending = 0
+        self._pending_condition = threading.Condition()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._flush_at_exit_registered = False
+
+    def publish(self, message):
+        with self._pending_condition:
+            try:
+                self._queue.put_nowait(make_cloudwatch_log_event(message))
+            except queue.Full:
+                self.dropped_count += 1
+                return False
+            self._pending += 1
+
+        self._ensure_running()
+        return True
+
+    def start(self):
+        self._ensure_running()
+
+    def _ensure_running(self):
+        with self._thread_lock:
+            # Threads do not survive a fork, as in the processes serving requests of the mount.efs daemon
+            if self._thread is not None and self._thread.is_alive():
+                return
+
+            self._thread = threading.Thread(
+                target=self._run, name="cloudwatch-log-shipper"
+            )
+            self._thread.daemon = True
+            self._thread.start()
+
+            if not self._flush_at_exit_registered:
+                atexit.register(self.flush)
+                self._flush_at_exit_registered = True
+
+    def _run_provision(self):
+        provision, self._provision = self._provision, None
+        FATAL_ERROR_STATE.quiet = True
+        try:
+            client = provision()
+        except (Exception, SystemExit) as e:
+            # Anything raised here would end the thread and leave the queue undrained
+            logging.warning("Unknown error, %s" % e)
+            client = None
+
+        if client:
+            self.cloudwatchlog_agent["client"] = client
+        else:
+            logging.warning(
+                "Could not set up cloudwatch logging, log events are not sent"
+            )
+
+    def _run(self):
+        if self._provision is not None:
+            self._run_provision()
+
+        while True:
+            log_events = [self._queue.get()]
+            try:
+                while True:
+                    log_events.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            try:
+                if self.cloudwatchlog_agent.get("client"):
+                    for batch in batch_cloudwatch_log_events(log_events):
+                        put_cloudwatch_log_events(self.cloudwatchlog_agent, batch)
+            finally:
+                with self._pending_condition:
+                    self._pending -= len(log_events)
+                    self._pending_condition.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Wait until every published event was sent, or timeout seconds passed. Return whether all events were sent.
+        """
+        if timeout is None:
+            timeout = self.flush_timeout
+        deadline = time.time() + timeout
+
+        with self._pending_condition:
+            while self._pending:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    logging.warning(
+                        "Could not send %d log events to cloudwatch within %s seconds",
+                        self._pending,
+                        timeout,
+                    )
+                    return False
+                self._pending_condition.wait(remaining)
+
+        if self.dropped_count:
+            logging.warning(
+                "Dropped %d log events as the cloudwatch log queue was full",
+                self.dropped_count,
+            )
+            self.dropped_count = 0
+        return True
+
+
+def flush_cloudwatch_log(cloudwatchlog_agent):
+    if cloudwatchlog_agent and cloudwatchlog_agent.get("shipper"):
+        cloudwatchlog_agent["shipper"].flush()
+
+
+def cloudwatch_put_log_events_helper(cloudwatchlog_agent, log_events):
+    cloudwatchlog_agent.get("client").put_log_events(
+        logGroupName=cloudwatchlog_agent.get("log_group_name"),
+        logStreamName=cloudwatchlog_agent.get("log_stream_name"),
+        logEvents=log_events,
+    )
 
 
 def publish_cloudwatch_log(cloudwatchlog_agent, message):
-    if not cloudwatchlog_agent or not cloudwatchlog_agent.get("client"):
+    """
+    Queue message for the cloudwatch log shipper of cloudwatchlog_agent, or send it right away if there is none
+    """
+    if not cloudwatchlog_agent:
         return False
 
-    token = get_log_stream_next_token(cloudwatchlog_agent)
+    shipper = cloudwatchlog_agent.get("shipper")
+    if shipper:
+        return shipper.publish(message)
+
+    if not cloudwatchlog_agent.get("client"):
+        return False
+
+    return put_cloudwatch_log_events(
+        cloudwatchlog_agent, [make_cloudwatch_log_event(message)]
+    )
+
 
+def put_cloudwatch_log_events(cloudwatchlog_agent, log_events):
     try:
-        cloudwatch_put_log_events_helper(cloudwatchlog_agent, message, token)
-    except ClientError as e:
+        cloudwatch_put_log_events_helper(cloudwatchlog_agent, log_events)
+    except botocore_exceptions.ClientError as e:
         exception = e.response["Error"]["Code"]
 
-        if exception == "InvalidSequenceTokenException":
-            logging.debug("The sequence token is not valid, %s" % e.response)
-            return False
-        elif exception == "InvalidParameterException":
+        if exception == "InvalidParameterException":
             logging.debug(
                 "One of the parameter to put log events is not valid, %s" % e.response
             )
             return False
         elif exception == "DataAlreadyAcceptedException":
-            logging.debug("The event %s was already logged, %s" % (message, e.response))
+            logging.debug(
+                "The %d events were already logged, %s" % (len(log_events), e.response)
+            )
             return False
         elif exception == "UnrecognizedClientException":
             logging.debug(
@@ -3791,14 +5427,16 @@ def publish_cloudwatch_log(cloudwatchlog_agent, message):
                     e.response,
                 )
             )
+            # Provision them again on the next mount
+            invalidate_cloudwatch_log_provisioned_marker(cloudwatchlog_agent)
             return False
         else:
             logging.debug("Unexpected error: %s" % e)
             return False
-    except NoCredentialsError as e:
+    except botocore_exceptions.NoCredentialsError as e:
         logging.warning("Credentials are not properly configured, %s" % e)
         return False
-    except EndpointConnectionError as e:
+    except botocore_exceptions.EndpointConnectionError as e:
         logging.warning("Could not connect to the endpoint, %s" % e)
         return False
     except Exception as e:
@@ -3807,59 +5445,6 @@ def publish_cloudwatch_log(cloudwatchlog_agent, message):
     return True
 
 
-def cloudwatch_describe_log_streams_helper(cloudwatchlog_agent):
-    return cloudwatchlog_agent.get("client").describe_log_streams(
-        logGroupName=cloudwatchlog_agent.get("log_group_name"),
-        logStreamNamePrefix=cloudwatchlog_agent.get("log_stream_name"),
-    )
-
-
-def get_log_stream_next_token(cloudwatchlog_agent):
-    try:
-        response = cloudwatch_describe_log_streams_helper(cloudwatchlog_agent)
-    except ClientError as e:
-        exception = e.response["Error"]["Code"]
-
-        if exception == "InvalidParameterException":
-            logging.debug(
-                "Either parameter log group name %s or log stream name %s is specified incorrectly, %s"
-                % (
-                    cloudwatchlog_agent.get("log_group_name"),
-                    cloudwatchlog_agent.get("log_stream_name"),
-                    e.response,
-                )
-            )
-        elif exception == "ResourceNotFoundException":
-            logging.debug(
-                "Either log group %s or log stream %s does not exist, %s"
-                % (
-                    cloudwatchlog_agent.get("log_group_name"),
-                    cloudwatchlog_agent.get("log_stream_name"),
-                    e.response,
-                )
-            )
-        else:
-            handle_general_botocore_exceptions(e)
-        return None
-    except NoCredentialsError as e:
-        logging.warning("Credentials are not properly configured, %s" % e)
-        return None
-    except EndpointConnectionError as e:
-        logging.warning("Could not connect to the endpoint, %s" % e)
-        return None
-    except Exception as e:
-        logging.warning("Unknown error, %s" % e)
-        return None
-
-    try:
-        log_stream = response["logStreams"][0]
-        return log_stream.get("uploadSequenceToken")
-    except (IndexError, TypeError, KeyError):
-        pass
-
-    return None
-
-
 def ec2_describe_availability_zones_helper(ec2_client, kwargs):
     # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ec2.html#EC2.Client.describe_availability_zones
     return ec2_client.describe_availability_zones(**kwargs)
@@ -3875,7 +5460,7 @@ def get_az_id_by_az_name_helper(ec2_client, az_name, dryrun=False):
         az_info = ec2_describe_availability_zones_helper(ec2_client, kwargs)
         logging.debug("Found the az information for %s: %s", az_name, az_info)
         return az_info
-    except ClientError as e:
+    except botocore_exceptions.ClientError as e:
         exception = e.response["Error"]["Code"]
         exception_message = e.response["Error"]["Message"]
 
@@ -3894,12 +5479,12 @@ def get_az_id_by_az_name_helper(ec2_client, az_name, dryrun=False):
             fallback_message = exception_message
         else:
             fallback_message = "Unexpected error: %s" % exception_message
-    except NoCredentialsError as e:
+    except botocore_exceptions.NoCredentialsError as e:
         fallback_message = (
             "%s when performing operation %s, please confirm your aws credentials are properly configured."
             % (e, operation)
         )
-    except EndpointConnectionError as e:
+    except botocore_exceptions.EndpointConnectionError as e:
         fallback_message = (
             "Could not connect to the endpoint when performing operation %s, %s"
             % (operation, e)
@@ -3940,7 +5525,7 @@ def get_mount_targets_info(efs_client, fs_id):
             mount_targets_info,
         )
         return mount_targets_info.get("MountTargets")
-    except ClientError as e:
+    except botocore_exceptions.ClientError as e:
         exception = e.response["Error"]["Code"]
         exception_message = e.response["Error"]["Message"]
 
@@ -3955,12 +5540,12 @@ def get_mount_targets_info(efs_client, fs_id):
             fallback_message = exception_message
         else:
             fallback_message = "Unexpected error: %s" % exception_message
-    except NoCredentialsError as e:
+    except botocore_exceptions.NoCredentialsError as e:
         fallback_message = (
             "%s when performing operation %s, please confirm your aws credentials are properly configured."
             % (e, operation)
         )
-    except EndpointConnectionError as e:
+    except botocore_exceptions.EndpointConnectionError as e:
         fallback_message = (
             "Could not connect to the endpoint when performing operation %s, %s"
             % (operation, e)
@@ -4077,12 +5662,14 @@ def handle_general_botocore_exceptions(error):
 # NFS client might see a throughput drop in kernel 5.4+, especially for sequential read.
 # To fix the issue, below function will modify read_ahead_kb to 15 * rsize (1MB by default) after mount.
 def optimize_readahead_window(mountpoint, options, config):
-    if not should_revise_readahead(config):
+    if platform.system() != "Linux":
         return
 
-    fixed_readahead_kb = int(
-        DEFAULT_NFS_MAX_READAHEAD_MULTIPLIER * int(options["rsize"]) / 1024
-    )
+    record_readahead_settings(config, mountpoint, options)
+
+    readahead_kb = get_readahead_kb(config, options)
+    if readahead_kb is None:
+        return
 
     try:
         major, minor = decode_device_number(os.stat(mountpoint).st_dev)
@@ -4094,24 +5681,81 @@ def optimize_readahead_window(mountpoint, options, config):
         logging.debug(
             "Modifying value in %s to %s.",
             read_ahead_kb_config_file,
-            str(fixed_readahead_kb),
+            str(readahead_kb),
         )
-        p = subprocess.Popen(
-            "echo %s > %s" % (fixed_readahead_kb, read_ahead_kb_config_file),
-            shell=True,
-            stderr=subprocess.PIPE,
-            stdout=subprocess.DEVNULL,
+        applied_readahead_kb = write_readahead_kb(
+            read_ahead_kb_config_file, readahead_kb
         )
-        _, error = p.communicate()
-        if p.returncode != 0:
+        if applied_readahead_kb != readahead_kb:
             logging.warning(
-                'Failed to modify read_ahead_kb: %s with returncode: %d, error: "%s".'
-                % (fixed_readahead_kb, p.returncode, error.strip())
+                "read_ahead_kb in %s is %d after setting it to %d.",
+                read_ahead_kb_config_file,
+                applied_readahead_kb,
+                readahead_kb,
             )
     except Exception as e:
         logging.warning(
-            'Failed to modify read_ahead_kb: %s with error: "%s".'
-            % (fixed_readahead_kb, e)
+            'Failed to modify read_ahead_kb: %s with error: "%s".' % (readahead_kb, e)
+        )
+
+
+def get_readahead_kb(config, options):
+    """
+    Return the read_ahead_kb of a mount: the "readahead_kb" mount option, or 15 * rsize when the readahead
+    optimization applies, or None to keep the default of the kernel
+    """
+    if "readahead_kb" in options:
+        return int(options["readahead_kb"])
+
+    if not should_revise_readahead(config):
+        return None
+
+    return int(DEFAULT_NFS_MAX_READAHEAD_MULTIPLIER * int(options["rsize"]) / 1024)
+
+
+def write_readahead_kb(read_ahead_kb_config_file, readahead_kb):
+    """
+    Write readahead_kb to a read_ahead_kb file of sysfs, and return the value read back from it, which the kernel
+    rounds down to whole pages
+    """
+    with open(read_ahead_kb_config_file, "w") as f:
+        f.write("%d\n" % readahead_kb)
+
+    with open(read_ahead_kb_config_file) as f:
+        return int(f.read().strip())
+
+
+def get_readahead_settings_path(mountpoint, state_file_dir=None):
+    return os.path.join(
+        state_file_dir or STATE_FILE_DIR,
+        READAHEAD_STATE_DIR,
+        os.path.abspath(mountpoint).replace(os.sep, ".").lstrip(".") or ".",
+    )
+
+
+def record_readahead_settings(config, mountpoint, options):
+    """
+    Record what the readahead of the mount at mountpoint derives from, so that the watchdog can re-apply it to the
+    mount when the config file changes
+    """
+    settings_path = get_readahead_settings_path(mountpoint)
+    settings = {
+        "mountpoint": os.path.abspath(mountpoint),
+        "rsize": int(options["rsize"]) if "rsize" in options else None,
+        "readahead_kb": (
+            int(options["readahead_kb"]) if "readahead_kb" in options else None
+        ),
+    }
+
+    try:
+        create_required_directory(config, os.path.dirname(settings_path))
+        tmp_path = "%s.%d~" % (settings_path, os.getpid())
+        with open(tmp_path, "w") as f:
+            json.dump(settings, f)
+        os.rename(tmp_path, settings_path)
+    except (IOError, OSError) as e:
+        logging.warning(
+            "Failed to record the readahead settings of %s: %s", mountpoint, e
         )
 
 
@@ -4150,42 +5794,43 @@ def should_revise_readahead(config):
 # Ubuntu      5.4.0-1038-aws                    [5, 4]
 # OpenSUSE    5.3.18-24.37-default              [5, 3]
 def get_linux_kernel_version(desired_length):
+    release = platform.release()
+    if (release, desired_length) in LINUX_KERNEL_VERSIONS:
+        return list(LINUX_KERNEL_VERSIONS[(release, desired_length)])
+
     version = []
     try:
-        version = [
-            int(v)
-            for v in platform.release().split("-", 1)[0].split(".")[:desired_length]
-        ]
+        version = [int(v) for v in release.split("-", 1)[0].split(".")[:desired_length]]
     except ValueError:
         logging.warning("Failed to retrieve linux kernel version")
     # filling 0 at the end
     for i in range(len(version), desired_length):
         version.append(0)
-    return version
 
+    LINUX_KERNEL_VERSIONS[(release, desired_length)] = version
+    return list(version)
 
-def main():
-    parse_arguments_early_exit()
-
-    assert_root()
 
-    config = read_config()
-    bootstrap_logging(config)
+def mount_file_system(
+    config, fs_id, path, mountpoint, options, exit_on_tunnel_failure=True
+):
+    """
+    Mount path of the file system fs_id at mountpoint, and return a MountResult
+    """
+    start_time = time.time()
 
     if check_if_platform_is_mac() and not check_if_mac_version_is_supported():
         fatal_error(
             "We do not support EFS on MacOS Kernel version " + platform.release()
         )
 
-    fs_id, path, mountpoint, options = parse_arguments(config)
-
     logging.info("version=%s options=%s", VERSION, options)
 
     global CLOUDWATCHLOG_AGENT
     CLOUDWATCHLOG_AGENT = bootstrap_cloudwatch_logging(config, options, fs_id)
 
     check_unsupported_options(options)
-    check_options_validity(options)
+    check_options_validity(options, config)
 
     init_system = get_init_system()
     check_network_status(fs_id, init_system)
@@ -4197,6 +5842,7 @@ def main():
     if check_if_platform_is_mac() and "notls" not in options:
         options["tls"] = None
 
+    tunnel_pid = None
     if "tls" not in options and legacy_stunnel_mode_enabled(options, config):
         mount_nfs(
             config,
@@ -4207,7 +5853,7 @@ def main():
             fallback_ip_address=fallback_ip_address,
         )
     else:
-        mount_with_proxy(
+        tunnel_pid = mount_with_proxy(
             config,
             init_system,
             dns_name,
@@ -4216,8 +5862,599 @@ def main():
             mountpoint,
             options,
             fallback_ip_address=fallback_ip_address,
+            exit_on_tunnel_failure=exit_on_tunnel_failure,
         )
 
+    return MountResult(
+        fs_id=fs_id,
+        mountpoint=mountpoint,
+        dns_name=dns_name,
+        fallback_ip_address=fallback_ip_address,
+        tls_port=options.get("tlsport"),
+        tunnel_pid=tunnel_pid,
+        duration_sec=time.time() - start_time,
+    )
+
+
+def mount(fsname, mountpoint, options=None, config=None):
+    """
+    Mount the EFS file system fsname at mountpoint, as `mount -t efs -o options fsname mountpoint` does, and return a
+    MountResult with the target the file system was mounted from, the tls_port and tunnel_pid of the TLS tunnel used by
+    the mount (tunnel_pid is None if the mount shares the tunnel of another mount or uses no tunnel), and how long the
+    mount took.
+
+    fsname is a file system id or DNS name, optionally followed by ":/path". options is a dict, or a comma separated
+    string, of mount options. config defaults to the efs-utils config file.
+
+    Raises MountError, or one of its subclasses, if the file system cannot be mounted. Errors are not written to
+    stderr or published to CloudWatch, they are only raised. This must be run as root.
+    """
+    quiet = getattr(FATAL_ERROR_STATE, "quiet", False)
+    FATAL_ERROR_STATE.quiet = True
+    try:
+        if config is None:
+            config = read_config()
+
+        if isinstance(options, str):
+            options = parse_options(options)
+        else:
+            options = dict(options or {})
+
+        fs_id, path, az = match_device(config, fsname, options)
+
+        return mount_file_system(
+            config,
+            fs_id,
+            path,
+            mountpoint,
+            add_field_in_options(options, "az", az),
+            exit_on_tunnel_failure=False,
+        )
+    finally:
+        FATAL_ERROR_STATE.quiet = quiet
+
+
+def mount_from_arguments(config, args=None):
+    fs_id, path, mountpoint, options = parse_arguments(config, args)
+    return mount_file_system(config, fs_id, path, mountpoint, options)
+
+
+def send_mount_service_message(sock, message):
+    sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+
+def receive_mount_service_message(sock):
+    with sock.makefile("rb") as f:
+        line = f.readline()
+    if not line:
+        raise ValueError("Connection closed before a message was received")
+    return json.loads(line.decode("utf-8"))
+
+
+def get_mount_namespace():
+    """
+    Return the mount namespace of this process, or None if it cannot be told, as on macOS
+    """
+    try:
+        return os.readlink("/proc/self/ns/mnt")
+    except OSError:
+        return None
+
+
+def get_mount_service_args(args):
+    """
+    Return a copy of the mount.efs command line args with an absolute mountpoint, as the daemon would resolve a
+    relative one against its own working directory
+    """
+    args = list(args)
+    if len(args) > 2:
+        mountpoint_index = -1 if check_if_platform_is_mac() else 2
+        args[mountpoint_index] = os.path.abspath(args[mountpoint_index])
+    return args
+
+
+def request_mount_from_service(args, socket_path=MOUNT_SERVICE_SOCKET):
+    """
+    Hand the mount over to a mount.efs daemon listening on socket_path, and relay its output.
+
+    Return the exit code of the mount, or None if no daemon is available, or the daemon runs in another mount
+    namespace, and this process should mount on its own. Once the request is sent, the daemon may have mounted the
+    file system, so a connection lost before its response is reported as a failure instead of mounting again.
+    """
+    if not os.path.exists(socket_path):
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            sock.settimeout(MOUNT_SERVICE_CONNECT_TIMEOUT_SEC)
+            sock.connect(socket_path)
+            # The mount itself takes as long as it takes mount.nfs to finish
+            sock.settimeout(None)
+            send_mount_service_message(
+                sock,
+                {
+                    "action": "mount",
+                    "args": get_mount_service_args(args),
+                    "env": dict(os.environ),
+                    "mount_namespace": get_mount_namespace(),
+                },
+            )
+        except OSError as e:
+            logging.warning(
+                "Unable to mount through the mount service at %s, mounting without it: %s",
+                socket_path,
+                e,
+            )
+            return None
+
+        try:
+            response = receive_mount_service_message(sock)
+        except (OSError, ValueError) as e:
+            message = (
+                "Lost the connection to the mount service at %s before it reported the result of the mount, "
+                "the file system may or may not be mounted: %s" % (socket_path, e)
+            )
+            logging.error(message)
+            sys.stderr.write("%s\n" % message)
+            return 1
+    finally:
+        sock.close()
+
+    if response.get("standalone"):
+        logging.info(
+            "The mount service at %s runs in another mount namespace, mounting without it",
+            socket_path,
+        )
+        return None
+
+    logging.debug("Mount service returned %s", response.get("returncode"))
+    sys.stdout.write(response.get("stdout", ""))
+    sys.stderr.write(response.get("stderr", ""))
+    return response.get("returncode", 1)
+
+
+def unmount_for_service_request(mountpoint):
+    proc = subprocess.Popen(
+        ["umount", mountpoint],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        close_fds=True,
+    )
+    out, err = proc.communicate()
+    sys.stdout.write(out.decode("utf-8"))
+    sys.stderr.write(err.decode("utf-8"))
+    return proc.returncode
+
+
+def get_exit_code(error):
+    """
+    Return the exit code of mount.efs for a MountError or the SystemExit of sys.exit
+    """
+    if isinstance(error, MountError):
+        return error.exit_code
+    if error.code is None or isinstance(error.code, int):
+        return error.code or 0
+    return 1
+
+
+def handle_mount_service_request(config, conn):
+    """
+    Serve one request of the mount service. This runs in a process forked from the daemon, so it starts with everything
+    the daemon has already loaded, and a failed mount, which ends in sys.exit, only ends this process.
+
+    A request is a JSON object with the "action" ("mount" or "unmount"), the environment of the client in "env", its
+    "mount_namespace", and either the mount.efs command line in "args" or the "mountpoint" to unmount. The response
+    holds the "returncode" and the "stdout" and "stderr" output of the request, or "standalone" if the client runs in
+    another mount namespace, where mounts made by the daemon are not visible, and must serve the request on its own.
+    """
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = io.StringIO(), io.StringIO()
+    returncode = 0
+    standalone = False
+    try:
+        request = receive_mount_service_message(conn)
+        # Credentials and region may come from the environment of the client
+        os.environ.clear()
+        os.environ.update(request.get("env", {}))
+
+        action = request.get("action")
+        logging.info("Serving %s request of the mount service", action)
+        client_mount_namespace = request.get("mount_namespace")
+        if (
+            client_mount_namespace is not None
+            and client_mount_namespace != get_mount_namespace()
+        ):
+            logging.info(
+                "Client runs in mount namespace %s, where mounts of the daemon are not visible, returning the "
+                "request to it",
+                client_mount_namespace,
+            )
+            standalone = True
+        elif action == "mount":
+            mount_from_arguments(config, request["args"])
+        elif action == "unmount":
+            returncode = unmount_for_service_request(request["mountpoint"])
+        else:
+            sys.stderr.write('Unsupported mount service action "%s"\n' % action)
+            returncode = 1
+    except (MountError, SystemExit) as e:
+        returncode = get_exit_code(e)
+    except Exception as e:
+        logging.exception("Failed to serve mount service request")
+        sys.stderr.write("%s\n" % e)
+        returncode = 1
+    finally:
+        response = {
+            "returncode": returncode,
+            "stdout": sys.stdout.getvalue(),
+            "stderr": sys.stderr.getvalue(),
+        }
+        if standalone:
+            response["standalone"] = True
+        sys.stdout, sys.stderr = stdout, stderr
+
+    send_mount_service_message(conn, response)
+
+
+def warm_mount_service_caches(config):
+    """
+    Load what mounts need up front, so that the processes forked to serve requests find it in memory or on disk
+    """
+    if not check_if_platform_is_mac():
+        get_instance_identity_info_from_instance_metadata(config, "region")
+
+    # Creating the RSA private key shared by tls mounts is slow
+    check_and_create_private_key(STATE_FILE_DIR)
+
+    # The forked processes create their clients from the loaded models, with the credentials of their request
+    warm_botocore_models()
+
+
+def get_config_file_mtime(config_file=CONFIG_FILE):
+    try:
+        return os.path.getmtime(config_file)
+    except OSError:
+        return None
+
+
+def reap_mount_service_workers():
+    while True:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+
+
+def serve_mount_requests(config, socket_path=MOUNT_SERVICE_SOCKET):
+    """
+    Serve mount and unmount requests on a unix socket until terminated. Every request is served by a forked process,
+    which inherits the loaded modules, config and instance metadata of the daemon instead of loading them again.
+
+    The socket is only accessible to root, as mount.efs itself.
+    """
+    create_required_directory(config, os.path.dirname(socket_path))
+    try:
+        os.remove(socket_path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+    warm_mount_service_caches(config)
+    config_mtime = get_config_file_mtime()
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(socket_path)
+    finally:
+        os.umask(old_umask)
+    server.listen(MOUNT_SERVICE_BACKLOG)
+    server.settimeout(MOUNT_SERVICE_POLL_INTERVAL_SEC)
+    logging.info("Serving mount requests on %s", socket_path)
+
+    try:
+        while True:
+            reap_mount_service_workers()
+
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                continue
+
+            current_config_mtime = get_config_file_mtime()
+            if current_config_mtime != config_mtime:
+                logging.info("Config file %s changed, reloading it", CONFIG_FILE)
+                config = read_config()
+                config_mtime = current_config_mtime
+
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    server.close()
+                    handle_mount_service_request(config, conn)
+                    flush_cloudwatch_log(CLOUDWATCHLOG_AGENT)
+                finally:
+                    os._exit(0)
+            conn.close()
+    finally:
+        server.close()
+        os.remove(socket_path)
+
+
+def get_batch_mount_file(args=None):
+    if args is None:
+        args = sys.argv
+
+    batch_index = args.index(BATCH_MOUNT_OPTION) + 1
+    if batch_index >= len(args):
+        usage(out=sys.stderr)
+
+    if args[batch_index] == "fstab":
+        return FSTAB_FILE
+    return args[batch_index]
+
+
+def unescape_fstab_field(field):
+    # fstab escapes white space in its fields as octal sequences, such as \040 for a space
+    return re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), field)
+
+
+def parse_batch_mount_entries(batch_file):
+    """
+    Return the BatchMountEntry of every efs entry of batch_file, which has the format of /etc/fstab. Entries with the
+    "noauto" option are skipped, as "mount -a" does, and the options consumed by mount(8) itself are dropped.
+    """
+    entries = []
+    with open(batch_file) as f:
+        for line in f:
+            fields = [unescape_fstab_field(field) for field in line.split()]
+            if len(fields) < 3 or fields[0].startswith("#") or fields[2] != "efs":
+                continue
+
+            options = parse_options(fields[3]) if len(fields) > 3 else {}
+            if "noauto" in options:
+                continue
+
+            entries.append(
+                BatchMountEntry(
+                    fsname=fields[0],
+                    mountpoint=fields[1],
+                    options=dict(
+                        (k, v)
+                        for k, v in options.items()
+                        if k not in FSTAB_ONLY_OPTIONS and not k.startswith("x-")
+                    ),
+                    nofail="nofail" in options,
+                )
+            )
+
+    return entries
+
+
+def get_batch_mount_concurrency(config):
+    """
+    Return batch_mount_concurrency, at least 1, as batch_mount would wait forever for entries it never started
+    """
+    concurrency = DEFAULT_BATCH_MOUNT_CONCURRENCY
+    if config.has_option(CONFIG_SECTION, BATCH_MOUNT_CONCURRENCY_ITEM):
+        value = config.get(CONFIG_SECTION, BATCH_MOUNT_CONCURRENCY_ITEM)
+        try:
+            concurrency = int(value)
+        except ValueError:
+            logging.warning(
+                'Bad %s, "%s", in config file "%s". Defaulting to %d.',
+                BATCH_MOUNT_CONCURRENCY_ITEM,
+                value,
+                CONFIG_FILE,
+                DEFAULT_BATCH_MOUNT_CONCURRENCY,
+            )
+
+    if concurrency < 1:
+        logging.warning(
+            '%s value in config file "%s" is lower than 1, mounting one entry at a time.',
+            BATCH_MOUNT_CONCURRENCY_ITEM,
+            CONFIG_FILE,
+        )
+        concurrency = 1
+    return concurrency
+
+
+def allocate_tls_ports(config, count, state_file_dir=STATE_FILE_DIR):
+    """
+    Return up to count distinct ports of the tls port range that are not used by an existing mount, listing the state
+    files once for all of them instead of once for every port tried by every mount
+    """
+    lower_bound, upper_bound = get_tls_port_range(config)
+
+    used_ports = set()
+    if os.path.isdir(state_file_dir):
+        for fname in os.listdir(state_file_dir):
+            suffix = fname.rsplit(".", 1)[-1]
+            if suffix.isdigit():
+                used_ports.add(int(suffix))
+
+    ports = [port for port in range(lower_bound, upper_bound) if port not in used_ports]
+    random.shuffle(ports)
+    return ports[:count]
+
+
+def warm_batch_mount_caches(config):
+    """
+    Do the setup shared by all mounts of a batch once, before the processes mounting the entries are forked
+    """
+    global STUNNEL_OPTIONS
+
+    warm_mount_service_caches(config)
+
+    try:
+        STUNNEL_OPTIONS = get_stunnel_options()
+    except MountError:
+        # Each mount reports the missing stunnel on its own
+        pass
+
+
+def mount_batch_entry(config, entry, tls_ports):
+    """
+    Mount one entry of a batch, in the process forked for it, and return its result. The output of the mount is
+    captured in the result, so that the output of concurrent mounts is not interleaved.
+    """
+    global RESERVED_TLS_PORTS
+    RESERVED_TLS_PORTS = tls_ports
+
+    start_time = time.time()
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = io.StringIO(), io.StringIO()
+    returncode = 0
+    try:
+        options = dict(entry.options)
+        fs_id, path, az = match_device(config, entry.fsname, options)
+        mount_file_system(
+            config,
+            fs_id,
+            path,
+            entry.mountpoint,
+            add_field_in_options(options, "az", az),
+            exit_on_tunnel_failure=False,
+        )
+    except (MountError, SystemExit) as e:
+        returncode = get_exit_code(e)
+    except Exception as e:
+        logging.exception("Failed to mount %s", entry.fsname)
+        sys.stderr.write("%s\n" % e)
+        returncode = 1
+    finally:
+        result = {
+            "returncode": returncode,
+            "stdout": sys.stdout.getvalue(),
+            "stderr": sys.stderr.getvalue(),
+            "duration_sec": time.time() - start_time,
+        }
+        sys.stdout, sys.stderr = stdout, stderr
+
+    return result
+
+
+def read_batch_mount_result(read_fd):
+    with os.fdopen(read_fd, "rb") as f:
+        data = f.read()
+    try:
+        return json.loads(data.decode("utf-8"))
+    except ValueError:
+        return None
+
+
+def report_batch_mount_result(entry, result):
+    sys.stdout.write(result.get("stdout", ""))
+    if result["returncode"] == 0:
+        sys.stdout.write(
+            "%s on %s: mounted in %.2fs\n"
+            % (entry.fsname, entry.mountpoint, result.get("duration_sec", 0))
+        )
+        return
+
+    message = result.get("stderr", "").strip().replace("\n", "; ")
+    sys.stderr.write(
+        "%s on %s: failed with exit code %d%s%s\n"
+        % (
+            entry.fsname,
+            entry.mountpoint,
+            result["returncode"],
+            ", ignored as nofail" if entry.nofail else "",
+            ": " + message if message else "",
+        )
+    )
+
+
+def batch_mount(config, batch_file):
+    """
+    Mount all efs entries of batch_file, which has the format of /etc/fstab. The setup shared by the mounts, such as
+    loading the instance metadata, the private key and the stunnel options, and allocating their tls ports, is done
+    once up front, and the entries are then mounted by forked processes, at most batch_mount_concurrency at a time.
+
+    The result of every entry is reported, and the exit code is 0 only if every entry without "nofail" was mounted.
+    """
+    try:
+        entries = parse_batch_mount_entries(batch_file)
+    except (IOError, OSError) as e:
+        fatal_error("Failed to read batch mount file %s: %s" % (batch_file, e))
+
+    if not entries:
+        sys.stdout.write("No efs entries to mount in %s\n" % batch_file)
+        return 0
+
+    warm_batch_mount_caches(config)
+    tls_ports = allocate_tls_ports(config, len(entries))
+    concurrency = get_batch_mount_concurrency(config)
+    logging.info(
+        "Mounting %d entries of %s, %d at a time", len(entries), batch_file, concurrency
+    )
+
+    pending = list(enumerate(entries))
+    running = {}
+    returncode = 0
+    while pending or running:
+        while pending and len(running) < concurrency:
+            index, entry = pending.pop(0)
+            read_fd, write_fd = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    os.close(read_fd)
+                    result = mount_batch_entry(
+                        config, entry, tls_ports[index : index + 1]
+                    )
+                    with os.fdopen(write_fd, "wb") as f:
+                        f.write(json.dumps(result).encode("utf-8"))
+                    flush_cloudwatch_log(CLOUDWATCHLOG_AGENT)
+                finally:
+                    os._exit(0)
+            os.close(write_fd)
+            running[read_fd] = (pid, entry)
+
+        # A process is done with its entry once it closes its end of the pipe
+        readable, _, _ = select.select(list(running), [], [])
+        for read_fd in readable:
+            pid, entry = running.pop(read_fd)
+            result = read_batch_mount_result(read_fd)
+            _, status = os.waitpid(pid, 0)
+            if result is None:
+                result = {"returncode": os.WEXITSTATUS(status) or 1}
+
+            report_batch_mount_result(entry, result)
+            if result["returncode"] != 0 and not entry.nofail:
+                returncode = 1
+
+    return returncode
+
+
+def main():
+    try:
+        parse_arguments_early_exit()
+
+        assert_root()
+
+        config = read_config()
+        bootstrap_logging(config)
+
+        if MOUNT_SERVICE_DAEMON_OPTION in sys.argv[1:]:
+            serve_mount_requests(config)
+            return
+
+        if BATCH_MOUNT_OPTION in sys.argv[1:]:
+            sys.exit(batch_mount(config, get_batch_mount_file()))
+
+        returncode = request_mount_from_service(sys.argv)
+        if returncode is not None:
+            sys.exit(returncode)
+
+        mount_from_arguments(config)
+    except MountError as e:
+        # fatal_error has reported the error already
+        sys.exit(e.exit_code)
+
 
 if "__main__" == __name__:
     main()
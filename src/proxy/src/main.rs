@@ -5,6 +5,8 @@ use crate::tls::TlsConfig;
 use clap::Parser;
 use controller::Controller;
 use log::{debug, error, info};
+use std::io::Write;
+use std::os::unix::io::FromRawFd;
 use std::path::Path;
 use std::sync::Arc;
 use tokio::io::AsyncWriteExt;
@@ -78,6 +80,7 @@ async fn main() {
             status_reporter,
         )
         .await;
+        notify_ready(args.ready_fd);
         tokio::spawn(controller.run(sigterm_cancellation_token.clone()))
     } else {
         let controller = Controller::new(
@@ -88,6 +91,7 @@ async fn main() {
             status_reporter,
         )
         .await;
+        notify_ready(args.ready_fd);
         tokio::spawn(controller.run(sigterm_cancellation_token.clone()))
     };
 
@@ -122,6 +126,20 @@ async fn write_pid_file(pid_file_path: &Path) -> Result<(), anyhow::Error> {
     Ok(())
 }
 
+// Tell the process that launched efs-proxy (mount.efs) that the listener is bound and NFS
+// connections can be accepted. The fd is closed afterwards, so the reader sees EOF either way.
+fn notify_ready(ready_fd: Option<i32>) {
+    let Some(fd) = ready_fd else {
+        return;
+    };
+    // Safety: the fd is handed to us by our parent for this sole purpose and is not used elsewhere.
+    let mut ready_pipe = unsafe { std::fs::File::from_raw_fd(fd) };
+    match ready_pipe.write_all(b"READY\n") {
+        Ok(()) => debug!("Notified readiness on fd {}", fd),
+        Err(e) => error!("Unable to notify readiness on fd {}: {}", fd, e),
+    }
+}
+
 fn run_sighup_handler(proxy_config: ProxyConfig, tls_config: Arc<Mutex<TlsConfig>>) {
     tokio::spawn(async move {
         let mut sighup_listener = match signal::unix::signal(signal::unix::SignalKind::hangup()) {
@@ -151,6 +169,10 @@ pub struct Args {
 
     #[arg(long, default_value_t = false)]
     pub tls: bool,
+
+    /// File descriptor inherited from the parent, written to once the listener is bound
+    #[arg(long)]
+    pub ready_fd: Option<i32>,
 }
 
 #[cfg(test)]
@@ -10,6 +10,7 @@
 import base64
 import errno
 import hashlib
+import heapq
 import hmac
 import json
 import logging
@@ -17,17 +18,20 @@ import logging.handlers
 import os
 import platform
 import pwd
+import random
 import re
 import shutil
+import signal
 import socket
 import subprocess
 import sys
 import time
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
 from logging.handlers import RotatingFileHandler
-from signal import SIGHUP, SIGKILL, SIGTERM
+from signal import SIGHUP, SIGKILL, SIGTERM, SIGUSR1
 
 try:
     from configparser import ConfigParser, NoOptionError, NoSectionError
@@ -74,6 +78,8 @@ LOG_DIR = "/var/log/amazon/efs"
 LOG_FILE = "mount-watchdog.log"
 
 STATE_FILE_DIR = "/var/run/efs"
+# References of mounts sharing the tunnel of another mount, see mount_efs.add_shared_tunnel_reference
+SHARED_TUNNEL_REFS_DIR = "tunnel-refs"
 STUNNEL_PID_FILE = "stunnel.pid"
 
 DEFAULT_NFS_PORT = "2049"
@@ -81,6 +87,29 @@ PRIVATE_KEY_FILE = "/etc/amazon/efs/privateKey.pem"
 DEFAULT_REFRESH_SELF_SIGNED_CERT_INTERVAL_MIN = 60
 DEFAULT_STUNNEL_HEALTH_CHECK_INTERVAL_MIN = 5
 DEFAULT_STUNNEL_HEALTH_CHECK_TIMEOUT_SEC = 30
+STALL_DETECTION_ENABLED_ITEM = "stall_detection_enabled"
+STALL_DETECTION_WINDOW_ITEM = "stall_detection_window_sec"
+# As long as the NFS client waits for a reply before retransmitting, timeo=600 of mount.efs, so that a slow but
+# healthy server does not get its tunnels restarted
+DEFAULT_STALL_DETECTION_WINDOW_SEC = 60
+RESTART_BACKOFF_INITIAL_ITEM = "restart_backoff_initial_sec"
+DEFAULT_RESTART_BACKOFF_INITIAL_SEC = 2
+RESTART_BACKOFF_MAX_ITEM = "restart_backoff_max_sec"
+DEFAULT_RESTART_BACKOFF_MAX_SEC = 300
+RESTART_STABLE_ITEM = "restart_stable_sec"
+DEFAULT_RESTART_STABLE_SEC = 60
+RESTART_QUARANTINE_FLAPS_ITEM = "restart_quarantine_flaps"
+DEFAULT_RESTART_QUARANTINE_FLAPS = 8
+CERTIFICATE_TASK = "certificate"
+HEALTH_CHECK_TASK = "health_check"
+TASK_JITTER_ITEM = "task_jitter_sec"
+DEFAULT_TASK_JITTER_SEC = 60
+# The delay before a task whose due time has already passed runs again, e.g. after a failed certificate refresh
+TASK_RETRY_INTERVAL_SEC = 30
+CERTIFICATE_REFRESH_CONCURRENCY_ITEM = "certificate_refresh_concurrency"
+DEFAULT_CERTIFICATE_REFRESH_CONCURRENCY = 4
+CERTIFICATE_SHARING_ENABLED_ITEM = "certificate_sharing_enabled"
+SHARED_CERTIFICATES_DIR = "shared-certificates"
 NOT_BEFORE_MINS = 15
 NOT_AFTER_HOURS = 3
 DATE_ONLY_FORMAT = "%Y%m%d"
@@ -184,6 +213,81 @@ EFS_PROXY_INSTALLATION_MESSAGE = "Please install it by reinstalling amazon-efs-u
 
 EFS_PROXY_BIN = "efs-proxy"
 
+MOUNTINFO_FILE = "/proc/self/mountinfo"
+# Written by mount.efs for every mount, see record_readahead_settings
+READAHEAD_STATE_DIR = "readahead"
+OPTIMIZE_READAHEAD_ITEM = "optimize_readahead"
+DEFAULT_NFS_MAX_READAHEAD_MULTIPLIER = 15
+NFS_READAHEAD_CONFIG_PATH_FORMAT = "/sys/class/bdi/%s/read_ahead_kb"
+NFS_READAHEAD_OPTIMIZE_LINUX_KERNEL_MIN_VERSION = [5, 4]
+MOUNTSTATS_FILE = "/proc/self/mountstats"
+READAHEAD_TUNING_ENABLED_ITEM = "readahead_tuning_enabled"
+READAHEAD_TUNING_INTERVAL_ITEM = "readahead_tuning_interval_sec"
+DEFAULT_READAHEAD_TUNING_INTERVAL_SEC = 60
+READAHEAD_TUNING_MIN_KB_ITEM = "readahead_tuning_min_kb"
+DEFAULT_READAHEAD_TUNING_MIN_KB = 128
+READAHEAD_TUNING_MAX_KB_ITEM = "readahead_tuning_max_kb"
+DEFAULT_READAHEAD_TUNING_MAX_KB = 15360
+# How many consecutive samples must show the same workload before read_ahead_kb is changed
+READAHEAD_TUNING_STABLE_SAMPLES_ITEM = "readahead_tuning_stable_samples"
+DEFAULT_READAHEAD_TUNING_STABLE_SAMPLES = 3
+# Samples with fewer READ operations than this do not tell anything about the workload
+READAHEAD_TUNING_MIN_READS = 64
+# Reads of this size or less on average are random reads, which readahead only wastes bandwidth on
+RANDOM_READ_MAX_BYTES = 64 * 1024
+DEFAULT_NFS_RSIZE = 1048576
+NFS_STATS_ENABLED_ITEM = "nfs_stats_enabled"
+NFS_STATS_FILE_ITEM = "nfs_stats_file"
+DEFAULT_NFS_STATS_FILE = os.path.join(STATE_FILE_DIR, "nfs-stats.prom")
+NFS_STATS_INTERVAL_ITEM = "nfs_stats_interval_sec"
+DEFAULT_NFS_STATS_INTERVAL_SEC = 15
+STATUS_ENABLED_ITEM = "status_enabled"
+STATUS_FILE_ITEM = "status_file"
+DEFAULT_STATUS_FILE = os.path.join(STATE_FILE_DIR, "watchdog-status.json")
+STATUS_METRICS_FILE_ITEM = "status_metrics_file"
+DEFAULT_STATUS_METRICS_FILE = os.path.join(STATE_FILE_DIR, "watchdog-status.prom")
+STATUS_INTERVAL_ITEM = "status_interval_sec"
+DEFAULT_STATUS_INTERVAL_SEC = 10
+PROFILE_CYCLES_ITEM = "profile_cycles"
+DEFAULT_PROFILE_CYCLES = 10
+PROFILE_FILE_PREFIX = "watchdog-profile"
+PROFILE_TOP_FUNCTIONS = 50
+PROFILE_TOP_ALLOCATIONS = 25
+SLOW_CYCLE_REPORTED_STEPS = 5
+
+# The time spent in every step of the current watchdog cycle, see timed_step
+CYCLE_STEP_TIMINGS = {}
+# Set by SIGUSR1 to profile the next watchdog cycles
+PROFILE_REQUESTED = False
+# The counters of a per-op statistics line of mountstats, in order
+NFS_OP_COUNTERS = [
+    "ops",
+    "transmissions",
+    "timeouts",
+    "bytes_sent",
+    "bytes_received",
+    "queue_ms",
+    "rtt_ms",
+    "execute_ms",
+    "errors",
+]
+# The counters of the "xprt: tcp" line of mountstats, in order, after the source port
+NFS_XPRT_TCP_COUNTERS = [
+    "bind_count",
+    "connect_count",
+    "connect_time",
+    "idle_time",
+    "sends",
+    "receives",
+    "bad_xids",
+    "requests_in_flight",
+    "backlog",
+    "max_slots",
+    "sending_queue",
+    "pending_queue",
+]
+MountStats = namedtuple("MountStats", ["server", "age", "ops", "xprt", "xprts"])
+
 
 def fatal_error(user_message, log_message=None):
     if log_message is None:
@@ -1160,6 +1264,11 @@ def cleanup_mount_state_if_stunnel_not_running(
 
         os.remove(state_file_path)
 
+        if "tunnelKey" in state:
+            refs_dir = os.path.join(state_file_dir, SHARED_TUNNEL_REFS_DIR, state_file)
+            if os.path.isdir(refs_dir):
+                shutil.rmtree(refs_dir)
+
         if mount_state_dir is not None:
             mount_state_dir_abs_path = os.path.join(state_file_dir, mount_state_dir)
             if os.path.isdir(mount_state_dir_abs_path):
@@ -1204,26 +1313,245 @@ def restart_tls_tunnel(child_procs, state, state_file_dir, state_file):
 
     new_tunnel_pid = start_tls_tunnel(child_procs, state, state_file_dir, state_file)
     state["pid"] = new_tunnel_pid
+    state["tunnel_start_time"] = time.time()
+    state["tunnel_restart_count"] = state.get("tunnel_restart_count", 0) + 1
 
     logging.debug("Rewriting %s with new pid: %d", state_file, new_tunnel_pid)
     rewrite_state_file(state, state_file_dir, state_file)
 
 
+def get_restart_backoff_sec(config, flap_count, quarantined=False):
+    """
+    Return how long to wait before restarting a tunnel that exited flap_count times in a row shortly after starting.
+    The first of those exits is restarted at once, then the wait doubles up to restart_backoff_max_sec. A quarantined
+    tunnel always waits restart_backoff_max_sec.
+    """
+    if flap_count < 2 and not quarantined:
+        return 0
+
+    max_sec = get_int_value_from_config_file(
+        config, RESTART_BACKOFF_MAX_ITEM, DEFAULT_RESTART_BACKOFF_MAX_SEC
+    )
+    if quarantined:
+        return max_sec
+    initial_sec = get_int_value_from_config_file(
+        config, RESTART_BACKOFF_INITIAL_ITEM, DEFAULT_RESTART_BACKOFF_INITIAL_SEC
+    )
+    return min(max_sec, initial_sec * 2 ** (flap_count - 2))
+
+
+def is_tunnel_restart_due(config, state, state_file_dir, state_file, current_time):
+    """
+    Return whether the tunnel, found not running, is due for a restart.
+
+    When the tunnel is first found not running, it counts as a flap if it exited within restart_stable_sec of its
+    start. The restart is delayed by get_restart_backoff_sec, and after restart_quarantine_flaps flaps in a row the
+    tunnel is quarantined: it is only restarted every restart_backoff_max_sec until it stays up.
+    """
+    state_changed = "tunnel_down_time" not in state
+    if state_changed:
+        stable_sec = get_int_value_from_config_file(
+            config, RESTART_STABLE_ITEM, DEFAULT_RESTART_STABLE_SEC
+        )
+        start_time = state.get("tunnel_start_time", state.get("mount_time"))
+        if start_time is not None and current_time - start_time < stable_sec:
+            state["tunnel_flap_count"] = state.get("tunnel_flap_count", 0) + 1
+            state["tunnel_flaps_total"] = state.get("tunnel_flaps_total", 0) + 1
+        else:
+            state["tunnel_flap_count"] = 0
+            state.pop("tunnel_quarantined", None)
+
+        flap_count = state["tunnel_flap_count"]
+        quarantine_flaps = get_int_value_from_config_file(
+            config, RESTART_QUARANTINE_FLAPS_ITEM, DEFAULT_RESTART_QUARANTINE_FLAPS
+        )
+        was_quarantined = state.get("tunnel_quarantined", False)
+        if flap_count >= quarantine_flaps:
+            state["tunnel_quarantined"] = True
+        backoff_sec = get_restart_backoff_sec(
+            config, flap_count, state.get("tunnel_quarantined", False)
+        )
+        state["tunnel_down_time"] = current_time
+        state["next_restart_time"] = current_time + backoff_sec
+
+        if was_quarantined:
+            logging.debug(
+                "Quarantined TLS tunnel for %s is not running, restarting it in %d sec",
+                state_file,
+                backoff_sec,
+            )
+        elif state.get("tunnel_quarantined"):
+            logging.error(
+                "TLS tunnel for %s exited %d times in a row within %d sec of starting, quarantining it: it is "
+                "restarted every %d sec until it stays up",
+                state_file,
+                flap_count,
+                stable_sec,
+                backoff_sec,
+            )
+        elif backoff_sec:
+            logging.warning(
+                "TLS tunnel for %s is not running, it exited %d times in a row within %d sec of starting, "
+                "restarting it in %d sec",
+                state_file,
+                flap_count,
+                stable_sec,
+                backoff_sec,
+            )
+        else:
+            logging.warning("TLS tunnel for %s is not running", state_file)
+
+    if current_time >= state["next_restart_time"]:
+        # The attempt counts as a start, so a restart that fails before the tunnel is up, e.g. on a missing
+        # certificate or binary, is a flap too
+        del state["tunnel_down_time"]
+        del state["next_restart_time"]
+        state["tunnel_start_time"] = current_time
+        rewrite_state_file(state, state_file_dir, state_file)
+        return True
+
+    if state_changed:
+        rewrite_state_file(state, state_file_dir, state_file)
+    return False
+
+
+def check_tunnel_flaps(config, state, state_file_dir, state_file, current_time):
+    """
+    Clear the flap count and the quarantine of a running tunnel once it has stayed up for restart_stable_sec
+    """
+    if not state.get("tunnel_flap_count") and "tunnel_down_time" not in state:
+        return
+
+    start_time = state.get("tunnel_start_time", state.get("mount_time", 0))
+    stable_sec = get_int_value_from_config_file(
+        config, RESTART_STABLE_ITEM, DEFAULT_RESTART_STABLE_SEC
+    )
+    if "tunnel_down_time" not in state and current_time - start_time < stable_sec:
+        return
+
+    if state.get("tunnel_quarantined"):
+        logging.info(
+            "TLS tunnel for %s has stayed up for %d sec, lifting its quarantine",
+            state_file,
+            stable_sec,
+        )
+    # A tunnel found running again before its restart was started by someone else, its flaps are counted anew
+    for item in [
+        "tunnel_down_time",
+        "next_restart_time",
+        "tunnel_flap_count",
+        "tunnel_quarantined",
+    ]:
+        state.pop(item, None)
+    rewrite_state_file(state, state_file_dir, state_file)
+
+
+def is_mount_present(mount, nfs_mounts):
+    # For MacOS, if we don't have port from previous system call (nfsstat -F JSON -m mount_point), we ignore the port
+    return mount in nfs_mounts or (
+        check_if_running_on_macos() and mount[: mount.rindex(".")] in nfs_mounts
+    )
+
+
+def get_live_shared_tunnel_refs(
+    state_file_dir, state_file, nfs_mounts, unmount_count_for_consistency
+):
+    """
+    Return the references, keyed by file-safe mountpoint and port, of the mounts that still use the tunnel of
+    state_file besides its own mount. References of mounts that are gone are removed with the same grace time and
+    consistency checks as state files.
+    """
+    refs = {}
+    refs_dir = os.path.join(state_file_dir, SHARED_TUNNEL_REFS_DIR, state_file)
+    if not os.path.isdir(refs_dir):
+        return refs
+
+    current_time = time.time()
+    for ref_file in os.listdir(refs_dir):
+        if not ref_file.startswith("fs-"):
+            continue
+
+        ref_file_path = os.path.join(refs_dir, ref_file)
+        try:
+            with open(ref_file_path) as f:
+                ref = json.load(f)
+        except (IOError, ValueError):
+            logging.exception("Unable to parse json in %s", ref_file_path)
+            continue
+
+        mount = ref_file[ref_file.find(".") + 1 :]
+        if is_mount_present(mount, nfs_mounts):
+            if ref.get("unmount_count", 0):
+                ref["unmount_count"] = 0
+                rewrite_state_file(ref, refs_dir, ref_file)
+            refs[mount] = ref
+        elif current_time - ref.get("mount_time", 0) <= UNMOUNT_DIFF_TIME:
+            # The mount may still be in progress
+            refs[mount] = ref
+        elif ref.get("unmount_count", 0) > unmount_count_for_consistency:
+            logging.info(
+                'No mount found for "%s" sharing the tunnel of "%s"',
+                ref_file,
+                state_file,
+            )
+            os.remove(ref_file_path)
+        else:
+            ref["unmount_count"] = ref.get("unmount_count", 0) + 1
+            rewrite_state_file(ref, refs_dir, ref_file)
+            refs[mount] = ref
+
+    return refs
+
+
 def check_efs_mounts(
     config,
     child_procs,
     unmount_grace_period_sec,
     unmount_count_for_consistency,
     state_file_dir=STATE_FILE_DIR,
+    tunnel_progress=None,
+    scheduler=None,
+    certificate_refresher=None,
+    shared_certificates=None,
 ):
-    nfs_mounts = get_current_local_nfs_mounts()
+    """
+    tunnel_progress holds the transport counters of every tunnel between calls, for the stall detection. Stalls are
+    not detected without it.
+
+    scheduler, a MountTaskScheduler, holds the due times of the certificate refresh and health check of every tunnel
+    between calls. Without it, both are considered on every call.
+
+    certificate_refresher, a CertificateRefresher, refreshes the certificates of running tunnels in the background.
+    Without it, certificates are refreshed during the call.
+
+    shared_certificates holds the certificates built by the watchdog between calls, to reuse them across mounts with
+    the same signing inputs. Without it, every mount builds its own certificate.
+    """
+    if certificate_refresher is not None:
+        with timed_step("check_efs_mounts.collect_certificate_refreshes"):
+            certificate_refresher.collect()
+
+    with timed_step("check_efs_mounts.get_nfs_mounts"):
+        nfs_mounts = get_current_local_nfs_mounts()
     logging.debug("Current local NFS mounts: %s", list(nfs_mounts.values()))
 
-    state_files = get_state_files(state_file_dir)
+    with timed_step("check_efs_mounts.get_state_files"):
+        state_files = get_state_files(state_file_dir)
     logging.debug(
         'Current state files in "%s": %s', state_file_dir, list(state_files.values())
     )
 
+    mount_stats = None
+    if tunnel_progress is not None:
+        for state_file in list(tunnel_progress):
+            if state_file not in state_files.values():
+                del tunnel_progress[state_file]
+        with timed_step("check_efs_mounts.read_mountstats"):
+            mount_stats = get_tunnel_mount_stats(config, nfs_mounts)
+
+    if scheduler is not None:
+        scheduler.start_cycle(time.time(), state_files.values())
+
     for mount, state_file in state_files.items():
         state_file_path = os.path.join(state_file_dir, state_file)
         with open(state_file_path) as f:
@@ -1234,20 +1562,32 @@ def check_efs_mounts(
                 continue
 
         current_time = time.time()
+
+        shared_refs = {}
+        if "tunnelKey" in state:
+            shared_refs = get_live_shared_tunnel_refs(
+                state_file_dir, state_file, nfs_mounts, unmount_count_for_consistency
+            )
+            if shared_refs and "unmount_time" in state:
+                logging.info(
+                    "TLS tunnel of %s is still used by %s, keeping it running",
+                    state_file,
+                    list(shared_refs),
+                )
+                del state["unmount_time"]
+                rewrite_state_file(state, state_file_dir, state_file)
+
         if "unmount_time" in state:
             if state["unmount_time"] + unmount_grace_period_sec < current_time:
                 logging.info("Unmount grace period expired for %s", state_file)
-                clean_up_mount_state(
-                    state_file_dir,
-                    state_file,
-                    state.get("pid"),
-                    state.get("mountStateDir"),
-                )
-        # For MacOS, if we don't have port from previous system call (nfsstat -F JSON -m mount_point), we ignore the port
-        elif mount not in nfs_mounts and (
-            not check_if_running_on_macos()
-            or mount[: mount.rindex(".")] not in nfs_mounts
-        ):
+                with timed_step("check_efs_mounts.clean_up_mount_state"):
+                    clean_up_mount_state(
+                        state_file_dir,
+                        state_file,
+                        state.get("pid"),
+                        state.get("mountStateDir"),
+                    )
+        elif not is_mount_present(mount, nfs_mounts) and not shared_refs:
             # Wait 30 seconds before deciding mount no longer exists to prevent race condition
             # of watchdog's reads of nfs mounts and state files.
             if current_time - state.get("mount_time", 0) > UNMOUNT_DIFF_TIME:
@@ -1263,20 +1603,209 @@ def check_efs_mounts(
 
         else:
             # Set unmount count to 0 if there were inconsistent reads
+            state_changed = state.get("unmount_count", 0) != 0
             state["unmount_count"] = 0
-            rewrite_state_file(state, state_file_dir, state_file)
-            if "certificate" in state:
-                check_certificate(config, state, state_file_dir, state_file)
+            if not is_mount_present(mount, nfs_mounts):
+                # The mount that started the tunnel is gone, health check the tunnel through a mount still using it
+                for shared_mount, ref in shared_refs.items():
+                    if is_mount_present(shared_mount, nfs_mounts):
+                        state_changed |= state.get("mountpoint") != ref["mountpoint"]
+                        state["mountpoint"] = ref["mountpoint"]
+                        break
+            # Only rewrite the state file when needed, instead of rewriting every state file every cycle
+            if state_changed:
+                rewrite_state_file(state, state_file_dir, state_file)
 
-            if is_mount_stunnel_proc_running(
+            tunnel_running = is_mount_stunnel_proc_running(
                 state.get("pid"), state_file, state_file_dir
+            )
+            # The certificate is checked before restarting a tunnel too, as the restart needs it to exist. The restart
+            # cannot wait for a worker, so that check runs during the call, unless a worker is already refreshing it.
+            refresh_pending = (
+                certificate_refresher is not None
+                and certificate_refresher.is_pending(state_file)
+            )
+            if (
+                "certificate" in state
+                and (tunnel_running or not refresh_pending)
+                and (
+                    not tunnel_running
+                    or scheduler is None
+                    or scheduler.is_due(state_file, CERTIFICATE_TASK)
+                )
             ):
-                check_stunnel_health(
-                    config, state, state_file_dir, state_file, child_procs, nfs_mounts
+                with timed_step("check_efs_mounts.check_certificate"):
+                    check_certificate(
+                        config,
+                        state,
+                        state_file_dir,
+                        state_file,
+                        certificate_refresher=(
+                            certificate_refresher if tunnel_running else None
+                        ),
+                        shared_certificates=shared_certificates,
+                    )
+                if scheduler is not None:
+                    schedule_certificate_refresh(config, scheduler, state, state_file)
+
+            if tunnel_running:
+                check_tunnel_flaps(
+                    config, state, state_file_dir, state_file, current_time
                 )
-            else:
-                logging.warning("TLS tunnel for %s is not running", state_file)
-                restart_tls_tunnel(child_procs, state, state_file_dir, state_file)
+                with timed_step("check_efs_mounts.check_tunnel_stall"):
+                    probed = mount_stats is not None and check_tunnel_stall(
+                        config,
+                        state,
+                        state_file_dir,
+                        state_file,
+                        child_procs,
+                        nfs_mounts,
+                        mount_stats,
+                        tunnel_progress,
+                    )
+                if probed or (
+                    scheduler is not None
+                    and not scheduler.is_due(state_file, HEALTH_CHECK_TASK)
+                ):
+                    continue
+                with timed_step("check_efs_mounts.check_stunnel_health"):
+                    check_stunnel_health(
+                        config,
+                        state,
+                        state_file_dir,
+                        state_file,
+                        child_procs,
+                        nfs_mounts,
+                    )
+                if scheduler is not None:
+                    schedule_health_check(config, scheduler, state, state_file)
+            elif is_tunnel_restart_due(
+                config, state, state_file_dir, state_file, current_time
+            ):
+                with timed_step("check_efs_mounts.restart_tls_tunnel"):
+                    restart_tls_tunnel(child_procs, state, state_file_dir, state_file)
+
+
+class MountTaskScheduler(object):
+    """
+    The next due time of the periodic tasks of every tunnel, the certificate refresh and the health check, in a heap
+    ordered by due time. A watchdog cycle only pops the tasks that are due, instead of comparing the timestamps of
+    every task of every tunnel.
+
+    A task that has not been scheduled, e.g. of a new tunnel, is due. Rescheduling or removing a task leaves its
+    previous heap entry in place, and the entry is dropped when it is popped.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.due_times = {}
+        self.due_tasks = set()
+        self.sequence = 0
+
+    def schedule(self, state_file, task, due_time):
+        self.due_times[(state_file, task)] = due_time
+        self.due_tasks.discard((state_file, task))
+        self.sequence += 1
+        heapq.heappush(self.heap, (due_time, self.sequence, state_file, task))
+
+    def start_cycle(self, current_time, state_files=None):
+        """
+        Pop the tasks due at current_time, and forget the tasks of tunnels that are not in state_files anymore
+        """
+        self.due_tasks = set()
+        while self.heap and self.heap[0][0] <= current_time:
+            due_time, _, state_file, task = heapq.heappop(self.heap)
+            if self.due_times.get((state_file, task)) == due_time:
+                del self.due_times[(state_file, task)]
+                self.due_tasks.add((state_file, task))
+
+        if state_files is not None:
+            state_files = set(state_files)
+            for key in [k for k in self.due_times if k[0] not in state_files]:
+                del self.due_times[key]
+
+    def is_due(self, state_file, task):
+        return (state_file, task) in self.due_tasks or (
+            state_file,
+            task,
+        ) not in self.due_times
+
+    def next_due_time(self):
+        while self.heap:
+            due_time, _, state_file, task = self.heap[0]
+            if self.due_times.get((state_file, task)) == due_time:
+                return due_time
+            heapq.heappop(self.heap)
+        return None
+
+    def get_sleep_time_sec(self, current_time, poll_interval_sec):
+        """
+        Return how long the watchdog sleeps before its next cycle: poll_interval_sec, or less when a task is due
+        sooner
+        """
+        next_due_time = self.next_due_time()
+        if next_due_time is None:
+            return poll_interval_sec
+        return max(0, min(next_due_time - current_time, poll_interval_sec))
+
+
+def get_task_jitter_sec(config, interval_sec):
+    """
+    Return a random delay to spread the tasks of tunnels started together, e.g. after a reboot, over up to
+    task_jitter_sec, and at most a quarter of the interval of the task
+    """
+    jitter_sec = get_int_value_from_config_file(
+        config, TASK_JITTER_ITEM, DEFAULT_TASK_JITTER_SEC
+    )
+    return random.uniform(0, min(jitter_sec, interval_sec / 4.0))
+
+
+def schedule_certificate_refresh(config, scheduler, state, state_file):
+    interval_sec = get_certificate_renewal_interval_mins(config) * 60
+    current_time = time.time()
+    try:
+        certificate_creation_time = (
+            datetime.strptime(state["certificateCreationTime"], CERT_DATETIME_FORMAT)
+            .replace(tzinfo=timezone.utc)
+            .timestamp()
+        )
+        # check_certificate refreshes the certificate once strictly more than the interval has passed
+        due_time = certificate_creation_time + interval_sec + 1
+    except (KeyError, ValueError):
+        due_time = current_time
+    due_time = max(due_time, current_time + TASK_RETRY_INTERVAL_SEC)
+    scheduler.schedule(
+        state_file,
+        CERTIFICATE_TASK,
+        due_time + get_task_jitter_sec(config, interval_sec),
+    )
+
+
+def schedule_health_check(config, scheduler, state, state_file):
+    interval_sec = (
+        get_int_value_from_config_file(
+            config,
+            "stunnel_health_check_interval_min",
+            DEFAULT_STUNNEL_HEALTH_CHECK_INTERVAL_MIN,
+        )
+        * 60
+    )
+    current_time = time.time()
+    due_time = (
+        max(
+            state.get("mount_time", current_time),
+            state.get("last_stunnel_check_time", 0),
+        )
+        + interval_sec
+    )
+    if due_time <= current_time:
+        # The health check is disabled, or did not run
+        due_time = current_time + min(interval_sec, TASK_RETRY_INTERVAL_SEC)
+    scheduler.schedule(
+        state_file,
+        HEALTH_CHECK_TASK,
+        due_time + get_task_jitter_sec(config, interval_sec),
+    )
 
 
 def check_stunnel_health(
@@ -1343,7 +1872,26 @@ def check_stunnel_health(
         state["mountpoint"] = mountpoint
         rewrite_state_file(state, state_file_dir, state_file)
 
+    command_timeout_sec = get_int_value_from_config_file(
+        config,
+        "stunnel_health_check_command_timeout_sec",
+        DEFAULT_STUNNEL_HEALTH_CHECK_TIMEOUT_SEC,
+    )
+    state["last_stunnel_check_time"] = current_time
+    probe_tunnel_health(
+        child_procs, state, state_file_dir, state_file, mountpoint, command_timeout_sec
+    )
+
+
+def probe_tunnel_health(
+    child_procs, state, state_file_dir, state_file, mountpoint, command_timeout_sec
+):
+    """
+    Execute `df` on the mountpoint, and kill and restart the tunnel of the mount when the command does not finish
+    within command_timeout_sec. Return whether the tunnel passed the check.
+    """
     stunnel_pid = state["pid"]
+    start_time = time.monotonic()
     process = subprocess.Popen(
         ["df", mountpoint],
         stdout=subprocess.DEVNULL,
@@ -1351,21 +1899,20 @@ def check_stunnel_health(
         close_fds=True,
     )
 
-    command_timeout_sec = get_int_value_from_config_file(
-        config,
-        "stunnel_health_check_command_timeout_sec",
-        DEFAULT_STUNNEL_HEALTH_CHECK_TIMEOUT_SEC,
-    )
     try:
-        state["last_stunnel_check_time"] = current_time
         process.communicate(timeout=command_timeout_sec)
+        state["last_health_check_latency_sec"] = round(time.monotonic() - start_time, 3)
+        state["last_health_check_passed"] = True
         logging.debug(
             "Stunnel [PID: %d] running for tls mount on %s passed health check.",
             stunnel_pid,
             mountpoint,
         )
         rewrite_state_file(state, state_file_dir, state_file)
+        return True
     except subprocess.TimeoutExpired:
+        state["last_health_check_latency_sec"] = round(time.monotonic() - start_time, 3)
+        state["last_health_check_passed"] = False
         if send_signal_to_running_stunnel_process_group(
             stunnel_pid, state_file, state_file_dir, SIGKILL
         ):
@@ -1387,6 +1934,119 @@ def check_stunnel_health(
         # process after the timeout.
         #
         process.kill()
+        return False
+
+
+def get_tunnel_mount_stats(config, nfs_mounts, mountstats_file=MOUNTSTATS_FILE):
+    """
+    Return the MountStats of the mounts through a tunnel, keyed by their mountpoint, or None when stall detection is
+    disabled or mountstats cannot be read
+    """
+    if not get_boolean_config_item_value(
+        config, CONFIG_SECTION, STALL_DETECTION_ENABLED_ITEM, default_value=False
+    ):
+        return None
+
+    try:
+        return parse_mountstats(
+            mountstats_file,
+            set(
+                unescape_mountinfo_field(mount.mountpoint)
+                for mount in nfs_mounts.values()
+            ),
+        )
+    except (IOError, OSError) as e:
+        logging.debug("Unable to read %s: %s", mountstats_file, e)
+        return None
+
+
+def check_tunnel_stall(
+    config,
+    state,
+    state_file_dir,
+    state_file,
+    child_procs,
+    nfs_mounts,
+    mount_stats,
+    tunnel_progress,
+    current_time=None,
+):
+    """
+    Detect a stuck tunnel from the transport counters of its mount, sampled every watchdog cycle: requests have been
+    sent on one of its transports since the last reply, and no reply has been received on that transport for
+    stall_detection_window_sec. This catches a stuck tunnel well before the periodic `df` health check, which only
+    runs every stunnel_health_check_interval_min.
+
+    A suspected stall is confirmed with the `df` probe of the periodic health check, which restarts the tunnel when it
+    does not finish within stunnel_health_check_command_timeout_sec. Return whether the tunnel was probed.
+    """
+    mountpoint = state.get("mountpoint")
+    if not mountpoint:
+        mountpoint = get_mountpoint_from_nfs_mounts(state_file, nfs_mounts)
+        if mountpoint:
+            mountpoint = unescape_mountinfo_field(mountpoint)
+    stats = mount_stats.get(mountpoint)
+    xprts = [xprt for xprt in stats.xprts if "receives" in xprt] if stats else []
+    if not xprts:
+        tunnel_progress.pop(state_file, None)
+        return False
+
+    if current_time is None:
+        current_time = time.time()
+
+    progress = tunnel_progress.get(state_file)
+    if progress is None or len(progress) != len(xprts):
+        # The first sample of the tunnel, or the mount connected another transport
+        tunnel_progress[state_file] = [
+            {"sends": xprt["sends"], "receives": xprt["receives"], "time": current_time}
+            for xprt in xprts
+        ]
+        return False
+
+    window_sec = get_int_value_from_config_file(
+        config, STALL_DETECTION_WINDOW_ITEM, DEFAULT_STALL_DETECTION_WINDOW_SEC
+    )
+    # A mount with nconnect has a transport per connection, each of them can get stuck while the others progress
+    stalled = None
+    for xprt, transport_progress in zip(xprts, progress):
+        sends = xprt["sends"]
+        receives = xprt["receives"]
+        if (
+            receives != transport_progress["receives"]
+            or sends < transport_progress["sends"]
+        ):
+            # A reply came back, or the counters were reset by a new transport
+            transport_progress.update(sends=sends, receives=receives, time=current_time)
+        elif sends == transport_progress["sends"]:
+            # Nothing has been sent since the last reply, the transport is idle
+            transport_progress["time"] = current_time
+        elif (
+            stalled is None and current_time - transport_progress["time"] >= window_sec
+        ):
+            stalled = (sends - transport_progress["sends"], transport_progress["time"])
+
+    if stalled is None:
+        return False
+
+    logging.warning(
+        "TLS tunnel for %s looks stuck, %d requests were sent on %s without a reply for %d sec. Probing the mount.",
+        state_file,
+        stalled[0],
+        mountpoint,
+        current_time - stalled[1],
+    )
+    del tunnel_progress[state_file]
+
+    probe_timeout_sec = get_int_value_from_config_file(
+        config,
+        "stunnel_health_check_command_timeout_sec",
+        DEFAULT_STUNNEL_HEALTH_CHECK_TIMEOUT_SEC,
+    )
+    state["last_stunnel_check_time"] = current_time
+    probe_tunnel_health(
+        child_procs, state, state_file_dir, state_file, mountpoint, probe_timeout_sec
+    )
+    return True
 
 
 # Retrieve the nfs mountpoint with the port information in the mount option
@@ -1473,8 +2133,22 @@ def read_config(config_file=CONFIG_FILE):
 
 
 def check_certificate(
-    config, state, state_file_dir, state_file, base_path=STATE_FILE_DIR
+    config,
+    state,
+    state_file_dir,
+    state_file,
+    base_path=STATE_FILE_DIR,
+    certificate_refresher=None,
+    shared_certificates=None,
 ):
+    """
+    Refresh the certificate of the tunnel if it is missing or due. With a CertificateRefresher, the refresh is only
+    submitted to its workers, and the state file is updated once it has finished.
+
+    shared_certificates maps the signing inputs of the certificates built by the watchdog to their creation time,
+    between calls. With it, a mount reuses the certificate built for another mount with the same signing inputs
+    within the renewal interval, instead of building its own.
+    """
     certificate_creation_time = datetime.strptime(
         state["certificateCreationTime"], CERT_DATETIME_FORMAT
     )
@@ -1508,72 +2182,379 @@ def check_certificate(
             "Refreshing self-signed certificate (at %s)" % state["certificate"]
         )
 
-    credentials_source = state.get("awsCredentialsMethod")
-    updated_certificate_creation_time = recreate_certificate(
+    certificate_key = None
+    if shared_certificates is not None and get_boolean_config_item_value(
+        config, CONFIG_SECTION, CERTIFICATE_SHARING_ENABLED_ITEM, default_value=False
+    ):
+        certificate_key = get_certificate_key(config, state)
+        if adopt_shared_certificate(
+            config,
+            state,
+            state_file_dir,
+            state_file,
+            shared_certificates,
+            certificate_key,
+            base_path,
+        ):
+            return
+
+    if certificate_refresher is not None:
+        if certificate_key and certificate_refresher.is_building(certificate_key):
+            # The certificate is reused once built, on the next check of this tunnel
+            logging.debug(
+                "A certificate with the signing inputs of %s is being built", state_file
+            )
+            return
+        certificate_refresher.submit(
+            config,
+            state,
+            state_file_dir,
+            state_file,
+            base_path,
+            shared_certificates,
+            certificate_key,
+        )
+        return
+
+    start_time = time.monotonic()
+    updated_certificate_creation_time = refresh_certificate(config, state, base_path)
+    if updated_certificate_creation_time:
+        apply_refreshed_certificate(
+            state,
+            state_file_dir,
+            state_file,
+            updated_certificate_creation_time,
+            time.monotonic() - start_time,
+        )
+        publish_shared_certificate(
+            config,
+            state,
+            shared_certificates,
+            certificate_key,
+            updated_certificate_creation_time,
+            base_path,
+        )
+
+
+def refresh_certificate(config, state, base_path=STATE_FILE_DIR):
+    return recreate_certificate(
         config,
         state["mountStateDir"],
         state["commonName"],
         state["fsId"],
-        credentials_source,
-        ap_state,
+        state.get("awsCredentialsMethod"),
+        state.get("accessPoint"),
         state["region"],
         base_path=base_path,
     )
-    if updated_certificate_creation_time:
-        state["certificateCreationTime"] = updated_certificate_creation_time
-        rewrite_state_file(state, state_file_dir, state_file)
-
-        # send SIGHUP to force a reload of the configuration file to trigger the stunnel process to notice the new certificate
-        send_signal_to_running_stunnel_process_group(
-            state.get("pid"), state_file, state_file_dir, SIGHUP
-        )
 
 
-def send_signal_to_running_stunnel_process_group(
-    stunnel_pid, state_file, state_file_dir, signal
+def apply_refreshed_certificate(
+    state,
+    state_file_dir,
+    state_file,
+    certificate_creation_time,
+    duration_sec,
+    wait_sec=None,
 ):
-    """
-    Send a signal to the given stunnel_pid if the process running with the pid is the mount stunnel process.
+    state["certificateCreationTime"] = certificate_creation_time
+    state["last_certificate_refresh_duration_sec"] = round(duration_sec, 3)
+    if wait_sec is not None:
+        state["last_certificate_refresh_wait_sec"] = round(wait_sec, 3)
+    rewrite_state_file(state, state_file_dir, state_file)
 
-    :param stunnel_pid: The pid in state file.
-    :param state_file: The state file path, e.g. fs-deadbeef.mnt.20560.
-    :param state_file_dir: The state file dir path, e.g. /var/run/efs.
-    :param signal: OS signal send to stunnel process group, e.g. SIGHUP, SIGKILL, SIGTERM.
+    # send SIGHUP to force a reload of the configuration file to trigger the stunnel process to notice the new certificate
+    send_signal_to_running_stunnel_process_group(
+        state.get("pid"), state_file, state_file_dir, SIGHUP
+    )
+
+
+def get_certificate_key(config, state):
     """
-    if is_mount_stunnel_proc_running(stunnel_pid, state_file, state_file_dir):
-        process_group = os.getpgid(stunnel_pid)
-        try:
-            logging.info(
-                "Sending signal %s(%d) to stunnel. PID: %d, group ID: %s",
-                signal.name,
-                signal.value,
-                stunnel_pid,
-                process_group,
-            )
-        except AttributeError:
-            # In python3.4, the signal is a int object, so it does not have name and value property
-            logging.info(
-                "Sending signal(%s) to stunnel. PID: %d, group ID: %s",
-                signal,
-                stunnel_pid,
-                process_group,
-            )
-        os.killpg(process_group, signal)
-        return True
-    else:
-        logging.warning("TLS tunnel is not running for %s", state_file)
-        return False
+    Return a digest of the inputs the certificate of the tunnel is signed with. All mounts sign with the same private
+    key, so mounts with the same digest can use the same certificate.
+    """
+    signing_inputs = [
+        state["fsId"],
+        state.get("accessPoint"),
+        state.get("awsCredentialsMethod"),
+        state["region"],
+        state["commonName"],
+        sorted(get_client_info(config).items()),
+    ]
+    return hashlib.sha256(json.dumps(signing_inputs).encode("utf-8")).hexdigest()
 
 
-def create_required_directory(config, directory):
-    mode = 0o750
-    try:
-        mode_str = config.get(CONFIG_SECTION, "state_file_dir_mode")
-        try:
-            mode = int(mode_str, 8)
-        except ValueError:
-            logging.warning(
-                'Bad state_file_dir_mode "%s" in config file "%s"',
+def get_shared_certificate_path(certificate_key, base_path=STATE_FILE_DIR):
+    return os.path.join(base_path, SHARED_CERTIFICATES_DIR, certificate_key + ".pem")
+
+
+def copy_certificate(source, destination):
+    tmp_file = "%s.%d~" % (destination, os.getpid())
+    shutil.copyfile(source, tmp_file)
+    os.rename(tmp_file, destination)
+
+
+def publish_shared_certificate(
+    config,
+    state,
+    shared_certificates,
+    certificate_key,
+    certificate_creation_time,
+    base_path=STATE_FILE_DIR,
+):
+    if shared_certificates is None or not certificate_key:
+        return
+
+    shared_certificate = get_shared_certificate_path(certificate_key, base_path)
+    try:
+        create_required_directory(config, os.path.dirname(shared_certificate))
+        copy_certificate(state["certificate"], shared_certificate)
+    except (IOError, OSError) as e:
+        logging.warning("Unable to share certificate %s: %s", state["certificate"], e)
+        return
+    shared_certificates[certificate_key] = certificate_creation_time
+
+
+def adopt_shared_certificate(
+    config,
+    state,
+    state_file_dir,
+    state_file,
+    shared_certificates,
+    certificate_key,
+    base_path=STATE_FILE_DIR,
+):
+    """
+    Copy the certificate built for another mount with the same signing inputs, if it was built within the renewal
+    interval. Return whether it was copied.
+    """
+    certificate_creation_time = shared_certificates.get(certificate_key)
+    if not certificate_creation_time:
+        return False
+
+    certificate_age_sec = (
+        get_utc_now()
+        - datetime.strptime(certificate_creation_time, CERT_DATETIME_FORMAT).replace(
+            tzinfo=timezone.utc
+        )
+    ).total_seconds()
+    if certificate_age_sec > get_certificate_renewal_interval_mins(config) * 60:
+        return False
+
+    start_time = time.monotonic()
+    try:
+        copy_certificate(
+            get_shared_certificate_path(certificate_key, base_path),
+            state["certificate"],
+        )
+    except (IOError, OSError) as e:
+        logging.info("Unable to reuse shared certificate for %s: %s", state_file, e)
+        del shared_certificates[certificate_key]
+        return False
+
+    logging.debug(
+        "Reusing the certificate created at %s for %s",
+        certificate_creation_time,
+        state_file,
+    )
+    apply_refreshed_certificate(
+        state,
+        state_file_dir,
+        state_file,
+        certificate_creation_time,
+        time.monotonic() - start_time,
+    )
+    return True
+
+
+PendingCertificateRefresh = namedtuple(
+    "PendingCertificateRefresh",
+    [
+        "future",
+        "config",
+        "state_file_dir",
+        "base_path",
+        "shared_certificates",
+        "certificate_key",
+    ],
+)
+
+
+class CertificateRefresher(object):
+    """
+    Refresh certificates on a bounded pool of worker threads, so that a wave of refreshes does not hold up the health
+    checks and restarts of the watchdog cycle. Every mount signs its certificate with its own CA database under its
+    mountStateDir, and the creation of the shared private key is locked, so refreshes of different mounts can run at
+    the same time. At most one refresh of a tunnel is in flight.
+
+    The state file of a tunnel is only rewritten by collect, from the watchdog cycle, which rewrites state files too.
+    """
+
+    def __init__(self, concurrency):
+        if concurrency < 1:
+            # ThreadPoolExecutor refuses a pool without workers, which would keep the watchdog from starting
+            logging.warning(
+                "%s is %d, refreshing one certificate at a time",
+                CERTIFICATE_REFRESH_CONCURRENCY_ITEM,
+                concurrency,
+            )
+            concurrency = 1
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.pending = {}
+
+    def submit(
+        self,
+        config,
+        state,
+        state_file_dir,
+        state_file,
+        base_path=STATE_FILE_DIR,
+        shared_certificates=None,
+        certificate_key=None,
+    ):
+        if state_file in self.pending:
+            logging.debug("Certificate refresh of %s is already pending", state_file)
+            return False
+
+        future = self.executor.submit(
+            self.refresh, config, dict(state), base_path, time.monotonic()
+        )
+        self.pending[state_file] = PendingCertificateRefresh(
+            future,
+            config,
+            state_file_dir,
+            base_path,
+            shared_certificates,
+            certificate_key,
+        )
+        return True
+
+    def is_pending(self, state_file):
+        return state_file in self.pending
+
+    def is_building(self, certificate_key):
+        return any(
+            refresh.certificate_key == certificate_key
+            for refresh in self.pending.values()
+        )
+
+    @staticmethod
+    def refresh(config, state, base_path, submit_time):
+        start_time = time.monotonic()
+        try:
+            certificate_creation_time = refresh_certificate(config, state, base_path)
+        except (Exception, SystemExit):
+            # fatal_error exits, which would only end the worker thread
+            logging.exception(
+                "Failed to refresh the certificate of %s", state["mountStateDir"]
+            )
+            certificate_creation_time = None
+        return (
+            certificate_creation_time,
+            start_time - submit_time,
+            time.monotonic() - start_time,
+        )
+
+    def collect(self):
+        """
+        Update the state files of the finished refreshes and signal their tunnels to reload the certificate. Return
+        the state files whose certificate was refreshed.
+        """
+        refreshed = []
+        for state_file, refresh in list(self.pending.items()):
+            if not refresh.future.done():
+                continue
+            del self.pending[state_file]
+            state_file_dir = refresh.state_file_dir
+
+            certificate_creation_time, wait_sec, duration_sec = refresh.future.result()
+            if not certificate_creation_time:
+                continue
+
+            # The state file is read again, the tunnel may have been restarted while the certificate was refreshed
+            state_file_path = os.path.join(state_file_dir, state_file)
+            try:
+                with open(state_file_path) as f:
+                    state = json.load(f)
+            except (IOError, OSError, ValueError):
+                logging.info(
+                    "Unable to read %s, discarding its refreshed certificate",
+                    state_file_path,
+                )
+                continue
+
+            logging.debug(
+                "Refreshed the certificate of %s in %.3f sec, after waiting %.3f sec",
+                state_file,
+                duration_sec,
+                wait_sec,
+            )
+            apply_refreshed_certificate(
+                state,
+                state_file_dir,
+                state_file,
+                certificate_creation_time,
+                duration_sec,
+                wait_sec,
+            )
+            publish_shared_certificate(
+                refresh.config,
+                state,
+                refresh.shared_certificates,
+                refresh.certificate_key,
+                certificate_creation_time,
+                refresh.base_path,
+            )
+            refreshed.append(state_file)
+        return refreshed
+
+
+def send_signal_to_running_stunnel_process_group(
+    stunnel_pid, state_file, state_file_dir, signal
+):
+    """
+    Send a signal to the given stunnel_pid if the process running with the pid is the mount stunnel process.
+
+    :param stunnel_pid: The pid in state file.
+    :param state_file: The state file path, e.g. fs-deadbeef.mnt.20560.
+    :param state_file_dir: The state file dir path, e.g. /var/run/efs.
+    :param signal: OS signal send to stunnel process group, e.g. SIGHUP, SIGKILL, SIGTERM.
+    """
+    if is_mount_stunnel_proc_running(stunnel_pid, state_file, state_file_dir):
+        process_group = os.getpgid(stunnel_pid)
+        try:
+            logging.info(
+                "Sending signal %s(%d) to stunnel. PID: %d, group ID: %s",
+                signal.name,
+                signal.value,
+                stunnel_pid,
+                process_group,
+            )
+        except AttributeError:
+            # In python3.4, the signal is a int object, so it does not have name and value property
+            logging.info(
+                "Sending signal(%s) to stunnel. PID: %d, group ID: %s",
+                signal,
+                stunnel_pid,
+                process_group,
+            )
+        os.killpg(process_group, signal)
+        return True
+    else:
+        logging.warning("TLS tunnel is not running for %s", state_file)
+        return False
+
+
+def create_required_directory(config, directory):
+    mode = 0o750
+    try:
+        mode_str = config.get(CONFIG_SECTION, "state_file_dir_mode")
+        try:
+            mode = int(mode_str, 8)
+        except ValueError:
+            logging.warning(
+                'Bad state_file_dir_mode "%s" in config file "%s"',
                 mode_str,
                 CONFIG_FILE,
             )
@@ -1675,9 +2656,77 @@ def recreate_certificate(
         )
     )
     subprocess_call(cmd, "Failed to create self-signed client-side certificate")
+    prune_ca_database(tls_paths, current_time)
     return current_time.strftime(CERT_DATETIME_FORMAT)
 
 
+def parse_certificate_expiry(expiry):
+    """Parse the UTCTime or GeneralizedTime expiry of an openssl ca database entry"""
+    expiry_format = CERT_DATETIME_FORMAT if len(expiry) == 13 else "%Y%m%d%H%M%SZ"
+    return datetime.strptime(expiry, expiry_format).replace(tzinfo=timezone.utc)
+
+
+def prune_ca_database(tls_paths, current_time):
+    """
+    Drop the expired certificates from the openssl ca database of the mount, and delete them from its certs
+    directory, along with issued certificates the database does not list. Otherwise a line is appended to index.txt,
+    which openssl reads on every refresh, and a file is added to certs every refresh, for the life of the mount.
+    The serial file is left alone, so serials are never reused. Return the number of issued certificates removed.
+    """
+    try:
+        with open(tls_paths["index"]) as f:
+            entries = f.read().splitlines()
+    except (IOError, OSError) as e:
+        logging.warning("Unable to read %s: %s", tls_paths["index"], e)
+        return 0
+
+    kept_entries = []
+    for entry in entries:
+        fields = entry.split("\t")
+        try:
+            expired = parse_certificate_expiry(fields[1]) < current_time
+        except (IndexError, ValueError):
+            expired = False
+        if not expired:
+            kept_entries.append(entry)
+
+    pruned_count = len(entries) - len(kept_entries)
+    if pruned_count:
+        tmp_file = "%s.%d~" % (tls_paths["index"], os.getpid())
+        with open(tmp_file, "w") as f:
+            f.write("".join(entry + "\n" for entry in kept_entries))
+        os.rename(tmp_file, tls_paths["index"])
+
+    kept_certificates = set()
+    for entry in kept_entries:
+        fields = entry.split("\t")
+        if len(fields) > 3:
+            kept_certificates.add((fields[3] + ".pem").upper())
+
+    try:
+        issued_certificates = os.listdir(tls_paths["certs_dir"])
+    except OSError:
+        issued_certificates = []
+    removed_count = 0
+    for issued_certificate in issued_certificates:
+        if issued_certificate.upper() in kept_certificates:
+            continue
+        try:
+            os.remove(os.path.join(tls_paths["certs_dir"], issued_certificate))
+            removed_count += 1
+        except OSError as e:
+            logging.debug("Unable to remove %s: %s", issued_certificate, e)
+
+    if pruned_count or removed_count:
+        logging.debug(
+            "Pruned %d expired entries from %s, removed %d issued certificates",
+            pruned_count,
+            tls_paths["index"],
+            removed_count,
+        )
+    return removed_count
+
+
 def get_private_key_path():
     """Wrapped for mocking purposes in unit tests"""
     return PRIVATE_KEY_FILE
@@ -2237,6 +3286,966 @@ def clean_up_previous_tunnel_pids(state_file_dir=STATE_FILE_DIR):
             rewrite_state_file(state, state_file_dir, state_file)
 
 
+def get_config_file_mtime(config_file=CONFIG_FILE):
+    try:
+        return os.path.getmtime(config_file)
+    except OSError:
+        return None
+
+
+def unescape_mountinfo_field(field):
+    # mountinfo escapes white space and backslashes in its fields as octal sequences, such as \040 for a space
+    return re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), field)
+
+
+def get_nfs_mount_devices(mountinfo_file=MOUNTINFO_FILE):
+    """
+    Return the device number, as MAJOR:MINOR, of every NFS mount keyed by its mountpoint. Unlike a stat of the
+    mountpoint, reading mountinfo never blocks on an unresponsive NFS server.
+    """
+    devices = {}
+    with open(mountinfo_file) as f:
+        for line in f:
+            fields = line.split()
+            try:
+                # The optional fields of a mount end with a "-", which is followed by the file system type
+                fs_type = fields[fields.index("-", 6) + 1]
+            except (ValueError, IndexError):
+                continue
+            if fs_type.startswith("nfs"):
+                devices[unescape_mountinfo_field(fields[4])] = fields[2]
+    return devices
+
+
+def get_linux_kernel_version(desired_length):
+    version = []
+    try:
+        version = [
+            int(v)
+            for v in platform.release().split("-", 1)[0].split(".")[:desired_length]
+        ]
+    except ValueError:
+        logging.warning("Failed to retrieve linux kernel version")
+    for i in range(len(version), desired_length):
+        version.append(0)
+    return version
+
+
+def get_readahead_kb(config, settings):
+    """
+    Return the read_ahead_kb of a mount with the readahead settings recorded by mount.efs, as mount.efs computes it
+    """
+    if settings.get("readahead_kb") is not None:
+        return settings["readahead_kb"]
+
+    if (
+        not settings.get("rsize")
+        or platform.system() != "Linux"
+        or get_linux_kernel_version(
+            len(NFS_READAHEAD_OPTIMIZE_LINUX_KERNEL_MIN_VERSION)
+        )
+        < NFS_READAHEAD_OPTIMIZE_LINUX_KERNEL_MIN_VERSION
+        or not get_boolean_config_item_value(
+            config, MOUNT_CONFIG_SECTION, OPTIMIZE_READAHEAD_ITEM, default_value=False
+        )
+    ):
+        return None
+
+    return int(DEFAULT_NFS_MAX_READAHEAD_MULTIPLIER * settings["rsize"] / 1024)
+
+
+def write_readahead_kb(read_ahead_kb_config_file, readahead_kb):
+    with open(read_ahead_kb_config_file, "w") as f:
+        f.write("%d\n" % readahead_kb)
+
+    with open(read_ahead_kb_config_file) as f:
+        return int(f.read().strip())
+
+
+def get_readahead_settings(state_file_dir=STATE_FILE_DIR):
+    """
+    Return the readahead settings recorded by mount.efs for every mount, keyed by the path of their file
+    """
+    readahead_dir = os.path.join(state_file_dir, READAHEAD_STATE_DIR)
+    if not os.path.isdir(readahead_dir):
+        return {}
+
+    readahead_settings = {}
+    for settings_file in os.listdir(readahead_dir):
+        settings_path = os.path.join(readahead_dir, settings_file)
+        if settings_file.endswith("~"):
+            continue
+        try:
+            with open(settings_path) as f:
+                readahead_settings[settings_path] = json.load(f)
+        except (IOError, OSError, ValueError) as e:
+            logging.warning(
+                "Unable to read readahead settings %s: %s", settings_path, e
+            )
+
+    return readahead_settings
+
+
+def read_readahead_kb(device):
+    with open(NFS_READAHEAD_CONFIG_PATH_FORMAT % device) as f:
+        return int(f.read().strip())
+
+
+def set_readahead_kb(device, mountpoint, readahead_kb, reason):
+    """
+    Set the read_ahead_kb of the NFS mount with the device MAJOR:MINOR to readahead_kb, unless it already is
+    """
+    read_ahead_kb_config_file = NFS_READAHEAD_CONFIG_PATH_FORMAT % device
+    try:
+        current_readahead_kb = read_readahead_kb(device)
+        if current_readahead_kb == readahead_kb:
+            return
+
+        applied_readahead_kb = write_readahead_kb(
+            read_ahead_kb_config_file, readahead_kb
+        )
+        logging.info(
+            "Changed read_ahead_kb of %s from %d to %d, %s",
+            mountpoint,
+            current_readahead_kb,
+            applied_readahead_kb,
+            reason,
+        )
+    except (IOError, OSError, ValueError) as e:
+        logging.warning(
+            "Failed to modify read_ahead_kb of %s to %d: %s",
+            mountpoint,
+            readahead_kb,
+            e,
+        )
+
+
+def apply_readahead_settings(
+    config, state_file_dir=STATE_FILE_DIR, mountinfo_file=MOUNTINFO_FILE
+):
+    """
+    Re-apply the readahead of every mount recorded by mount.efs, so that changes of the config file take effect
+    without re-mounting. Settings of mountpoints that are no longer NFS mounts are removed.
+    """
+    readahead_settings = get_readahead_settings(state_file_dir)
+    if not readahead_settings:
+        return
+
+    devices = get_nfs_mount_devices(mountinfo_file)
+
+    for settings_path, settings in readahead_settings.items():
+        mountpoint = settings.get("mountpoint")
+        device = devices.get(mountpoint)
+        if device is None:
+            logging.debug(
+                "%s is no longer mounted, removing %s", mountpoint, settings_path
+            )
+            check_and_remove_file(settings_path)
+            continue
+
+        readahead_kb = get_readahead_kb(config, settings)
+        if readahead_kb is not None:
+            set_readahead_kb(device, mountpoint, readahead_kb, "the config changed")
+
+
+def parse_mountstats(mountstats_file=MOUNTSTATS_FILE, mountpoints=None):
+    """
+    Return the MountStats of every NFS mount in mountstats_file, keyed by its mountpoint. When mountpoints is given,
+    the statistics of other mounts are skipped without being parsed.
+
+    The ops of a MountStats map every NFS operation to a dict of its NFS_OP_COUNTERS. A mount with nconnect has one
+    transport per connection, its xprts holds the NFS_XPRT_TCP_COUNTERS of every transport, and its xprt their sums.
+    """
+    all_stats = {}
+    stats = None
+    with open(mountstats_file) as f:
+        for line in f:
+            fields = line.split()
+            if not fields:
+                continue
+            if fields[0] == "device":
+                # device 127.0.0.1:/ mounted on /mnt with fstype nfs4 statvers=1.1
+                stats = None
+                if (
+                    len(fields) > 7
+                    and fields[5] == "with"
+                    and fields[7].startswith("nfs")
+                ):
+                    mountpoint = unescape_mountinfo_field(fields[4])
+                    if mountpoints is None or mountpoint in mountpoints:
+                        stats = MountStats(
+                            server=fields[1], age=None, ops={}, xprt={}, xprts=[]
+                        )
+                        all_stats[mountpoint] = stats
+            elif stats is None:
+                continue
+            elif fields[0] == "age:" and len(fields) > 1:
+                all_stats[mountpoint] = stats = stats._replace(age=int(fields[1]))
+            elif fields[0] == "xprt:" and len(fields) > 2 and fields[1] == "tcp":
+                try:
+                    xprt = dict(
+                        zip(NFS_XPRT_TCP_COUNTERS, (int(v) for v in fields[3:]))
+                    )
+                except ValueError:
+                    continue
+                stats.xprts.append(xprt)
+                for counter, value in xprt.items():
+                    stats.xprt[counter] = stats.xprt.get(counter, 0) + value
+            elif fields[0].endswith(":") and fields[0][:-1].isupper():
+                # READ: ops transmissions timeouts bytes_sent bytes_received queue rtt execute errors
+                try:
+                    counters = [int(v) for v in fields[1:]]
+                except ValueError:
+                    continue
+                if len(counters) >= 8:
+                    stats.ops[fields[0][:-1]] = dict(zip(NFS_OP_COUNTERS, counters))
+    return all_stats
+
+
+def get_nfs_read_stats(mountstats_file=MOUNTSTATS_FILE):
+    """
+    Return the number of READ operations and the bytes they received of every NFS mount, keyed by its mountpoint
+    """
+    read_stats = {}
+    for mountpoint, stats in parse_mountstats(mountstats_file).items():
+        read = stats.ops.get("READ")
+        if read:
+            read_stats[mountpoint] = (read["ops"], read["bytes_received"])
+    return read_stats
+
+
+def classify_read_workload(read_ops, read_bytes, rsize, readahead_kb=None):
+    """
+    Return "sequential" if the reads of a sample are as large as the NFS client makes them when it reads ahead,
+    "random" if they are small, or None if the sample is too small or in between.
+
+    The NFS client reads ahead at most readahead_kb, the current read_ahead_kb of the mount, at once, so with a small
+    readahead sequential reads are READs of about readahead_kb rather than rsize.
+    """
+    if read_ops < READAHEAD_TUNING_MIN_READS:
+        return None
+
+    sequential_read_bytes = rsize
+    if readahead_kb:
+        sequential_read_bytes = min(rsize, readahead_kb * 1024)
+
+    average_read_bytes = read_bytes / read_ops
+    if (
+        average_read_bytes > RANDOM_READ_MAX_BYTES
+        and average_read_bytes >= sequential_read_bytes / 2
+    ):
+        return "sequential"
+    if average_read_bytes <= RANDOM_READ_MAX_BYTES:
+        return "random"
+    return None
+
+
+def tune_readahead(
+    config,
+    tuning_state,
+    state_file_dir=STATE_FILE_DIR,
+    mountinfo_file=MOUNTINFO_FILE,
+    mountstats_file=MOUNTSTATS_FILE,
+    current_time=None,
+):
+    """
+    Sample the READ statistics of every mount recorded by mount.efs, and set read_ahead_kb to its upper bound for
+    sequential reads and to its lower bound for random reads, once readahead_tuning_stable_samples consecutive samples
+    agree. Mounts with the "readahead_kb" mount option are left alone.
+
+    tuning_state holds the previous samples between calls.
+    """
+    if not get_boolean_config_item_value(
+        config, CONFIG_SECTION, READAHEAD_TUNING_ENABLED_ITEM, default_value=False
+    ):
+        return
+
+    if current_time is None:
+        current_time = time.time()
+    interval_sec = get_int_value_from_config_file(
+        config, READAHEAD_TUNING_INTERVAL_ITEM, DEFAULT_READAHEAD_TUNING_INTERVAL_SEC
+    )
+    if current_time - tuning_state.get("sample_time", 0) < interval_sec:
+        return
+    tuning_state["sample_time"] = current_time
+
+    readahead_settings = get_readahead_settings(state_file_dir)
+    if not readahead_settings:
+        tuning_state["mounts"] = {}
+        return
+
+    min_kb = get_int_value_from_config_file(
+        config, READAHEAD_TUNING_MIN_KB_ITEM, DEFAULT_READAHEAD_TUNING_MIN_KB
+    )
+    max_kb = max(
+        min_kb,
+        get_int_value_from_config_file(
+            config, READAHEAD_TUNING_MAX_KB_ITEM, DEFAULT_READAHEAD_TUNING_MAX_KB
+        ),
+    )
+    stable_samples = get_int_value_from_config_file(
+        config,
+        READAHEAD_TUNING_STABLE_SAMPLES_ITEM,
+        DEFAULT_READAHEAD_TUNING_STABLE_SAMPLES,
+    )
+
+    try:
+        devices = get_nfs_mount_devices(mountinfo_file)
+        read_stats = get_nfs_read_stats(mountstats_file)
+    except (IOError, OSError) as e:
+        logging.warning("Unable to sample NFS read statistics: %s", e)
+        return
+
+    previous_mounts = tuning_state.get("mounts", {})
+    mounts = {}
+    for settings in readahead_settings.values():
+        mountpoint = settings.get("mountpoint")
+        device = devices.get(mountpoint)
+        stats = read_stats.get(mountpoint)
+        if settings.get("readahead_kb") is not None or not device or not stats:
+            continue
+
+        mount = previous_mounts.get(mountpoint)
+        if (
+            mount is None
+            or mount["device"] != device
+            or stats[0] < mount["stats"][0]
+            or stats[1] < mount["stats"][1]
+        ):
+            # The first sample of a mount is the baseline of the next one
+            mounts[mountpoint] = {
+                "device": device,
+                "stats": stats,
+                "workload": None,
+                "samples": 0,
+            }
+            continue
+        mounts[mountpoint] = mount
+
+        read_ops = stats[0] - mount["stats"][0]
+        read_bytes = stats[1] - mount["stats"][1]
+        mount["stats"] = stats
+
+        try:
+            current_readahead_kb = read_readahead_kb(device)
+        except (IOError, OSError, ValueError):
+            current_readahead_kb = None
+
+        workload = classify_read_workload(
+            read_ops,
+            read_bytes,
+            settings.get("rsize") or DEFAULT_NFS_RSIZE,
+            current_readahead_kb,
+        )
+        if workload != mount["workload"]:
+            mount["workload"] = workload
+            mount["samples"] = 0
+        mount["samples"] += 1
+
+        if workload is None or mount["samples"] < stable_samples:
+            continue
+
+        set_readahead_kb(
+            device,
+            mountpoint,
+            max_kb if workload == "sequential" else min_kb,
+            "%d samples in a row show %s reads, the last one %d reads of %d bytes on average"
+            % (mount["samples"], workload, read_ops, read_bytes // read_ops),
+        )
+
+    tuning_state["mounts"] = mounts
+
+
+def get_efs_mountpoints(state_file_dir, nfs_mounts):
+    """
+    Return the mountpoints of the EFS mounts: the mounts through a TLS tunnel, and the mounts recorded by mount.efs
+    """
+    mountpoints = set(
+        unescape_mountinfo_field(mount.mountpoint) for mount in nfs_mounts.values()
+    )
+    for settings in get_readahead_settings(state_file_dir).values():
+        if settings.get("mountpoint"):
+            mountpoints.add(settings["mountpoint"])
+    return mountpoints
+
+
+def format_prometheus_labels(labels):
+    return ",".join(
+        '%s="%s"'
+        % (
+            k,
+            str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for k, v in sorted(labels.items())
+    )
+
+
+def format_nfs_stats(all_stats, previous_stats, interval_sec):
+    """
+    Return the NFS client statistics of the EFS mounts in the Prometheus text format. Besides the counters of every
+    NFS operation, the rate of operations and the average RTT, execution and queue time of an operation are computed
+    from the difference to previous_stats, the statistics interval_sec seconds ago.
+    """
+    metrics = [
+        ("efs_nfs_op_total", "counter", "NFS operations completed"),
+        ("efs_nfs_op_transmissions_total", "counter", "NFS requests transmitted"),
+        ("efs_nfs_op_timeouts_total", "counter", "NFS requests that timed out"),
+        ("efs_nfs_op_errors_total", "counter", "NFS operations that failed"),
+        ("efs_nfs_op_sent_bytes_total", "counter", "Bytes sent by NFS operations"),
+        (
+            "efs_nfs_op_received_bytes_total",
+            "counter",
+            "Bytes received by NFS operations",
+        ),
+        ("efs_nfs_op_rate", "gauge", "NFS operations per second"),
+        (
+            "efs_nfs_op_rtt_avg_ms",
+            "gauge",
+            "Average round trip time of an NFS operation",
+        ),
+        (
+            "efs_nfs_op_execute_avg_ms",
+            "gauge",
+            "Average time from queueing to completion of an NFS operation",
+        ),
+        (
+            "efs_nfs_op_queue_avg_ms",
+            "gauge",
+            "Average time an NFS operation waited to be transmitted",
+        ),
+        ("efs_nfs_xprt_sends_total", "counter", "RPC requests sent"),
+        ("efs_nfs_xprt_connects_total", "counter", "Connections of the transport"),
+        (
+            "efs_nfs_xprt_backlog_avg",
+            "gauge",
+            "Average number of requests waiting for a transport slot when a request is sent",
+        ),
+        (
+            "efs_nfs_xprt_in_flight_avg",
+            "gauge",
+            "Average number of requests in flight when a request is sent",
+        ),
+    ]
+    samples = dict((name, []) for name, _, _ in metrics)
+
+    def add(name, labels, value):
+        samples[name].append(
+            "%s{%s} %s" % (name, format_prometheus_labels(labels), value)
+        )
+
+    for mountpoint, stats in sorted(all_stats.items()):
+        previous = previous_stats.get(mountpoint)
+        mount_labels = {"mountpoint": mountpoint, "server": stats.server}
+
+        for op, counters in sorted(stats.ops.items()):
+            if not counters["ops"]:
+                continue
+            labels = dict(mount_labels, op=op)
+            add("efs_nfs_op_total", labels, counters["ops"])
+            add("efs_nfs_op_transmissions_total", labels, counters["transmissions"])
+            add("efs_nfs_op_timeouts_total", labels, counters["timeouts"])
+            add("efs_nfs_op_errors_total", labels, counters.get("errors", 0))
+            add("efs_nfs_op_sent_bytes_total", labels, counters["bytes_sent"])
+            add("efs_nfs_op_received_bytes_total", labels, counters["bytes_received"])
+
+            previous_counters = previous.ops.get(op) if previous else None
+            if previous_counters is None or counters["ops"] < previous_counters["ops"]:
+                continue
+            ops = counters["ops"] - previous_counters["ops"]
+            add("efs_nfs_op_rate", labels, "%.3f" % (ops / interval_sec))
+            if ops:
+                for name, counter in [
+                    ("efs_nfs_op_rtt_avg_ms", "rtt_ms"),
+                    ("efs_nfs_op_execute_avg_ms", "execute_ms"),
+                    ("efs_nfs_op_queue_avg_ms", "queue_ms"),
+                ]:
+                    add(
+                        name,
+                        labels,
+                        "%.3f"
+                        % ((counters[counter] - previous_counters[counter]) / ops),
+                    )
+
+        if not stats.xprt:
+            continue
+        add("efs_nfs_xprt_sends_total", mount_labels, stats.xprt.get("sends", 0))
+        add(
+            "efs_nfs_xprt_connects_total",
+            mount_labels,
+            stats.xprt.get("connect_count", 0),
+        )
+        if previous and previous.xprt:
+            sends = stats.xprt.get("sends", 0) - previous.xprt.get("sends", 0)
+            if sends > 0:
+                for name, counter in [
+                    ("efs_nfs_xprt_backlog_avg", "backlog"),
+                    ("efs_nfs_xprt_in_flight_avg", "requests_in_flight"),
+                ]:
+                    add(
+                        name,
+                        mount_labels,
+                        "%.3f"
+                        % (
+                            (stats.xprt.get(counter, 0) - previous.xprt.get(counter, 0))
+                            / sends
+                        ),
+                    )
+
+    lines = []
+    for name, metric_type, description in metrics:
+        if samples[name]:
+            lines.append("# HELP %s %s" % (name, description))
+            lines.append("# TYPE %s %s" % (name, metric_type))
+            lines.extend(samples[name])
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def write_metrics_file(metrics_file, content):
+    tmp_file = "%s.%d~" % (metrics_file, os.getpid())
+    with open(tmp_file, "w") as f:
+        f.write(content)
+    os.rename(tmp_file, metrics_file)
+
+
+def export_nfs_stats(
+    config,
+    stats_state,
+    state_file_dir=STATE_FILE_DIR,
+    mountstats_file=MOUNTSTATS_FILE,
+    current_time=None,
+):
+    """
+    Every nfs_stats_interval_sec, sample /proc/self/mountstats for the EFS mounts and write their statistics to
+    nfs_stats_file in the Prometheus text format, e.g. for the textfile collector of the node exporter.
+
+    stats_state holds the previous sample between calls.
+    """
+    if not get_boolean_config_item_value(
+        config, CONFIG_SECTION, NFS_STATS_ENABLED_ITEM, default_value=False
+    ):
+        return
+
+    if current_time is None:
+        current_time = time.time()
+    interval_sec = get_int_value_from_config_file(
+        config, NFS_STATS_INTERVAL_ITEM, DEFAULT_NFS_STATS_INTERVAL_SEC
+    )
+    previous_time = stats_state.get("sample_time")
+    if previous_time is not None and current_time - previous_time < interval_sec:
+        return
+
+    try:
+        nfs_stats_file = config.get(CONFIG_SECTION, NFS_STATS_FILE_ITEM)
+    except (NoOptionError, NoSectionError):
+        nfs_stats_file = DEFAULT_NFS_STATS_FILE
+
+    try:
+        mountpoints = get_efs_mountpoints(
+            state_file_dir, get_current_local_nfs_mounts()
+        )
+        all_stats = parse_mountstats(mountstats_file, mountpoints)
+        content = format_nfs_stats(
+            all_stats,
+            stats_state.get("stats", {}),
+            current_time - previous_time if previous_time else interval_sec,
+        )
+        create_required_directory(config, os.path.dirname(nfs_stats_file))
+        write_metrics_file(nfs_stats_file, content)
+    except (IOError, OSError) as e:
+        logging.warning("Unable to export NFS statistics to %s: %s", nfs_stats_file, e)
+        return
+
+    stats_state["sample_time"] = current_time
+    stats_state["stats"] = all_stats
+
+
+def get_directory_usage(directory):
+    """
+    Return the total size in bytes and the number of files under directory, or None and None if it does not exist
+    """
+    if not os.path.isdir(directory):
+        return None, None
+
+    size_bytes = 0
+    file_count = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            try:
+                size_bytes += os.lstat(os.path.join(root, name)).st_size
+                file_count += 1
+            except OSError:
+                pass
+    return size_bytes, file_count
+
+
+def get_tunnel_status(state_file, state, current_time, state_file_dir=None):
+    """
+    Return the status of the tunnel of state_file, as seen by the watchdog, from its state. The usage of the state
+    directory of the mount is only measured when state_file_dir is given.
+    """
+    status = {
+        "state_file": state_file,
+        "fs_id": state.get("fsId", state_file.split(".", 1)[0]),
+        "mountpoint": state.get("mountpoint"),
+        "pid": state.get("pid"),
+        "running": "unmount_time" not in state and is_pid_running(state.get("pid")),
+        "unmounted": "unmount_time" in state,
+        "restart_count": state.get("tunnel_restart_count", 0),
+        "flap_count": state.get("tunnel_flap_count", 0),
+        "flaps_total": state.get("tunnel_flaps_total", 0),
+        "quarantined": state.get("tunnel_quarantined", False),
+        "next_restart_time": state.get("next_restart_time"),
+        "uptime_sec": None,
+        "last_health_check_time": state.get("last_stunnel_check_time"),
+        "last_health_check_latency_sec": state.get("last_health_check_latency_sec"),
+        "last_health_check_passed": state.get("last_health_check_passed"),
+        "certificate_age_sec": None,
+        "last_certificate_refresh_duration_sec": state.get(
+            "last_certificate_refresh_duration_sec"
+        ),
+        "last_certificate_refresh_wait_sec": state.get(
+            "last_certificate_refresh_wait_sec"
+        ),
+        "state_dir_size_bytes": None,
+        "state_dir_files": None,
+    }
+
+    if state_file_dir and state.get("mountStateDir"):
+        (
+            status["state_dir_size_bytes"],
+            status["state_dir_files"],
+        ) = get_directory_usage(os.path.join(state_file_dir, state["mountStateDir"]))
+
+    start_time = state.get("tunnel_start_time", state.get("mount_time"))
+    if status["running"] and start_time:
+        status["uptime_sec"] = round(current_time - start_time, 3)
+
+    if "certificateCreationTime" in state:
+        try:
+            certificate_creation_time = datetime.strptime(
+                state["certificateCreationTime"], CERT_DATETIME_FORMAT
+            ).replace(tzinfo=timezone.utc)
+            status["certificate_age_sec"] = round(
+                (get_utc_now() - certificate_creation_time).total_seconds(), 3
+            )
+        except ValueError:
+            pass
+
+    return status
+
+
+def format_watchdog_status_metrics(status):
+    """
+    Return the status of the watchdog and its tunnels in the Prometheus text format
+    """
+    lines = [
+        "# HELP efs_watchdog_cycle_duration_seconds Duration of the last watchdog cycle",
+        "# TYPE efs_watchdog_cycle_duration_seconds gauge",
+        "efs_watchdog_cycle_duration_seconds %.3f" % status["cycle_duration_sec"],
+        "# HELP efs_watchdog_cycle_duration_max_seconds Longest watchdog cycle since the previous status",
+        "# TYPE efs_watchdog_cycle_duration_max_seconds gauge",
+        "efs_watchdog_cycle_duration_max_seconds %.3f"
+        % status["max_cycle_duration_sec"],
+        "# HELP efs_watchdog_tunnels Tunnels tracked by the watchdog",
+        "# TYPE efs_watchdog_tunnels gauge",
+        "efs_watchdog_tunnels %d" % len(status["tunnels"]),
+    ]
+    if status["cycle_steps"]:
+        lines.append(
+            "# HELP efs_watchdog_cycle_step_duration_seconds Time spent in a step of the last watchdog cycle"
+        )
+        lines.append("# TYPE efs_watchdog_cycle_step_duration_seconds gauge")
+        for step, duration_sec in sorted(status["cycle_steps"].items()):
+            lines.append(
+                "efs_watchdog_cycle_step_duration_seconds{%s} %.3f"
+                % (format_prometheus_labels({"step": step}), duration_sec)
+            )
+
+    metrics = [
+        ("efs_watchdog_tunnel_up", "gauge", "Whether the tunnel is running", "running"),
+        (
+            "efs_watchdog_tunnel_uptime_seconds",
+            "gauge",
+            "Time since the tunnel was started",
+            "uptime_sec",
+        ),
+        (
+            "efs_watchdog_tunnel_restarts_total",
+            "counter",
+            "Restarts of the tunnel by the watchdog",
+            "restart_count",
+        ),
+        (
+            "efs_watchdog_tunnel_flaps_total",
+            "counter",
+            "Exits of the tunnel within restart_stable_sec of its start",
+            "flaps_total",
+        ),
+        (
+            "efs_watchdog_tunnel_quarantined",
+            "gauge",
+            "Whether the tunnel is quarantined after exiting too often",
+            "quarantined",
+        ),
+        (
+            "efs_watchdog_health_check_latency_seconds",
+            "gauge",
+            "Duration of the last health check of the tunnel",
+            "last_health_check_latency_sec",
+        ),
+        (
+            "efs_watchdog_health_check_passed",
+            "gauge",
+            "Whether the last health check of the tunnel passed",
+            "last_health_check_passed",
+        ),
+        (
+            "efs_watchdog_certificate_age_seconds",
+            "gauge",
+            "Time since the certificate of the tunnel was created",
+            "certificate_age_sec",
+        ),
+        (
+            "efs_watchdog_certificate_refresh_duration_seconds",
+            "gauge",
+            "Duration of the last certificate refresh of the tunnel",
+            "last_certificate_refresh_duration_sec",
+        ),
+        (
+            "efs_watchdog_certificate_refresh_wait_seconds",
+            "gauge",
+            "Time the last certificate refresh of the tunnel waited for a worker",
+            "last_certificate_refresh_wait_sec",
+        ),
+        (
+            "efs_watchdog_state_dir_size_bytes",
+            "gauge",
+            "Size of the files in the state directory of the mount",
+            "state_dir_size_bytes",
+        ),
+        (
+            "efs_watchdog_state_dir_files",
+            "gauge",
+            "Files in the state directory of the mount",
+            "state_dir_files",
+        ),
+    ]
+    for name, metric_type, description, item in metrics:
+        samples = []
+        for tunnel in status["tunnels"]:
+            value = tunnel[item]
+            if value is None:
+                continue
+            labels = {"fs_id": tunnel["fs_id"], "state_file": tunnel["state_file"]}
+            if tunnel["mountpoint"]:
+                labels["mountpoint"] = tunnel["mountpoint"]
+            samples.append(
+                "%s{%s} %s" % (name, format_prometheus_labels(labels), float(value))
+            )
+        if samples:
+            lines.append("# HELP %s %s" % (name, description))
+            lines.append("# TYPE %s %s" % (name, metric_type))
+            lines.extend(samples)
+
+    return "\n".join(lines) + "\n"
+
+
+def write_watchdog_status(
+    config,
+    status_state,
+    cycle_duration_sec,
+    state_file_dir=STATE_FILE_DIR,
+    current_time=None,
+    step_timings=None,
+):
+    """
+    Every status_interval_sec, write the status of the watchdog and the tunnels it tracks to status_file as JSON, and
+    to status_metrics_file in the Prometheus text format. The status is built from the state files, so writing it
+    costs one read of every state file, and a walk of every mount state directory, per interval.
+
+    status_state holds the longest cycle since the previous status between calls.
+    """
+    if not get_boolean_config_item_value(
+        config, CONFIG_SECTION, STATUS_ENABLED_ITEM, default_value=True
+    ):
+        return
+
+    status_state["max_cycle_duration_sec"] = max(
+        status_state.get("max_cycle_duration_sec", 0), cycle_duration_sec
+    )
+
+    if current_time is None:
+        current_time = time.time()
+    interval_sec = get_int_value_from_config_file(
+        config, STATUS_INTERVAL_ITEM, DEFAULT_STATUS_INTERVAL_SEC
+    )
+    previous_time = status_state.get("write_time")
+    if previous_time is not None and current_time - previous_time < interval_sec:
+        return
+
+    tunnels = []
+    for state_file in sorted(get_state_files(state_file_dir).values()):
+        try:
+            with open(os.path.join(state_file_dir, state_file)) as f:
+                state = json.load(f)
+        except (IOError, ValueError):
+            continue
+        tunnels.append(
+            get_tunnel_status(state_file, state, current_time, state_file_dir)
+        )
+
+    status = {
+        "version": VERSION,
+        "pid": os.getpid(),
+        "time": current_time,
+        "cycle_duration_sec": round(cycle_duration_sec, 3),
+        "max_cycle_duration_sec": round(status_state["max_cycle_duration_sec"], 3),
+        "cycle_steps": dict(
+            (step, round(duration_sec, 3))
+            for step, duration_sec in (step_timings or {}).items()
+        ),
+        "tunnels": tunnels,
+    }
+
+    for item, default_file, content in [
+        (STATUS_FILE_ITEM, DEFAULT_STATUS_FILE, lambda: json.dumps(status)),
+        (
+            STATUS_METRICS_FILE_ITEM,
+            DEFAULT_STATUS_METRICS_FILE,
+            lambda: format_watchdog_status_metrics(status),
+        ),
+    ]:
+        try:
+            status_file = config.get(CONFIG_SECTION, item)
+        except (NoOptionError, NoSectionError):
+            status_file = default_file
+        if not status_file:
+            continue
+        try:
+            create_required_directory(config, os.path.dirname(status_file))
+            write_metrics_file(status_file, content())
+        except (IOError, OSError) as e:
+            logging.warning(
+                "Unable to write the watchdog status to %s: %s", status_file, e
+            )
+
+    status_state["write_time"] = current_time
+    status_state["max_cycle_duration_sec"] = 0
+
+
+@contextmanager
+def timed_step(step):
+    """
+    Add the time spent in the block to the timing of step in CYCLE_STEP_TIMINGS
+    """
+    start_time = time.monotonic()
+    try:
+        yield
+    finally:
+        CYCLE_STEP_TIMINGS[step] = (
+            CYCLE_STEP_TIMINGS.get(step, 0) + time.monotonic() - start_time
+        )
+
+
+def report_slow_cycle(cycle_duration_sec, poll_interval_sec, step_timings):
+    """
+    Warn when a watchdog cycle took longer than the poll interval, which delays the checks of every mount, with the
+    steps that took the most time. Return whether the cycle was slow.
+    """
+    if cycle_duration_sec <= poll_interval_sec:
+        return False
+
+    slowest_steps = sorted(step_timings.items(), key=lambda s: s[1], reverse=True)
+    logging.warning(
+        "Watchdog cycle took %.3f sec, longer than poll_interval_sec of %d sec. Slowest steps: %s",
+        cycle_duration_sec,
+        poll_interval_sec,
+        ", ".join(
+            "%s %.3f sec" % step for step in slowest_steps[:SLOW_CYCLE_REPORTED_STEPS]
+        ),
+    )
+    return True
+
+
+def request_cycle_profile(signum, frame):
+    global PROFILE_REQUESTED
+    PROFILE_REQUESTED = True
+
+
+def start_cycle_profile(config, profile_state):
+    """
+    When SIGUSR1 has been received, start profiling the next profile_cycles watchdog cycles with cProfile and
+    tracemalloc. profile_state holds the running profile between cycles.
+    """
+    global PROFILE_REQUESTED
+    if not PROFILE_REQUESTED or profile_state:
+        return
+    PROFILE_REQUESTED = False
+
+    import cProfile
+    import tracemalloc
+
+    cycles = get_int_value_from_config_file(
+        config, PROFILE_CYCLES_ITEM, DEFAULT_PROFILE_CYCLES
+    )
+    logging.info("Profiling the next %d watchdog cycles", cycles)
+
+    profile_state["cycles"] = cycles
+    # Leave tracemalloc running when it was started with PYTHONTRACEMALLOC
+    profile_state["stop_tracemalloc"] = not tracemalloc.is_tracing()
+    tracemalloc.start()
+    profile_state["profiler"] = cProfile.Profile()
+    profile_state["profiler"].enable()
+
+
+def finish_cycle_profile(config, profile_state, profile_dir=STATE_FILE_DIR):
+    """
+    Once the profiled cycles are done, write the cProfile statistics and the lines that allocated the most memory
+    to a text file in profile_dir, and the raw cProfile statistics next to it for pstats or snakeviz. Return the path
+    of the files without their extension.
+    """
+    if not profile_state:
+        return None
+    profile_state["cycles"] -= 1
+    if profile_state["cycles"] > 0:
+        return None
+
+    import pstats
+    import tracemalloc
+
+    profiler = profile_state["profiler"]
+    profiler.disable()
+    snapshot = tracemalloc.take_snapshot()
+    if profile_state["stop_tracemalloc"]:
+        tracemalloc.stop()
+    profile_state.clear()
+
+    profile_file = os.path.join(
+        profile_dir, "%s-%d" % (PROFILE_FILE_PREFIX, int(time.time()))
+    )
+    try:
+        create_required_directory(config, profile_dir)
+        profiler.dump_stats(profile_file + ".prof")
+        with open(profile_file + ".txt", "w") as f:
+            f.write("Functions by cumulative time\n")
+            pstats.Stats(profiler, stream=f).sort_stats("cumulative").print_stats(
+                PROFILE_TOP_FUNCTIONS
+            )
+            f.write("Memory allocated by line\n\n")
+            for stat in snapshot.statistics("lineno")[:PROFILE_TOP_ALLOCATIONS]:
+                f.write("%s\n" % stat)
+    except (IOError, OSError) as e:
+        logging.warning(
+            "Unable to write the watchdog profile to %s: %s", profile_dir, e
+        )
+        return None
+
+    logging.info(
+        "Wrote the watchdog profile to %s.txt and %s.prof", profile_file, profile_file
+    )
+    return profile_file
+
+
 def main():
     parse_arguments()
     assert_root()
@@ -2268,18 +4277,71 @@ def main():
         clean_up_previous_tunnel_pids()
         clean_up_certificate_lock_file()
 
+        readahead_config_mtime = get_config_file_mtime()
+        apply_readahead_settings(config)
+        readahead_tuning_state = {}
+        nfs_stats_state = {}
+        tunnel_progress = {}
+        status_state = {}
+        profile_state = {}
+        scheduler = MountTaskScheduler()
+        shared_certificates = {}
+        # The pool is sized once, changing the concurrency needs a restart of the watchdog
+        certificate_refresher = CertificateRefresher(
+            get_int_value_from_config_file(
+                config,
+                CERTIFICATE_REFRESH_CONCURRENCY_ITEM,
+                DEFAULT_CERTIFICATE_REFRESH_CONCURRENCY,
+            )
+        )
+        signal.signal(SIGUSR1, request_cycle_profile)
+
         while True:
-            config = read_config()
+            cycle_start_time = time.monotonic()
+            CYCLE_STEP_TIMINGS.clear()
+            start_cycle_profile(config, profile_state)
+
+            with timed_step("read_config"):
+                config = read_config()
+
+            config_mtime = get_config_file_mtime()
+            if config_mtime != readahead_config_mtime:
+                logging.info(
+                    "Config file %s changed, re-applying readahead", CONFIG_FILE
+                )
+                with timed_step("apply_readahead_settings"):
+                    apply_readahead_settings(config)
+                readahead_config_mtime = config_mtime
+            with timed_step("tune_readahead"):
+                tune_readahead(config, readahead_tuning_state)
+            with timed_step("export_nfs_stats"):
+                export_nfs_stats(config, nfs_stats_state)
+
+            with timed_step("check_efs_mounts"):
+                check_efs_mounts(
+                    config,
+                    child_procs,
+                    unmount_grace_period_sec,
+                    unmount_count_for_consistency,
+                    tunnel_progress=tunnel_progress,
+                    scheduler=scheduler,
+                    certificate_refresher=certificate_refresher,
+                    shared_certificates=shared_certificates,
+                )
+            with timed_step("check_child_procs"):
+                check_child_procs(child_procs)
 
-            check_efs_mounts(
+            cycle_duration_sec = time.monotonic() - cycle_start_time
+            report_slow_cycle(cycle_duration_sec, poll_interval_sec, CYCLE_STEP_TIMINGS)
+            finish_cycle_profile(config, profile_state)
+            write_watchdog_status(
                 config,
-                child_procs,
-                unmount_grace_period_sec,
-                unmount_count_for_consistency,
+                status_state,
+                cycle_duration_sec,
+                step_timings=CYCLE_STEP_TIMINGS,
             )
-            check_child_procs(child_procs)
 
-            time.sleep(poll_interval_sec)
+            time.sleep(scheduler.get_sleep_time_sec(time.time(), poll_interval_sec))
     else:
         logging.info("amazon-efs-mount-watchdog is not enabled")
 
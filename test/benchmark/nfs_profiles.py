@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+#
+# Copyright 2017-2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+#
+# Licensed under the MIT License. See the LICENSE accompanying this file
+# for the specific language governing permissions and limitations under
+# the License.
+#
+"""
+Compare the NFS performance profiles of mount.efs against an NFS server, usually a local one.
+
+Every profile is mounted with the NFS options mount.efs would use for it, and measured with the same workloads: a
+sequential write and read of one large file, random 4 KiB reads of that file, and the creation, stat and removal of
+many small files. The client caches are emptied by re-mounting between the steps.
+
+Usage, as root and from the root of the repository:
+
+    PYTHONPATH=src python3 test/benchmark/nfs_profiles.py 127.0.0.1:/export
+
+See "NFS performance profiles" in the README for setting up a local NFS server.
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from configparser import ConfigParser
+
+import mount_efs
+
+CHUNK_SIZE = 1024 * 1024
+RANDOM_READ_SIZE = 4096
+DEFAULT_PROFILE = "default"
+
+
+def get_nfs_options(profile):
+    config = ConfigParser()
+    config.add_section(mount_efs.CONFIG_SECTION)
+    config.set(mount_efs.CONFIG_SECTION, "stunnel_check_cert_validity", "false")
+
+    # The options of a mount.efs mount without TLS, which connects to the server directly
+    options = {mount_efs.LEGACY_STUNNEL_MOUNT_OPTION: None}
+    if profile != DEFAULT_PROFILE:
+        options[mount_efs.NFS_PERFORMANCE_PROFILE_OPTION] = profile
+    return mount_efs.get_nfs_mount_options(options, config)
+
+
+def mount(server, mountpoint, nfs_options):
+    subprocess.check_call(
+        ["mount", "-t", "nfs4", "-o", nfs_options, server, mountpoint]
+    )
+
+
+def unmount(mountpoint):
+    subprocess.check_call(["umount", mountpoint])
+
+
+def remount(server, mountpoint, nfs_options):
+    unmount(mountpoint)
+    mount(server, mountpoint, nfs_options)
+
+
+def sequential_write(path, size_mb):
+    chunk = os.urandom(CHUNK_SIZE)
+    start = time.time()
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    return size_mb / (time.time() - start)
+
+
+def sequential_read(path):
+    read_bytes = 0
+    start = time.time()
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(CHUNK_SIZE)
+            if not data:
+                break
+            read_bytes += len(data)
+    return read_bytes / CHUNK_SIZE / (time.time() - start)
+
+
+def random_reads(path, count):
+    size = os.path.getsize(path)
+    offsets = [
+        random.randrange(0, size // RANDOM_READ_SIZE) * RANDOM_READ_SIZE
+        for _ in range(count)
+    ]
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        start = time.time()
+        for offset in offsets:
+            os.pread(fd, RANDOM_READ_SIZE, offset)
+        return count / (time.time() - start)
+    finally:
+        os.close(fd)
+
+
+def create_files(directory, count):
+    os.mkdir(directory)
+    start = time.time()
+    for i in range(count):
+        with open(os.path.join(directory, "file-%d" % i), "wb") as f:
+            f.write(b"x")
+    return count / (time.time() - start)
+
+
+def stat_files(directory, count):
+    start = time.time()
+    for i in range(count):
+        os.stat(os.path.join(directory, "file-%d" % i))
+    return count / (time.time() - start)
+
+
+def remove_files(directory, count):
+    start = time.time()
+    for i in range(count):
+        os.remove(os.path.join(directory, "file-%d" % i))
+    os.rmdir(directory)
+    return count / (time.time() - start)
+
+
+def run_profile(args, profile, mountpoint):
+    nfs_options = get_nfs_options(profile)
+    mount(args.server, mountpoint, nfs_options)
+    try:
+        work_dir = os.path.join(mountpoint, "efs-utils-benchmark-%d" % os.getpid())
+        os.mkdir(work_dir)
+        data_file = os.path.join(work_dir, "data")
+        files_dir = os.path.join(work_dir, "files")
+
+        results = {"options": nfs_options}
+        results["write MB/s"] = sequential_write(data_file, args.size_mb)
+        remount(args.server, mountpoint, nfs_options)
+        results["read MB/s"] = sequential_read(data_file)
+        remount(args.server, mountpoint, nfs_options)
+        results["4k reads/s"] = random_reads(data_file, args.random_reads)
+        results["creates/s"] = create_files(files_dir, args.files)
+        remount(args.server, mountpoint, nfs_options)
+        results["stats/s"] = stat_files(files_dir, args.files)
+        results["removes/s"] = remove_files(files_dir, args.files)
+
+        os.remove(data_file)
+        os.rmdir(work_dir)
+        return results
+    finally:
+        unmount(mountpoint)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the NFS performance profiles of mount.efs"
+    )
+    parser.add_argument("server", help="the NFS export to mount, e.g. 127.0.0.1:/")
+    parser.add_argument(
+        "--profiles",
+        default=",".join(
+            [DEFAULT_PROFILE] + sorted(mount_efs.NFS_PERFORMANCE_PROFILES)
+        ),
+        help="comma separated profiles to compare, %s is the mount without a profile"
+        % DEFAULT_PROFILE,
+    )
+    parser.add_argument("--size-mb", type=int, default=512)
+    parser.add_argument("--random-reads", type=int, default=2000)
+    parser.add_argument("--files", type=int, default=2000)
+    args = parser.parse_args()
+
+    if os.geteuid() != 0:
+        sys.stderr.write("The benchmark mounts the NFS export, run it as root\n")
+        sys.exit(1)
+
+    columns = [
+        "write MB/s",
+        "read MB/s",
+        "4k reads/s",
+        "creates/s",
+        "stats/s",
+        "removes/s",
+    ]
+    sys.stdout.write("%-12s %s\n" % ("profile", " ".join("%12s" % c for c in columns)))
+
+    mountpoint = tempfile.mkdtemp(prefix="efs-utils-benchmark-")
+    try:
+        for profile in args.profiles.split(","):
+            results = run_profile(args, profile, mountpoint)
+            sys.stdout.write(
+                "%-12s %s\n    %s\n"
+                % (
+                    profile,
+                    " ".join("%12.1f" % results[c] for c in columns),
+                    results["options"],
+                )
+            )
+            sys.stdout.flush()
+    finally:
+        os.rmdir(mountpoint)
+
+
+if "__main__" == __name__:
+    main()
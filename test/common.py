@@ -6,10 +6,15 @@
 # the License.
 #
 
+import os
 import subprocess
+import sys
 
 from mock import MagicMock
 
+# Modules that must only be imported when they are used, as they take a large part of the start up time of mount.efs
+DEFERRED_MODULES = ["botocore", "cProfile", "pstats", "tracemalloc"]
+
 
 # The process mock can be retrieved by calling PopenMock(<init params>).mock
 class PopenMock:
@@ -63,3 +68,22 @@ DEFAULT_TIMEOUT_POPEN = PopenMock(
 DEFAULT_UNKNOWN_EXCEPTION_POPEN = PopenMock(
     return_code=1, poll_result=1, communicate_side_effect=Exception("Unknown error")
 )
+
+
+def get_imported_modules(module):
+    """Return a dict mapping every module imported by importing module to its cumulative import time in microseconds"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import %s" % module],
+        stderr=subprocess.PIPE,
+        env=env,
+        check=True,
+    )
+
+    imported_modules = {}
+    for line in proc.stderr.decode().splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        imported_modules[name.strip()] = int(cumulative)
+    return imported_modules
@@ -51,12 +51,12 @@ def test_use_missing_cafile(capsys):
     options = {"cafile": "/missing1"}
     efs_config = {}
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.add_tunnel_ca_options(
             efs_config, _get_config(), options, DEFAULT_REGION
         )
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
 
     out, err = capsys.readouterr()
     assert "Failed to find certificate authority file for verification" in err
@@ -0,0 +1,239 @@
+#
+# Copyright 2017-2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+#
+# Licensed under the MIT License. See the LICENSE accompanying this file
+# for the specific language governing permissions and limitations under
+# the License.
+#
+
+from unittest.mock import MagicMock
+
+import pytest
+
+import mount_efs
+
+try:
+    import ConfigParser
+except ImportError:
+    from configparser import ConfigParser
+
+FSTAB = """# /etc/fstab
+UUID=1234 / xfs defaults 0 0
+fs-deadbeef /mnt/a efs _netdev,tls,defaults 0 0
+fs-deadbeef:/data /mnt/with\\040space efs _netdev,nofail,x-systemd.automount 0 0
+fs-cafebabe /mnt/c efs noauto,tls 0 0
+# fs-cafebabe /mnt/d efs tls 0 0
+server:/export /mnt/nfs nfs4 defaults 0 0
+fs-cafebabe /mnt/e efs
+"""
+
+TLS_PORT_RANGE_LOW = 20049
+TLS_PORT_RANGE_HIGH = 20059
+
+
+@pytest.fixture(autouse=True)
+def setup(mocker):
+    mocker.patch("mount_efs.RESERVED_TLS_PORTS", [])
+    mocker.patch("mount_efs.STUNNEL_OPTIONS", None)
+
+
+def _get_config(concurrency=None):
+    try:
+        config = ConfigParser.SafeConfigParser()
+    except AttributeError:
+        config = ConfigParser()
+    config.add_section(mount_efs.CONFIG_SECTION)
+    config.set(
+        mount_efs.CONFIG_SECTION, "port_range_lower_bound", str(TLS_PORT_RANGE_LOW)
+    )
+    config.set(
+        mount_efs.CONFIG_SECTION, "port_range_upper_bound", str(TLS_PORT_RANGE_HIGH)
+    )
+    if concurrency is not None:
+        config.set(
+            mount_efs.CONFIG_SECTION,
+            mount_efs.BATCH_MOUNT_CONCURRENCY_ITEM,
+            str(concurrency),
+        )
+    return config
+
+
+def _write_batch_file(tmpdir, content=FSTAB):
+    batch_file = tmpdir.join("fstab")
+    batch_file.write(content)
+    return str(batch_file)
+
+
+def test_get_batch_mount_file():
+    assert "/tmp/entries" == mount_efs.get_batch_mount_file(
+        ["mount.efs", "--batch", "/tmp/entries"]
+    )
+    assert mount_efs.FSTAB_FILE == mount_efs.get_batch_mount_file(
+        ["mount.efs", "--batch", "fstab"]
+    )
+
+
+def test_get_batch_mount_file_missing(capsys):
+    with pytest.raises(SystemExit) as ex:
+        mount_efs.get_batch_mount_file(["mount.efs", "--batch"])
+
+    assert 0 != ex.value.code
+    assert "Usage:" in capsys.readouterr().err
+
+
+def test_parse_batch_mount_entries(tmpdir):
+    entries = mount_efs.parse_batch_mount_entries(_write_batch_file(tmpdir))
+
+    assert [
+        mount_efs.BatchMountEntry(
+            "fs-deadbeef", "/mnt/a", {"_netdev": None, "tls": None}, False
+        ),
+        mount_efs.BatchMountEntry(
+            "fs-deadbeef:/data", "/mnt/with space", {"_netdev": None}, True
+        ),
+        mount_efs.BatchMountEntry("fs-cafebabe", "/mnt/e", {}, False),
+    ] == entries
+
+
+def test_allocate_tls_ports_skips_ports_of_existing_mounts(tmpdir):
+    tmpdir.join("fs-deadbeef.mnt.%d" % TLS_PORT_RANGE_LOW).write("{}")
+    tmpdir.join("fs-deadbeef.mnt.%d+" % (TLS_PORT_RANGE_LOW + 1)).write("")
+
+    ports = mount_efs.allocate_tls_ports(_get_config(), 20, str(tmpdir))
+
+    assert TLS_PORT_RANGE_HIGH - TLS_PORT_RANGE_LOW - 1 == len(ports)
+    assert len(ports) == len(set(ports))
+    assert TLS_PORT_RANGE_LOW not in ports
+    assert TLS_PORT_RANGE_LOW + 1 in ports
+
+
+def test_choose_tls_port_tries_reserved_port_first(mocker, tmpdir):
+    reserved_port = TLS_PORT_RANGE_LOW + 5
+    mocker.patch("mount_efs.RESERVED_TLS_PORTS", [reserved_port])
+    sock_mock = MagicMock()
+    mocker.patch("socket.socket", return_value=sock_mock)
+
+    mount_efs.choose_tls_port_and_get_bind_sock(_get_config(), {}, str(tmpdir))
+
+    sock_mock.bind.assert_called_once_with(("localhost", reserved_port))
+
+
+def test_get_stunnel_options_loaded_up_front(mocker):
+    mocker.patch("mount_efs.STUNNEL_OPTIONS", [b"foreground"])
+    popen_mock = mocker.patch("subprocess.Popen")
+
+    assert [b"foreground"] == mount_efs.get_stunnel_options()
+    popen_mock.assert_not_called()
+
+
+def test_mount_batch_entry(mocker):
+    mocker.patch("mount_efs.match_device", return_value=("fs-deadbeef", "/", None))
+    mount_mock = mocker.patch("mount_efs.mount_file_system")
+    entry = mount_efs.BatchMountEntry("fs-deadbeef", "/mnt", {"tls": None}, False)
+
+    result = mount_efs.mount_batch_entry(_get_config(), entry, [20050])
+
+    assert 0 == result["returncode"]
+    assert [20050] == mount_efs.RESERVED_TLS_PORTS
+    args, kwargs = mount_mock.call_args
+    assert ("fs-deadbeef", "/", "/mnt") == args[1:4]
+    assert not kwargs["exit_on_tunnel_failure"]
+
+
+def test_mount_batch_entry_failure(mocker):
+    mocker.patch("mount_efs.match_device", return_value=("fs-deadbeef", "/", None))
+    mocker.patch(
+        "mount_efs.mount_file_system",
+        side_effect=lambda *args, **kwargs: mount_efs.fatal_error(
+            "mount failed", exit_code=32
+        ),
+    )
+    entry = mount_efs.BatchMountEntry("fs-deadbeef", "/mnt", {}, False)
+
+    result = mount_efs.mount_batch_entry(_get_config(), entry, [])
+
+    assert 32 == result["returncode"]
+    assert "mount failed\n" == result["stderr"]
+
+
+def test_batch_mount(mocker, tmpdir, capsys):
+    mocker.patch("mount_efs.warm_batch_mount_caches")
+    mocker.patch("mount_efs.STATE_FILE_DIR", str(tmpdir))
+
+    def mount_batch_entry(config, entry, tls_ports):
+        failed = entry.mountpoint != "/mnt/a"
+        return {
+            "returncode": 1 if failed else 0,
+            "stdout": "",
+            "stderr": "mount failed\n" if failed else "",
+            "duration_sec": 0.5,
+        }
+
+    mocker.patch("mount_efs.mount_batch_entry", side_effect=mount_batch_entry)
+
+    returncode = mount_efs.batch_mount(
+        _get_config(concurrency=2), _write_batch_file(tmpdir)
+    )
+
+    assert 1 == returncode
+    out, err = capsys.readouterr()
+    assert "fs-deadbeef on /mnt/a: mounted in 0.50s" in out
+    assert (
+        "fs-deadbeef:/data on /mnt/with space: failed with exit code 1, ignored as nofail: mount failed"
+        in err
+    )
+    assert "fs-cafebabe on /mnt/e: failed with exit code 1: mount failed" in err
+
+
+@pytest.mark.parametrize("concurrency", ["0", "-2"])
+def test_batch_mount_concurrency_lower_than_one(mocker, tmpdir, caplog, concurrency):
+    mocker.patch("mount_efs.warm_batch_mount_caches")
+    mocker.patch("mount_efs.STATE_FILE_DIR", str(tmpdir))
+    mocker.patch(
+        "mount_efs.mount_batch_entry",
+        return_value={"returncode": 0, "stdout": "", "stderr": ""},
+    )
+    config = _get_config(concurrency=concurrency)
+
+    assert 1 == mount_efs.get_batch_mount_concurrency(config)
+    assert "lower than 1" in caplog.text
+    assert 0 == mount_efs.batch_mount(
+        config, _write_batch_file(tmpdir, "fs-deadbeef /mnt efs tls 0 0\n")
+    )
+
+
+def test_get_batch_mount_concurrency():
+    assert mount_efs.DEFAULT_BATCH_MOUNT_CONCURRENCY == (
+        mount_efs.get_batch_mount_concurrency(_get_config())
+    )
+    assert mount_efs.DEFAULT_BATCH_MOUNT_CONCURRENCY == (
+        mount_efs.get_batch_mount_concurrency(_get_config(concurrency="many"))
+    )
+    assert 8 == mount_efs.get_batch_mount_concurrency(_get_config(concurrency=8))
+
+
+def test_batch_mount_nofail_entries_only(mocker, tmpdir):
+    mocker.patch("mount_efs.warm_batch_mount_caches")
+    mocker.patch(
+        "mount_efs.mount_batch_entry",
+        return_value={"returncode": 1, "stdout": "", "stderr": ""},
+    )
+    batch_file = _write_batch_file(tmpdir, "fs-deadbeef /mnt efs nofail 0 0\n")
+
+    assert 0 == mount_efs.batch_mount(_get_config(), batch_file)
+
+
+def test_batch_mount_no_entries(mocker, tmpdir, capsys):
+    warm_mock = mocker.patch("mount_efs.warm_batch_mount_caches")
+    batch_file = _write_batch_file(tmpdir, "server:/export /mnt nfs4 defaults 0 0\n")
+
+    assert 0 == mount_efs.batch_mount(_get_config(), batch_file)
+    assert "No efs entries to mount" in capsys.readouterr().out
+    warm_mock.assert_not_called()
+
+
+def test_batch_mount_missing_file(tmpdir, capsys):
+    with pytest.raises(mount_efs.MountError):
+        mount_efs.batch_mount(_get_config(), str(tmpdir.join("missing")))
+
+    assert "Failed to read batch mount file" in capsys.readouterr().err
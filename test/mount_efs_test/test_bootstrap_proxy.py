@@ -4,12 +4,18 @@
 # for the specific language governing permissions and limitations under
 # the License.
 
+import json
 import os
 import tempfile
 from unittest.mock import MagicMock
 
 import mount_efs
 
+try:
+    import ConfigParser
+except ImportError:
+    from configparser import ConfigParser
+
 AP_ID = "fsap-beefdead"
 FS_ID = "fs-deadbeef"
 CLIENT_SOURCE = "test"
@@ -30,6 +36,7 @@ MOCK_CONFIG = MagicMock()
 
 def setup_mocks(mocker):
     mocker.patch("mount_efs.start_watchdog")
+    mocker.patch("mount_efs.is_tunnel_sharing_enabled", return_value=False)
     mocker.patch(
         "mount_efs.get_tls_port_range",
         return_value=(DEFAULT_TLS_PORT, DEFAULT_TLS_PORT + 10),
@@ -67,6 +74,7 @@ def setup_mocks(mocker):
 
 def setup_mocks_without_popen(mocker):
     mocker.patch("mount_efs.start_watchdog")
+    mocker.patch("mount_efs.is_tunnel_sharing_enabled", return_value=False)
     mocker.patch(
         "mount_efs.get_tls_port_range",
         return_value=(DEFAULT_TLS_PORT, DEFAULT_TLS_PORT + 10),
@@ -475,3 +483,153 @@ def test_bootstrap_proxy_netns_option(mocker, tmpdir):
     assert EXPECTED_STUNNEL_CONFIG_FILE in popen_args
     assert "nsenter" in popen_args
     assert "--net=" + netns in popen_args
+
+
+def test_bootstrap_proxy_efs_proxy_ready_fd_not_in_state_file(mocker, tmpdir):
+    popen_mock, _ = setup_mocks(mocker)
+    state_file_mock = mocker.patch(
+        "mount_efs.write_tunnel_state_file", return_value="~mocktempfile"
+    )
+    state_file_dir = str(tmpdir)
+    mocker.patch("mount_efs.is_ocsp_enabled", return_value=False)
+    mocker.patch("mount_efs._efs_proxy_bin", return_value="/usr/bin/efs-proxy")
+    with mount_efs.bootstrap_proxy(
+        MOCK_CONFIG,
+        INIT_SYSTEM,
+        DNS_NAME,
+        FS_ID,
+        MOUNT_POINT,
+        {"tls": None},
+        state_file_dir,
+        efs_proxy_enabled=True,
+    ):
+        pass
+
+    popen_args, popen_kwargs = popen_mock.call_args
+    popen_args = popen_args[0]
+
+    ready_fd_index = popen_args.index(mount_efs.EFS_PROXY_READY_FD_OPTION)
+    assert (int(popen_args[ready_fd_index + 1]),) == popen_kwargs["pass_fds"]
+
+    state_file_args, _ = state_file_mock.call_args
+    assert mount_efs.EFS_PROXY_READY_FD_OPTION not in state_file_args[4]
+
+
+def test_bootstrap_proxy_stunnel_no_ready_fd(mocker, tmpdir):
+    popen_mock, _ = setup_mocks(mocker)
+    state_file_dir = str(tmpdir)
+    test_tlsport_mock = mocker.patch("mount_efs.test_tlsport")
+    mocker.patch("mount_efs._stunnel_bin", return_value="/usr/bin/stunnel")
+    with mount_efs.bootstrap_proxy(
+        MOCK_CONFIG,
+        INIT_SYSTEM,
+        DNS_NAME,
+        FS_ID,
+        MOUNT_POINT,
+        {},
+        state_file_dir,
+        efs_proxy_enabled=False,
+    ):
+        pass
+
+    popen_args, popen_kwargs = popen_mock.call_args
+
+    assert mount_efs.EFS_PROXY_READY_FD_OPTION not in popen_args[0]
+    assert () == popen_kwargs["pass_fds"]
+    test_tlsport_mock.assert_called_once()
+
+
+def test_bootstrap_proxy_efs_proxy_ready_skips_tlsport_probe(mocker, tmpdir):
+    setup_mocks(mocker)
+    state_file_dir = str(tmpdir)
+    mocker.patch("mount_efs.is_ocsp_enabled", return_value=False)
+    mocker.patch("mount_efs._efs_proxy_bin", return_value="/usr/bin/efs-proxy")
+    mocker.patch("mount_efs.wait_for_tunnel_ready", return_value=True)
+    test_tlsport_mock = mocker.patch("mount_efs.test_tlsport")
+    with mount_efs.bootstrap_proxy(
+        MOCK_CONFIG, INIT_SYSTEM, DNS_NAME, FS_ID, MOUNT_POINT, {}, state_file_dir
+    ):
+        pass
+
+    test_tlsport_mock.assert_not_called()
+
+
+def _get_tunnel_sharing_config():
+    config = ConfigParser()
+    config.add_section(mount_efs.CONFIG_SECTION)
+    config.set(mount_efs.CONFIG_SECTION, "state_file_dir_mode", "750")
+    config.set(mount_efs.CONFIG_SECTION, mount_efs.TUNNEL_SHARING_ENABLED_ITEM, "true")
+    return config
+
+
+def test_bootstrap_proxy_shares_running_tunnel(mocker, tmpdir):
+    popen_mock, _ = setup_mocks(mocker)
+    mocker.patch("mount_efs.is_tunnel_sharing_enabled", return_value=True)
+    mocker.patch("mount_efs.get_tunnel_sharing_key", return_value="tunnel-key")
+    state_file_dir = str(tmpdir)
+    shared_state_file = "fs-deadbeef.other.mnt.%d" % (DEFAULT_TLS_PORT + 1)
+    tmpdir.join(shared_state_file).write(
+        json.dumps({"pid": 1234, "tunnelKey": "tunnel-key"})
+    )
+    options = {"tls": None}
+
+    with mount_efs.bootstrap_proxy(
+        _get_tunnel_sharing_config(),
+        INIT_SYSTEM,
+        DNS_NAME,
+        FS_ID,
+        MOUNT_POINT,
+        options,
+        state_file_dir,
+    ) as tunnel_proc:
+        assert tunnel_proc is None
+
+    popen_mock.assert_not_called()
+    assert DEFAULT_TLS_PORT + 1 == options["tlsport"]
+
+    ref_file = os.path.join(
+        state_file_dir,
+        mount_efs.SHARED_TUNNEL_REFS_DIR,
+        shared_state_file,
+        "fs-deadbeef.mnt.%d" % (DEFAULT_TLS_PORT + 1),
+    )
+    with open(ref_file) as f:
+        assert MOUNT_POINT == json.load(f)["mountpoint"]
+
+
+def test_bootstrap_proxy_does_not_share_unmounted_tunnel(mocker, tmpdir):
+    popen_mock, _ = setup_mocks(mocker)
+    mocker.patch("mount_efs.is_tunnel_sharing_enabled", return_value=True)
+    mocker.patch("mount_efs.get_tunnel_sharing_key", return_value="tunnel-key")
+    mocker.patch("mount_efs.is_ocsp_enabled", return_value=False)
+    mocker.patch("mount_efs._efs_proxy_bin", return_value="/usr/bin/efs-proxy")
+    mocker.patch("mount_efs.wait_for_tunnel_ready", return_value=True)
+    state_file_mock = mocker.patch(
+        "mount_efs.write_tunnel_state_file", return_value="~mocktempfile"
+    )
+    state_file_dir = str(tmpdir)
+    tmpdir.join("fs-deadbeef.other.mnt.%d" % (DEFAULT_TLS_PORT + 1)).write(
+        json.dumps({"pid": 1234, "tunnelKey": "tunnel-key", "unmount_time": 1})
+    )
+
+    with mount_efs.bootstrap_proxy(
+        _get_tunnel_sharing_config(),
+        INIT_SYSTEM,
+        DNS_NAME,
+        FS_ID,
+        MOUNT_POINT,
+        {},
+        state_file_dir,
+    ) as tunnel_proc:
+        assert tunnel_proc is not None
+
+    popen_mock.assert_called_once()
+    _, state_file_kwargs = state_file_mock.call_args
+    assert "tunnel-key" == state_file_kwargs["tunnel_key"]
+
+
+def test_bootstrap_proxy_tlsport_option_disables_tunnel_sharing():
+    config = _get_tunnel_sharing_config()
+
+    assert mount_efs.is_tunnel_sharing_enabled(config, {})
+    assert not mount_efs.is_tunnel_sharing_enabled(config, {"tlsport": "3030"})
@@ -47,8 +47,8 @@ def test_systemd_network_up(mocker):
 def test_systemd_network_down(mocker):
     call_mock = _mock_subprocess_call(mocker, returncode=1)
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.check_network_status(FS_ID, "systemd")
 
     utils.assert_called_once(call_mock)
-    assert 0 == ex.value.code
+    assert 0 == ex.value.exit_code
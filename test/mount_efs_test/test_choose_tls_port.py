@@ -110,10 +110,10 @@ def test_choose_tls_port_never_succeeds(mocker, tmpdir, capsys):
 
     mocker.patch("socket.socket", return_value=bad_sock)
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.choose_tls_port_and_get_bind_sock(_get_config(), options, str(tmpdir))
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
 
     out, err = capsys.readouterr()
     assert "Failed to locate an available port" in err
@@ -145,10 +145,10 @@ def test_choose_tls_port_option_specified_unavailable(mocker, tmpdir, capsys):
 
     mocker.patch("socket.socket", return_value=bad_sock)
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.choose_tls_port_and_get_bind_sock(_get_config(), options, str(tmpdir))
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
 
     out, err = capsys.readouterr()
     assert "Specified port [1000] is unavailable" in err
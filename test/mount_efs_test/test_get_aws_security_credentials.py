@@ -301,10 +301,10 @@ def test_get_aws_security_credentials_no_credentials_found(mocker, capsys):
     mocker.patch("os.path.exists", return_value=False)
     mocker.patch("mount_efs.urlopen")
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.get_aws_security_credentials(config, True, "us-east-1", None)
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
 
     out, err = capsys.readouterr()
     assert (
@@ -326,10 +326,10 @@ def test_get_aws_security_credentials_credentials_not_found_in_files_and_botocor
     mocker.patch("mount_efs.urlopen")
     mount_efs.BOTOCORE_PRESENT = False
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.get_aws_security_credentials(config, True, "us-east-1", "default")
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
 
     out, err = capsys.readouterr()
     assert "AWS security credentials not found in" in err
@@ -370,12 +370,12 @@ def test_get_aws_security_credentials_credentials_not_found_in_aws_creds_uri(
     config = get_fake_config()
     mocker.patch("mount_efs.urlopen")
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.get_aws_security_credentials(
             config, True, "us-east-1", "default", AWSCREDSURI
         )
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
 
     out, err = capsys.readouterr()
     assert "Unsuccessful retrieval of AWS security credentials at" in err
@@ -511,12 +511,12 @@ def test_get_aws_security_credentials_from_webidentity_passed_in_one_param(
     )
     mocker.patch("mount_efs.get_iam_role_name", return_value=None)
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.get_aws_security_credentials(
             config, True, "us-east-1", jwt_path=WEB_IDENTITY_TOKEN_FILE
         )
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
 
     out, err = capsys.readouterr()
     assert (
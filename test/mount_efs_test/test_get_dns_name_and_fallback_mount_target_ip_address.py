@@ -49,7 +49,9 @@ TEST_SOCKET_GET_ADDR_INFO_RETURN = [
 
 
 @pytest.fixture(autouse=True)
-def setup(mocker):
+def setup(mocker, tmpdir):
+    mocker.patch("mount_efs.STATE_FILE_DIR", str(tmpdir))
+    mount_efs.DNS_CACHE.clear()
     mocker.patch("mount_efs.get_target_region", return_value=DEFAULT_REGION)
     mocker.patch(
         "socket.getaddrinfo",
@@ -230,12 +232,12 @@ def test_get_dns_name_unresolvable(mocker, capsys):
 
     mocker.patch("socket.getaddrinfo", side_effect=socket.gaierror)
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.get_dns_name_and_fallback_mount_target_ip_address(
             config, FS_ID, DEFAULT_NFS_OPTIONS
         )
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
 
     out, err = capsys.readouterr()
     assert "Failed to resolve" in err
@@ -369,12 +371,12 @@ def test_get_dns_name_and_mount_target_ip_address_via_option_failure(mocker, cap
         side_effect=mount_efs.FallbackException("Timeout"),
     )
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.get_dns_name_and_fallback_mount_target_ip_address(
             config, FS_ID, OPTIONS_WITH_IP
         )
 
-        assert 0 != ex.value.code
+        assert 0 != ex.value.exit_code
 
         out, err = capsys.readouterr()
         assert "Failed to resolve" not in err
@@ -399,12 +401,12 @@ def test_get_dns_name_and_fall_back_ip_address_failure(mocker, capsys):
         side_effect=mount_efs.FallbackException("timeout"),
     )
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.get_dns_name_and_fallback_mount_target_ip_address(
             config, FS_ID, DEFAULT_NFS_OPTIONS
         )
 
-        assert 0 != ex.value.code
+        assert 0 != ex.value.exit_code
 
         out, err = capsys.readouterr()
         assert "cannot be retrieved" in err
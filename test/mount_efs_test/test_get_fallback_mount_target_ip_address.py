@@ -5,7 +5,9 @@
 # the License.
 
 import ipaddress
+import json
 import socket
+import time
 
 import pytest
 
@@ -44,6 +46,11 @@ MOCK_EFS_AGENT = "fake-efs-client"
 MOCK_EC2_AGENT = "fake-ec2-client"
 
 
+@pytest.fixture(autouse=True)
+def setup(mocker, tmpdir):
+    mocker.patch("mount_efs.STATE_FILE_DIR", str(tmpdir))
+
+
 def _get_mock_config(
     config_section="mount",
     has_fallback_to_mount_target_ip_address_item=True,
@@ -212,6 +219,113 @@ def test_get_fall_back_ip_address_success(mocker):
     utils.assert_called(check_ip_resolve_mock)
 
 
+def test_get_fall_back_ip_address_probed_is_not_checked_again(mocker):
+    """
+    When the mount target is selected by probing, it has been connected to already and is not checked again
+    """
+    config = _get_mock_config()
+    config.set(
+        mount_efs.CONFIG_SECTION, mount_efs.MOUNT_TARGET_PROBING_ENABLED_ITEM, "true"
+    )
+
+    mocker.patch(
+        "mount_efs.check_if_fall_back_to_mount_target_ip_address_is_enabled",
+        return_value=True,
+    )
+    mocker.patch(
+        "mount_efs.get_fallback_mount_target_ip_address_helper",
+        return_value=FALLBACK_IP_ADDRESS,
+    )
+    check_ip_resolve_mock = mocker.patch(
+        "mount_efs.mount_target_ip_address_can_be_resolved"
+    )
+
+    ip_address = mount_efs.get_fallback_mount_target_ip_address(
+        config, FS_ID, DEFAULT_NFS_OPTIONS, DNS_NAME
+    )
+
+    assert FALLBACK_IP_ADDRESS == ip_address
+    utils.assert_not_called(check_ip_resolve_mock)
+
+
+def _mock_fallback_lookup(mocker, ip_addresses):
+    mocker.patch(
+        "mount_efs.check_if_fall_back_to_mount_target_ip_address_is_enabled",
+        return_value=True,
+    )
+    return mocker.patch(
+        "mount_efs.get_fallback_mount_target_ip_address_helper",
+        side_effect=ip_addresses,
+    )
+
+
+def test_get_fall_back_ip_address_from_cache(mocker):
+    config = _get_mock_config()
+    get_fallback_mount_target_ip_mock = _mock_fallback_lookup(
+        mocker, [FALLBACK_IP_ADDRESS]
+    )
+    check_ip_resolve_mock = mocker.patch(
+        "mount_efs.mount_target_ip_address_can_be_resolved", return_value=True
+    )
+
+    for _ in range(2):
+        ip_address = mount_efs.get_fallback_mount_target_ip_address(
+            config, OPTIONS_WITH_AZ, FS_ID, DNS_NAME
+        )
+        assert FALLBACK_IP_ADDRESS == ip_address
+
+    utils.assert_called_once(get_fallback_mount_target_ip_mock)
+    check_ip_resolve_mock.assert_called_with(
+        FALLBACK_IP_ADDRESS, network_namespace=None, tries=1
+    )
+
+
+def test_get_fall_back_ip_address_cached_ip_address_cannot_be_connected(mocker):
+    config = _get_mock_config()
+    new_ip_address = "192.0.0.2"
+    get_fallback_mount_target_ip_mock = _mock_fallback_lookup(
+        mocker, [FALLBACK_IP_ADDRESS, new_ip_address]
+    )
+    mocker.patch("mount_efs.mount_target_ip_address_can_be_resolved")
+    mount_efs.get_fallback_mount_target_ip_address(
+        config, OPTIONS_WITH_AZ, FS_ID, DNS_NAME
+    )
+
+    mocker.patch(
+        "mount_efs.mount_target_ip_address_can_be_resolved",
+        side_effect=[mount_efs.FallbackException("timeout"), True],
+    )
+    ip_address = mount_efs.get_fallback_mount_target_ip_address(
+        config, OPTIONS_WITH_AZ, FS_ID, DNS_NAME
+    )
+
+    assert new_ip_address == ip_address
+    assert get_fallback_mount_target_ip_mock.call_count == 2
+    cache_path = mount_efs.get_mount_target_cache_path(config, OPTIONS_WITH_AZ, FS_ID)
+    assert json.load(open(cache_path))["ip_address"] == new_ip_address
+
+
+def test_get_fall_back_ip_address_cache_expired(mocker):
+    config = _get_mock_config()
+    get_fallback_mount_target_ip_mock = _mock_fallback_lookup(
+        mocker, [FALLBACK_IP_ADDRESS, FALLBACK_IP_ADDRESS]
+    )
+    mocker.patch("mount_efs.mount_target_ip_address_can_be_resolved")
+    mount_efs.get_fallback_mount_target_ip_address(
+        config, OPTIONS_WITH_AZ, FS_ID, DNS_NAME
+    )
+
+    mocker.patch(
+        "time.time",
+        return_value=time.time() + mount_efs.DEFAULT_MOUNT_TARGET_CACHE_TTL_SEC,
+    )
+    mount_efs.get_fallback_mount_target_ip_address(
+        config, OPTIONS_WITH_AZ, FS_ID, DNS_NAME
+    )
+
+    assert get_fallback_mount_target_ip_mock.call_count == 2
+
+
 def test_get_fall_back_ip_address_feature_not_enabled(mocker):
     """
     When the fallback to mount target ip address is not enabled
@@ -315,12 +429,12 @@ def test_get_dns_name_and_fall_back_ip_address_cannot_be_resolved(mocker, capsys
         side_effect=[mount_efs.FallbackException("timeout")],
     )
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.get_fallback_mount_target_ip_address(
             config, FS_ID, DEFAULT_NFS_OPTIONS, DNS_NAME
         )
 
-        assert 0 != ex.value.code
+        assert 0 != ex.value.exit_code
 
         out, err = capsys.readouterr()
         assert "Failed to resolve" in err
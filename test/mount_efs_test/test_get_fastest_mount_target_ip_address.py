@@ -0,0 +1,179 @@
+# Copyright 2017-2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+#
+# Licensed under the MIT License. See the LICENSE accompanying this file
+# for the specific language governing permissions and limitations under
+# the License.
+
+import json
+import os
+
+import pytest
+
+import mount_efs
+
+try:
+    import ConfigParser
+except ImportError:
+    from configparser import ConfigParser
+
+FS_ID = "fs-deadbeef"
+DEFAULT_AZ = "us-east-1a"
+DEFAULT_AZ_ID = "use1-az1"
+OTHER_AZ = "us-east-1b"
+OTHER_AZ_ID = "use1-az2"
+SAME_AZ_IP_ADDRESS = "192.0.0.1"
+SAME_AZ_IPV6_ADDRESS = "2001:db8::1"
+OTHER_AZ_IP_ADDRESS = "192.0.1.1"
+MOUNT_TARGETS = [
+    {
+        "MountTargetId": "fsmt-1",
+        "AvailabilityZoneId": DEFAULT_AZ_ID,
+        "AvailabilityZoneName": DEFAULT_AZ,
+        "LifeCycleState": "available",
+        "IpAddress": SAME_AZ_IP_ADDRESS,
+        "Ipv6Address": SAME_AZ_IPV6_ADDRESS,
+    },
+    {
+        "MountTargetId": "fsmt-2",
+        "AvailabilityZoneId": OTHER_AZ_ID,
+        "AvailabilityZoneName": OTHER_AZ,
+        "LifeCycleState": "available",
+        "IpAddress": OTHER_AZ_IP_ADDRESS,
+    },
+    {
+        "MountTargetId": "fsmt-3",
+        "AvailabilityZoneId": "use1-az3",
+        "AvailabilityZoneName": "us-east-1c",
+        "LifeCycleState": "creating",
+        "IpAddress": "192.0.2.1",
+    },
+]
+
+
+@pytest.fixture(autouse=True)
+def setup(mocker, tmpdir):
+    mocker.patch("mount_efs.STATE_FILE_DIR", str(tmpdir))
+    mocker.patch("mount_efs.get_mount_targets_info", return_value=MOUNT_TARGETS)
+    mocker.patch("mount_efs.get_az_id_by_az_name", return_value=DEFAULT_AZ_ID)
+
+
+def _get_config():
+    config = ConfigParser()
+    config.add_section(mount_efs.CONFIG_SECTION)
+    return config
+
+
+def _mock_rtts(mocker, rtts):
+    probed = []
+
+    def measure_connect_rtt(ip_address, network_namespace=None, timeout=2):
+        probed.append(ip_address)
+        return rtts.get(ip_address)
+
+    mocker.patch("mount_efs.measure_connect_rtt", side_effect=measure_connect_rtt)
+    return probed
+
+
+def _get_fastest_mount_target_ip_address(az_name=DEFAULT_AZ):
+    return mount_efs.get_fastest_mount_target_ip_address(
+        _get_config(), "efs-client", "ec2-client", FS_ID, az_name
+    )
+
+
+def test_get_fastest_mount_target_ip_address_prefers_same_az(mocker, tmpdir):
+    probed = _mock_rtts(
+        mocker,
+        {
+            SAME_AZ_IP_ADDRESS: 0.004,
+            SAME_AZ_IPV6_ADDRESS: 0.002,
+            OTHER_AZ_IP_ADDRESS: 0.001,
+        },
+    )
+
+    ip_address = _get_fastest_mount_target_ip_address()
+
+    assert ip_address == SAME_AZ_IPV6_ADDRESS
+    assert "192.0.2.1" not in probed
+
+
+def test_get_fastest_mount_target_ip_address_other_az_when_same_az_unreachable(
+    mocker,
+):
+    _mock_rtts(mocker, {OTHER_AZ_IP_ADDRESS: 0.003})
+
+    assert _get_fastest_mount_target_ip_address() == OTHER_AZ_IP_ADDRESS
+
+
+def test_get_fastest_mount_target_ip_address_without_az(mocker):
+    _mock_rtts(
+        mocker,
+        {
+            SAME_AZ_IP_ADDRESS: 0.004,
+            SAME_AZ_IPV6_ADDRESS: 0.005,
+            OTHER_AZ_IP_ADDRESS: 0.001,
+        },
+    )
+
+    assert _get_fastest_mount_target_ip_address(az_name=None) == OTHER_AZ_IP_ADDRESS
+
+
+def test_get_fastest_mount_target_ip_address_none_reachable(mocker):
+    _mock_rtts(mocker, {})
+
+    with pytest.raises(mount_efs.FallbackException) as excinfo:
+        _get_fastest_mount_target_ip_address()
+
+    assert "None of the available mount targets" in excinfo.value.message
+
+
+def test_get_fastest_mount_target_ip_address_records_rtts(mocker, tmpdir):
+    _mock_rtts(mocker, {SAME_AZ_IP_ADDRESS: 0.0025})
+
+    _get_fastest_mount_target_ip_address()
+
+    rtt_path = os.path.join(
+        str(tmpdir), mount_efs.MOUNT_TARGET_CACHE_DIR, "%s.rtt" % FS_ID
+    )
+    with open(rtt_path) as f:
+        records = json.load(f)["mount_targets"]
+    assert records[SAME_AZ_IP_ADDRESS] == {"az": DEFAULT_AZ, "rtt_ms": 2.5}
+
+
+def test_select_probed_mount_target_waits_for_same_az():
+    candidates = [(SAME_AZ_IP_ADDRESS, True), (OTHER_AZ_IP_ADDRESS, False)]
+
+    assert (
+        mount_efs.select_probed_mount_target(candidates, {OTHER_AZ_IP_ADDRESS: 0.001})
+        is None
+    )
+    assert (
+        mount_efs.select_probed_mount_target(
+            candidates, {OTHER_AZ_IP_ADDRESS: 0.001, SAME_AZ_IP_ADDRESS: None}
+        )
+        == OTHER_AZ_IP_ADDRESS
+    )
+    assert (
+        mount_efs.select_probed_mount_target(candidates, {SAME_AZ_IP_ADDRESS: 0.01})
+        == SAME_AZ_IP_ADDRESS
+    )
+
+
+def test_fallback_helper_probes_when_enabled(mocker):
+    config = _get_config()
+    config.set(
+        mount_efs.CONFIG_SECTION, mount_efs.MOUNT_TARGET_PROBING_ENABLED_ITEM, "true"
+    )
+    mocker.patch("mount_efs.get_botocore_client", return_value="client")
+    get_fastest_mock = mocker.patch(
+        "mount_efs.get_fastest_mount_target_ip_address",
+        return_value=SAME_AZ_IP_ADDRESS,
+    )
+
+    ip_address = mount_efs.get_fallback_mount_target_ip_address_helper(
+        config, {"az": DEFAULT_AZ}, FS_ID
+    )
+
+    assert ip_address == SAME_AZ_IP_ADDRESS
+    get_fastest_mock.assert_called_once_with(
+        config, "client", "client", FS_ID, DEFAULT_AZ, network_namespace=None
+    )
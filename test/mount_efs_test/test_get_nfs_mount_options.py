@@ -172,10 +172,10 @@ def test_get_default_nfs_mount_options_macos(mocker):
 def _test_unsupported_mount_options_macos(mocker, capsys, options={}):
     mocker.patch("mount_efs.check_if_platform_is_mac", return_value=True)
     _mock_popen(mocker, stdout="nfs")
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.get_nfs_mount_options(options, _get_config())
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
 
     out, err = capsys.readouterr()
     assert "NFSv4.1 is not supported on MacOS" in err
@@ -191,3 +191,94 @@ def test_unsupported_vers_mount_options_macos(mocker, capsys):
 
 def test_unsupported_minorversion_mount_options_macos(mocker, capsys):
     _test_unsupported_mount_options_macos(mocker, capsys, {"minorversion": 1})
+
+
+def _mock_kernel_version(mocker, kernel_version=[5, 10]):
+    mocker.patch("mount_efs.check_if_platform_is_mac", return_value=False)
+    mocker.patch("mount_efs.get_linux_kernel_version", return_value=kernel_version)
+
+
+def test_performance_profile_mount_option(mocker):
+    _mock_kernel_version(mocker)
+    options = dict(DEFAULT_OPTIONS, perfprofile="throughput")
+    nfs_opts = mount_efs.get_nfs_mount_options(options, _get_config())
+
+    assert "nconnect=16" in nfs_opts
+    assert "rsize=1048576" in nfs_opts
+    assert "perfprofile" not in nfs_opts
+
+
+def test_performance_profile_config(mocker):
+    _mock_kernel_version(mocker)
+    config = _get_config()
+    config.set(mount_efs.CONFIG_SECTION, "performance_profile", "latency")
+    nfs_opts = mount_efs.get_nfs_mount_options(dict(DEFAULT_OPTIONS), config)
+
+    assert "nconnect=4" in nfs_opts
+    assert "timeo=600" in nfs_opts
+
+
+def test_performance_profile_mount_option_overrides_config(mocker):
+    _mock_kernel_version(mocker)
+    config = _get_config()
+    config.set(mount_efs.CONFIG_SECTION, "performance_profile", "latency")
+    options = dict(DEFAULT_OPTIONS, perfprofile="metadata")
+    nfs_opts = mount_efs.get_nfs_mount_options(options, config)
+
+    assert "actimeo=60" in nfs_opts
+    assert "timeo=600" in nfs_opts
+
+
+def test_performance_profile_explicit_options_win(mocker):
+    _mock_kernel_version(mocker)
+    options = dict(DEFAULT_OPTIONS, perfprofile="throughput", nconnect="2")
+    nfs_opts = mount_efs.get_nfs_mount_options(options, _get_config())
+
+    assert "nconnect=2" in nfs_opts
+    assert "nconnect=16" not in nfs_opts
+
+
+def test_performance_profile_nconnect_unsupported_kernel(mocker):
+    _mock_kernel_version(mocker, kernel_version=[4, 14])
+    options = dict(DEFAULT_OPTIONS, perfprofile="metadata")
+    nfs_opts = mount_efs.get_nfs_mount_options(options, _get_config())
+
+    assert "nconnect" not in nfs_opts
+    assert "actimeo=60" in nfs_opts
+
+
+def test_performance_profile_empty_config(mocker):
+    config = _get_config()
+    config.set(mount_efs.CONFIG_SECTION, "performance_profile", "")
+
+    assert mount_efs.get_nfs_performance_profile(config, {}) is None
+
+
+def test_performance_profile_unknown_config(capsys):
+    config = _get_config()
+    config.set(mount_efs.CONFIG_SECTION, "performance_profile", "fastest")
+
+    with pytest.raises(mount_efs.MountOptionsError):
+        mount_efs.get_nfs_mount_options(dict(DEFAULT_OPTIONS), config)
+
+    assert 'Unknown NFS performance profile "fastest"' in capsys.readouterr().err
+
+
+def test_performance_profile_unknown_mount_option():
+    with pytest.raises(mount_efs.MountOptionsError):
+        mount_efs.check_options_validity({"perfprofile": "fastest"})
+
+
+def test_performance_profile_unknown_config_option_validity():
+    config = _get_config()
+    config.set(mount_efs.CONFIG_SECTION, "performance_profile", "fastest")
+
+    with pytest.raises(mount_efs.MountOptionsError):
+        mount_efs.check_options_validity({}, config)
+
+
+def test_performance_profile_mount_option_validity_ignores_config():
+    config = _get_config()
+    config.set(mount_efs.CONFIG_SECTION, "performance_profile", "fastest")
+
+    mount_efs.check_options_validity({"perfprofile": "latency"}, config)
@@ -173,10 +173,10 @@ def test_get_target_region_config_metadata_unavailable(mocker, capsys):
     mocker.patch("mount_efs.get_aws_ec2_metadata_token", return_value=None)
     mocker.patch("mount_efs.urlopen", side_effect=URLError("test error"))
     config = get_config("{fs_id}.efs.{region}.{dns_name_suffix}")
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.get_target_region(config, {})
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
     out, err = capsys.readouterr()
     assert "Error retrieving region" in err
 
@@ -190,10 +190,10 @@ def _test_get_target_region_error(mocker, capsys, response=None, error=None):
     elif error:
         mocker.patch("mount_efs.urlopen", side_effect=error)
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         get_target_region_helper()
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
 
     out, err = capsys.readouterr()
     assert "Error retrieving region" in err
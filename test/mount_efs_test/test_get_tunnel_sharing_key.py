@@ -0,0 +1,51 @@
+#
+# Copyright 2017-2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+#
+# Licensed under the MIT License. See the LICENSE accompanying this file
+# for the specific language governing permissions and limitations under
+# the License.
+#
+
+from unittest.mock import MagicMock
+
+import mount_efs
+
+FS_ID = "fs-deadbeef"
+DNS_NAME = "%s.efs.us-east-1.amazonaws.com" % FS_ID
+REGION = "us-east-1"
+
+
+def _get_key(mocker, options, dns_name=DNS_NAME, efs_proxy_enabled=True):
+    mocker.patch("mount_efs.get_target_region", return_value=REGION)
+    mocker.patch("mount_efs.is_ocsp_enabled", return_value=False)
+    mocker.patch("mount_efs.get_aws_profile", return_value="default")
+    return mount_efs.get_tunnel_sharing_key(
+        MagicMock(), dns_name, FS_ID, options, None, efs_proxy_enabled
+    )
+
+
+def test_get_tunnel_sharing_key_same_profile(mocker):
+    assert _get_key(mocker, {"tls": None, "iam": None}) == _get_key(
+        mocker, {"tls": None, "iam": None, "rsize": "1048576"}
+    )
+
+
+def test_get_tunnel_sharing_key_different_access_point(mocker):
+    assert _get_key(mocker, {"tls": None, "accesspoint": "fsap-1"}) != _get_key(
+        mocker, {"tls": None, "accesspoint": "fsap-2"}
+    )
+
+
+def test_get_tunnel_sharing_key_different_iam_identity(mocker):
+    assert _get_key(mocker, {"tls": None, "iam": None}) != _get_key(
+        mocker, {"tls": None, "iam": None, "rolearn": "arn", "jwtpath": "/token"}
+    )
+
+
+def test_get_tunnel_sharing_key_different_target(mocker):
+    assert _get_key(mocker, {"tls": None}) != _get_key(
+        mocker, {"tls": None}, dns_name="us-east-1a." + DNS_NAME
+    )
+    assert _get_key(mocker, {"tls": None}) != _get_key(
+        mocker, {"tls": None}, efs_proxy_enabled=False
+    )
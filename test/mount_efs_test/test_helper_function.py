@@ -37,6 +37,14 @@ AL2 = "Amazon Linux release 2"
 NON_AL2_RELEASE_ID_VAL = "FAKE_NON_AL2_RELEASE_ID_VAL"
 
 
+@pytest.fixture(autouse=True)
+def setup(mocker, tmpdir):
+    mount_efs.BOTOCORE_SESSIONS.clear()
+    mount_efs.BOTOCORE_CLIENTS.clear()
+    mocker.patch("mount_efs.STATE_FILE_DIR", str(tmpdir))
+    mount_efs.DNS_CACHE.clear()
+
+
 def get_config(
     config_section=mount_efs.CONFIG_SECTION, config_item=None, config_item_value=None
 ):
@@ -337,10 +345,10 @@ def test_get_botocore_client_use_awsprofile_profile_not_found(mocker, capsys):
     ]
     mocker.patch("botocore.session.get_session", return_value=boto_session_mock)
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.CredentialsError) as ex:
         mount_efs.get_botocore_client(config, "efs", {"awsprofile": "test_profile"})
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
 
     out, err = capsys.readouterr()
 
@@ -352,6 +360,57 @@ def test_get_botocore_client_use_awsprofile_profile_not_found(mocker, capsys):
     utils.assert_called(get_target_region_mock)
 
 
+def _mock_botocore_session(mocker):
+    mocker.patch("mount_efs.get_fips_config", return_value=False)
+    mocker.patch("mount_efs.get_target_region", return_value=DEFAULT_REGION)
+    mount_efs.BOTOCORE_PRESENT = True
+    boto_session_mock = MagicMock()
+    boto_session_mock.create_client.side_effect = lambda service, **kwargs: (
+        "%s-client" % service
+    )
+    get_session_mock = mocker.patch(
+        "botocore.session.get_session", return_value=boto_session_mock
+    )
+    return get_session_mock, boto_session_mock
+
+
+def test_get_botocore_client_reused(mocker):
+    config = get_config()
+    get_session_mock, boto_session_mock = _mock_botocore_session(mocker)
+
+    assert mount_efs.get_botocore_client(config, "efs", {}) == "efs-client"
+    assert mount_efs.get_botocore_client(config, "efs", {}) == "efs-client"
+    assert mount_efs.get_botocore_client(config, "ec2", {}) == "ec2-client"
+
+    utils.assert_called_once(get_session_mock)
+    assert boto_session_mock.create_client.call_count == 2
+
+
+def test_get_botocore_client_not_reused_across_profiles(mocker):
+    config = get_config()
+    get_session_mock, boto_session_mock = _mock_botocore_session(mocker)
+
+    mount_efs.get_botocore_client(config, "efs", {})
+    mount_efs.get_botocore_client(config, "efs", {"awsprofile": "test_profile"})
+    mount_efs.get_botocore_client(config, "efs", {"awsprofile": "test_profile"})
+
+    assert get_session_mock.call_count == 2
+    assert boto_session_mock.create_client.call_count == 2
+
+
+def test_warm_botocore_models(mocker):
+    get_session_mock, boto_session_mock = _mock_botocore_session(mocker)
+
+    mount_efs.warm_botocore_models()
+
+    assert [c[0][0] for c in boto_session_mock.get_service_model.call_args_list] == [
+        "ec2",
+        "efs",
+        "logs",
+    ]
+    utils.assert_not_called(boto_session_mock.create_client)
+
+
 def test_get_botocore_client_botocore_not_present(mocker):
     config = get_config()
     get_target_region_mock = mocker.patch(
@@ -451,10 +510,10 @@ def test_get_assumed_profile_credentials_via_botocore_botocore_present_profile_n
 
     mocker.patch("botocore.session.get_session", return_value=boto_session_mock)
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.botocore_credentials_helper("test_profile")
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
 
     out, err = capsys.readouterr()
 
@@ -0,0 +1,30 @@
+#
+# Copyright 2017-2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+#
+# Licensed under the MIT License. See the LICENSE accompanying this file
+# for the specific language governing permissions and limitations under
+# the License.
+#
+
+import mount_efs
+
+from .. import common
+
+
+def test_import_mount_efs_defers_heavy_modules():
+    imported_modules = common.get_imported_modules("mount_efs")
+
+    assert "mount_efs" in imported_modules
+    for name in imported_modules:
+        assert name.split(".")[0] not in common.DEFERRED_MODULES
+
+
+def test_deferred_import():
+    json_module = mount_efs.DeferredImport("json")
+
+    assert '{"a": 1}' == json_module.dumps({"a": 1})
+
+
+def test_is_module_available():
+    assert mount_efs.is_module_available("json")
+    assert not mount_efs.is_module_available("not_a_module_efs_utils_depends_on")
@@ -58,7 +58,9 @@ TEST_SOCKET_GET_ADDR_INFO_RETURN = [
 
 
 @pytest.fixture(autouse=True)
-def setup(mocker):
+def setup(mocker, tmpdir):
+    mocker.patch("mount_efs.STATE_FILE_DIR", str(tmpdir))
+    mount_efs.DNS_CACHE.clear()
     mocker.patch("mount_efs.get_target_region", return_value=DEFAULT_REGION)
     mocker.patch(
         "socket.getaddrinfo",
@@ -197,10 +199,10 @@ def test_match_device_correct_descriptors_cname_dns_amongst_invalid(mocker):
 def test_match_device_unresolvable_domain(mocker, capsys):
     mocker.patch("socket.gethostbyname_ex", side_effect=socket.gaierror)
     config = _get_mock_config()
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.match_device(config, "custom-cname.example.com", DEFAULT_NFS_OPTIONS)
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
     out, err = capsys.readouterr()
     assert "Failed to resolve" in err
 
@@ -210,10 +212,10 @@ def test_match_device_no_hostnames(mocker, capsys):
         "socket.gethostbyname_ex", return_value=(None, [], None)
     )
     config = _get_mock_config()
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.match_device(config, "custom-cname.example.com", DEFAULT_NFS_OPTIONS)
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
     out, err = capsys.readouterr()
     assert "did not resolve to an EFS mount target" in err
     utils.assert_called(gethostbyname_ex_mock)
@@ -224,10 +226,10 @@ def test_match_device_no_hostnames2(mocker, capsys):
         "socket.gethostbyname_ex", return_value=(None, [None, None], None)
     )
     config = _get_mock_config()
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.match_device(config, "custom-cname.example.com", DEFAULT_NFS_OPTIONS)
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
     out, err = capsys.readouterr()
     assert "did not resolve to an EFS mount target" in err
     utils.assert_called(gethostbyname_ex_mock)
@@ -239,10 +241,10 @@ def test_match_device_resolve_to_invalid_efs_dns_name(mocker, capsys):
         return_value=("invalid-efs-name.example.com", [], None),
     )
     config = _get_mock_config()
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.match_device(config, "custom-cname.example.com", DEFAULT_NFS_OPTIONS)
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
     out, err = capsys.readouterr()
     assert "did not resolve to a valid DNS name" in err
     utils.assert_called(gethostbyname_ex_mock)
@@ -258,10 +260,10 @@ def test_match_device_resolve_to_unexpected_efs_dns_name(mocker, capsys):
         return_value=("fs-deadbeef.efs.us-east-1.amazonaws.com", [], None),
     )
     config = _get_mock_config()
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.match_device(config, "custom-cname.example.com", DEFAULT_NFS_OPTIONS)
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
     out, err = capsys.readouterr()
     assert "did not resolve to a valid DNS name" in err
     utils.assert_called(get_dns_name_mock)
@@ -394,10 +396,10 @@ def test_match_device_with_dns_name_mount_az_in_option_not_match(mocker, capsys)
         "socket.gethostbyname_ex", return_value=(az_dns_name, [], None)
     )
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.match_device(config, dns_name, OPTIONS_WITH_AZ)
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
     out, err = capsys.readouterr()
     assert "does not match the az provided" in err
     utils.assert_not_called(get_dns_name_mock)
@@ -0,0 +1,110 @@
+#
+# Copyright 2017-2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+#
+# Licensed under the MIT License. See the LICENSE accompanying this file
+# for the specific language governing permissions and limitations under
+# the License.
+#
+
+from unittest.mock import MagicMock
+
+import pytest
+
+import mount_efs
+
+FS_ID = "fs-deadbeef"
+DNS_NAME = "%s.efs.us-east-1.amazonaws.com" % FS_ID
+MOUNT_POINT = "/mnt"
+TLS_PORT = 20049
+TUNNEL_PID = 1234
+
+
+def _get_config():
+    config = MagicMock()
+    config.has_option.return_value = False
+    return config
+
+
+def setup_mocks(mocker):
+    mocker.patch("mount_efs.bootstrap_cloudwatch_logging")
+    mocker.patch("mount_efs.check_network_status")
+    mocker.patch("mount_efs.get_init_system", return_value="systemd")
+    mocker.patch(
+        "mount_efs.get_dns_name_and_fallback_mount_target_ip_address",
+        return_value=(DNS_NAME, None),
+    )
+
+    def mount_with_proxy(
+        config, init_system, dns_name, path, fs_id, mountpoint, options, **kwargs
+    ):
+        options["tlsport"] = TLS_PORT
+        return TUNNEL_PID
+
+    return mocker.patch("mount_efs.mount_with_proxy", side_effect=mount_with_proxy)
+
+
+def test_mount(mocker):
+    mount_with_proxy_mock = setup_mocks(mocker)
+    mocker.patch("mount_efs.match_device", return_value=(FS_ID, "/", None))
+
+    result = mount_efs.mount(FS_ID, MOUNT_POINT, "tls,iam", config=_get_config())
+
+    assert FS_ID == result.fs_id
+    assert MOUNT_POINT == result.mountpoint
+    assert DNS_NAME == result.dns_name
+    assert TLS_PORT == result.tls_port
+    assert TUNNEL_PID == result.tunnel_pid
+    assert result.duration_sec >= 0
+
+    args, kwargs = mount_with_proxy_mock.call_args
+    assert {"tls": None, "iam": None, "tlsport": TLS_PORT} == args[6]
+    assert kwargs["exit_on_tunnel_failure"] is False
+
+
+def test_mount_does_not_modify_options(mocker):
+    setup_mocks(mocker)
+    mocker.patch("mount_efs.match_device", return_value=(FS_ID, "/", None))
+    options = {"tls": None}
+
+    mount_efs.mount(FS_ID, MOUNT_POINT, options, config=_get_config())
+
+    assert {"tls": None} == options
+
+
+def test_mount_no_tls(mocker):
+    mount_with_proxy_mock = setup_mocks(mocker)
+    mocker.patch("mount_efs.match_device", return_value=(FS_ID, "/", None))
+    mocker.patch("mount_efs.legacy_stunnel_mode_enabled", return_value=True)
+    mount_nfs_mock = mocker.patch("mount_efs.mount_nfs")
+
+    result = mount_efs.mount(FS_ID, MOUNT_POINT, config=_get_config())
+
+    mount_nfs_mock.assert_called_once()
+    mount_with_proxy_mock.assert_not_called()
+    assert result.tls_port is None
+    assert result.tunnel_pid is None
+
+
+def test_mount_invalid_options(mocker, capsys):
+    setup_mocks(mocker)
+    mocker.patch("mount_efs.match_device", return_value=(FS_ID, "/", None))
+    publish_mock = mocker.patch("mount_efs.publish_cloudwatch_log")
+
+    with pytest.raises(mount_efs.MountOptionsError) as ex:
+        mount_efs.mount(FS_ID, MOUNT_POINT, "iam", config=_get_config())
+
+    assert 1 == ex.value.exit_code
+    assert "iam" in str(ex.value)
+
+    out, err = capsys.readouterr()
+    assert "" == err
+    publish_mock.assert_not_called()
+    assert not getattr(mount_efs.FATAL_ERROR_STATE, "quiet", False)
+
+
+def test_mount_error_is_exception():
+    with pytest.raises(Exception) as ex:
+        raise mount_efs.NfsMountError("mount.nfs failed", 32)
+
+    assert isinstance(ex.value, mount_efs.MountError)
+    assert 32 == ex.value.exit_code
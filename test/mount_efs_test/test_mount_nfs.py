@@ -57,6 +57,11 @@ NETNS = "/proc/1/net/ns"
 LOCAL_HOST = "127.0.0.1"
 
 
+@pytest.fixture(autouse=True)
+def setup(mocker, tmpdir):
+    mocker.patch("mount_efs.STATE_FILE_DIR", str(tmpdir))
+
+
 def _get_config(
     mount_nfs_command_retry="true",
     mount_nfs_command_retry_count=4,
@@ -191,7 +196,7 @@ def test_mount_nfs_failure(mocker):
     _mock_popen(mocker, returncode=1)
     optimize_readahead_window_mock = mocker.patch("mount_efs.optimize_readahead_window")
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.mount_nfs(
             _get_config(mount_nfs_command_retry="false"),
             DNS_NAME,
@@ -200,7 +205,7 @@ def test_mount_nfs_failure(mocker):
             DEFAULT_OPTIONS,
         )
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
 
     utils.assert_not_called(optimize_readahead_window_mock)
 
@@ -318,7 +323,7 @@ def test_mount_nfs_not_retry_on_non_retryable_failure(mocker):
         side_effect=[common.DEFAULT_NON_RETRYABLE_FAILURE_POPEN.mock],
     )
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.mount_nfs(
             _get_config(),
             DNS_NAME,
@@ -327,7 +332,7 @@ def test_mount_nfs_not_retry_on_non_retryable_failure(mocker):
             DEFAULT_OPTIONS,
         )
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
     utils.assert_not_called(optimize_readahead_window_mock)
 
 
@@ -341,7 +346,7 @@ def test_mount_nfs_failure_after_all_attempts_fail(mocker):
         ],
     )
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.mount_nfs(
             _get_config(mount_nfs_command_retry_count=2),
             DNS_NAME,
@@ -350,7 +355,7 @@ def test_mount_nfs_failure_after_all_attempts_fail(mocker):
             DEFAULT_OPTIONS,
         )
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
     utils.assert_not_called(optimize_readahead_window_mock)
 
 
@@ -402,14 +407,155 @@ def test_mount_nfs_not_retry_after_one_unknown_exception(mocker):
         side_effect=[common.DEFAULT_UNKNOWN_EXCEPTION_POPEN.mock],
     )
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
+        mount_efs.mount_nfs(
+            _get_config(),
+            DNS_NAME,
+            "/",
+            "/mnt",
+            DEFAULT_OPTIONS,
+        )
+
+    assert 0 != ex.value.exit_code
+    utils.assert_not_called(optimize_readahead_window_mock)
+
+
+def _record_durations(durations):
+    for duration in durations:
+        mount_efs.record_nfs_mount_duration(_get_config(), DNS_NAME, duration)
+
+
+def test_mount_nfs_records_duration(mocker):
+    mocker.patch("mount_efs.optimize_readahead_window")
+    mocker.patch("subprocess.Popen", side_effect=[common.DEFAULT_SUCCESS_POPEN.mock])
+
+    mount_efs.mount_nfs(_get_config(), DNS_NAME, "/", "/mnt", DEFAULT_OPTIONS)
+
+    assert len(mount_efs.read_nfs_mount_durations(DNS_NAME)) == 1
+
+
+def test_nfs_mount_history_keeps_recent_durations():
+    _record_durations(range(mount_efs.NFS_MOUNT_HISTORY_SIZE + 5))
+
+    durations = mount_efs.read_nfs_mount_durations(DNS_NAME)
+
+    assert len(durations) == mount_efs.NFS_MOUNT_HISTORY_SIZE
+    assert durations[-1] == mount_efs.NFS_MOUNT_HISTORY_SIZE + 4
+
+
+def test_get_nfs_mount_attempt_timeout_without_history():
+    assert mount_efs.get_nfs_mount_attempt_timeout([1.0, 1.0], 0, 15) == 15
+
+
+def test_get_nfs_mount_attempt_timeout_from_p99():
+    durations = [0.5] * 19 + [2.0]
+
+    assert mount_efs.get_nfs_mount_attempt_timeout(durations, 0, 15) == 6
+    assert mount_efs.get_nfs_mount_attempt_timeout(durations, 1, 15) == 12
+    assert mount_efs.get_nfs_mount_attempt_timeout(durations, 2, 15) == 15
+    assert (
+        mount_efs.get_nfs_mount_attempt_timeout([0.1] * 20, 0, 15)
+        == mount_efs.MIN_NFS_MOUNT_COMMAND_TIMEOUT_SEC
+    )
+
+
+def test_mount_nfs_uses_adaptive_timeout(mocker):
+    mocker.patch("mount_efs.optimize_readahead_window")
+    _record_durations([1.0] * mount_efs.NFS_MOUNT_HISTORY_MIN_SAMPLES)
+    success_popen = common.PopenMock(communicate_return_value=(b"", b"")).mock
+    mocker.patch("subprocess.Popen", side_effect=[success_popen])
+
+    mount_efs.mount_nfs(_get_config(), DNS_NAME, "/", "/mnt", DEFAULT_OPTIONS)
+
+    _, kwargs = success_popen.communicate.call_args
+    assert kwargs["timeout"] <= mount_efs.NFS_MOUNT_POLL_INTERVAL_SEC
+
+
+def test_classify_nfs_mount_failure():
+    assert mount_efs.classify_nfs_mount_failure(
+        b"mount.nfs4: Connection reset by peer"
+    ) == ("connection_reset", True)
+    assert mount_efs.classify_nfs_mount_failure(
+        b"mount.nfs4: Connection timed out"
+    ) == ("timeout", True)
+    assert mount_efs.classify_nfs_mount_failure(
+        b"mount.nfs4: access denied by server while mounting 127.0.0.1:/"
+    ) == ("access_denied", False)
+    assert mount_efs.classify_nfs_mount_failure(b"mount.nfs4: bad option") == (
+        "unknown",
+        False,
+    )
+
+
+def test_mount_nfs_retry_after_connection_refused(mocker):
+    optimize_readahead_window_mock = mocker.patch("mount_efs.optimize_readahead_window")
+    mocker.patch("time.sleep")
+    refused_popen = common.PopenMock(
+        return_code=1,
+        poll_result=1,
+        communicate_return_value=(b"", b"mount.nfs4: Connection refused"),
+    )
+    mocker.patch(
+        "subprocess.Popen",
+        side_effect=[refused_popen.mock, common.DEFAULT_SUCCESS_POPEN.mock],
+    )
+
+    mount_efs.mount_nfs(_get_config(), DNS_NAME, "/", "/mnt", DEFAULT_OPTIONS)
+
+    utils.assert_called(optimize_readahead_window_mock)
+
+
+def test_wait_for_nfs_mount_command_backend_unreachable(mocker):
+    proc = common.DEFAULT_TIMEOUT_POPEN.mock
+    measure_connect_rtt_mock = mocker.patch(
+        "mount_efs.measure_connect_rtt", return_value=None
+    )
+
+    out, err, abort_reason = mount_efs.wait_for_nfs_mount_command(
+        proc,
+        10,
+        backend_address=FALLBACK_IP_ADDRESS,
+        backend_probe_after_sec=0,
+    )
+
+    assert "%s cannot be connected" % FALLBACK_IP_ADDRESS == abort_reason
+    measure_connect_rtt_mock.assert_called_once_with(FALLBACK_IP_ADDRESS, None)
+
+
+def test_wait_for_nfs_mount_command_backend_reachable_until_timeout(mocker):
+    proc = common.DEFAULT_TIMEOUT_POPEN.mock
+    measure_connect_rtt_mock = mocker.patch(
+        "mount_efs.measure_connect_rtt", return_value=0.001
+    )
+
+    with pytest.raises(subprocess.TimeoutExpired):
+        mount_efs.wait_for_nfs_mount_command(
+            proc, 0.1, backend_address=FALLBACK_IP_ADDRESS, backend_probe_after_sec=0
+        )
+
+    utils.assert_called_once(measure_connect_rtt_mock)
+
+
+def test_mount_nfs_tunnel_exited_during_attempt(mocker):
+    optimize_readahead_window_mock = mocker.patch("mount_efs.optimize_readahead_window")
+    timeout_popen = common.PopenMock(
+        return_code=1,
+        poll_result=1,
+        communicate_side_effect=subprocess.TimeoutExpired("cmd", timeout=1),
+    )
+    mocker.patch("subprocess.Popen", side_effect=[timeout_popen.mock])
+    tunnel_proc = MagicMock()
+    tunnel_proc.poll.return_value = 1
+
+    with pytest.raises(mount_efs.TunnelError):
         mount_efs.mount_nfs(
             _get_config(),
             DNS_NAME,
             "/",
             "/mnt",
             DEFAULT_OPTIONS,
+            tunnel_proc=tunnel_proc,
         )
 
-    assert 0 != ex.value.code
+    utils.assert_called(timeout_popen.mock.kill)
     utils.assert_not_called(optimize_readahead_window_mock)
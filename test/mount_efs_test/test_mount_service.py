@@ -0,0 +1,219 @@
+#
+# Copyright 2017-2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+#
+# Licensed under the MIT License. See the LICENSE accompanying this file
+# for the specific language governing permissions and limitations under
+# the License.
+#
+
+import os
+import socket
+import sys
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+import mount_efs
+
+MOUNT_ARGS = ["mount.efs", "fs-deadbeef", "/mnt", "-o", "tls"]
+
+
+def _serve_once(socket_path, response=None):
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(1)
+    requests = []
+
+    def serve():
+        conn, _ = server.accept()
+        requests.append(mount_efs.receive_mount_service_message(conn))
+        if response is not None:
+            mount_efs.send_mount_service_message(conn, response)
+        conn.close()
+        server.close()
+
+    t = threading.Thread(target=serve)
+    t.start()
+    return t, requests
+
+
+def test_request_mount_from_service_no_daemon(tmpdir):
+    socket_path = str(tmpdir.join("mount.sock"))
+
+    assert mount_efs.request_mount_from_service(MOUNT_ARGS, socket_path) is None
+
+
+def test_request_mount_from_service_daemon_not_listening(tmpdir):
+    socket_path = str(tmpdir.join("mount.sock"))
+    stale_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale_socket.bind(socket_path)
+    stale_socket.close()
+
+    assert mount_efs.request_mount_from_service(MOUNT_ARGS, socket_path) is None
+
+
+def test_request_mount_from_service(tmpdir, capsys):
+    socket_path = str(tmpdir.join("mount.sock"))
+    t, requests = _serve_once(
+        socket_path, {"returncode": 32, "stdout": "out\n", "stderr": "err\n"}
+    )
+
+    returncode = mount_efs.request_mount_from_service(MOUNT_ARGS, socket_path)
+    t.join()
+
+    assert 32 == returncode
+    assert "mount" == requests[0]["action"]
+    assert MOUNT_ARGS == requests[0]["args"]
+    assert dict(os.environ) == requests[0]["env"]
+    assert mount_efs.get_mount_namespace() == requests[0]["mount_namespace"]
+    out, err = capsys.readouterr()
+    assert "out\n" == out
+    assert "err\n" == err
+
+
+def test_request_mount_from_service_relative_mountpoint(mocker, tmpdir):
+    mocker.patch("mount_efs.check_if_platform_is_mac", return_value=False)
+    socket_path = str(tmpdir.join("mount.sock"))
+    t, requests = _serve_once(socket_path, {"returncode": 0})
+
+    with tmpdir.as_cwd():
+        mount_efs.request_mount_from_service(
+            ["mount.efs", "fs-deadbeef", "mnt", "-o", "tls"], socket_path
+        )
+    t.join()
+
+    assert str(tmpdir.join("mnt")) == requests[0]["args"][2]
+
+
+def test_request_mount_from_service_other_mount_namespace(tmpdir):
+    socket_path = str(tmpdir.join("mount.sock"))
+    t, _ = _serve_once(socket_path, {"returncode": 0, "standalone": True})
+
+    returncode = mount_efs.request_mount_from_service(MOUNT_ARGS, socket_path)
+    t.join()
+
+    assert returncode is None
+
+
+def test_request_mount_from_service_connection_lost(tmpdir, capsys):
+    socket_path = str(tmpdir.join("mount.sock"))
+    t, requests = _serve_once(socket_path)
+
+    returncode = mount_efs.request_mount_from_service(MOUNT_ARGS, socket_path)
+    t.join()
+
+    assert 1 == returncode
+    assert 1 == len(requests)
+    assert "may or may not be mounted" in capsys.readouterr().err
+
+
+def _handle_request(mocker, request):
+    mocker.patch.dict(os.environ)
+    client, server = socket.socketpair()
+    try:
+        mount_efs.send_mount_service_message(client, request)
+        mount_efs.handle_mount_service_request(MagicMock(), server)
+        return mount_efs.receive_mount_service_message(client)
+    finally:
+        client.close()
+        server.close()
+
+
+def test_handle_mount_service_request_mount_failure(mocker):
+    def mount_from_arguments(config, args):
+        assert "us-west-2" == os.environ["AWS_REGION"]
+        sys.stderr.write("mount failed\n")
+        sys.exit(1)
+
+    mount_mock = mocker.patch(
+        "mount_efs.mount_from_arguments", side_effect=mount_from_arguments
+    )
+
+    response = _handle_request(
+        mocker,
+        {"action": "mount", "args": MOUNT_ARGS, "env": {"AWS_REGION": "us-west-2"}},
+    )
+
+    assert MOUNT_ARGS == mount_mock.call_args[0][1]
+    assert 1 == response["returncode"]
+    assert "mount failed\n" == response["stderr"]
+
+
+def test_handle_mount_service_request_mount_success(mocker):
+    mocker.patch("mount_efs.mount_from_arguments")
+
+    response = _handle_request(
+        mocker, {"action": "mount", "args": MOUNT_ARGS, "env": {}}
+    )
+
+    assert 0 == response["returncode"]
+
+
+def test_handle_mount_service_request_same_mount_namespace(mocker):
+    mocker.patch("mount_efs.get_mount_namespace", return_value="mnt:[4026531840]")
+    mount_mock = mocker.patch("mount_efs.mount_from_arguments")
+
+    response = _handle_request(
+        mocker,
+        {
+            "action": "mount",
+            "args": MOUNT_ARGS,
+            "env": {},
+            "mount_namespace": "mnt:[4026531840]",
+        },
+    )
+
+    assert 1 == mount_mock.call_count
+    assert 0 == response["returncode"]
+    assert "standalone" not in response
+
+
+def test_handle_mount_service_request_other_mount_namespace(mocker):
+    mocker.patch("mount_efs.get_mount_namespace", return_value="mnt:[4026531840]")
+    mount_mock = mocker.patch("mount_efs.mount_from_arguments")
+
+    response = _handle_request(
+        mocker,
+        {
+            "action": "mount",
+            "args": MOUNT_ARGS,
+            "env": {},
+            "mount_namespace": "mnt:[4026532318]",
+        },
+    )
+
+    mount_mock.assert_not_called()
+    assert response["standalone"]
+
+
+def test_handle_mount_service_request_unmount(mocker):
+    unmount_mock = mocker.patch("mount_efs.unmount_for_service_request", return_value=0)
+
+    response = _handle_request(
+        mocker, {"action": "unmount", "mountpoint": "/mnt", "env": {}}
+    )
+
+    unmount_mock.assert_called_once_with("/mnt")
+    assert 0 == response["returncode"]
+
+
+def test_handle_mount_service_request_unsupported_action(mocker):
+    response = _handle_request(mocker, {"action": "remount", "env": {}})
+
+    assert 1 == response["returncode"]
+    assert "remount" in response["stderr"]
+
+
+def test_main_uses_mount_service(mocker):
+    mocker.patch("os.geteuid", return_value=0)
+    mocker.patch("mount_efs.bootstrap_logging")
+    mocker.patch("mount_efs.request_mount_from_service", return_value=0)
+    mount_mock = mocker.patch("mount_efs.mount_from_arguments")
+
+    with pytest.raises(SystemExit) as ex:
+        mount_efs.main()
+
+    assert 0 == ex.value.code
+
+    mount_mock.assert_not_called()
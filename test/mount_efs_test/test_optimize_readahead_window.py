@@ -5,9 +5,12 @@
 # for the specific language governing permissions and limitations under
 # the License.
 #
+import json
 import os
 import subprocess
 
+import pytest
+
 import mount_efs
 
 from .. import utils
@@ -31,6 +34,11 @@ DEFAULT_OPTIONS = {
 DEFAULT_MOUNT_DEVICE_NUMBER = 1048761
 
 
+@pytest.fixture(autouse=True)
+def setup(mocker, tmpdir):
+    mocker.patch("mount_efs.STATE_FILE_DIR", str(tmpdir.join("state")))
+
+
 def _get_new_mock_config(
     enable_optimize_readahead, has_readahead_optimization_item_in_config=True
 ):
@@ -123,6 +131,7 @@ def test_device_number_parsing():
 def test_optimize_readahead_should_not_apply(mocker):
     mock_config = _get_new_mock_config(True)
     _mock_should_revise_readahead(mocker, False)
+    mocker.patch("mount_efs.record_readahead_settings")
     stat_mock_call = mocker.patch("os.stat")
     mount_efs.optimize_readahead_window(MOUNT_POINT, DEFAULT_OPTIONS, mock_config)
     utils.assert_not_called(stat_mock_call)
@@ -185,6 +194,93 @@ def test_optimize_readahead_should_apply_failed_with_exception(mocker, tmpdir):
     )
 
 
+def _mock_readahead_config_file(mocker, tmpdir):
+    mocker.patch(
+        "mount_efs.NFS_READAHEAD_CONFIG_PATH_FORMAT",
+        str(tmpdir) + "/%s:%s/read_ahead_kb",
+    )
+    mocker.patch(
+        "os.stat",
+        return_value=generate_os_stat_result(st_dev=DEFAULT_MOUNT_DEVICE_NUMBER),
+    )
+    major, minor = mount_efs.decode_device_number(DEFAULT_MOUNT_DEVICE_NUMBER)
+    os.mkdir(str(tmpdir) + "/%s:%s" % (major, minor))
+    return str(tmpdir) + "/%s:%s/read_ahead_kb" % (major, minor)
+
+
+def test_optimize_readahead_with_readahead_kb_option(mocker, tmpdir):
+    mock_config = _get_new_mock_config(enable_optimize_readahead=False)
+    mocker.patch("platform.system", return_value="Linux")
+    _mock_should_revise_readahead(mocker, False)
+    read_ahead_kb_config_file = _mock_readahead_config_file(mocker, tmpdir)
+    options = dict(DEFAULT_OPTIONS, readahead_kb="4096")
+
+    mount_efs.optimize_readahead_window(MOUNT_POINT, options, mock_config)
+
+    with open(read_ahead_kb_config_file) as f:
+        assert 4096 == int(f.read())
+
+
+def test_optimize_readahead_value_not_applied(mocker, tmpdir):
+    mock_config = _get_new_mock_config(enable_optimize_readahead=True)
+    mocker.patch("platform.system", return_value="Linux")
+    _mock_should_revise_readahead(mocker, True)
+    _mock_readahead_config_file(mocker, tmpdir)
+    mocker.patch("mount_efs.write_readahead_kb", return_value=128)
+    mock_log_warning = mocker.patch("logging.warning")
+
+    mount_efs.optimize_readahead_window(MOUNT_POINT, DEFAULT_OPTIONS, mock_config)
+
+    args = mock_log_warning.call_args[0]
+    assert "after setting it to" in args[0]
+    assert 128 == args[2]
+
+
+def test_optimize_readahead_records_settings(mocker):
+    mock_config = _get_new_mock_config(enable_optimize_readahead=False)
+    mocker.patch("platform.system", return_value="Linux")
+    _mock_should_revise_readahead(mocker, False)
+    options = dict(DEFAULT_OPTIONS, readahead_kb="2048")
+
+    mount_efs.optimize_readahead_window("/mnt/data", options, mock_config)
+
+    with open(mount_efs.get_readahead_settings_path("/mnt/data")) as f:
+        settings = json.load(f)
+    assert {
+        "mountpoint": "/mnt/data",
+        "rsize": DEFAULT_OPTIONS["rsize"],
+        "readahead_kb": 2048,
+    } == settings
+
+
+def test_optimize_readahead_not_linux(mocker):
+    mocker.patch("platform.system", return_value="Darwin")
+    write_mock = mocker.patch("mount_efs.write_readahead_kb")
+
+    mount_efs.optimize_readahead_window(
+        MOUNT_POINT, dict(DEFAULT_OPTIONS, readahead_kb="2048"), None
+    )
+
+    utils.assert_not_called(write_mock)
+    assert not os.path.exists(mount_efs.get_readahead_settings_path(MOUNT_POINT))
+
+
+def test_readahead_kb_option_not_integer(capsys):
+    with pytest.raises(mount_efs.MountOptionsError):
+        mount_efs.check_options_validity({"readahead_kb": "big"})
+
+    assert "readahead_kb option [big]" in capsys.readouterr().err
+
+
+def test_readahead_kb_option_negative():
+    with pytest.raises(mount_efs.MountOptionsError):
+        mount_efs.check_options_validity({"readahead_kb": "-1"})
+
+
+def test_readahead_kb_option_not_passed_to_nfs():
+    assert "readahead_kb" in mount_efs.EFS_ONLY_OPTIONS
+
+
 def generate_os_stat_result(
     st_mode=0,
     st_ino=0,
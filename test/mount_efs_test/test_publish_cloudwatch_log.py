@@ -4,8 +4,10 @@
 # for the specific language governing permissions and limitations under
 # the License.
 
+import time
 from unittest.mock import MagicMock
 
+import pytest
 from botocore.exceptions import ClientError, NoCredentialsError
 
 import mount_efs
@@ -31,6 +33,12 @@ MOCK_AGENT = {
 }
 
 
+@pytest.fixture(autouse=True)
+def setup(mocker):
+    mount_efs.BOTOCORE_SESSIONS.clear()
+    mount_efs.BOTOCORE_CLIENTS.clear()
+
+
 def _get_mock_config(enabled, log_group_name, retention_in_days):
     def config_get_side_effect(section, field):
         if section == mount_efs.CLOUDWATCH_LOG_SECTION and field == "log_group_name":
@@ -145,24 +153,22 @@ def test_botocore_not_called_when_feature_not_enabled(mocker):
     assert cloudwatchlog_agent == None
 
 
-# When config set enabled = true, call the bootstrap_cloudwatch_logging, the get_botocore_client is called
-def test_cloudwatchlog_agent_none_when_botocore_agent_is_none(mocker):
-    config = _get_mock_config(
-        DEFAULT_CLOUDWATCH_ENABLED, DEFAULT_CLOUDWATCH_LOG_GROUP, DEFAULT_RETENTION_DAYS
-    )
-    get_botocore_client_mock = mocker.patch(
-        "mount_efs.get_botocore_client", return_value=None
-    )
-    cloudwatchlog_agent = mount_efs.bootstrap_cloudwatch_logging(config, {}, FS_ID)
-    utils.assert_called_once(get_botocore_client_mock)
-
-    assert cloudwatchlog_agent == None
-
-
 """
 bootstrap cloud watch log unit tests
 """
 
+MOCK_CLOUDWATCHLOG_CONFIG = {
+    "log_group_name": DEFAULT_CLOUDWATCH_LOG_GROUP,
+    "log_stream_name": DEFAULT_CLOUDWATCH_LOG_STREAM,
+    "retention_days": DEFAULT_RETENTION_DAYS,
+}
+
+
+def _get_state_dir_config():
+    config = ConfigParser()
+    config.add_section(mount_efs.CONFIG_SECTION)
+    return config
+
 
 def test_bootstrap_cloudwatch_log(mocker):
     config = _get_mock_config(
@@ -172,35 +178,29 @@ def test_bootstrap_cloudwatch_log(mocker):
         "mount_efs.get_instance_identity_info_from_instance_metadata",
         return_value=INSTANCE,
     )
-    get_botocore_client_mock = mocker.patch(
-        "mount_efs.get_botocore_client", return_value="fake-agent"
-    )
-    create_log_group_mock = mocker.patch(
-        "mount_efs.create_cloudwatch_log_group", return_value=True
-    )
-    put_retention_policy_mock = mocker.patch(
-        "mount_efs.put_cloudwatch_log_retention_policy", return_value=True
+    provision_mock = mocker.patch(
+        "mount_efs.provision_cloudwatch_logging", return_value="fake-agent"
     )
-    create_log_stream_mock = mocker.patch(
-        "mount_efs.create_cloudwatch_log_stream", return_value=True
+    put_log_events_mock = mocker.patch(
+        "mount_efs.put_cloudwatch_log_events", return_value=True
     )
 
     cloudwatchlog_agent = mount_efs.bootstrap_cloudwatch_logging(config, {}, FS_ID)
-    utils.assert_called_once(get_botocore_client_mock)
-    utils.assert_called_once(create_log_group_mock)
-    utils.assert_called_once(put_retention_policy_mock)
-    utils.assert_called_once(create_log_stream_mock)
+    shipper = cloudwatchlog_agent["shipper"]
+    assert isinstance(shipper, mount_efs.CloudWatchLogShipper)
+    assert shipper.cloudwatchlog_agent is cloudwatchlog_agent
+
+    assert mount_efs.publish_cloudwatch_log(cloudwatchlog_agent, "Test")
+    assert shipper.flush()
 
+    provision_mock.assert_called_once_with(config, {}, MOCK_CLOUDWATCHLOG_CONFIG)
+    utils.assert_called_once(put_log_events_mock)
+    cloudwatchlog_agent.pop("shipper")
     assert cloudwatchlog_agent == MOCK_AGENT
 
 
 def test_bootstrap_cloudwatch_log_with_fs_id_template(mocker):
     log_group = DEFAULT_CLOUDWATCH_LOG_GROUP + "/{fs_id}"
-    expected_agent = {
-        "client": "fake-agent",
-        "log_group_name": log_group.format(fs_id=FS_ID),
-        "log_stream_name": "%s - %s - mount.log" % (FS_ID, INSTANCE),
-    }
 
     config = _get_mock_config(
         DEFAULT_CLOUDWATCH_ENABLED, log_group, DEFAULT_RETENTION_DAYS
@@ -209,28 +209,15 @@ def test_bootstrap_cloudwatch_log_with_fs_id_template(mocker):
         "mount_efs.get_instance_identity_info_from_instance_metadata",
         return_value=INSTANCE,
     )
-    get_botocore_client_mock = mocker.patch(
-        "mount_efs.get_botocore_client", return_value="fake-agent"
-    )
-    create_log_group_mock = mocker.patch(
-        "mount_efs.create_cloudwatch_log_group", return_value=True
-    )
-    put_retention_policy_mock = mocker.patch(
-        "mount_efs.put_cloudwatch_log_retention_policy", return_value=True
-    )
-    create_log_stream_mock = mocker.patch(
-        "mount_efs.create_cloudwatch_log_stream", return_value=True
-    )
+    mocker.patch("mount_efs.provision_cloudwatch_logging", return_value=None)
+
     cloudwatchlog_agent = mount_efs.bootstrap_cloudwatch_logging(config, {}, FS_ID)
-    utils.assert_called_once(get_botocore_client_mock)
-    utils.assert_called_once(create_log_group_mock)
-    utils.assert_called_once(put_retention_policy_mock)
-    utils.assert_called_once(create_log_stream_mock)
 
-    assert cloudwatchlog_agent == expected_agent
+    assert cloudwatchlog_agent["log_group_name"] == log_group.format(fs_id=FS_ID)
+    assert cloudwatchlog_agent["log_stream_name"] == DEFAULT_CLOUDWATCH_LOG_STREAM
 
 
-def test_bootstrap_cloudwatch_log_create_log_group_failed(mocker):
+def test_bootstrap_cloudwatch_log_provision_failed(mocker):
     config = _get_mock_config(
         DEFAULT_CLOUDWATCH_ENABLED, DEFAULT_CLOUDWATCH_LOG_GROUP, DEFAULT_RETENTION_DAYS
     )
@@ -238,27 +225,18 @@ def test_bootstrap_cloudwatch_log_create_log_group_failed(mocker):
         "mount_efs.get_instance_identity_info_from_instance_metadata",
         return_value=INSTANCE,
     )
-    get_botocore_client_mock = mocker.patch(
-        "mount_efs.get_botocore_client", return_value="fake-agent"
-    )
-    create_log_group_mock = mocker.patch(
-        "mount_efs.create_cloudwatch_log_group", return_value=False
-    )
-    put_retention_policy_mock = mocker.patch(
-        "mount_efs.put_cloudwatch_log_retention_policy"
-    )
-    create_log_stream_mock = mocker.patch("mount_efs.create_cloudwatch_log_stream")
+    mocker.patch("mount_efs.provision_cloudwatch_logging", return_value=None)
+    put_log_events_mock = mocker.patch("mount_efs.put_cloudwatch_log_events")
 
     cloudwatchlog_agent = mount_efs.bootstrap_cloudwatch_logging(config, {}, FS_ID)
-    utils.assert_called_once(get_botocore_client_mock)
-    utils.assert_called_once(create_log_group_mock)
-    utils.assert_not_called(put_retention_policy_mock)
-    utils.assert_not_called(create_log_stream_mock)
+    assert mount_efs.publish_cloudwatch_log(cloudwatchlog_agent, "Test")
+    assert cloudwatchlog_agent["shipper"].flush()
 
-    assert cloudwatchlog_agent == None
+    utils.assert_not_called(put_log_events_mock)
+    assert cloudwatchlog_agent["client"] == None
 
 
-def test_bootstrap_cloudwatch_log_put_retention_days_failed(mocker):
+def test_bootstrap_cloudwatch_log_provision_mount_error(mocker, capsys):
     config = _get_mock_config(
         DEFAULT_CLOUDWATCH_ENABLED, DEFAULT_CLOUDWATCH_LOG_GROUP, DEFAULT_RETENTION_DAYS
     )
@@ -266,54 +244,179 @@ def test_bootstrap_cloudwatch_log_put_retention_days_failed(mocker):
         "mount_efs.get_instance_identity_info_from_instance_metadata",
         return_value=INSTANCE,
     )
+    mocker.patch(
+        "mount_efs.provision_cloudwatch_logging",
+        side_effect=lambda *args: mount_efs.fatal_error(
+            "Error retrieving region", error=mount_efs.TargetResolutionError
+        ),
+    )
+    put_log_events_mock = mocker.patch("mount_efs.put_cloudwatch_log_events")
+
+    cloudwatchlog_agent = mount_efs.bootstrap_cloudwatch_logging(config, {}, FS_ID)
+    assert mount_efs.publish_cloudwatch_log(cloudwatchlog_agent, "Test")
+
+    start = time.time()
+    assert cloudwatchlog_agent["shipper"].flush()
+    assert time.time() - start < 1
+
+    utils.assert_not_called(put_log_events_mock)
+    assert cloudwatchlog_agent["client"] == None
+    assert "" == capsys.readouterr().err
+    assert cloudwatchlog_agent["shipper"]._thread.is_alive()
+
+
+def _mock_provision_steps(
+    mocker, provisioned=False, group=True, retention=True, stream=True
+):
+    mocks = {
+        "is_provisioned": mocker.patch(
+            "mount_efs.is_cloudwatch_log_provisioned", return_value=provisioned
+        ),
+        "mark_provisioned": mocker.patch("mount_efs.mark_cloudwatch_log_provisioned"),
+        "create_log_group": mocker.patch(
+            "mount_efs.create_cloudwatch_log_group", return_value=group
+        ),
+        "put_retention_policy": mocker.patch(
+            "mount_efs.put_cloudwatch_log_retention_policy", return_value=retention
+        ),
+        "create_log_stream": mocker.patch(
+            "mount_efs.create_cloudwatch_log_stream", return_value=stream
+        ),
+    }
+    mocker.patch("mount_efs.get_botocore_client", return_value="fake-agent")
+    return mocks
+
+
+def test_provision_cloudwatch_logging_none_when_botocore_agent_is_none(mocker):
     get_botocore_client_mock = mocker.patch(
-        "mount_efs.get_botocore_client", return_value="fake-agent"
+        "mount_efs.get_botocore_client", return_value=None
     )
-    create_log_group_mock = mocker.patch(
-        "mount_efs.create_cloudwatch_log_group", return_value=True
+    client = mount_efs.provision_cloudwatch_logging(
+        MagicMock(), {}, MOCK_CLOUDWATCHLOG_CONFIG
     )
-    put_retention_policy_mock = mocker.patch(
-        "mount_efs.put_cloudwatch_log_retention_policy", return_value=False
+    utils.assert_called_once(get_botocore_client_mock)
+
+    assert client == None
+
+
+def test_provision_cloudwatch_logging(mocker):
+    mocks = _mock_provision_steps(mocker)
+
+    client = mount_efs.provision_cloudwatch_logging(
+        MagicMock(), {}, MOCK_CLOUDWATCHLOG_CONFIG
     )
-    create_log_stream_mock = mocker.patch("mount_efs.create_cloudwatch_log_stream")
 
-    cloudwatchlog_agent = mount_efs.bootstrap_cloudwatch_logging(config, {}, FS_ID)
-    utils.assert_called_once(get_botocore_client_mock)
-    utils.assert_called_once(create_log_group_mock)
-    utils.assert_called_once(put_retention_policy_mock)
-    utils.assert_not_called(create_log_stream_mock)
+    for name in ("create_log_group", "put_retention_policy", "create_log_stream"):
+        utils.assert_called_once(mocks[name])
+    utils.assert_called_once(mocks["mark_provisioned"])
+    assert client == "fake-agent"
 
-    assert cloudwatchlog_agent == None
 
+def test_provision_cloudwatch_logging_already_provisioned(mocker):
+    mocks = _mock_provision_steps(mocker, provisioned=True)
 
-def test_bootstrap_cloudwatch_log_create_log_stream_failed(mocker):
-    config = _get_mock_config(
-        DEFAULT_CLOUDWATCH_ENABLED, DEFAULT_CLOUDWATCH_LOG_GROUP, DEFAULT_RETENTION_DAYS
+    client = mount_efs.provision_cloudwatch_logging(
+        MagicMock(), {}, MOCK_CLOUDWATCHLOG_CONFIG
     )
-    mocker.patch(
-        "mount_efs.get_instance_identity_info_from_instance_metadata",
-        return_value=INSTANCE,
+
+    for name in (
+        "create_log_group",
+        "put_retention_policy",
+        "create_log_stream",
+        "mark_provisioned",
+    ):
+        utils.assert_not_called(mocks[name])
+    assert client == "fake-agent"
+
+
+def test_provision_cloudwatch_logging_create_log_group_failed(mocker):
+    mocks = _mock_provision_steps(mocker, group=False)
+
+    client = mount_efs.provision_cloudwatch_logging(
+        MagicMock(), {}, MOCK_CLOUDWATCHLOG_CONFIG
     )
-    get_botocore_client_mock = mocker.patch(
-        "mount_efs.get_botocore_client", return_value="fake-agent"
+    utils.assert_called_once(mocks["create_log_group"])
+    utils.assert_not_called(mocks["put_retention_policy"])
+    utils.assert_not_called(mocks["create_log_stream"])
+    utils.assert_not_called(mocks["mark_provisioned"])
+
+    assert client == None
+
+
+def test_provision_cloudwatch_logging_put_retention_days_failed(mocker):
+    mocks = _mock_provision_steps(mocker, retention=False)
+
+    client = mount_efs.provision_cloudwatch_logging(
+        MagicMock(), {}, MOCK_CLOUDWATCHLOG_CONFIG
     )
-    create_log_group_mock = mocker.patch(
-        "mount_efs.create_cloudwatch_log_group", return_value=True
+    utils.assert_called_once(mocks["create_log_group"])
+    utils.assert_called_once(mocks["put_retention_policy"])
+    utils.assert_not_called(mocks["create_log_stream"])
+    utils.assert_not_called(mocks["mark_provisioned"])
+
+    assert client == None
+
+
+def test_provision_cloudwatch_logging_create_log_stream_failed(mocker):
+    mocks = _mock_provision_steps(mocker, stream=False)
+
+    client = mount_efs.provision_cloudwatch_logging(
+        MagicMock(), {}, MOCK_CLOUDWATCHLOG_CONFIG
     )
-    put_retention_policy_mock = mocker.patch(
-        "mount_efs.put_cloudwatch_log_retention_policy", return_value=True
+    utils.assert_called_once(mocks["create_log_group"])
+    utils.assert_called_once(mocks["put_retention_policy"])
+    utils.assert_called_once(mocks["create_log_stream"])
+    utils.assert_not_called(mocks["mark_provisioned"])
+
+    assert client == None
+
+
+def test_cloudwatch_log_provisioned_marker(tmpdir):
+    state_file_dir = str(tmpdir)
+    assert not mount_efs.is_cloudwatch_log_provisioned(
+        DEFAULT_CLOUDWATCH_LOG_GROUP, DEFAULT_CLOUDWATCH_LOG_STREAM, 14, state_file_dir
     )
-    create_log_stream_mock = mocker.patch(
-        "mount_efs.create_cloudwatch_log_stream", return_value=False
+
+    mount_efs.mark_cloudwatch_log_provisioned(
+        _get_state_dir_config(),
+        DEFAULT_CLOUDWATCH_LOG_GROUP,
+        DEFAULT_CLOUDWATCH_LOG_STREAM,
+        14,
+        state_file_dir,
     )
 
-    cloudwatchlog_agent = mount_efs.bootstrap_cloudwatch_logging(config, {}, FS_ID)
-    utils.assert_called_once(get_botocore_client_mock)
-    utils.assert_called_once(create_log_group_mock)
-    utils.assert_called_once(put_retention_policy_mock)
-    utils.assert_called_once(create_log_stream_mock)
+    assert mount_efs.is_cloudwatch_log_provisioned(
+        DEFAULT_CLOUDWATCH_LOG_GROUP, DEFAULT_CLOUDWATCH_LOG_STREAM, 14, state_file_dir
+    )
+    assert not mount_efs.is_cloudwatch_log_provisioned(
+        DEFAULT_CLOUDWATCH_LOG_GROUP, DEFAULT_CLOUDWATCH_LOG_STREAM, 30, state_file_dir
+    )
+    assert not mount_efs.is_cloudwatch_log_provisioned(
+        DEFAULT_CLOUDWATCH_LOG_GROUP, "other stream", 14, state_file_dir
+    )
 
-    assert cloudwatchlog_agent == None
+    mount_efs.invalidate_cloudwatch_log_provisioned_marker(MOCK_AGENT, state_file_dir)
+    assert not mount_efs.is_cloudwatch_log_provisioned(
+        DEFAULT_CLOUDWATCH_LOG_GROUP, DEFAULT_CLOUDWATCH_LOG_STREAM, 14, state_file_dir
+    )
+
+
+def test_cloudwatch_log_provisioned_marker_expired(mocker, tmpdir):
+    state_file_dir = str(tmpdir)
+    mount_efs.mark_cloudwatch_log_provisioned(
+        _get_state_dir_config(),
+        DEFAULT_CLOUDWATCH_LOG_GROUP,
+        DEFAULT_CLOUDWATCH_LOG_STREAM,
+        14,
+        state_file_dir,
+    )
+
+    mocker.patch(
+        "time.time", return_value=mount_efs.CLOUDWATCH_LOG_PROVISIONED_TTL_SEC * 2
+    )
+    assert not mount_efs.is_cloudwatch_log_provisioned(
+        DEFAULT_CLOUDWATCH_LOG_GROUP, DEFAULT_CLOUDWATCH_LOG_STREAM, 14, state_file_dir
+    )
 
 
 """
@@ -538,7 +641,6 @@ def _test_put_log_events_client_error(mocker, exception, desired_result=False):
     operation_name = "PutLogEvents"
     response = {"Error": {"Code": exception, "Message": exception}}
 
-    mocker.patch("mount_efs.get_log_stream_next_token", return_value="ABCDEF")
     mocker.patch(
         "mount_efs.cloudwatch_put_log_events_helper",
         side_effect=[ClientError(response, operation_name)],
@@ -548,7 +650,6 @@ def _test_put_log_events_client_error(mocker, exception, desired_result=False):
 
 
 def test_put_log_events_no_credentials_error(mocker):
-    mocker.patch("mount_efs.get_log_stream_next_token", return_value="ABCDEF")
     mocker.patch(
         "mount_efs.cloudwatch_put_log_events_helper", side_effect=[NoCredentialsError()]
     )
@@ -557,7 +658,11 @@ def test_put_log_events_no_credentials_error(mocker):
 
 
 def test_put_log_events_resource_not_found(mocker):
+    invalidate_mock = mocker.patch(
+        "mount_efs.invalidate_cloudwatch_log_provisioned_marker"
+    )
     _test_put_log_events_client_error(mocker, "ResourceNotFoundException")
+    invalidate_mock.assert_called_once_with(MOCK_AGENT)
 
 
 def test_put_log_events_invalid_sequence_token(mocker):
@@ -589,77 +694,101 @@ def test_put_log_events_unexpected_client_error(mocker):
 
 
 """
-describe_log_stream api call exception unit tests
+cloudwatch log shipper unit tests
 """
 
 
-def _test_get_log_stream_next_token_client_error(
-    mocker, exception, desired_result=None
-):
-    operation_name = "DescribeLogStream"
-    response = {"Error": {"Code": exception, "Message": exception}}
+def _get_shipper_agent(put_log_events_side_effect=None):
+    client = MagicMock()
+    client.put_log_events.side_effect = put_log_events_side_effect
+    agent = dict(MOCK_AGENT, client=client)
+    agent["shipper"] = mount_efs.CloudWatchLogShipper(agent, flush_timeout=5)
+    return agent
 
-    mocker.patch(
-        "mount_efs.cloudwatch_describe_log_streams_helper",
-        side_effect=[ClientError(response, operation_name)],
-    )
-    token = mount_efs.get_log_stream_next_token(MOCK_AGENT)
-    assert token == desired_result
 
+def test_publish_cloudwatch_log_with_shipper_batches_messages(mocker):
+    agent = _get_shipper_agent()
 
-def test_get_log_stream_next_token_no_credentials_error(mocker):
-    mocker.patch(
-        "mount_efs.cloudwatch_describe_log_streams_helper",
-        side_effect=[NoCredentialsError()],
-    )
-    token = mount_efs.get_log_stream_next_token(MOCK_AGENT)
-    assert token == None
+    for i in range(3):
+        assert mount_efs.publish_cloudwatch_log(agent, "message %d" % i)
+    assert agent["shipper"].flush()
 
+    put_log_events = agent["client"].put_log_events
+    sent_messages = [
+        event["message"]
+        for call in put_log_events.call_args_list
+        for event in call[1]["logEvents"]
+    ]
+    assert sent_messages == ["message 0", "message 1", "message 2"]
+    for call in put_log_events.call_args_list:
+        assert "sequenceToken" not in call[1]
+        assert call[1]["logGroupName"] == MOCK_AGENT["log_group_name"]
+        assert call[1]["logStreamName"] == MOCK_AGENT["log_stream_name"]
 
-def test_get_log_stream_next_token_resource_not_found(mocker):
-    _test_put_log_events_client_error(mocker, "ResourceNotFoundException")
 
+def test_publish_cloudwatch_log_with_shipper_put_failure(mocker):
+    agent = _get_shipper_agent(NoCredentialsError())
 
-def test_get_log_stream_next_token_invalid_parameter(mocker):
-    _test_get_log_stream_next_token_client_error(mocker, "InvalidParameterException")
+    assert mount_efs.publish_cloudwatch_log(agent, "message")
+    assert agent["shipper"].flush()
+    utils.assert_called_once(agent["client"].put_log_events)
 
 
-def test_get_log_stream_next_token_service_unavailable_exception(mocker):
-    _test_get_log_stream_next_token_client_error(mocker, "ServiceUnavailableException")
+def test_publish_cloudwatch_log_with_shipper_queue_full(mocker):
+    agent = dict(MOCK_AGENT)
+    shipper = mount_efs.CloudWatchLogShipper(agent, queue_size=1)
+    mocker.patch.object(shipper, "_ensure_running")
+    agent["shipper"] = shipper
 
+    assert mount_efs.publish_cloudwatch_log(agent, "first")
+    assert not mount_efs.publish_cloudwatch_log(agent, "second")
+    assert shipper.dropped_count == 1
 
-def test_get_log_stream_next_token_access_denied_exception(mocker):
-    _test_get_log_stream_next_token_client_error(mocker, "AccessDeniedException")
 
+def test_cloudwatch_log_shipper_flush_timeout(mocker):
+    shipper = mount_efs.CloudWatchLogShipper(dict(MOCK_AGENT))
+    mocker.patch.object(shipper, "_ensure_running")
 
-def test_get_log_stream_next_token_unexpected_client_error(mocker):
-    _test_get_log_stream_next_token_client_error(mocker, "Unknown exception")
+    shipper.publish("never sent")
+    assert not shipper.flush(timeout=0.01)
 
 
-def _test_get_log_stream_token_response(mocker, response, desired_token=None):
-    mocker.patch(
-        "mount_efs.cloudwatch_describe_log_streams_helper", return_value=response
-    )
-    token = mount_efs.get_log_stream_next_token(MOCK_AGENT)
-    assert token == desired_token
+def test_batch_cloudwatch_log_events_count_limit(mocker):
+    mocker.patch("mount_efs.CLOUDWATCH_LOG_MAX_BATCH_EVENTS", 2)
+    events = [mount_efs.make_cloudwatch_log_event("m", i) for i in range(5)]
 
+    batches = list(mount_efs.batch_cloudwatch_log_events(events))
 
-def test_get_log_stream_token_index_error(mocker):
-    response = {"logStreams": []}
-    _test_get_log_stream_token_response(mocker, response)
+    assert [len(batch) for batch in batches] == [2, 2, 1]
 
 
-def test_get_log_stream_token_key_error(mocker):
-    response = {}
-    _test_get_log_stream_token_response(mocker, response)
+def test_batch_cloudwatch_log_events_size_limit(mocker):
+    message = "x" * (100 - mount_efs.CLOUDWATCH_LOG_EVENT_OVERHEAD_BYTES)
+    mocker.patch("mount_efs.CLOUDWATCH_LOG_MAX_BATCH_BYTES", 250)
+    events = [mount_efs.make_cloudwatch_log_event(message, i) for i in range(5)]
 
+    batches = list(mount_efs.batch_cloudwatch_log_events(events))
 
-def test_get_log_stream_token_type_error(mocker):
-    response = None
-    _test_get_log_stream_token_response(mocker, response)
+    assert [len(batch) for batch in batches] == [2, 2, 1]
 
 
-def test_get_log_stream_token_return_correct(mocker):
-    token = "ABCDEF"
-    response = {"logStreams": [{"uploadSequenceToken": token}]}
-    _test_get_log_stream_token_response(mocker, response, token)
+def test_batch_cloudwatch_log_events_sorted_by_timestamp():
+    events = [
+        mount_efs.make_cloudwatch_log_event("second", 2),
+        mount_efs.make_cloudwatch_log_event("first", 1),
+    ]
+
+    batches = list(mount_efs.batch_cloudwatch_log_events(events))
+
+    assert [event["message"] for event in batches[0]] == ["first", "second"]
+
+
+def test_make_cloudwatch_log_event_truncates_message():
+    event = mount_efs.make_cloudwatch_log_event(
+        "x" * (mount_efs.CLOUDWATCH_LOG_MAX_EVENT_BYTES + 1), 0
+    )
+
+    assert (
+        mount_efs.get_cloudwatch_log_event_size(event)
+        == mount_efs.CLOUDWATCH_LOG_MAX_EVENT_BYTES
+    )
@@ -0,0 +1,187 @@
+# Copyright 2017-2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+#
+# Licensed under the MIT License. See the LICENSE accompanying this file
+# for the specific language governing permissions and limitations under
+# the License.
+
+import socket
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+import mount_efs
+
+DNS_NAME = "fs-deadbeef.efs.us-east-1.amazonaws.com"
+IPV4_ADDRESS = "192.0.2.1"
+IPV6_ADDRESS = "2001:db8::1"
+NETNS = "/proc/1000/ns/net"
+
+
+@pytest.fixture(autouse=True)
+def setup(mocker, tmpdir):
+    mocker.patch("mount_efs.STATE_FILE_DIR", str(tmpdir))
+    mount_efs.DNS_CACHE.clear()
+
+
+def _getaddrinfo(name, port, family):
+    address = IPV4_ADDRESS if family == socket.AF_INET else IPV6_ADDRESS
+    return [(family, socket.SOCK_STREAM, 6, "", (address, 0))]
+
+
+def test_resolve_addresses(mocker):
+    getaddrinfo_mock = mocker.patch("socket.getaddrinfo", side_effect=_getaddrinfo)
+
+    addresses = mount_efs.resolve_addresses(DNS_NAME)
+
+    assert addresses == {"ipv4": [IPV4_ADDRESS], "ipv6": [IPV6_ADDRESS]}
+    assert sorted(c[0][2] for c in getaddrinfo_mock.call_args_list) == sorted(
+        [socket.AF_INET, socket.AF_INET6]
+    )
+
+
+def test_resolve_addresses_cached_in_memory_and_on_disk(mocker):
+    getaddrinfo_mock = mocker.patch("socket.getaddrinfo", side_effect=_getaddrinfo)
+
+    first = mount_efs.resolve_addresses(DNS_NAME)
+    assert mount_efs.resolve_addresses(DNS_NAME) == first
+
+    # Another mount process only finds the entry on disk
+    mount_efs.DNS_CACHE.clear()
+    assert mount_efs.resolve_addresses(DNS_NAME) == first
+
+    assert getaddrinfo_mock.call_count == 2
+
+
+def test_resolve_addresses_cache_expired(mocker):
+    getaddrinfo_mock = mocker.patch("socket.getaddrinfo", side_effect=_getaddrinfo)
+    mount_efs.resolve_addresses(DNS_NAME)
+
+    mocker.patch(
+        "time.time", return_value=time.time() + mount_efs.DNS_CACHE_TTL_SEC + 1
+    )
+    mount_efs.resolve_addresses(DNS_NAME)
+
+    assert getaddrinfo_mock.call_count == 4
+
+
+def test_read_dns_cache_entry_removes_expired_entry(mocker, tmpdir):
+    key = ("addresses", DNS_NAME, None)
+    mount_efs.write_dns_cache_entry(key, result={"ipv4": [IPV4_ADDRESS]})
+    mount_efs.DNS_CACHE.clear()
+
+    mocker.patch(
+        "time.time", return_value=time.time() + mount_efs.DNS_CACHE_TTL_SEC + 1
+    )
+
+    assert mount_efs.read_dns_cache_entry(key) is None
+    assert [] == tmpdir.join(mount_efs.DNS_CACHE_DIR).listdir()
+
+
+def test_write_dns_cache_entry_prunes_expired_entries(mocker, tmpdir):
+    mount_efs.write_dns_cache_entry(("addresses", "expired", None), result={})
+    cache_dir = tmpdir.join(mount_efs.DNS_CACHE_DIR)
+    cache_dir.join("garbage").write("not json")
+    stale_tmp_file = cache_dir.join("entry.1234.5678~")
+    stale_tmp_file.write("")
+    fresh_tmp_file = cache_dir.join("entry.1234.5679~")
+    fresh_tmp_file.write("")
+    stale_tmp_file.setmtime(time.time() - mount_efs.DNS_CACHE_TTL_SEC - 1)
+
+    mocker.patch(
+        "time.time", return_value=time.time() + mount_efs.DNS_CACHE_TTL_SEC - 1
+    )
+    mount_efs.write_dns_cache_entry(("addresses", "fresh", None), result={})
+
+    assert sorted(
+        [
+            mount_efs.get_dns_cache_path(["addresses", "expired", None]),
+            mount_efs.get_dns_cache_path(["addresses", "fresh", None]),
+            str(fresh_tmp_file),
+        ]
+    ) == sorted(str(f) for f in cache_dir.listdir())
+
+    mocker.patch(
+        "time.time", return_value=time.time() + 2 * mount_efs.DNS_CACHE_TTL_SEC
+    )
+    mount_efs.write_dns_cache_entry(("addresses", "fresh", None), result={})
+
+    assert [mount_efs.get_dns_cache_path(["addresses", "fresh", None])] == [
+        str(f) for f in cache_dir.listdir()
+    ]
+
+
+def test_resolve_addresses_name_not_found_cached(mocker):
+    getaddrinfo_mock = mocker.patch(
+        "socket.getaddrinfo",
+        side_effect=socket.gaierror(socket.EAI_NONAME, "Name or service not known"),
+    )
+
+    for _ in range(2):
+        with pytest.raises(socket.gaierror) as excinfo:
+            mount_efs.resolve_addresses(DNS_NAME)
+        assert excinfo.value.errno == socket.EAI_NONAME
+
+    assert getaddrinfo_mock.call_count == 2
+    assert not mount_efs.dns_name_can_be_resolved(DNS_NAME)
+
+
+def test_resolve_addresses_temporary_failure_not_cached(mocker):
+    getaddrinfo_mock = mocker.patch(
+        "socket.getaddrinfo",
+        side_effect=socket.gaierror(socket.EAI_AGAIN, "Temporary failure"),
+    )
+
+    for _ in range(2):
+        with pytest.raises(socket.gaierror) as excinfo:
+            mount_efs.resolve_addresses(DNS_NAME)
+        assert excinfo.value.errno == socket.EAI_AGAIN
+
+    assert getaddrinfo_mock.call_count == 4
+
+
+def test_resolve_addresses_does_not_wait_for_slow_family(mocker):
+    release = threading.Event()
+
+    def getaddrinfo(name, port, family):
+        if family == socket.AF_INET6:
+            release.wait(5)
+        return _getaddrinfo(name, port, family)
+
+    mocker.patch("socket.getaddrinfo", side_effect=getaddrinfo)
+
+    try:
+        addresses = mount_efs.resolve_addresses(DNS_NAME)
+    finally:
+        release.set()
+
+    assert addresses == {"ipv4": [IPV4_ADDRESS], "ipv6": []}
+    # Incomplete results are not cached
+    assert not mount_efs.DNS_CACHE
+
+
+def test_resolve_addresses_in_network_namespace(mocker):
+    netns_mock = mocker.patch("mount_efs.NetNS", return_value=MagicMock())
+    mocker.patch("socket.getaddrinfo", side_effect=_getaddrinfo)
+
+    mount_efs.resolve_addresses(DNS_NAME, network_namespace=NETNS)
+
+    assert netns_mock.call_count == 2
+    netns_mock.assert_called_with(nspath=NETNS)
+    assert ("addresses", DNS_NAME, NETNS) in mount_efs.DNS_CACHE
+
+
+def test_resolve_host_aliases_cached(mocker):
+    gethostbyname_ex_mock = mocker.patch(
+        "socket.gethostbyname_ex", return_value=(DNS_NAME, [], [IPV4_ADDRESS])
+    )
+
+    for _ in range(2):
+        assert mount_efs.resolve_host_aliases("efs.example.com") == (
+            DNS_NAME,
+            [],
+            [IPV4_ADDRESS],
+        )
+
+    gethostbyname_ex_mock.assert_called_once_with("efs.example.com")
@@ -0,0 +1,110 @@
+# Copyright 2017-2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+#
+# Licensed under the MIT License. See the LICENSE accompanying this file
+# for the specific language governing permissions and limitations under
+# the License.
+
+import os
+import subprocess
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+import mount_efs
+
+
+def _tunnel_proc_mock():
+    tunnel_proc = MagicMock()
+    tunnel_proc.pid = 1234
+    return tunnel_proc
+
+
+def test_wait_for_tunnel_ready_reported():
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, b"READY\n")
+    os.close(write_fd)
+
+    assert mount_efs.wait_for_tunnel_ready(_tunnel_proc_mock(), read_fd, 1)
+
+
+def test_wait_for_tunnel_ready_fd_closed_without_report():
+    read_fd, write_fd = os.pipe()
+    os.close(write_fd)
+
+    assert not mount_efs.wait_for_tunnel_ready(_tunnel_proc_mock(), read_fd, 1)
+
+
+def test_wait_for_tunnel_ready_timeout():
+    read_fd, write_fd = os.pipe()
+    try:
+        assert not mount_efs.wait_for_tunnel_ready(_tunnel_proc_mock(), read_fd, 0.01)
+    finally:
+        os.close(write_fd)
+
+
+def test_wait_for_tunnel_ready_closes_fd():
+    read_fd, write_fd = os.pipe()
+    os.close(write_fd)
+
+    mount_efs.wait_for_tunnel_ready(_tunnel_proc_mock(), read_fd, 1)
+
+    try:
+        os.fstat(read_fd)
+        assert False, "Expected the readiness fd to be closed"
+    except OSError:
+        pass
+
+
+def test_poll_tunnel_process_returns_when_mount_completed():
+    tunnel_proc = subprocess.Popen(["sleep", "10"])
+    mount_completed = threading.Event()
+    read_fd, write_fd = os.pipe()
+    try:
+        mount_completed.set()
+        os.write(write_fd, b"\0")
+        mount_efs.poll_tunnel_process(
+            tunnel_proc, "fs-deadbeef", mount_completed, read_fd
+        )
+    finally:
+        tunnel_proc.kill()
+        tunnel_proc.wait()
+        os.close(read_fd)
+        os.close(write_fd)
+
+
+def test_poll_tunnel_process_exits_when_tunnel_dies(mocker):
+    exit_mock = mocker.patch("os._exit", side_effect=SystemExit)
+    mocker.patch("mount_efs.publish_cloudwatch_log")
+    tunnel_proc = subprocess.Popen(
+        ["false"], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    mount_completed = threading.Event()
+    read_fd, write_fd = os.pipe()
+    try:
+        with pytest.raises(SystemExit):
+            mount_efs.poll_tunnel_process(
+                tunnel_proc, "fs-deadbeef", mount_completed, read_fd
+            )
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+
+    exit_mock.assert_called_once_with(1)
+
+
+def test_watch_tunnel_process_raises_when_tunnel_dies(mocker):
+    exit_mock = mocker.patch("os._exit")
+    mocker.patch("mount_efs.publish_cloudwatch_log")
+    tunnel_proc = subprocess.Popen(
+        ["false"], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    tunnel_proc.wait()
+
+    with pytest.raises(mount_efs.TunnelError):
+        with mount_efs.watch_tunnel_process(
+            tunnel_proc, "fs-deadbeef", exit_on_failure=False
+        ):
+            pass
+
+    exit_mock.assert_not_called()
@@ -536,7 +536,7 @@ def test_write_stunnel_config_check_cert_hostname_not_supported_flag_set_true(
 ):
     mocker.patch("mount_efs.add_tunnel_ca_options")
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.write_stunnel_config_file(
             _get_config(
                 mocker,
@@ -555,7 +555,7 @@ def test_write_stunnel_config_check_cert_hostname_not_supported_flag_set_true(
             efs_proxy_enabled=False,
         )
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
 
     out, err = capsys.readouterr()
     assert "WARNING: Your client lacks sufficient controls" in err
@@ -603,7 +603,7 @@ def test_write_stunnel_config_check_cert_validity_not_supported_ocsp_enabled(
 ):
     mocker.patch("mount_efs.add_tunnel_ca_options")
 
-    with pytest.raises(SystemExit) as ex:
+    with pytest.raises(mount_efs.MountError) as ex:
         mount_efs.write_stunnel_config_file(
             _get_config(
                 mocker,
@@ -622,7 +622,7 @@ def test_write_stunnel_config_check_cert_validity_not_supported_ocsp_enabled(
             efs_proxy_enabled=False,
         )
 
-    assert 0 != ex.value.code
+    assert 0 != ex.value.exit_code
 
     out, err = capsys.readouterr()
     assert "WARNING: Your client lacks sufficient controls" in err
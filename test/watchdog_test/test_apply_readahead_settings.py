@@ -0,0 +1,136 @@
+#
+# Copyright 2017-2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+#
+# Licensed under the MIT License. See the LICENSE accompanying this file
+# for the specific language governing permissions and limitations under
+# the License.
+#
+
+import json
+
+import pytest
+
+import watchdog
+
+try:
+    import ConfigParser
+except ImportError:
+    from configparser import ConfigParser
+
+MOUNTINFO = """22 1 259:1 / / rw,relatime shared:1 - xfs /dev/nvme0n1p1 rw
+36 22 0:53 / /mnt rw,relatime shared:20 - nfs4 127.0.0.1:/ rw,vers=4.1,rsize=1048576
+37 22 0:54 / /mnt/with\\040space rw,relatime - nfs4 127.0.0.1:/ rw,vers=4.1
+"""
+
+
+@pytest.fixture(autouse=True)
+def setup(mocker, tmpdir):
+    mocker.patch(
+        "watchdog.NFS_READAHEAD_CONFIG_PATH_FORMAT",
+        str(tmpdir.join("bdi")) + "/%s/read_ahead_kb",
+    )
+    mocker.patch("platform.system", return_value="Linux")
+    mocker.patch("watchdog.get_linux_kernel_version", return_value=[5, 10])
+
+
+def _get_config(optimize_readahead=True):
+    try:
+        config = ConfigParser.SafeConfigParser()
+    except AttributeError:
+        config = ConfigParser()
+    config.add_section(watchdog.MOUNT_CONFIG_SECTION)
+    config.set(
+        watchdog.MOUNT_CONFIG_SECTION,
+        watchdog.OPTIMIZE_READAHEAD_ITEM,
+        str(optimize_readahead).lower(),
+    )
+    return config
+
+
+def _setup_mount(tmpdir, name, settings, device="0:53", readahead_kb=128):
+    state_dir = tmpdir.join("state")
+    state_dir.join(watchdog.READAHEAD_STATE_DIR).ensure(dir=True)
+    state_dir.join(watchdog.READAHEAD_STATE_DIR, name).write(json.dumps(settings))
+    tmpdir.join("bdi", device).ensure(dir=True)
+    tmpdir.join("bdi", device, "read_ahead_kb").write("%d\n" % readahead_kb)
+
+    mountinfo = tmpdir.join("mountinfo")
+    mountinfo.write(MOUNTINFO)
+    return str(state_dir), str(mountinfo)
+
+
+def _read_ahead_kb(tmpdir, device="0:53"):
+    return int(tmpdir.join("bdi", device, "read_ahead_kb").read())
+
+
+def test_get_nfs_mount_devices(tmpdir):
+    mountinfo = tmpdir.join("mountinfo")
+    mountinfo.write(MOUNTINFO)
+
+    assert {
+        "/mnt": "0:53",
+        "/mnt/with space": "0:54",
+    } == watchdog.get_nfs_mount_devices(str(mountinfo))
+
+
+def test_apply_readahead_settings_optimized(tmpdir):
+    state_dir, mountinfo = _setup_mount(
+        tmpdir, "mnt", {"mountpoint": "/mnt", "rsize": 1048576, "readahead_kb": None}
+    )
+
+    watchdog.apply_readahead_settings(_get_config(), state_dir, mountinfo)
+
+    assert 15360 == _read_ahead_kb(tmpdir)
+
+
+def test_apply_readahead_settings_optimization_disabled(tmpdir):
+    state_dir, mountinfo = _setup_mount(
+        tmpdir, "mnt", {"mountpoint": "/mnt", "rsize": 1048576, "readahead_kb": None}
+    )
+
+    watchdog.apply_readahead_settings(_get_config(False), state_dir, mountinfo)
+
+    assert 128 == _read_ahead_kb(tmpdir)
+
+
+def test_apply_readahead_settings_mount_option(tmpdir):
+    state_dir, mountinfo = _setup_mount(
+        tmpdir,
+        "mnt.with space",
+        {"mountpoint": "/mnt/with space", "rsize": 1048576, "readahead_kb": 4096},
+        device="0:54",
+    )
+
+    watchdog.apply_readahead_settings(_get_config(False), state_dir, mountinfo)
+
+    assert 4096 == _read_ahead_kb(tmpdir, "0:54")
+
+
+def test_apply_readahead_settings_unchanged(mocker, tmpdir):
+    state_dir, mountinfo = _setup_mount(
+        tmpdir,
+        "mnt",
+        {"mountpoint": "/mnt", "rsize": 1048576, "readahead_kb": None},
+        readahead_kb=15360,
+    )
+    write_mock = mocker.patch("watchdog.write_readahead_kb")
+
+    watchdog.apply_readahead_settings(_get_config(), state_dir, mountinfo)
+
+    write_mock.assert_not_called()
+
+
+def test_apply_readahead_settings_unmounted(tmpdir):
+    state_dir, mountinfo = _setup_mount(
+        tmpdir, "data", {"mountpoint": "/data", "rsize": 1048576, "readahead_kb": None}
+    )
+
+    watchdog.apply_readahead_settings(_get_config(), state_dir, mountinfo)
+
+    assert not tmpdir.join("state", watchdog.READAHEAD_STATE_DIR, "data").exists()
+
+
+def test_apply_readahead_settings_no_settings(tmpdir):
+    watchdog.apply_readahead_settings(
+        _get_config(), str(tmpdir), str(tmpdir.join("missing"))
+    )
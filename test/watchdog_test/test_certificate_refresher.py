@@ -0,0 +1,271 @@
+#
+# Copyright 2017-2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+#
+# Licensed under the MIT License. See the LICENSE accompanying this file
+# for the specific language governing permissions and limitations under
+# the License.
+#
+
+import json
+import logging
+import threading
+from signal import SIGHUP
+
+import pytest
+
+import watchdog
+
+try:
+    import ConfigParser
+except ImportError:
+    from configparser import ConfigParser
+
+STATE_FILE = "fs-deadbeef.mnt.20049"
+CERTIFICATE_CREATION_TIME = "231114221320Z"
+MOUNTS = {"mnt.20049": watchdog.Mount("127.0.0.1", "/mnt", "nfs4", "", "0", "0")}
+
+
+@pytest.fixture(autouse=True)
+def setup(mocker):
+    mocker.patch("watchdog.send_signal_to_running_stunnel_process_group")
+
+
+@pytest.fixture
+def refresher():
+    refresher = watchdog.CertificateRefresher(2)
+    yield refresher
+    refresher.executor.shutdown(wait=True)
+
+
+def _get_config():
+    try:
+        config = ConfigParser.SafeConfigParser()
+    except AttributeError:
+        config = ConfigParser()
+    config.add_section(watchdog.CONFIG_SECTION)
+    config.set(watchdog.CONFIG_SECTION, "tls_cert_renewal_interval_min", "60")
+    return config
+
+
+def _write_state_file(tmpdir, state_file=STATE_FILE, **kwargs):
+    state = {
+        "pid": 1234,
+        "mountpoint": "/mnt",
+        "mount_time": 1000,
+        "mountStateDir": state_file + "+",
+        "certificate": str(tmpdir.join("certificate.pem")),
+        "certificateCreationTime": "000101000000Z",
+    }
+    state.update(kwargs)
+    tmpdir.join(state_file).write(json.dumps(state))
+    return state
+
+
+def _read_state_file(tmpdir, state_file=STATE_FILE):
+    return json.loads(tmpdir.join(state_file).read())
+
+
+def _wait(refresher):
+    for refresh in list(refresher.pending.values()):
+        refresh.future.result()
+
+
+def test_certificate_refresher(mocker, tmpdir, refresher):
+    refresh_mock = mocker.patch(
+        "watchdog.refresh_certificate", return_value=CERTIFICATE_CREATION_TIME
+    )
+    state = _write_state_file(tmpdir)
+
+    assert refresher.submit(_get_config(), state, str(tmpdir), STATE_FILE)
+    assert refresher.is_pending(STATE_FILE)
+    _wait(refresher)
+    # The tunnel was restarted while its certificate was refreshed
+    _write_state_file(tmpdir, pid=5678)
+
+    assert [STATE_FILE] == refresher.collect()
+
+    assert not refresher.is_pending(STATE_FILE)
+    assert state["mountStateDir"] == refresh_mock.call_args[0][1]["mountStateDir"]
+    state = _read_state_file(tmpdir)
+    assert CERTIFICATE_CREATION_TIME == state["certificateCreationTime"]
+    assert 5678 == state["pid"]
+    assert state["last_certificate_refresh_duration_sec"] >= 0
+    assert state["last_certificate_refresh_wait_sec"] >= 0
+    watchdog.send_signal_to_running_stunnel_process_group.assert_called_once_with(
+        5678, STATE_FILE, str(tmpdir), SIGHUP
+    )
+
+
+@pytest.mark.parametrize("concurrency", [0, -1])
+def test_certificate_refresher_concurrency_lower_than_one(
+    mocker, tmpdir, caplog, concurrency
+):
+    caplog.set_level(logging.WARNING)
+    mocker.patch("watchdog.refresh_certificate", return_value=CERTIFICATE_CREATION_TIME)
+    state = _write_state_file(tmpdir)
+
+    refresher = watchdog.CertificateRefresher(concurrency)
+    try:
+        assert refresher.submit(_get_config(), state, str(tmpdir), STATE_FILE)
+        _wait(refresher)
+        assert [STATE_FILE] == refresher.collect()
+    finally:
+        refresher.executor.shutdown(wait=True)
+
+    assert "refreshing one certificate at a time" in caplog.text
+
+
+def test_certificate_refresher_one_refresh_per_tunnel(mocker, tmpdir, refresher):
+    refreshing = threading.Event()
+    mocker.patch(
+        "watchdog.refresh_certificate",
+        side_effect=lambda *args: refreshing.wait(5) and CERTIFICATE_CREATION_TIME,
+    )
+    state = _write_state_file(tmpdir)
+
+    assert refresher.submit(_get_config(), state, str(tmpdir), STATE_FILE)
+    assert not refresher.submit(_get_config(), state, str(tmpdir), STATE_FILE)
+    assert [] == refresher.collect()
+
+    refreshing.set()
+    _wait(refresher)
+    assert [STATE_FILE] == refresher.collect()
+
+
+def test_certificate_refresher_bounded(mocker, tmpdir, refresher):
+    lock = threading.Lock()
+    release = threading.Event()
+    running = {"now": 0, "max": 0}
+
+    def refresh(*args):
+        with lock:
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+        release.wait(5)
+        with lock:
+            running["now"] -= 1
+        return CERTIFICATE_CREATION_TIME
+
+    mocker.patch("watchdog.refresh_certificate", side_effect=refresh)
+    state_files = ["fs-deadbeef.mnt%d.20049" % i for i in range(5)]
+    for state_file in state_files:
+        state = _write_state_file(tmpdir, state_file)
+        refresher.submit(_get_config(), state, str(tmpdir), state_file)
+
+    release.set()
+    _wait(refresher)
+
+    assert 2 == running["max"]
+    assert sorted(state_files) == sorted(refresher.collect())
+
+
+def test_certificate_refresher_failure(mocker, tmpdir, refresher):
+    mocker.patch("watchdog.refresh_certificate", side_effect=SystemExit(1))
+    rewrite_mock = mocker.patch("watchdog.rewrite_state_file")
+    state = _write_state_file(tmpdir)
+
+    refresher.submit(_get_config(), state, str(tmpdir), STATE_FILE)
+    _wait(refresher)
+
+    assert [] == refresher.collect()
+    assert not refresher.is_pending(STATE_FILE)
+    rewrite_mock.assert_not_called()
+
+
+def test_certificate_refresher_state_file_removed(mocker, tmpdir, refresher):
+    mocker.patch("watchdog.refresh_certificate", return_value=CERTIFICATE_CREATION_TIME)
+    state = _write_state_file(tmpdir)
+
+    refresher.submit(_get_config(), state, str(tmpdir), STATE_FILE)
+    _wait(refresher)
+    tmpdir.join(STATE_FILE).remove()
+
+    assert [] == refresher.collect()
+    assert not tmpdir.join(STATE_FILE).exists()
+    watchdog.send_signal_to_running_stunnel_process_group.assert_not_called()
+
+
+def test_check_certificate_submits_refresh(mocker, tmpdir):
+    recreate_mock = mocker.patch("watchdog.recreate_certificate")
+    certificate_refresher = mocker.MagicMock()
+    config = _get_config()
+    state = _write_state_file(tmpdir)
+
+    watchdog.check_certificate(
+        config,
+        state,
+        str(tmpdir),
+        STATE_FILE,
+        base_path=str(tmpdir),
+        certificate_refresher=certificate_refresher,
+    )
+
+    certificate_refresher.submit.assert_called_once_with(
+        config, state, str(tmpdir), STATE_FILE, str(tmpdir), None, None
+    )
+    recreate_mock.assert_not_called()
+
+
+def _setup_check_efs_mounts(mocker, tmpdir, tunnel_running):
+    _write_state_file(tmpdir)
+    mocker.patch("watchdog.get_current_local_nfs_mounts", return_value=MOUNTS)
+    mocker.patch("watchdog.is_mount_stunnel_proc_running", return_value=tunnel_running)
+    mocker.patch("watchdog.check_stunnel_health")
+    mocker.patch("watchdog.restart_tls_tunnel")
+    return mocker.patch("watchdog.check_certificate")
+
+
+def test_check_efs_mounts_refreshes_running_tunnel_in_background(mocker, tmpdir):
+    check_certificate_mock = _setup_check_efs_mounts(mocker, tmpdir, True)
+    certificate_refresher = mocker.MagicMock()
+    certificate_refresher.is_pending.return_value = False
+
+    watchdog.check_efs_mounts(
+        _get_config(),
+        [],
+        30,
+        5,
+        str(tmpdir),
+        certificate_refresher=certificate_refresher,
+    )
+
+    certificate_refresher.collect.assert_called_once_with()
+    assert (
+        certificate_refresher
+        == check_certificate_mock.call_args[1]["certificate_refresher"]
+    )
+
+
+def test_check_efs_mounts_refreshes_stopped_tunnel_in_cycle(mocker, tmpdir):
+    check_certificate_mock = _setup_check_efs_mounts(mocker, tmpdir, False)
+    certificate_refresher = mocker.MagicMock()
+    certificate_refresher.is_pending.return_value = False
+
+    watchdog.check_efs_mounts(
+        _get_config(),
+        [],
+        30,
+        5,
+        str(tmpdir),
+        certificate_refresher=certificate_refresher,
+    )
+
+    assert check_certificate_mock.call_args[1]["certificate_refresher"] is None
+
+
+def test_check_efs_mounts_stopped_tunnel_refresh_pending(mocker, tmpdir):
+    check_certificate_mock = _setup_check_efs_mounts(mocker, tmpdir, False)
+    certificate_refresher = mocker.MagicMock()
+    certificate_refresher.is_pending.return_value = True
+
+    watchdog.check_efs_mounts(
+        _get_config(),
+        [],
+        30,
+        5,
+        str(tmpdir),
+        certificate_refresher=certificate_refresher,
+    )
+
+    check_certificate_mock.assert_not_called()
+    assert 1 == watchdog.restart_tls_tunnel.call_count
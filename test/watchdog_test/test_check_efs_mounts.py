@@ -7,6 +7,7 @@
 #
 
 import json
+import os
 import tempfile
 from datetime import datetime
 
@@ -287,3 +288,80 @@ def test_ap_mount_with_extra_mount(mocker, tmpdir):
     utils.assert_not_called(clean_up_mock)
     utils.assert_not_called(restart_tls_mock)
     utils.assert_called_once(check_certificate_call)
+
+
+def create_shared_tunnel_ref(state_file_dir, state_file, ref):
+    refs_dir = os.path.join(state_file_dir, watchdog.SHARED_TUNNEL_REFS_DIR, state_file)
+    os.makedirs(refs_dir)
+    ref_file = os.path.join(refs_dir, "fs-deadbeef.other.mnt.12345")
+    with open(ref_file, "w") as f:
+        json.dump(ref, f)
+    return ref_file
+
+
+def test_shared_tunnel_kept_while_referenced(mocker, tmpdir):
+    state = dict(STATE)
+    state["tunnelKey"] = "tunnel-key"
+    state["unmount_time"] = TIME - GRACE_PERIOD
+
+    state_file_dir, state_file = create_state_file(tmpdir, content=json.dumps(state))
+    create_shared_tunnel_ref(
+        state_file_dir, state_file, {"mountpoint": "/other/mnt", "mount_time": TIME}
+    )
+
+    clean_up_mock, restart_tls_mock, _, rewrite_state_mock, _ = setup_mocks(
+        mocker,
+        mounts={
+            "other.mnt.12345": watchdog.Mount(
+                "127.0.0.1", "/other/mnt", "nfs4", "", "0", "0"
+            )
+        },
+        state_files={"mnt.12345": state_file},
+    )
+
+    watchdog.check_efs_mounts(
+        _get_config(),
+        [],
+        GRACE_PERIOD,
+        UNMOUNT_COUNT,
+        state_file_dir=state_file_dir,
+    )
+
+    utils.assert_not_called(clean_up_mock)
+    utils.assert_not_called(restart_tls_mock)
+    rewritten_state = rewrite_state_mock.call_args[0][0]
+    assert "unmount_time" not in rewritten_state
+    assert "/other/mnt" == rewritten_state["mountpoint"]
+
+
+def test_shared_tunnel_stale_ref_removed(mocker, tmpdir):
+    state = dict(STATE)
+    state["tunnelKey"] = "tunnel-key"
+    state["unmount_time"] = TIME - GRACE_PERIOD
+
+    state_file_dir, state_file = create_state_file(tmpdir, content=json.dumps(state))
+    ref_file = create_shared_tunnel_ref(
+        state_file_dir,
+        state_file,
+        {
+            "mountpoint": "/other/mnt",
+            "mount_time": TIME - watchdog.UNMOUNT_DIFF_TIME,
+            "unmount_count": UNMOUNT_COUNT + 1,
+        },
+    )
+
+    clean_up_mock, restart_tls_mock, _, _, _ = setup_mocks(
+        mocker, mounts={}, state_files={"mnt.12345": state_file}
+    )
+
+    watchdog.check_efs_mounts(
+        _get_config(),
+        [],
+        GRACE_PERIOD,
+        UNMOUNT_COUNT,
+        state_file_dir=state_file_dir,
+    )
+
+    assert not os.path.exists(ref_file)
+    utils.assert_called_once(clean_up_mock)
+    utils.assert_not_called(restart_tls_mock)
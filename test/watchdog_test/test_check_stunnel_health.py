@@ -172,6 +172,8 @@ def test_stunnel_health_checked_passed_for_first_check(mocker, tmpdir):
     with state_file.open() as f:
         new_state = json.load(f)
     assert FIXED_TIME == new_state["last_stunnel_check_time"]
+    assert 0 <= new_state["last_health_check_latency_sec"] < 1
+    assert new_state["last_health_check_passed"]
 
 
 def test_stunnel_health_checked_passed_for_non_first_check_default_interval(
@@ -0,0 +1,249 @@
+#
+# Copyright 2017-2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+#
+# Licensed under the MIT License. See the LICENSE accompanying this file
+# for the specific language governing permissions and limitations under
+# the License.
+#
+
+import json
+
+import pytest
+
+import watchdog
+
+try:
+    import ConfigParser
+except ImportError:
+    from configparser import ConfigParser
+
+STATE_FILE = "fs-deadbeef.mnt.20049"
+MOUNTS = {
+    "mnt.20049": watchdog.Mount("127.0.0.1", "/mnt", "nfs4", "rw,port=20049", "0", "0"),
+}
+MOUNTSTATS = """device 127.0.0.1:/ mounted on /mnt with fstype nfs4 statvers=1.1
+\txprt:\ttcp 832 1 1 0 0 %d %d 0 0 0 4 0 0
+\tper-op statistics
+\t        READ: 0 0 0 0 0 0 0 0 0
+"""
+
+MOUNTSTATS_NCONNECT = """device 127.0.0.1:/ mounted on /mnt with fstype nfs4 statvers=1.1
+\txprt:\ttcp 832 1 1 0 0 %d %d 0 0 0 4 0 0
+\txprt:\ttcp 833 1 1 0 0 %d %d 0 0 0 4 0 0
+\tper-op statistics
+\t        READ: 0 0 0 0 0 0 0 0 0
+"""
+
+
+@pytest.fixture(autouse=True)
+def setup(mocker):
+    mocker.patch("watchdog.rewrite_state_file")
+
+
+def _get_config(enabled=True, window_sec=10):
+    try:
+        config = ConfigParser.SafeConfigParser()
+    except AttributeError:
+        config = ConfigParser()
+    config.add_section(watchdog.CONFIG_SECTION)
+    if enabled is not None:
+        config.set(
+            watchdog.CONFIG_SECTION,
+            watchdog.STALL_DETECTION_ENABLED_ITEM,
+            str(enabled).lower(),
+        )
+    if window_sec is not None:
+        config.set(
+            watchdog.CONFIG_SECTION,
+            watchdog.STALL_DETECTION_WINDOW_ITEM,
+            str(window_sec),
+        )
+    config.set(watchdog.CONFIG_SECTION, "stunnel_health_check_command_timeout_sec", "5")
+    return config
+
+
+class Tunnel(object):
+    def __init__(self, mocker, tmpdir, config):
+        self.tmpdir = tmpdir
+        self.config = config
+        self.state = {"pid": 1234, "mountpoint": "/mnt"}
+        self.tunnel_progress = {}
+        self.probe_mock = mocker.patch("watchdog.probe_tunnel_health")
+
+    def sample(self, current_time, sends, receives, *other_transport):
+        if other_transport:
+            self.tmpdir.join("mountstats").write(
+                MOUNTSTATS_NCONNECT % ((sends, receives) + other_transport)
+            )
+        else:
+            self.tmpdir.join("mountstats").write(MOUNTSTATS % (sends, receives))
+        mount_stats = watchdog.get_tunnel_mount_stats(
+            self.config, MOUNTS, str(self.tmpdir.join("mountstats"))
+        )
+        return watchdog.check_tunnel_stall(
+            self.config,
+            self.state,
+            str(self.tmpdir),
+            STATE_FILE,
+            [],
+            MOUNTS,
+            mount_stats,
+            self.tunnel_progress,
+            current_time=current_time,
+        )
+
+
+def test_check_tunnel_stall_stuck(mocker, tmpdir):
+    tunnel = Tunnel(mocker, tmpdir, _get_config())
+
+    assert not tunnel.sample(1000, 100, 100)
+    assert not tunnel.sample(1001, 105, 100)
+    assert not tunnel.sample(1009, 110, 100)
+    assert tunnel.sample(1010, 110, 100)
+
+    tunnel.probe_mock.assert_called_once_with(
+        [], tunnel.state, str(tmpdir), STATE_FILE, "/mnt", 5
+    )
+    assert 1010 == tunnel.state["last_stunnel_check_time"]
+    assert STATE_FILE not in tunnel.tunnel_progress
+
+
+def test_check_tunnel_stall_nconnect_one_transport_stuck(mocker, tmpdir):
+    tunnel = Tunnel(mocker, tmpdir, _get_config())
+
+    # The first transport keeps getting replies, the second one does not
+    assert not tunnel.sample(1000, 100, 100, 50, 50)
+    assert not tunnel.sample(1005, 200, 195, 60, 50)
+    assert not tunnel.sample(1009, 300, 295, 60, 50)
+    assert tunnel.sample(1010, 400, 395, 60, 50)
+
+    assert 1 == tunnel.probe_mock.call_count
+
+
+def test_check_tunnel_stall_nconnect_transports_progress(mocker, tmpdir):
+    tunnel = Tunnel(mocker, tmpdir, _get_config())
+
+    for i in range(30):
+        assert not tunnel.sample(
+            1000 + i, 100 + 10 * i, 100 + 10 * i - 5, 50 + 2 * i, 50 + 2 * i - 1
+        )
+
+    tunnel.probe_mock.assert_not_called()
+
+
+def test_check_tunnel_stall_slow_server(mocker, tmpdir):
+    tunnel = Tunnel(mocker, tmpdir, _get_config(window_sec=None))
+
+    # A throttled server replies every 30 sec while requests keep being sent
+    for i in range(20):
+        assert not tunnel.sample(1000 + 5 * i, 100 + 10 * i, 100 + 10 * (i // 6 * 6))
+
+    tunnel.probe_mock.assert_not_called()
+
+
+def test_check_tunnel_stall_replies(mocker, tmpdir):
+    tunnel = Tunnel(mocker, tmpdir, _get_config())
+
+    for i in range(30):
+        assert not tunnel.sample(1000 + i, 100 + 10 * i, 100 + 10 * i - 5)
+
+    tunnel.probe_mock.assert_not_called()
+
+
+def test_check_tunnel_stall_idle(mocker, tmpdir):
+    tunnel = Tunnel(mocker, tmpdir, _get_config())
+
+    # A retransmission left the sends ahead of the receives, nothing is sent afterwards
+    assert not tunnel.sample(1000, 101, 100)
+    for i in range(1, 30):
+        assert not tunnel.sample(1000 + i, 101, 100)
+
+    # A request sent after a long idle time only counts from the last idle sample
+    assert not tunnel.sample(1030, 102, 100)
+    assert not tunnel.sample(1038, 102, 100)
+    tunnel.probe_mock.assert_not_called()
+
+
+def test_check_tunnel_stall_counter_reset(mocker, tmpdir):
+    tunnel = Tunnel(mocker, tmpdir, _get_config())
+
+    assert not tunnel.sample(1000, 100, 100)
+    assert not tunnel.sample(1005, 110, 100)
+    assert not tunnel.sample(1020, 5, 5)
+    assert not tunnel.sample(1025, 10, 5)
+
+    tunnel.probe_mock.assert_not_called()
+
+
+def test_check_tunnel_stall_mount_not_in_mountstats(mocker, tmpdir):
+    tunnel = Tunnel(mocker, tmpdir, _get_config())
+    tunnel.state["mountpoint"] = "/other"
+
+    assert not tunnel.sample(1000, 100, 100)
+    assert {} == tunnel.tunnel_progress
+
+
+def test_get_tunnel_mount_stats_disabled(tmpdir):
+    tmpdir.join("mountstats").write(MOUNTSTATS % (100, 100))
+
+    assert (
+        watchdog.get_tunnel_mount_stats(
+            _get_config(enabled=False), MOUNTS, str(tmpdir.join("mountstats"))
+        )
+        is None
+    )
+
+
+def test_get_tunnel_mount_stats_disabled_by_default(tmpdir):
+    tmpdir.join("mountstats").write(MOUNTSTATS % (100, 100))
+
+    assert (
+        watchdog.get_tunnel_mount_stats(
+            _get_config(enabled=None), MOUNTS, str(tmpdir.join("mountstats"))
+        )
+        is None
+    )
+
+
+def test_get_tunnel_mount_stats_missing_file(tmpdir):
+    assert (
+        watchdog.get_tunnel_mount_stats(
+            _get_config(), MOUNTS, str(tmpdir.join("missing"))
+        )
+        is None
+    )
+
+
+def test_check_efs_mounts_probes_stalled_tunnel(mocker, tmpdir):
+    tmpdir.join(STATE_FILE).write(
+        json.dumps({"pid": 1234, "mountpoint": "/mnt", "mount_time": 1000})
+    )
+    mocker.patch("watchdog.get_current_local_nfs_mounts", return_value=MOUNTS)
+    mocker.patch("watchdog.is_mount_stunnel_proc_running", return_value=True)
+    mocker.patch(
+        "watchdog.get_tunnel_mount_stats",
+        return_value={
+            "/mnt": watchdog.MountStats(
+                "127.0.0.1:/",
+                None,
+                {},
+                {"sends": 110, "receives": 100},
+                [{"sends": 110, "receives": 100}],
+            )
+        },
+    )
+    mocker.patch("time.time", return_value=1100)
+    probe_mock = mocker.patch("watchdog.probe_tunnel_health")
+    health_check_mock = mocker.patch("watchdog.check_stunnel_health")
+    tunnel_progress = {
+        STATE_FILE: [{"sends": 100, "receives": 100, "time": 1000}],
+        "fs-deadbeef.gone.20050": [{"sends": 1, "receives": 1, "time": 1000}],
+    }
+
+    watchdog.check_efs_mounts(
+        _get_config(), [], 30, 5, str(tmpdir), tunnel_progress=tunnel_progress
+    )
+
+    assert 1 == probe_mock.call_count
+    health_check_mock.assert_not_called()
+    assert {} == tunnel_progress
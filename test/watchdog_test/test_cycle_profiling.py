@@ -0,0 +1,130 @@
+#
+# Copyright 2017-2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+#
+# Licensed under the MIT License. See the LICENSE accompanying this file
+# for the specific language governing permissions and limitations under
+# the License.
+#
+
+import logging
+import os
+import tracemalloc
+
+import pytest
+
+import watchdog
+
+try:
+    import ConfigParser
+except ImportError:
+    from configparser import ConfigParser
+
+
+@pytest.fixture(autouse=True)
+def setup(mocker):
+    mocker.patch("watchdog.CYCLE_STEP_TIMINGS", {})
+    mocker.patch("watchdog.PROFILE_REQUESTED", False)
+
+
+def _get_config(profile_cycles=2):
+    try:
+        config = ConfigParser.SafeConfigParser()
+    except AttributeError:
+        config = ConfigParser()
+    config.add_section(watchdog.CONFIG_SECTION)
+    config.set(
+        watchdog.CONFIG_SECTION, watchdog.PROFILE_CYCLES_ITEM, str(profile_cycles)
+    )
+    return config
+
+
+def test_timed_step(mocker):
+    mocker.patch("time.monotonic", side_effect=[10, 10.5, 20, 20.25])
+
+    with watchdog.timed_step("check_certificate"):
+        pass
+    with watchdog.timed_step("check_certificate"):
+        pass
+
+    assert {"check_certificate": 0.75} == watchdog.CYCLE_STEP_TIMINGS
+
+
+def test_timed_step_exception(mocker):
+    mocker.patch("time.monotonic", side_effect=[10, 12])
+
+    with pytest.raises(ValueError):
+        with watchdog.timed_step("read_config"):
+            raise ValueError()
+
+    assert {"read_config": 2} == watchdog.CYCLE_STEP_TIMINGS
+
+
+def test_report_slow_cycle(caplog):
+    caplog.set_level(logging.WARNING)
+    step_timings = {
+        "check_efs_mounts": 2.5,
+        "check_efs_mounts.check_stunnel_health": 2.25,
+        "read_config": 0.01,
+    }
+
+    assert watchdog.report_slow_cycle(2.6, 1, step_timings)
+
+    assert "Watchdog cycle took 2.600 sec" in caplog.text
+    assert (
+        "check_efs_mounts 2.500 sec, check_efs_mounts.check_stunnel_health 2.250 sec"
+        in caplog.text
+    )
+
+
+def test_report_slow_cycle_within_interval(caplog):
+    assert not watchdog.report_slow_cycle(0.5, 1, {"read_config": 0.5})
+    assert "" == caplog.text
+
+
+def test_cycle_profile(mocker, tmpdir):
+    config = _get_config(profile_cycles=2)
+    profile_state = {}
+
+    watchdog.start_cycle_profile(config, profile_state)
+    assert {} == profile_state
+
+    watchdog.request_cycle_profile(None, None)
+    watchdog.start_cycle_profile(config, profile_state)
+    try:
+        assert tracemalloc.is_tracing()
+        assert not watchdog.PROFILE_REQUESTED
+
+        assert watchdog.finish_cycle_profile(config, profile_state, str(tmpdir)) is None
+        profile_file = watchdog.finish_cycle_profile(config, profile_state, str(tmpdir))
+    finally:
+        if profile_state:
+            profile_state["profiler"].disable()
+            tracemalloc.stop()
+
+    assert {} == profile_state
+    assert not tracemalloc.is_tracing()
+    assert profile_file.startswith(str(tmpdir.join(watchdog.PROFILE_FILE_PREFIX)))
+    with open(profile_file + ".txt") as f:
+        report = f.read()
+    assert "Functions by cumulative time" in report
+    assert "Memory allocated by line" in report
+    assert os.path.getsize(profile_file + ".prof") > 0
+
+
+def test_cycle_profile_keeps_tracemalloc_running(tmpdir):
+    config = _get_config(profile_cycles=1)
+    profile_state = {}
+    tracemalloc.start()
+    try:
+        watchdog.request_cycle_profile(None, None)
+        watchdog.start_cycle_profile(config, profile_state)
+        watchdog.finish_cycle_profile(config, profile_state, str(tmpdir))
+
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_finish_cycle_profile_not_profiling(tmpdir):
+    assert watchdog.finish_cycle_profile(_get_config(), {}, str(tmpdir)) is None
+    assert [] == tmpdir.listdir()
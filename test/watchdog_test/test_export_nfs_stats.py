@@ -0,0 +1,265 @@
+#
+# Copyright 2017-2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+#
+# Licensed under the MIT License. See the LICENSE accompanying this file
+# for the specific language governing permissions and limitations under
+# the License.
+#
+
+import pytest
+
+import watchdog
+
+try:
+    import ConfigParser
+except ImportError:
+    from configparser import ConfigParser
+
+MOUNTSTATS = """device /dev/nvme0n1p1 mounted on / with fstype xfs
+device 127.0.0.1:/ mounted on /mnt with fstype nfs4 statvers=1.1
+\topts:\trw,vers=4.1,rsize=1048576,wsize=1048576
+\tage:\t120
+\txprt:\ttcp 832 1 2 0 0 %(sends)d %(sends)d 0 %(sends)d %(backlog)d 4 0 0
+\tper-op statistics
+\t        NULL: 0 0 0 0 0 0 0 0
+\t        READ: %(reads)d %(reads)d 0 1000 4096 %(queue)d %(rtt)d %(execute)d 1
+\t       WRITE: 3 3 0 1000 400 0 1 2 0
+device 10.0.0.1:/export mounted on /other with fstype nfs4 statvers=1.1
+\tper-op statistics
+\t        READ: 7 7 0 0 0 0 0 0 0
+"""
+
+MOUNTSTATS_NCONNECT = """device 127.0.0.1:/ mounted on /mnt with fstype nfs4 statvers=1.1
+\topts:\trw,vers=4.1,rsize=1048576,wsize=1048576,nconnect=2
+\txprt:\ttcp 832 1 2 0 0 %(sends)d %(sends)d 0 %(sends)d %(backlog)d 4 0 0
+\txprt:\ttcp 833 1 1 0 0 %(other_sends)d %(other_sends)d 0 0 0 4 0 0
+\tper-op statistics
+\t        READ: 10 10 0 1000 4096 10 50 60 0
+"""
+
+
+@pytest.fixture(autouse=True)
+def setup(mocker):
+    mocker.patch("watchdog.get_current_local_nfs_mounts", return_value={})
+
+
+def _get_config(tmpdir, enabled=True):
+    try:
+        config = ConfigParser.SafeConfigParser()
+    except AttributeError:
+        config = ConfigParser()
+    config.add_section(watchdog.CONFIG_SECTION)
+    config.set(
+        watchdog.CONFIG_SECTION, watchdog.NFS_STATS_ENABLED_ITEM, str(enabled).lower()
+    )
+    config.set(watchdog.CONFIG_SECTION, watchdog.NFS_STATS_INTERVAL_ITEM, "10")
+    config.set(
+        watchdog.CONFIG_SECTION,
+        watchdog.NFS_STATS_FILE_ITEM,
+        str(tmpdir.join("metrics", "nfs-stats.prom")),
+    )
+    return config
+
+
+def _write_mountstats(tmpdir, reads, rtt, sends=100, backlog=0):
+    tmpdir.join("mountstats").write(
+        MOUNTSTATS
+        % {
+            "reads": reads,
+            "queue": reads,
+            "rtt": rtt,
+            "execute": rtt + reads,
+            "sends": sends,
+            "backlog": backlog,
+        }
+    )
+    return str(tmpdir.join("mountstats"))
+
+
+def _write_mount_record(tmpdir, mountpoint="/mnt"):
+    tmpdir.join("state", watchdog.READAHEAD_STATE_DIR, "mnt").write(
+        '{"mountpoint": "%s", "rsize": 1048576, "readahead_kb": null}' % mountpoint,
+        ensure=True,
+    )
+    return str(tmpdir.join("state"))
+
+
+def _export(config, tmpdir, stats_state, current_time):
+    watchdog.export_nfs_stats(
+        config,
+        stats_state,
+        str(tmpdir.join("state")),
+        str(tmpdir.join("mountstats")),
+        current_time=current_time,
+    )
+    return tmpdir.join("metrics", "nfs-stats.prom").read()
+
+
+def test_parse_mountstats(tmpdir):
+    all_stats = watchdog.parse_mountstats(
+        _write_mountstats(tmpdir, reads=10, rtt=50, backlog=3)
+    )
+
+    assert ["/mnt", "/other"] == sorted(all_stats)
+    stats = all_stats["/mnt"]
+    assert "127.0.0.1:/" == stats.server
+    assert 120 == stats.age
+    assert 10 == stats.ops["READ"]["ops"]
+    assert 50 == stats.ops["READ"]["rtt_ms"]
+    assert 1 == stats.ops["READ"]["errors"]
+    assert 0 == stats.ops["NULL"]["ops"]
+    assert 100 == stats.xprt["sends"]
+    assert 3 == stats.xprt["backlog"]
+    assert {} == all_stats["/other"].xprt
+
+
+def _write_mountstats_nconnect(tmpdir, sends, other_sends, backlog=0):
+    tmpdir.join("mountstats").write(
+        MOUNTSTATS_NCONNECT
+        % {"sends": sends, "other_sends": other_sends, "backlog": backlog}
+    )
+    return str(tmpdir.join("mountstats"))
+
+
+def test_parse_mountstats_nconnect(tmpdir):
+    stats = watchdog.parse_mountstats(
+        _write_mountstats_nconnect(tmpdir, sends=500, other_sends=10)
+    )["/mnt"]
+
+    assert [500, 10] == [xprt["sends"] for xprt in stats.xprts]
+    assert 510 == stats.xprt["sends"]
+    assert 3 == stats.xprt["connect_count"]
+
+
+def test_parse_mountstats_selected_mountpoints(tmpdir):
+    all_stats = watchdog.parse_mountstats(
+        _write_mountstats(tmpdir, reads=10, rtt=50), ["/other"]
+    )
+
+    assert ["/other"] == list(all_stats)
+    assert 7 == all_stats["/other"].ops["READ"]["ops"]
+
+
+def test_get_efs_mountpoints(tmpdir):
+    nfs_mounts = {
+        "mnt.with\\040space.20049": watchdog.Mount(
+            "127.0.0.1", "/mnt/with\\040space", "nfs4", "", "0", "0"
+        )
+    }
+
+    assert {"/mnt", "/mnt/with space"} == watchdog.get_efs_mountpoints(
+        _write_mount_record(tmpdir), nfs_mounts
+    )
+
+
+def test_format_prometheus_labels():
+    assert (
+        'mountpoint="/mnt/a\\"b\\\\c",op="READ"'
+        == watchdog.format_prometheus_labels(
+            {"op": "READ", "mountpoint": '/mnt/a"b\\c'}
+        )
+    )
+
+
+def test_export_nfs_stats(tmpdir):
+    _write_mount_record(tmpdir)
+    config = _get_config(tmpdir)
+    stats_state = {}
+
+    _write_mountstats(tmpdir, reads=10, rtt=50, sends=100, backlog=0)
+    content = _export(config, tmpdir, stats_state, 1000)
+
+    labels = 'mountpoint="/mnt",op="READ",server="127.0.0.1:/"'
+    assert "# TYPE efs_nfs_op_total counter" in content
+    assert "efs_nfs_op_total{%s} 10" % labels in content
+    assert "efs_nfs_op_errors_total{%s} 1" % labels in content
+    assert 'op="NULL"' not in content
+    assert "/other" not in content
+    assert "efs_nfs_op_rate" not in content
+
+    _write_mountstats(tmpdir, reads=30, rtt=150, sends=200, backlog=50)
+    content = _export(config, tmpdir, stats_state, 1010)
+
+    assert "efs_nfs_op_total{%s} 30" % labels in content
+    assert "efs_nfs_op_rate{%s} 2.000" % labels in content
+    assert "efs_nfs_op_rtt_avg_ms{%s} 5.000" % labels in content
+    assert "efs_nfs_op_execute_avg_ms{%s} 6.000" % labels in content
+    assert "efs_nfs_op_queue_avg_ms{%s} 1.000" % labels in content
+    assert (
+        'efs_nfs_xprt_backlog_avg{mountpoint="/mnt",server="127.0.0.1:/"} 0.500'
+        in content
+    )
+    assert not tmpdir.join("metrics").listdir(lambda p: p.basename.endswith("~"))
+
+
+def test_export_nfs_stats_nconnect(tmpdir):
+    _write_mount_record(tmpdir)
+    config = _get_config(tmpdir)
+    stats_state = {}
+    labels = 'mountpoint="/mnt",server="127.0.0.1:/"'
+
+    _write_mountstats_nconnect(tmpdir, sends=500, other_sends=10)
+    _export(config, tmpdir, stats_state, 1000)
+    _write_mountstats_nconnect(tmpdir, sends=600, other_sends=110, backlog=50)
+    content = _export(config, tmpdir, stats_state, 1010)
+
+    assert "efs_nfs_xprt_sends_total{%s} 710" % labels in content
+    assert "efs_nfs_xprt_connects_total{%s} 3" % labels in content
+    assert "efs_nfs_xprt_backlog_avg{%s} 0.250" % labels in content
+
+
+def test_export_nfs_stats_counter_reset(tmpdir):
+    _write_mount_record(tmpdir)
+    config = _get_config(tmpdir)
+    stats_state = {}
+
+    _write_mountstats(tmpdir, reads=30, rtt=150)
+    _export(config, tmpdir, stats_state, 1000)
+    _write_mountstats(tmpdir, reads=10, rtt=50)
+    content = _export(config, tmpdir, stats_state, 1010)
+
+    assert 'efs_nfs_op_rate{mountpoint="/mnt",op="READ"' not in content
+    assert 'efs_nfs_op_rate{mountpoint="/mnt",op="WRITE"' in content
+
+
+def test_export_nfs_stats_interval(tmpdir):
+    _write_mount_record(tmpdir)
+    config = _get_config(tmpdir)
+    stats_state = {}
+
+    _write_mountstats(tmpdir, reads=10, rtt=50)
+    _export(config, tmpdir, stats_state, 1000)
+    _write_mountstats(tmpdir, reads=30, rtt=50)
+    content = _export(config, tmpdir, stats_state, 1005)
+
+    assert 1000 == stats_state["sample_time"]
+    assert "efs_nfs_op_rate" not in content
+
+
+def test_export_nfs_stats_disabled(tmpdir):
+    _write_mount_record(tmpdir)
+    stats_state = {}
+    _write_mountstats(tmpdir, reads=10, rtt=50)
+
+    watchdog.export_nfs_stats(
+        _get_config(tmpdir, enabled=False),
+        stats_state,
+        str(tmpdir.join("state")),
+        str(tmpdir.join("mountstats")),
+    )
+
+    assert {} == stats_state
+    assert not tmpdir.join("metrics").exists()
+
+
+def test_export_nfs_stats_missing_mountstats(tmpdir):
+    stats_state = {}
+
+    watchdog.export_nfs_stats(
+        _get_config(tmpdir),
+        stats_state,
+        str(tmpdir.join("state")),
+        str(tmpdir.join("missing")),
+    )
+
+    assert {} == stats_state
@@ -0,0 +1,17 @@
+#
+# Copyright 2017-2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+#
+# Licensed under the MIT License. See the LICENSE accompanying this file
+# for the specific language governing permissions and limitations under
+# the License.
+#
+
+from .. import common
+
+
+def test_import_watchdog_defers_heavy_modules():
+    imported_modules = common.get_imported_modules("watchdog")
+
+    assert "watchdog" in imported_modules
+    for name in imported_modules:
+        assert name.split(".")[0] not in common.DEFERRED_MODULES
@@ -0,0 +1,228 @@
+#
+# Copyright 2017-2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+#
+# Licensed under the MIT License. See the LICENSE accompanying this file
+# for the specific language governing permissions and limitations under
+# the License.
+#
+
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+import watchdog
+
+try:
+    import ConfigParser
+except ImportError:
+    from configparser import ConfigParser
+
+TIME = 1700000000
+STATE_FILE = "fs-deadbeef.mnt.20049"
+MOUNTS = {"mnt.20049": watchdog.Mount("127.0.0.1", "/mnt", "nfs4", "", "0", "0")}
+
+
+@pytest.fixture(autouse=True)
+def setup(mocker):
+    mocker.patch("random.uniform", side_effect=lambda low, high: high)
+
+
+def _get_config(jitter_sec=60):
+    try:
+        config = ConfigParser.SafeConfigParser()
+    except AttributeError:
+        config = ConfigParser()
+    config.add_section(watchdog.CONFIG_SECTION)
+    config.set(watchdog.CONFIG_SECTION, watchdog.TASK_JITTER_ITEM, str(jitter_sec))
+    config.set(watchdog.CONFIG_SECTION, "tls_cert_renewal_interval_min", "60")
+    config.set(watchdog.CONFIG_SECTION, "stunnel_health_check_interval_min", "5")
+    return config
+
+
+def _certificate_creation_time(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime(
+        watchdog.CERT_DATETIME_FORMAT
+    )
+
+
+def test_scheduler_pops_due_tasks():
+    scheduler = watchdog.MountTaskScheduler()
+    scheduler.schedule("a", watchdog.CERTIFICATE_TASK, 100)
+    scheduler.schedule("b", watchdog.CERTIFICATE_TASK, 200)
+    scheduler.schedule("a", watchdog.HEALTH_CHECK_TASK, 150)
+
+    scheduler.start_cycle(99)
+    assert not scheduler.is_due("a", watchdog.CERTIFICATE_TASK)
+    assert 100 == scheduler.next_due_time()
+
+    scheduler.start_cycle(150)
+    assert scheduler.is_due("a", watchdog.CERTIFICATE_TASK)
+    assert scheduler.is_due("a", watchdog.HEALTH_CHECK_TASK)
+    assert not scheduler.is_due("b", watchdog.CERTIFICATE_TASK)
+    assert 200 == scheduler.next_due_time()
+
+
+def test_scheduler_unscheduled_task_is_due():
+    scheduler = watchdog.MountTaskScheduler()
+    scheduler.start_cycle(100)
+
+    assert scheduler.is_due("a", watchdog.CERTIFICATE_TASK)
+
+
+def test_scheduler_task_stays_due_until_rescheduled():
+    scheduler = watchdog.MountTaskScheduler()
+    scheduler.schedule("a", watchdog.HEALTH_CHECK_TASK, 100)
+
+    scheduler.start_cycle(100)
+    scheduler.start_cycle(101)
+    assert scheduler.is_due("a", watchdog.HEALTH_CHECK_TASK)
+
+    scheduler.schedule("a", watchdog.HEALTH_CHECK_TASK, 400)
+    assert not scheduler.is_due("a", watchdog.HEALTH_CHECK_TASK)
+
+
+def test_scheduler_reschedule_drops_previous_entry():
+    scheduler = watchdog.MountTaskScheduler()
+    scheduler.schedule("a", watchdog.CERTIFICATE_TASK, 100)
+    scheduler.schedule("a", watchdog.CERTIFICATE_TASK, 300)
+
+    scheduler.start_cycle(200)
+
+    assert not scheduler.is_due("a", watchdog.CERTIFICATE_TASK)
+    assert 300 == scheduler.next_due_time()
+
+
+def test_scheduler_forgets_removed_tunnels():
+    scheduler = watchdog.MountTaskScheduler()
+    scheduler.schedule("a", watchdog.CERTIFICATE_TASK, 100)
+    scheduler.schedule("b", watchdog.CERTIFICATE_TASK, 100)
+
+    scheduler.start_cycle(50, ["b"])
+
+    assert {("b", watchdog.CERTIFICATE_TASK)} == set(scheduler.due_times)
+    assert 100 == scheduler.next_due_time()
+
+
+def test_scheduler_sleep_time_until_next_task():
+    scheduler = watchdog.MountTaskScheduler()
+    assert 10 == scheduler.get_sleep_time_sec(100, 10)
+
+    scheduler.schedule("a", watchdog.HEALTH_CHECK_TASK, 103)
+    assert 3 == scheduler.get_sleep_time_sec(100, 10)
+    assert 10 == scheduler.get_sleep_time_sec(90, 10)
+    assert 0 == scheduler.get_sleep_time_sec(105, 10)
+
+
+def test_schedule_certificate_refresh(mocker):
+    mocker.patch("time.time", return_value=TIME)
+    scheduler = watchdog.MountTaskScheduler()
+    state = {"certificateCreationTime": _certificate_creation_time(TIME - 600)}
+
+    watchdog.schedule_certificate_refresh(_get_config(), scheduler, state, STATE_FILE)
+
+    assert {
+        (STATE_FILE, watchdog.CERTIFICATE_TASK): TIME - 600 + 3600 + 1 + 60
+    } == scheduler.due_times
+
+
+def test_schedule_certificate_refresh_overdue(mocker):
+    mocker.patch("time.time", return_value=TIME)
+    scheduler = watchdog.MountTaskScheduler()
+    state = {"certificateCreationTime": _certificate_creation_time(TIME - 7200)}
+
+    watchdog.schedule_certificate_refresh(_get_config(), scheduler, state, STATE_FILE)
+
+    assert {
+        (STATE_FILE, watchdog.CERTIFICATE_TASK): TIME
+        + watchdog.TASK_RETRY_INTERVAL_SEC
+        + 60
+    } == scheduler.due_times
+
+
+def test_schedule_health_check_jitter_capped(mocker):
+    mocker.patch("time.time", return_value=TIME)
+    scheduler = watchdog.MountTaskScheduler()
+    state = {"mount_time": TIME - 100, "last_stunnel_check_time": TIME - 10}
+
+    watchdog.schedule_health_check(
+        _get_config(jitter_sec=600), scheduler, state, STATE_FILE
+    )
+
+    assert {
+        (STATE_FILE, watchdog.HEALTH_CHECK_TASK): TIME - 10 + 300 + 75
+    } == scheduler.due_times
+
+
+def _setup_check_efs_mounts(mocker, tmpdir, tunnel_running=True):
+    tmpdir.join(STATE_FILE).write(
+        json.dumps(
+            {
+                "pid": 1234,
+                "mountpoint": "/mnt",
+                "mount_time": TIME - 100,
+                "certificate": "/tmp/certificate.pem",
+                "certificateCreationTime": _certificate_creation_time(TIME - 100),
+            }
+        )
+    )
+    mocker.patch("watchdog.get_current_local_nfs_mounts", return_value=MOUNTS)
+    mocker.patch("watchdog.is_mount_stunnel_proc_running", return_value=tunnel_running)
+    mocker.patch("time.time", return_value=TIME)
+    return (
+        mocker.patch("watchdog.check_certificate"),
+        mocker.patch("watchdog.check_stunnel_health"),
+        mocker.patch("watchdog.restart_tls_tunnel"),
+        mocker.patch("watchdog.rewrite_state_file"),
+    )
+
+
+def _check_efs_mounts(tmpdir, scheduler):
+    watchdog.check_efs_mounts(
+        _get_config(), [], 30, 5, str(tmpdir), scheduler=scheduler
+    )
+
+
+def test_check_efs_mounts_runs_due_tasks_only(mocker, tmpdir):
+    check_certificate_mock, health_check_mock, _, rewrite_mock = (
+        _setup_check_efs_mounts(mocker, tmpdir)
+    )
+    scheduler = watchdog.MountTaskScheduler()
+
+    _check_efs_mounts(tmpdir, scheduler)
+    _check_efs_mounts(tmpdir, scheduler)
+
+    assert 1 == check_certificate_mock.call_count
+    assert 1 == health_check_mock.call_count
+    rewrite_mock.assert_not_called()
+    assert {
+        (STATE_FILE, watchdog.CERTIFICATE_TASK): TIME - 100 + 3600 + 1 + 60,
+        (STATE_FILE, watchdog.HEALTH_CHECK_TASK): TIME - 100 + 300 + 60,
+    } == scheduler.due_times
+
+
+def test_check_efs_mounts_checks_certificate_before_restart(mocker, tmpdir):
+    check_certificate_mock, health_check_mock, restart_mock, _ = (
+        _setup_check_efs_mounts(mocker, tmpdir, tunnel_running=False)
+    )
+    scheduler = watchdog.MountTaskScheduler()
+    scheduler.schedule(STATE_FILE, watchdog.CERTIFICATE_TASK, TIME + 3600)
+
+    _check_efs_mounts(tmpdir, scheduler)
+
+    assert 1 == check_certificate_mock.call_count
+    health_check_mock.assert_not_called()
+    assert 1 == restart_mock.call_count
+
+
+def test_check_efs_mounts_rewrites_state_after_inconsistent_unmount_reads(
+    mocker, tmpdir
+):
+    _, _, _, rewrite_mock = _setup_check_efs_mounts(mocker, tmpdir)
+    state = json.loads(tmpdir.join(STATE_FILE).read())
+    state["unmount_count"] = 2
+    tmpdir.join(STATE_FILE).write(json.dumps(state))
+
+    _check_efs_mounts(tmpdir, watchdog.MountTaskScheduler())
+
+    assert 0 == rewrite_mock.call_args[0][0]["unmount_count"]
@@ -0,0 +1,125 @@
+#
+# Copyright 2017-2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+#
+# Licensed under the MIT License. See the LICENSE accompanying this file
+# for the specific language governing permissions and limitations under
+# the License.
+#
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import watchdog
+
+try:
+    import ConfigParser
+except ImportError:
+    from configparser import ConfigParser
+
+MOUNT_NAME = "fs-deadbeef.mnt.20049"
+NOW = datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+INDEX_ENTRY = "V\t%s\t\t%s\tunknown\t/CN=fs-deadbeef.efs.us-east-1.amazonaws.com"
+
+
+def _get_config():
+    try:
+        config = ConfigParser.SafeConfigParser()
+    except AttributeError:
+        config = ConfigParser()
+    config.add_section(watchdog.CONFIG_SECTION)
+    config.set(watchdog.CONFIG_SECTION, "state_file_dir_mode", "0755")
+    return config
+
+
+def _create_ca_database(tmpdir, entries, certificates):
+    tls_paths = watchdog.tls_paths_dictionary(MOUNT_NAME, str(tmpdir))
+    os.makedirs(tls_paths["database_dir"])
+    os.makedirs(tls_paths["certs_dir"])
+    with open(tls_paths["index"], "w") as f:
+        f.write("".join(entry + "\n" for entry in entries))
+    for certificate in certificates:
+        open(os.path.join(tls_paths["certs_dir"], certificate), "w").close()
+    return tls_paths
+
+
+def _read_index(tls_paths):
+    with open(tls_paths["index"]) as f:
+        return f.read().splitlines()
+
+
+def _expiry(**kwargs):
+    return (NOW + timedelta(**kwargs)).strftime(watchdog.CERT_DATETIME_FORMAT)
+
+
+def test_prune_ca_database(tmpdir):
+    valid_entries = [
+        INDEX_ENTRY % (_expiry(hours=1), "0B"),
+        INDEX_ENTRY % (_expiry(hours=2), "0C"),
+    ]
+    tls_paths = _create_ca_database(
+        tmpdir,
+        [INDEX_ENTRY % (_expiry(hours=-1), "0A")] + valid_entries,
+        ["0A.pem", "0B.pem", "0C.pem", "01.pem"],
+    )
+
+    assert 2 == watchdog.prune_ca_database(tls_paths, NOW)
+
+    assert valid_entries == _read_index(tls_paths)
+    assert ["0B.pem", "0C.pem"] == sorted(os.listdir(tls_paths["certs_dir"]))
+    assert not [f for f in os.listdir(tls_paths["database_dir"]) if f.endswith("~")]
+
+
+def test_prune_ca_database_generalized_time_expiry(tmpdir):
+    entries = [
+        INDEX_ENTRY % ("20231231120000Z", "0A"),
+        INDEX_ENTRY % ("20500101120000Z", "0B"),
+    ]
+    tls_paths = _create_ca_database(tmpdir, entries, ["0A.pem", "0B.pem"])
+
+    watchdog.prune_ca_database(tls_paths, NOW)
+
+    assert entries[1:] == _read_index(tls_paths)
+
+
+def test_prune_ca_database_keeps_unparseable_entries(tmpdir):
+    entries = ["unexpected entry", INDEX_ENTRY % ("not-a-date", "0A")]
+    tls_paths = _create_ca_database(tmpdir, entries, ["0A.pem"])
+
+    assert 0 == watchdog.prune_ca_database(tls_paths, NOW)
+
+    assert entries == _read_index(tls_paths)
+    assert ["0A.pem"] == os.listdir(tls_paths["certs_dir"])
+
+
+def test_prune_ca_database_missing_index(tmpdir):
+    tls_paths = watchdog.tls_paths_dictionary(MOUNT_NAME, str(tmpdir))
+
+    assert 0 == watchdog.prune_ca_database(tls_paths, NOW)
+
+
+def test_recreate_certificate_prunes_ca_database(mocker, tmpdir):
+    mocker.patch(
+        "watchdog.get_private_key_path",
+        return_value=str(tmpdir.join("privateKey.pem")),
+    )
+    get_utc_now_mock = mocker.patch("watchdog.get_utc_now")
+    tls_paths = watchdog.tls_paths_dictionary(MOUNT_NAME, str(tmpdir))
+
+    for hours in range(0, 16, 4):
+        get_utc_now_mock.return_value = NOW + timedelta(hours=hours)
+        watchdog.recreate_certificate(
+            _get_config(),
+            MOUNT_NAME,
+            "fs-deadbeef.efs.us-east-1.amazonaws.com",
+            "fs-deadbeef",
+            None,
+            None,
+            "us-east-1",
+            base_path=str(tmpdir),
+        )
+
+    index = _read_index(tls_paths)
+    assert 1 == len(index)
+    assert ["%s.pem" % index[0].split("\t")[3]] == os.listdir(tls_paths["certs_dir"])
+    with open(tls_paths["serial"]) as f:
+        assert 4 == int(f.read(), 16)
@@ -32,6 +32,7 @@ def test_restart_tls_tunnel_without_certificate_path(mocker, tmpdir):
         new_state = json.load(f)
 
     assert PID == new_state["pid"]
+    assert 1 == new_state["tunnel_restart_count"]
 
 
 def test_restart_tls_tunnel_with_certificate_path(mocker, tmpdir):
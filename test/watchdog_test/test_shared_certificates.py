@@ -0,0 +1,253 @@
+#
+# Copyright 2017-2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+#
+# Licensed under the MIT License. See the LICENSE accompanying this file
+# for the specific language governing permissions and limitations under
+# the License.
+#
+
+import json
+from datetime import timedelta
+
+import pytest
+
+import watchdog
+
+try:
+    import ConfigParser
+except ImportError:
+    from configparser import ConfigParser
+
+FS_ID = "fs-deadbeef"
+REGION = "us-east-1"
+
+
+@pytest.fixture(autouse=True)
+def setup(mocker):
+    mocker.patch("watchdog.send_signal_to_running_stunnel_process_group")
+
+
+def _get_config(sharing_enabled=True):
+    try:
+        config = ConfigParser.SafeConfigParser()
+    except AttributeError:
+        config = ConfigParser()
+    config.add_section(watchdog.CONFIG_SECTION)
+    config.set(watchdog.CONFIG_SECTION, "tls_cert_renewal_interval_min", "60")
+    if sharing_enabled is not None:
+        config.set(
+            watchdog.CONFIG_SECTION,
+            watchdog.CERTIFICATE_SHARING_ENABLED_ITEM,
+            str(sharing_enabled).lower(),
+        )
+    return config
+
+
+def _certificate_creation_time(**kwargs):
+    return (watchdog.get_utc_now() + timedelta(**kwargs)).strftime(
+        watchdog.CERT_DATETIME_FORMAT
+    )
+
+
+def _write_state_file(tmpdir, mount, **kwargs):
+    state_file = "%s.%s.20049" % (kwargs.get("fsId", FS_ID), mount)
+    mount_dir = tmpdir.join(state_file + "+").ensure(dir=True)
+    state = {
+        "pid": 1234,
+        "fsId": FS_ID,
+        "region": REGION,
+        "commonName": "%s.efs.%s.amazonaws.com" % (FS_ID, REGION),
+        "awsCredentialsMethod": "podidentity:token",
+        "accessPoint": "fsap-0123456789abcdef0",
+        "mountStateDir": state_file + "+",
+        "certificate": str(mount_dir.join("certificate.pem")),
+        "certificateCreationTime": _certificate_creation_time(hours=-2),
+    }
+    state.update(kwargs)
+    tmpdir.join(state_file).write(json.dumps(state))
+    return state, state_file
+
+
+def _mock_refresh_certificate(mocker):
+    def refresh_certificate(config, state, base_path):
+        with open(state["certificate"], "w") as f:
+            f.write("certificate of %s" % state["mountStateDir"])
+        return _certificate_creation_time()
+
+    return mocker.patch("watchdog.refresh_certificate", side_effect=refresh_certificate)
+
+
+def _check_certificate(config, tmpdir, state, state_file, shared_certificates):
+    watchdog.check_certificate(
+        config,
+        state,
+        str(tmpdir),
+        state_file,
+        base_path=str(tmpdir),
+        shared_certificates=shared_certificates,
+    )
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def test_get_certificate_key():
+    config = _get_config()
+    state = {
+        "fsId": FS_ID,
+        "region": REGION,
+        "commonName": "%s.efs.%s.amazonaws.com" % (FS_ID, REGION),
+        "mountStateDir": "fs-deadbeef.mnt.20049+",
+    }
+    other_mount = dict(state, mountStateDir="fs-deadbeef.other.20050+")
+    access_point = dict(state, accessPoint="fsap-0123456789abcdef0")
+
+    key = watchdog.get_certificate_key(config, state)
+    assert key == watchdog.get_certificate_key(config, other_mount)
+    assert key != watchdog.get_certificate_key(config, access_point)
+
+    config.add_section(watchdog.CLIENT_INFO_SECTION)
+    config.set(watchdog.CLIENT_INFO_SECTION, "source", "k8s")
+    assert key != watchdog.get_certificate_key(config, state)
+
+
+def test_check_certificate_reuses_shared_certificate(mocker, tmpdir):
+    refresh_mock = _mock_refresh_certificate(mocker)
+    config = _get_config()
+    shared_certificates = {}
+    state, state_file = _write_state_file(tmpdir, "mnt")
+    other_state, other_state_file = _write_state_file(tmpdir, "other")
+
+    _check_certificate(config, tmpdir, state, state_file, shared_certificates)
+    _check_certificate(
+        config, tmpdir, other_state, other_state_file, shared_certificates
+    )
+
+    assert 1 == refresh_mock.call_count
+    assert "certificate of %s+" % state_file == _read(other_state["certificate"])
+    written_state = json.loads(tmpdir.join(other_state_file).read())
+    assert state["certificateCreationTime"] == written_state["certificateCreationTime"]
+    assert 2 == watchdog.send_signal_to_running_stunnel_process_group.call_count
+    assert [watchdog.get_certificate_key(config, state)] == list(shared_certificates)
+
+
+def test_check_certificate_different_signing_inputs(mocker, tmpdir):
+    refresh_mock = _mock_refresh_certificate(mocker)
+    config = _get_config()
+    shared_certificates = {}
+    state, state_file = _write_state_file(tmpdir, "mnt")
+    other_state, other_state_file = _write_state_file(
+        tmpdir, "other", accessPoint="fsap-0123456789abcdef1"
+    )
+
+    _check_certificate(config, tmpdir, state, state_file, shared_certificates)
+    _check_certificate(
+        config, tmpdir, other_state, other_state_file, shared_certificates
+    )
+
+    assert 2 == refresh_mock.call_count
+    assert 2 == len(shared_certificates)
+
+
+def test_check_certificate_shared_certificate_due(mocker, tmpdir):
+    refresh_mock = _mock_refresh_certificate(mocker)
+    config = _get_config()
+    state, state_file = _write_state_file(tmpdir, "mnt")
+    shared_certificates = {
+        watchdog.get_certificate_key(config, state): _certificate_creation_time(
+            minutes=-61
+        )
+    }
+
+    _check_certificate(config, tmpdir, state, state_file, shared_certificates)
+
+    assert 1 == refresh_mock.call_count
+    assert state["certificateCreationTime"] == list(shared_certificates.values())[0]
+
+
+def test_check_certificate_shared_certificate_missing(mocker, tmpdir):
+    refresh_mock = _mock_refresh_certificate(mocker)
+    config = _get_config()
+    state, state_file = _write_state_file(tmpdir, "mnt")
+    certificate_key = watchdog.get_certificate_key(config, state)
+    shared_certificates = {certificate_key: _certificate_creation_time()}
+
+    _check_certificate(config, tmpdir, state, state_file, shared_certificates)
+
+    assert 1 == refresh_mock.call_count
+    assert tmpdir.join(
+        watchdog.SHARED_CERTIFICATES_DIR, certificate_key + ".pem"
+    ).exists()
+
+
+@pytest.mark.parametrize("sharing_enabled", [False, None])
+def test_check_certificate_sharing_disabled(mocker, tmpdir, sharing_enabled):
+    refresh_mock = _mock_refresh_certificate(mocker)
+    config = _get_config(sharing_enabled=sharing_enabled)
+    shared_certificates = {}
+    state, state_file = _write_state_file(tmpdir, "mnt")
+    other_state, other_state_file = _write_state_file(tmpdir, "other")
+
+    _check_certificate(config, tmpdir, state, state_file, shared_certificates)
+    _check_certificate(
+        config, tmpdir, other_state, other_state_file, shared_certificates
+    )
+
+    assert 2 == refresh_mock.call_count
+    assert {} == shared_certificates
+    assert not tmpdir.join(watchdog.SHARED_CERTIFICATES_DIR).exists()
+
+
+def test_check_certificate_waits_for_certificate_being_built(mocker, tmpdir):
+    config = _get_config()
+    state, state_file = _write_state_file(tmpdir, "mnt")
+    certificate_refresher = mocker.MagicMock()
+    certificate_refresher.is_building.return_value = True
+
+    watchdog.check_certificate(
+        config,
+        state,
+        str(tmpdir),
+        state_file,
+        base_path=str(tmpdir),
+        certificate_refresher=certificate_refresher,
+        shared_certificates={},
+    )
+
+    certificate_refresher.is_building.assert_called_once_with(
+        watchdog.get_certificate_key(config, state)
+    )
+    certificate_refresher.submit.assert_not_called()
+
+
+def test_certificate_refresher_publishes_certificate(mocker, tmpdir):
+    _mock_refresh_certificate(mocker)
+    config = _get_config()
+    shared_certificates = {}
+    state, state_file = _write_state_file(tmpdir, "mnt")
+    certificate_refresher = watchdog.CertificateRefresher(1)
+    try:
+        watchdog.check_certificate(
+            config,
+            state,
+            str(tmpdir),
+            state_file,
+            base_path=str(tmpdir),
+            certificate_refresher=certificate_refresher,
+            shared_certificates=shared_certificates,
+        )
+        certificate_refresher.pending[state_file].future.result()
+        certificate_refresher.collect()
+    finally:
+        certificate_refresher.executor.shutdown(wait=True)
+
+    certificate_key = watchdog.get_certificate_key(config, state)
+    written_state = json.loads(tmpdir.join(state_file).read())
+    assert {
+        certificate_key: written_state["certificateCreationTime"]
+    } == shared_certificates
+    assert "certificate of %s+" % state_file == _read(
+        str(tmpdir.join(watchdog.SHARED_CERTIFICATES_DIR, certificate_key + ".pem"))
+    )
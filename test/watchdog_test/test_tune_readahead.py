@@ -0,0 +1,230 @@
+#
+# Copyright 2017-2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+#
+# Licensed under the MIT License. See the LICENSE accompanying this file
+# for the specific language governing permissions and limitations under
+# the License.
+#
+
+import json
+
+import pytest
+
+import watchdog
+
+try:
+    import ConfigParser
+except ImportError:
+    from configparser import ConfigParser
+
+MOUNTINFO = "36 22 0:53 / /mnt rw,relatime shared:20 - nfs4 127.0.0.1:/ rw,vers=4.1\n"
+
+MOUNTSTATS = """device /dev/nvme0n1p1 mounted on / with fstype xfs
+device 127.0.0.1:/ mounted on /mnt with fstype nfs4 statvers=1.1
+\topts:\trw,vers=4.1,rsize=1048576,wsize=1048576
+\tper-op statistics
+\t        NULL: 0 0 0 0 0 0 0 0
+\t        READ: %d %d 0 0 %d 0 0 0 0
+\t       WRITE: 3 3 0 1000 400 0 1 2 0
+"""
+
+MIN_KB = 128
+MAX_KB = 15360
+
+
+@pytest.fixture(autouse=True)
+def setup(mocker, tmpdir):
+    mocker.patch(
+        "watchdog.NFS_READAHEAD_CONFIG_PATH_FORMAT",
+        str(tmpdir.join("bdi")) + "/%s/read_ahead_kb",
+    )
+
+
+def _get_config(enabled=True, stable_samples=2):
+    try:
+        config = ConfigParser.SafeConfigParser()
+    except AttributeError:
+        config = ConfigParser()
+    config.add_section(watchdog.CONFIG_SECTION)
+    config.set(
+        watchdog.CONFIG_SECTION,
+        watchdog.READAHEAD_TUNING_ENABLED_ITEM,
+        str(enabled).lower(),
+    )
+    config.set(watchdog.CONFIG_SECTION, watchdog.READAHEAD_TUNING_INTERVAL_ITEM, "10")
+    config.set(watchdog.CONFIG_SECTION, watchdog.READAHEAD_TUNING_MIN_KB_ITEM, "128")
+    config.set(
+        watchdog.CONFIG_SECTION, watchdog.READAHEAD_TUNING_MAX_KB_ITEM, str(MAX_KB)
+    )
+    config.set(
+        watchdog.CONFIG_SECTION,
+        watchdog.READAHEAD_TUNING_STABLE_SAMPLES_ITEM,
+        str(stable_samples),
+    )
+    return config
+
+
+class Mount(object):
+    def __init__(self, tmpdir, readahead_kb=None, current_readahead_kb=1024):
+        self.tmpdir = tmpdir
+        self.state_file_dir = str(tmpdir.join("state"))
+        tmpdir.join("state", watchdog.READAHEAD_STATE_DIR, "mnt").write(
+            json.dumps(
+                {"mountpoint": "/mnt", "rsize": 1048576, "readahead_kb": readahead_kb}
+            ),
+            ensure=True,
+        )
+        tmpdir.join("bdi", "0:53", "read_ahead_kb").write(
+            "%d\n" % current_readahead_kb, ensure=True
+        )
+        tmpdir.join("mountinfo").write(MOUNTINFO)
+        self.read_ops = 0
+        self.read_bytes = 0
+        self.tuning_state = {}
+        self.time = 1000
+
+    def sample(self, config, read_ops, read_bytes_each):
+        self.read_ops += read_ops
+        self.read_bytes += read_ops * read_bytes_each
+        self.tmpdir.join("mountstats").write(
+            MOUNTSTATS % (self.read_ops, self.read_ops, self.read_bytes)
+        )
+        self.time += 10
+        watchdog.tune_readahead(
+            config,
+            self.tuning_state,
+            self.state_file_dir,
+            str(self.tmpdir.join("mountinfo")),
+            str(self.tmpdir.join("mountstats")),
+            current_time=self.time,
+        )
+
+    @property
+    def readahead_kb(self):
+        return int(self.tmpdir.join("bdi", "0:53", "read_ahead_kb").read())
+
+
+def test_get_nfs_read_stats(tmpdir):
+    tmpdir.join("mountstats").write(MOUNTSTATS % (10, 11, 4096))
+
+    assert {"/mnt": (10, 4096)} == watchdog.get_nfs_read_stats(
+        str(tmpdir.join("mountstats"))
+    )
+
+
+def test_classify_read_workload():
+    assert "sequential" == watchdog.classify_read_workload(100, 100 * 1048576, 1048576)
+    assert "random" == watchdog.classify_read_workload(100, 100 * 4096, 1048576)
+    assert watchdog.classify_read_workload(100, 100 * 262144, 1048576) is None
+    assert watchdog.classify_read_workload(10, 10 * 4096, 1048576) is None
+
+
+def test_classify_read_workload_small_readahead():
+    assert "sequential" == watchdog.classify_read_workload(
+        100, 100 * 131072, 1048576, MIN_KB
+    )
+    assert "random" == watchdog.classify_read_workload(
+        100, 100 * 65536, 1048576, MIN_KB
+    )
+    assert watchdog.classify_read_workload(100, 100 * 131072, 1048576, 1024) is None
+
+
+def test_tune_readahead_sequential_reads(tmpdir):
+    mount = Mount(tmpdir)
+    config = _get_config()
+
+    mount.sample(config, 0, 0)
+    mount.sample(config, 1000, 1048576)
+    assert 1024 == mount.readahead_kb
+
+    mount.sample(config, 1000, 1048576)
+    assert MAX_KB == mount.readahead_kb
+
+
+def test_tune_readahead_sequential_reads_after_random_reads(tmpdir):
+    mount = Mount(tmpdir)
+    config = _get_config()
+
+    for _ in range(3):
+        mount.sample(config, 1000, 4096)
+    assert MIN_KB == mount.readahead_kb
+
+    # With read_ahead_kb at its lower bound, sequential reads are READs of about read_ahead_kb
+    for _ in range(2):
+        mount.sample(config, 1000, MIN_KB * 1024)
+    assert MAX_KB == mount.readahead_kb
+
+
+def test_tune_readahead_random_reads(tmpdir):
+    mount = Mount(tmpdir)
+    config = _get_config()
+
+    for _ in range(3):
+        mount.sample(config, 1000, 4096)
+
+    assert MIN_KB == mount.readahead_kb
+
+
+def test_tune_readahead_hysteresis(tmpdir):
+    mount = Mount(tmpdir)
+    config = _get_config(stable_samples=3)
+
+    mount.sample(config, 0, 0)
+    mount.sample(config, 1000, 4096)
+    mount.sample(config, 1000, 4096)
+    mount.sample(config, 1000, 1048576)
+    mount.sample(config, 1000, 4096)
+    mount.sample(config, 1000, 4096)
+    assert 1024 == mount.readahead_kb
+
+    mount.sample(config, 1000, 4096)
+    assert MIN_KB == mount.readahead_kb
+
+
+def test_tune_readahead_idle_mount(tmpdir):
+    mount = Mount(tmpdir)
+    config = _get_config()
+
+    for _ in range(5):
+        mount.sample(config, 1, 4096)
+
+    assert 1024 == mount.readahead_kb
+
+
+def test_tune_readahead_readahead_kb_option(tmpdir):
+    mount = Mount(tmpdir, readahead_kb=2048, current_readahead_kb=2048)
+    config = _get_config()
+
+    for _ in range(3):
+        mount.sample(config, 1000, 4096)
+
+    assert 2048 == mount.readahead_kb
+
+
+def test_tune_readahead_disabled(tmpdir):
+    mount = Mount(tmpdir)
+    config = _get_config(enabled=False)
+
+    for _ in range(3):
+        mount.sample(config, 1000, 4096)
+
+    assert 1024 == mount.readahead_kb
+    assert {} == mount.tuning_state
+
+
+def test_tune_readahead_interval(tmpdir):
+    mount = Mount(tmpdir)
+    config = _get_config()
+    mount.sample(config, 0, 0)
+
+    sample_time = mount.tuning_state["sample_time"]
+    watchdog.tune_readahead(
+        config,
+        mount.tuning_state,
+        mount.state_file_dir,
+        str(tmpdir.join("mountinfo")),
+        str(tmpdir.join("mountstats")),
+        current_time=sample_time + 5,
+    )
+
+    assert sample_time == mount.tuning_state["sample_time"]
@@ -0,0 +1,204 @@
+#
+# Copyright 2017-2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+#
+# Licensed under the MIT License. See the LICENSE accompanying this file
+# for the specific language governing permissions and limitations under
+# the License.
+#
+
+import json
+import logging
+
+import pytest
+
+import watchdog
+
+try:
+    import ConfigParser
+except ImportError:
+    from configparser import ConfigParser
+
+TIME = 1700000000
+STATE_FILE = "fs-deadbeef.mnt.20049"
+MOUNTS = {"mnt.20049": watchdog.Mount("127.0.0.1", "/mnt", "nfs4", "", "0", "0")}
+
+
+@pytest.fixture(autouse=True)
+def setup(mocker):
+    mocker.patch("watchdog.rewrite_state_file")
+
+
+def _get_config(quarantine_flaps=4):
+    try:
+        config = ConfigParser.SafeConfigParser()
+    except AttributeError:
+        config = ConfigParser()
+    config.add_section(watchdog.CONFIG_SECTION)
+    config.set(watchdog.CONFIG_SECTION, watchdog.RESTART_BACKOFF_INITIAL_ITEM, "2")
+    config.set(watchdog.CONFIG_SECTION, watchdog.RESTART_BACKOFF_MAX_ITEM, "10")
+    config.set(watchdog.CONFIG_SECTION, watchdog.RESTART_STABLE_ITEM, "60")
+    config.set(
+        watchdog.CONFIG_SECTION,
+        watchdog.RESTART_QUARANTINE_FLAPS_ITEM,
+        str(quarantine_flaps),
+    )
+    return config
+
+
+def _is_restart_due(config, state, current_time):
+    return watchdog.is_tunnel_restart_due(
+        config, state, "/tmp", STATE_FILE, current_time
+    )
+
+
+def test_get_restart_backoff_sec():
+    config = _get_config()
+
+    assert [0, 0, 2, 4, 8, 10, 10] == [
+        watchdog.get_restart_backoff_sec(config, flap_count) for flap_count in range(7)
+    ]
+    assert 10 == watchdog.get_restart_backoff_sec(config, 0, quarantined=True)
+    assert 10 == watchdog.get_restart_backoff_sec(config, 10000)
+
+
+def test_is_tunnel_restart_due_after_stable_run():
+    state = {"mount_time": TIME - 3600, "tunnel_flap_count": 3}
+
+    assert _is_restart_due(_get_config(), state, TIME)
+
+    assert 0 == state["tunnel_flap_count"]
+    assert TIME == state["tunnel_start_time"]
+    assert "tunnel_down_time" not in state
+    assert "next_restart_time" not in state
+
+
+def test_is_tunnel_restart_due_backoff(caplog):
+    caplog.set_level(logging.WARNING)
+    config = _get_config()
+    state = {"mount_time": TIME}
+
+    # The first exit shortly after the start is restarted at once
+    assert _is_restart_due(config, state, TIME + 1)
+    assert 1 == state["tunnel_flap_count"]
+
+    # The second waits initial_sec
+    assert not _is_restart_due(config, state, TIME + 2)
+    assert TIME + 4 == state["next_restart_time"]
+    assert not _is_restart_due(config, state, TIME + 3)
+    assert _is_restart_due(config, state, TIME + 4)
+
+    # The third waits twice as long
+    assert not _is_restart_due(config, state, TIME + 5)
+    assert TIME + 9 == state["next_restart_time"]
+    assert 3 == state["tunnel_flaps_total"]
+    assert "restarting it in 4 sec" in caplog.text
+    # The state file is only rewritten when the tunnel is found down and when it is restarted
+    assert 4 == watchdog.rewrite_state_file.call_count
+
+
+def test_is_tunnel_restart_due_quarantine(caplog):
+    caplog.set_level(logging.DEBUG)
+    config = _get_config(quarantine_flaps=3)
+    state = {"mount_time": TIME}
+    current_time = TIME
+
+    for _ in range(3):
+        current_time += 1
+        while not _is_restart_due(config, state, current_time):
+            current_time += 1
+
+    assert state["tunnel_quarantined"]
+    assert "quarantining it: it is restarted every 10 sec" in caplog.text
+
+    # A quarantined tunnel waits the longest backoff
+    assert not _is_restart_due(config, state, current_time + 1)
+    assert current_time + 11 == state["next_restart_time"]
+
+
+def test_is_tunnel_restart_due_lifts_quarantine_after_stable_run():
+    state = {
+        "tunnel_start_time": TIME - 120,
+        "tunnel_flap_count": 5,
+        "tunnel_quarantined": True,
+    }
+
+    assert _is_restart_due(_get_config(), state, TIME)
+
+    assert "tunnel_quarantined" not in state
+
+
+def test_check_tunnel_flaps():
+    state = {
+        "tunnel_start_time": TIME - 30,
+        "tunnel_flap_count": 5,
+        "tunnel_quarantined": True,
+    }
+
+    watchdog.check_tunnel_flaps(_get_config(), state, "/tmp", STATE_FILE, TIME)
+    assert state["tunnel_quarantined"]
+    watchdog.rewrite_state_file.assert_not_called()
+
+    watchdog.check_tunnel_flaps(_get_config(), state, "/tmp", STATE_FILE, TIME + 30)
+    assert "tunnel_quarantined" not in state
+    assert "tunnel_flap_count" not in state
+    assert 1 == watchdog.rewrite_state_file.call_count
+
+
+def test_check_tunnel_flaps_started_elsewhere():
+    state = {
+        "tunnel_start_time": TIME - 30,
+        "tunnel_down_time": TIME - 5,
+        "next_restart_time": TIME + 5,
+        "tunnel_flap_count": 2,
+    }
+
+    watchdog.check_tunnel_flaps(_get_config(), state, "/tmp", STATE_FILE, TIME)
+
+    assert {"tunnel_start_time": TIME - 30} == state
+
+
+def _setup_check_efs_mounts(mocker, tmpdir, state):
+    tmpdir.join(STATE_FILE).write(json.dumps(state))
+    mocker.patch("watchdog.get_current_local_nfs_mounts", return_value=MOUNTS)
+    mocker.patch("watchdog.is_mount_stunnel_proc_running", return_value=False)
+    mocker.patch("time.time", return_value=TIME)
+    return mocker.patch("watchdog.restart_tls_tunnel")
+
+
+def test_check_efs_mounts_waits_for_restart_backoff(mocker, tmpdir):
+    restart_mock = _setup_check_efs_mounts(
+        mocker,
+        tmpdir,
+        {
+            "pid": 1234,
+            "mountpoint": "/mnt",
+            "mount_time": TIME - 3600,
+            "tunnel_down_time": TIME - 1,
+            "next_restart_time": TIME + 1,
+            "tunnel_flap_count": 2,
+        },
+    )
+
+    watchdog.check_efs_mounts(_get_config(), [], 30, 5, str(tmpdir))
+
+    restart_mock.assert_not_called()
+
+
+def test_check_efs_mounts_restarts_when_due(mocker, tmpdir):
+    restart_mock = _setup_check_efs_mounts(
+        mocker,
+        tmpdir,
+        {
+            "pid": 1234,
+            "mountpoint": "/mnt",
+            "mount_time": TIME - 3600,
+            "tunnel_down_time": TIME - 2,
+            "next_restart_time": TIME,
+            "tunnel_flap_count": 2,
+        },
+    )
+
+    watchdog.check_efs_mounts(_get_config(), [], 30, 5, str(tmpdir))
+
+    assert 1 == restart_mock.call_count
+    assert TIME == restart_mock.call_args[0][1]["tunnel_start_time"]
@@ -0,0 +1,222 @@
+#
+# Copyright 2017-2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+#
+# Licensed under the MIT License. See the LICENSE accompanying this file
+# for the specific language governing permissions and limitations under
+# the License.
+#
+
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import watchdog
+
+try:
+    import ConfigParser
+except ImportError:
+    from configparser import ConfigParser
+
+TIME = 1700000000
+STATE_FILE = "fs-deadbeef.mnt.20049"
+
+
+@pytest.fixture(autouse=True)
+def setup(mocker):
+    mocker.patch("watchdog.is_pid_running", return_value=True)
+    mocker.patch(
+        "watchdog.get_utc_now",
+        return_value=datetime.fromtimestamp(TIME, timezone.utc),
+    )
+
+
+def _get_config(tmpdir, enabled=True):
+    try:
+        config = ConfigParser.SafeConfigParser()
+    except AttributeError:
+        config = ConfigParser()
+    config.add_section(watchdog.CONFIG_SECTION)
+    config.set(
+        watchdog.CONFIG_SECTION, watchdog.STATUS_ENABLED_ITEM, str(enabled).lower()
+    )
+    config.set(watchdog.CONFIG_SECTION, watchdog.STATUS_INTERVAL_ITEM, "10")
+    config.set(
+        watchdog.CONFIG_SECTION,
+        watchdog.STATUS_FILE_ITEM,
+        str(tmpdir.join("status", "watchdog-status.json")),
+    )
+    config.set(
+        watchdog.CONFIG_SECTION,
+        watchdog.STATUS_METRICS_FILE_ITEM,
+        str(tmpdir.join("status", "watchdog-status.prom")),
+    )
+    return config
+
+
+def _write_state_file(tmpdir, state_file=STATE_FILE, **kwargs):
+    state = {
+        "pid": 1234,
+        "fsId": "fs-deadbeef",
+        "mountpoint": "/mnt",
+        "mount_time": TIME - 100,
+        "certificateCreationTime": (
+            datetime.fromtimestamp(TIME, timezone.utc) - timedelta(seconds=600)
+        ).strftime(watchdog.CERT_DATETIME_FORMAT),
+    }
+    state.update(kwargs)
+    tmpdir.join("state", state_file).write(json.dumps(state), ensure=True)
+
+
+def _write_status(config, tmpdir, status_state, cycle_duration_sec, current_time):
+    watchdog.write_watchdog_status(
+        config,
+        status_state,
+        cycle_duration_sec,
+        str(tmpdir.join("state")),
+        current_time=current_time,
+    )
+
+
+def _read_status(tmpdir):
+    return json.loads(tmpdir.join("status", "watchdog-status.json").read())
+
+
+def test_write_watchdog_status(tmpdir):
+    _write_state_file(
+        tmpdir,
+        tunnel_start_time=TIME - 30,
+        tunnel_restart_count=2,
+        last_stunnel_check_time=TIME - 5,
+        last_health_check_latency_sec=0.012,
+        last_health_check_passed=True,
+        last_certificate_refresh_duration_sec=0.25,
+    )
+    _write_state_file(
+        tmpdir, "fs-cafebabe.data.20050", fsId="fs-cafebabe", unmount_time=TIME - 1
+    )
+
+    watchdog.write_watchdog_status(
+        _get_config(tmpdir),
+        {},
+        0.5,
+        str(tmpdir.join("state")),
+        current_time=TIME,
+        step_timings={"check_efs_mounts": 0.4, "read_config": 0.0001},
+    )
+
+    status = _read_status(tmpdir)
+    assert 0.5 == status["cycle_duration_sec"]
+    assert {"check_efs_mounts": 0.4, "read_config": 0.0} == status["cycle_steps"]
+    assert ["fs-cafebabe.data.20050", STATE_FILE] == [
+        t["state_file"] for t in status["tunnels"]
+    ]
+    unmounted, tunnel = status["tunnels"]
+    assert unmounted["unmounted"]
+    assert not unmounted["running"]
+    assert unmounted["uptime_sec"] is None
+    assert "fs-deadbeef" == tunnel["fs_id"]
+    assert tunnel["running"]
+    assert 30 == tunnel["uptime_sec"]
+    assert 2 == tunnel["restart_count"]
+    assert 0.012 == tunnel["last_health_check_latency_sec"]
+    assert 600 == tunnel["certificate_age_sec"]
+    assert 0.25 == tunnel["last_certificate_refresh_duration_sec"]
+
+    metrics = tmpdir.join("status", "watchdog-status.prom").read()
+    labels = 'fs_id="fs-deadbeef",mountpoint="/mnt",state_file="%s"' % STATE_FILE
+    assert "efs_watchdog_tunnels 2" in metrics
+    assert (
+        'efs_watchdog_cycle_step_duration_seconds{step="check_efs_mounts"} 0.400'
+        in metrics
+    )
+    assert "efs_watchdog_tunnel_up{%s} 1.0" % labels in metrics
+    assert "efs_watchdog_tunnel_restarts_total{%s} 2.0" % labels in metrics
+    assert "efs_watchdog_health_check_latency_seconds{%s} 0.012" % labels in metrics
+    assert "efs_watchdog_certificate_age_seconds{%s} 600.0" % labels in metrics
+
+
+def test_write_watchdog_status_uptime_from_mount_time(tmpdir):
+    _write_state_file(tmpdir)
+
+    _write_status(_get_config(tmpdir), tmpdir, {}, 0.1, TIME)
+
+    tunnel = _read_status(tmpdir)["tunnels"][0]
+    assert 100 == tunnel["uptime_sec"]
+    assert 0 == tunnel["restart_count"]
+    assert tunnel["last_health_check_latency_sec"] is None
+    assert tunnel["state_dir_size_bytes"] is None
+    assert not tunnel["quarantined"]
+    assert 0 == tunnel["flaps_total"]
+
+
+def test_write_watchdog_status_state_dir_usage(tmpdir):
+    _write_state_file(tmpdir, mountStateDir=STATE_FILE + "+")
+    tmpdir.join("state", STATE_FILE + "+", "certificate.pem").write(
+        "a" * 10, ensure=True
+    )
+    tmpdir.join("state", STATE_FILE + "+", "certs", "01.pem").write(
+        "b" * 5, ensure=True
+    )
+
+    _write_status(_get_config(tmpdir), tmpdir, {}, 0.1, TIME)
+
+    tunnel = _read_status(tmpdir)["tunnels"][0]
+    assert 15 == tunnel["state_dir_size_bytes"]
+    assert 2 == tunnel["state_dir_files"]
+    metrics = tmpdir.join("status", "watchdog-status.prom").read()
+    labels = 'fs_id="fs-deadbeef",mountpoint="/mnt",state_file="%s"' % STATE_FILE
+    assert "efs_watchdog_state_dir_size_bytes{%s} 15.0" % labels in metrics
+
+
+def test_write_watchdog_status_quarantined_tunnel(tmpdir):
+    _write_state_file(
+        tmpdir,
+        tunnel_flap_count=8,
+        tunnel_flaps_total=9,
+        tunnel_quarantined=True,
+        next_restart_time=TIME + 300,
+    )
+
+    _write_status(_get_config(tmpdir), tmpdir, {}, 0.1, TIME)
+
+    tunnel = _read_status(tmpdir)["tunnels"][0]
+    assert tunnel["quarantined"]
+    assert 8 == tunnel["flap_count"]
+    assert TIME + 300 == tunnel["next_restart_time"]
+    metrics = tmpdir.join("status", "watchdog-status.prom").read()
+    labels = 'fs_id="fs-deadbeef",mountpoint="/mnt",state_file="%s"' % STATE_FILE
+    assert "efs_watchdog_tunnel_quarantined{%s} 1.0" % labels in metrics
+    assert "efs_watchdog_tunnel_flaps_total{%s} 9.0" % labels in metrics
+
+
+def test_write_watchdog_status_interval(tmpdir):
+    config = _get_config(tmpdir)
+    status_state = {}
+
+    _write_status(config, tmpdir, status_state, 0.1, TIME)
+    _write_status(config, tmpdir, status_state, 2.5, TIME + 5)
+    assert 0.1 == _read_status(tmpdir)["max_cycle_duration_sec"]
+
+    _write_status(config, tmpdir, status_state, 0.2, TIME + 10)
+    status = _read_status(tmpdir)
+    assert 0.2 == status["cycle_duration_sec"]
+    assert 2.5 == status["max_cycle_duration_sec"]
+    assert [] == status["tunnels"]
+
+
+def test_write_watchdog_status_disabled(tmpdir):
+    _write_state_file(tmpdir)
+
+    _write_status(_get_config(tmpdir, enabled=False), tmpdir, {}, 0.1, TIME)
+
+    assert not tmpdir.join("status").exists()
+
+
+def test_write_watchdog_status_skips_corrupt_state_file(tmpdir):
+    _write_state_file(tmpdir)
+    tmpdir.join("state", "fs-cafebabe.data.20050").write("{")
+
+    _write_status(_get_config(tmpdir), tmpdir, {}, 0.1, TIME)
+
+    assert [STATE_FILE] == [t["state_file"] for t in _read_status(tmpdir)["tunnels"]]